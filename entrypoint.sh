@@ -3,6 +3,16 @@
 # Create data directory if it doesn't exist
 mkdir -p /app/data
 
+# Use the embedding model baked into the image (PREBAKE_EMBEDDING_MODEL), if any
+if [ -z "$EMBEDDING_MODEL_DIR" ] && [ -f /opt/models/embedding/MANIFEST.json ]; then
+    export EMBEDDING_MODEL_DIR=/opt/models/embedding
+fi
+
+# Load the ONNX export saved with the model (fetch_embedding_model.py --onnx), so it is verified with it
+if [ -z "$EMBEDDING_ONNX_DIR" ] && [ -n "$EMBEDDING_MODEL_DIR" ] && [ -f "$EMBEDDING_MODEL_DIR/onnx/embedding_config.json" ]; then
+    export EMBEDDING_ONNX_DIR="$EMBEDDING_MODEL_DIR/onnx"
+fi
+
 # Set PYTHONPATH for miachat module imports
 export PYTHONPATH=/app/src:$PYTHONPATH
 
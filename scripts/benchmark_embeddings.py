@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark the embedding backends on this host's CPU.
+
+For each backend, reports ingestion throughput (texts/s when encoding large
+batches of chunk-sized texts), p50/p99 latency of single-query encodes, and
+cosine agreement with the PyTorch embeddings, so EMBEDDING_BACKEND and
+EMBEDDING_ONNX_QUANTIZE can be chosen from data. Missing ONNX exports are
+written to EMBEDDING_ONNX_DIR (or ./data/onnx/<model>) first.
+
+Usage:
+    python scripts/benchmark_embeddings.py
+    python scripts/benchmark_embeddings.py --backends torch onnx-int8 --texts 5000 --batch-size 64
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from sentence_transformers import SentenceTransformer
+
+from miachat.api.core.onnx_embeddings import OnnxEmbeddingModel, export_onnx_model, onnx_model_dir
+
+WORDS = ("the project meeting budget notes character story memory garden letter travel schedule "
+         "music coffee weather friend dinner report idea question answer").split()
+
+
+def make_texts(n, words_per_text, seed):
+    """Random word sequences with roughly the length of document chunks or chat queries."""
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=rng.integers(words_per_text // 2, words_per_text + 1)))
+            for _ in range(n)]
+
+
+def load_backend(name, model_name, torch_model):
+    """Model object for a backend name: torch, onnx or onnx-int8."""
+    if name == 'torch':
+        return torch_model
+    quantize = name == 'onnx-int8'
+    directory = onnx_model_dir(model_name)
+    export_onnx_model(torch_model, directory, quantize=quantize, model_name=model_name)
+    return OnnxEmbeddingModel(directory, quantize=quantize)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--backends', nargs='+', choices=['torch', 'onnx', 'onnx-int8'],
+                        default=['torch', 'onnx', 'onnx-int8'])
+    parser.add_argument('--texts', type=int, default=2000, help="Chunks encoded for the ingestion figure")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--queries', type=int, default=200, help="Single-query encodes for the latency figures")
+    args = parser.parse_args()
+
+    chunks = make_texts(args.texts, 150, seed=0)
+    queries = make_texts(args.queries, 12, seed=1)
+    torch_model = SentenceTransformer(args.model, device='cpu')
+    reference = torch_model.encode(queries, normalize_embeddings=True)
+
+    print(f"{args.model}: {args.texts} chunks in batches of {args.batch_size}, {args.queries} single queries\n")
+    print(f"{'backend':<12}{'texts/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'min cos':>10}{'mean cos':>10}")
+    for name in args.backends:
+        model = load_backend(name, args.model, torch_model)
+        model.encode(queries[:4], normalize_embeddings=True)  # Warm-up
+
+        started = time.perf_counter()
+        model.encode(chunks, normalize_embeddings=True, batch_size=args.batch_size)
+        throughput = len(chunks) / (time.perf_counter() - started)
+
+        latencies, embeddings = [], []
+        for query in queries:
+            started = time.perf_counter()
+            embeddings.append(model.encode([query], normalize_embeddings=True)[0])
+            latencies.append((time.perf_counter() - started) * 1000)
+        agreement = np.sum(np.array(embeddings) * reference, axis=1)
+
+        print(f"{name:<12}{throughput:>10.1f}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 99):>10.2f}{agreement.min():>10.4f}{agreement.mean():>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark approximate index settings against the exact flat index.
+
+Reports recall@k (share of the flat index's top-k found by the approximate
+index) and p50/p99 single-query latency for each setting, so the FAISS_ANN_*
+variables can be chosen from data.
+
+Usage:
+    python scripts/benchmark_vector_index.py --vectors 100000 --k 10
+    python scripts/benchmark_vector_index.py --kinds hnsw --ef-search 32 64 128
+    python scripts/benchmark_vector_index.py --kinds ivf ivfpq --nprobe 8 16 32
+    python scripts/benchmark_vector_index.py --kinds flat hnsw --quantization sq8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from miachat.api.core.vector_index import AnnConfig, IndexPartition
+
+
+def make_vectors(n, dimension, clusters, seed):
+    """Unit vectors drawn around random centres, a rough stand-in for text embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=n)] + 0.6 * rng.standard_normal((n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_queries(partition, queries, k):
+    """Search each query alone; returns (hit lists, latencies in ms)."""
+    hits, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results = partition.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits.append([chunk_id for chunk_id, _ in results])
+    return hits, np.array(latencies)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--vectors', type=int, default=100000)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--kinds', nargs='+', choices=['flat', 'hnsw', 'ivf', 'ivfpq'], default=['hnsw', 'ivf', 'ivfpq'])
+    parser.add_argument('--ef-search', nargs='+', type=int, default=[16, 32, 64, 128])
+    parser.add_argument('--nprobe', nargs='+', type=int, default=[4, 8, 16, 32])
+    parser.add_argument('--quantization', choices=['none', 'sq8', 'sq4'], default=None,
+                        help="Codes for the compared indexes (default: FAISS_QUANTIZATION)")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors + args.queries, args.dimension, clusters=max(1, args.vectors // 500), seed=0)
+    data, queries = vectors[:args.vectors], vectors[args.vectors:]
+    chunk_ids = [f"c{i}" for i in range(args.vectors)]
+    base = AnnConfig.from_env()
+    if args.quantization:
+        base = replace(base, quantization=args.quantization)
+
+    with tempfile.TemporaryDirectory() as directory:
+        flat = IndexPartition(0, args.dimension, directory, private=True, ann=replace(base, quantization='none'))
+        flat.add(chunk_ids, data)
+        truth, latencies = run_queries(flat, queries, args.k)
+        print(f"{args.vectors} vectors x {args.dimension} dims, {args.queries} queries, k={args.k}\n")
+        print(f"{'index':<24}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}{'build s':>10}{'MB':>10}")
+        print(f"{'flat':<24}{1.0:>10.3f}{np.percentile(latencies, 50):>10.3f}"
+              f"{np.percentile(latencies, 99):>10.3f}{'-':>10}{flat.memory_bytes() / 2**20:>10.1f}")
+
+        for kind in args.kinds:
+            partition = IndexPartition(0, args.dimension, directory, private=True, ann=base)
+            partition.add(chunk_ids, data)
+            started = time.perf_counter()
+            partition.convert(kind)
+            build_seconds = time.perf_counter() - started
+
+            if kind == 'hnsw':
+                settings = [('efSearch', v) for v in args.ef_search]
+            elif kind == 'flat':
+                settings = [('codec', partition.codec)]
+            else:
+                settings = [('nprobe', v) for v in args.nprobe]
+            for name, value in settings:
+                if name != 'codec':
+                    partition.tune(replace(base, **{'ef_search' if name == 'efSearch' else 'nprobe': value}))
+                hits, latencies = run_queries(partition, queries, args.k)
+                recall = np.mean([len(set(h) & set(t)) / len(t) for h, t in zip(hits, truth)])
+                print(f"{f'{kind} {name}={value}':<24}{recall:>10.3f}{np.percentile(latencies, 50):>10.3f}"
+                      f"{np.percentile(latencies, 99):>10.3f}{build_seconds:>10.1f}{partition.memory_bytes() / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Download the embedding model once and save it as a pinned local artifact.
+
+Saves the model into a directory and records its content hash in
+MANIFEST.json. Point EMBEDDING_MODEL_DIR at the directory (and optionally pin
+EMBEDDING_MODEL_SHA256 to the printed hash) to load it offline. Used by the
+Dockerfile when built with --build-arg PREBAKE_EMBEDDING_MODEL=true.
+
+Usage:
+    python scripts/fetch_embedding_model.py --output ./models/all-MiniLM-L6-v2
+    python scripts/fetch_embedding_model.py --model all-MiniLM-L6-v2 --output /opt/models/embedding --onnx
+    python scripts/fetch_embedding_model.py --output ./models/all-MiniLM-L6-v2 --verify
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from miachat.api.core.model_artifacts import ModelArtifactError, fetch_model, verify_model_dir, write_manifest
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--output', required=True, help="Directory to save the model in")
+    parser.add_argument('--onnx', action='store_true',
+                        help="Also write the ONNX export (and int8 copy) to <output>/onnx")
+    parser.add_argument('--verify', action='store_true', help="Only verify an existing directory")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.verify:
+        try:
+            print(verify_model_dir(args.output))
+        except ModelArtifactError as e:
+            sys.exit(f"Verification failed: {e}")
+        return
+
+    sha256 = fetch_model(args.model, args.output)
+    if args.onnx:
+        from sentence_transformers import SentenceTransformer
+        from miachat.api.core.onnx_embeddings import export_onnx_model
+        export_onnx_model(SentenceTransformer(args.output, device='cpu'), os.path.join(args.output, 'onnx'),
+                          quantize=True, model_name=args.model)
+        # The export lives inside the model directory, so re-pin the hash
+        sha256 = write_manifest(args.output, args.model)
+
+    print(f"EMBEDDING_MODEL_DIR={os.path.abspath(args.output)}")
+    print(f"EMBEDDING_MODEL_SHA256={sha256}")
+    if args.onnx:
+        print(f"EMBEDDING_ONNX_DIR={os.path.abspath(os.path.join(args.output, 'onnx'))}")
+
+
+if __name__ == "__main__":
+    main()
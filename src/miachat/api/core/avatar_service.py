@@ -15,11 +15,12 @@ import os
 import re
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import TYPE_CHECKING, Optional, Dict, Any, Tuple
 from io import BytesIO
 import uuid
 
-from PIL import Image, ImageDraw, ImageOps
+if TYPE_CHECKING:
+    from PIL import Image  # Imported by the methods that process images
 from fastapi import UploadFile, HTTPException
 
 logger = logging.getLogger(__name__)
@@ -124,6 +125,8 @@ class AvatarService:
                 f"({MAX_FILE_SIZE} bytes / {MAX_FILE_SIZE // 1024 // 1024}MB)"
             )
 
+        from PIL import Image
+
         try:
             # Open and validate image
             image = Image.open(BytesIO(content))
@@ -171,7 +174,7 @@ class AvatarService:
             logger.error(f"Failed to process image for {character_id}: {e}")
             raise InvalidImageError(f"Failed to process image: {e}")
 
-    def _apply_crop(self, image: Image.Image, crop_data: Dict[str, float]) -> Image.Image:
+    def _apply_crop(self, image: "Image.Image", crop_data: Dict[str, float]) -> "Image.Image":
         """
         Apply crop coordinates to an image.
 
@@ -203,7 +206,7 @@ class AvatarService:
 
         return image.crop((x, y, x + size, y + size))
 
-    def _create_circular_avatar(self, image: Image.Image, size: int) -> Image.Image:
+    def _create_circular_avatar(self, image: "Image.Image", size: int) -> "Image.Image":
         """
         Create a circular avatar from an image.
 
@@ -214,6 +217,8 @@ class AvatarService:
         Returns:
             Circular avatar as RGBA PIL Image
         """
+        from PIL import Image, ImageDraw, ImageOps
+
         # Resize to target size with high-quality resampling
         image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
 
@@ -16,6 +16,7 @@ import numpy as np
 from sqlalchemy.orm import Session
 
 from ...database.models import BackstoryChunk
+from ...database.embedding_codec import encode_embedding, decode_embedding
 from .embedding_service import embedding_service
 
 logger = logging.getLogger(__name__)
@@ -111,7 +112,7 @@ class BackstoryService:
                 return False
 
             # 3. Generate embeddings for all chunks
-            embeddings = embedding_service.create_embeddings(chunks)
+            embeddings = embedding_service.create_embeddings(chunks, cache=False)
 
             # 4. Store chunks in database
             for i, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
@@ -120,7 +121,7 @@ class BackstoryService:
                     user_id=user_id,
                     chunk_index=i,
                     text_content=chunk_text,
-                    embedding_vector=json.dumps(embedding.tolist()),
+                    embedding_vector=encode_embedding(embedding),
                     created_at=datetime.now(timezone.utc)
                 )
                 db.add(chunk)
@@ -150,7 +151,7 @@ class BackstoryService:
         """
         Load chunks from DB and parse embeddings, using cache when available.
 
-        This avoids repeated JSON parsing of embeddings on every query.
+        This avoids re-decoding embeddings on every query.
 
         Returns:
             List of dicts with 'text', 'index', and 'embedding' (numpy array)
@@ -178,16 +179,16 @@ class BackstoryService:
             if not chunk.embedding_vector:
                 continue
 
-            try:
-                embedding = np.array(json.loads(chunk.embedding_vector))
-                chunks.append({
-                    'text': chunk.text_content,
-                    'index': chunk.chunk_index,
-                    'embedding': embedding
-                })
-            except (json.JSONDecodeError, ValueError) as e:
-                logger.warning(f"Invalid embedding for chunk {chunk.id}: {e}")
+            # Zero-copy view over the stored bytes
+            embedding = decode_embedding(chunk.embedding_vector)
+            if embedding is None:
+                logger.warning(f"Invalid embedding for chunk {chunk.id}")
                 continue
+            chunks.append({
+                'text': chunk.text_content,
+                'index': chunk.chunk_index,
+                'embedding': embedding
+            })
 
         # Store in cache
         self._set_cache(cache_key, chunks)
@@ -706,37 +706,29 @@ Reply with ONLY the title, no quotes, no explanation, no punctuation at the end.
 
         return None
 
-    def generate_title_async(
-        self,
-        conversation_id: int,
-        model_config: Optional[Dict[str, Any]] = None
-    ):
-        """Generate a conversation title asynchronously in a background thread.
+    def generate_title_async(self, conversation_id: int, user_id: int) -> int:
+        """Queue title generation for a conversation on the background job queue.
+
+        Repeated requests for the same conversation are coalesced while the
+        first is still pending. The job resolves the user's LLM config when it
+        runs, so API keys are never stored in the job payload.
 
         Args:
             conversation_id: Conversation ID
-            model_config: Optional LLM config
+            user_id: Owner of the conversation, whose LLM settings are used
+
+        Returns:
+            ID of the queued (or coalesced) job
         """
-        import threading
-        from ...database.config import db_config
-
-        logger.warning(f"[TITLE] Starting async title generation for conversation {conversation_id}")
-
-        def _generate():
-            logger.warning(f"[TITLE] Thread started for conversation {conversation_id}")
-            # Create a new database session for this thread
-            db = db_config.get_session()
-            try:
-                result = self.generate_title_with_llm(conversation_id, db, model_config)
-                logger.warning(f"[TITLE] Title generation result for {conversation_id}: {result}")
-            except Exception as e:
-                logger.error(f"[TITLE] Exception in title generation thread: {e}")
-            finally:
-                db.close()
-
-        thread = threading.Thread(target=_generate, daemon=True)
-        thread.start()
-        logger.warning(f"[TITLE] Thread started for conversation {conversation_id}")
+        from .job_queue import job_queue
+
+        job_id = job_queue.enqueue(
+            'title_generation',
+            {'conversation_id': conversation_id, 'user_id': user_id},
+            coalesce_key=f"conversation:{conversation_id}"
+        )
+        logger.info(f"[TITLE] Queued title generation for conversation {conversation_id} (job {job_id})")
+        return job_id
 
     def update_conversation_title(self, conversation_id: int, title: str, db: Session) -> bool:
         """Update a conversation's title.
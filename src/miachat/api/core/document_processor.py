@@ -9,12 +9,12 @@ import hashlib
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-import fitz  # PyMuPDF
-import docx
-import pandas as pd
 from pathlib import Path
 import json
-import tiktoken
+
+# PyMuPDF (fitz), python-docx and pandas are imported by the format handlers
+# that need them; the tokenizer is shared with TokenService
+from .token_service import get_encoder
 
 logger = logging.getLogger(__name__)
 
@@ -40,13 +40,11 @@ class DocumentProcessor:
             '.xls': self._process_excel,
             '.csv': self._process_csv
         }
-        
-        # Initialize tokenizer for chunk sizing
-        try:
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
-        except Exception as e:
-            logger.warning(f"Could not load tiktoken encoder: {e}")
-            self.tokenizer = None
+    
+    @property
+    def tokenizer(self):
+        """Tokenizer for chunk sizing, loaded on first use."""
+        return get_encoder()
     
     def is_supported(self, filename: str) -> bool:
         """Check if a file format is supported.
@@ -130,6 +128,7 @@ class DocumentProcessor:
             Tuple of (extracted_text, metadata)
         """
         try:
+            import fitz  # PyMuPDF
             doc = fitz.open(file_path)
             text_content = ""
             metadata = {
@@ -164,6 +163,7 @@ class DocumentProcessor:
             Tuple of (extracted_text, metadata)
         """
         try:
+            import docx
             doc = docx.Document(file_path)
             text_content = ""
             
@@ -252,6 +252,7 @@ class DocumentProcessor:
             Tuple of (extracted_text, metadata)
         """
         try:
+            import pandas as pd
             # Read all sheets
             excel_file = pd.read_excel(file_path, sheet_name=None)
             text_content = ""
@@ -315,6 +316,7 @@ class DocumentProcessor:
             elif '\t' in sample:
                 delimiter = '\t'
             
+            import pandas as pd
             df = pd.read_csv(file_path, delimiter=delimiter)
             
             # Convert to text
@@ -1,23 +1,62 @@
 """
 Document service for managing document upload, processing, and retrieval.
+
+Document search is hybrid: BM25 over the SQLite full-text index (see
+database/fulltext) runs on a worker thread while the FAISS search runs on
+the caller's, and the two rankings are merged with reciprocal rank fusion.
+Exact terms such as names and codes are found even when the embedding misses
+them. Chunks found only by BM25 must contain at least half of the query's
+words and reach a share of the similarity threshold, so weak lexical matches
+do not fill the context. Without the full-text index the search is
+vector-only.
+
+Configuration (environment variables):
+    - DOCUMENT_SEARCH_HYBRID: Set to "false" for vector-only search (default: true)
+    - DOCUMENT_SEARCH_RRF_K: Rank constant of the fusion; larger values flatten
+      the advantage of top ranks (default: 60)
+    - DOCUMENT_SEARCH_LEXICAL_FLOOR: Share of similarity_threshold that chunks found
+      only by BM25 must reach (default: 0.5)
 """
 
 import os
 import uuid
 import shutil
 import logging
-from typing import List, Dict, Any, Optional, BinaryIO
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, BinaryIO, Tuple
 from datetime import datetime
 from pathlib import Path
+import numpy as np
 from sqlalchemy.orm import Session
 from fastapi import UploadFile
 from ...database.models import Document, DocumentChunk, User
 from ...database.config import get_db
+from ...database.embedding_codec import decode_embedding
+from ...database.fulltext import fulltext_available, search_chunks
 from .document_processor import document_processor
 from .embedding_service import embedding_service
 
 logger = logging.getLogger(__name__)
 
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: float = 60) -> List[Tuple[str, float]]:
+    """Merge rankings by summing 1 / (k + rank) for each item.
+
+    Args:
+        rankings: Item IDs per ranking, best first
+        k: Rank constant
+
+    Returns:
+        (item_id, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
 class DocumentService:
     """Service for comprehensive document management with RAG capabilities."""
     
@@ -31,6 +70,13 @@ class DocumentService:
         self.documents_dir = documents_dir or os.getenv("DOCUMENTS_DIR", "./documents")
         self.max_file_size = max_file_size
 
+        # Lexical (BM25) search runs next to the vector search
+        self.hybrid_search = os.getenv("DOCUMENT_SEARCH_HYBRID", "true").lower() == "true"
+        self.rrf_k = float(os.getenv("DOCUMENT_SEARCH_RRF_K", "60"))
+        self.lexical_floor = float(os.getenv("DOCUMENT_SEARCH_LEXICAL_FLOOR", "0.5"))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
         # Ensure documents directory exists
         os.makedirs(self.documents_dir, exist_ok=True)
     
@@ -255,7 +301,7 @@ class DocumentService:
         character_id: Optional[str] = None,
         db: Session = None
     ) -> List[Dict[str, Any]]:
-        """Search user's documents using vector similarity.
+        """Search user's documents using vector similarity and BM25.
 
         Args:
             query: Search query
@@ -272,14 +318,23 @@ class DocumentService:
             db = next(get_db())
         
         try:
+            candidates = top_k * 2  # Get more results to filter
+            lexical = None
+            if self.hybrid_search and fulltext_available(db):
+                lexical = self._get_executor().submit(self._lexical_search, query, user_id, candidates, db)
+
             # Use embedding service for vector search
             results = embedding_service.search_similar_chunks(
                 query=query,
                 user_id=user_id,
-                top_k=top_k * 2,  # Get more results to filter
+                top_k=candidates,
                 similarity_threshold=similarity_threshold,
                 db=db
             )
+            if lexical is not None:
+                results = self._fuse_results(
+                    query, user_id, results, lexical.result(), similarity_threshold, db
+                )[:candidates]
 
             # Filter by character if specified
             if character_id:
@@ -310,6 +365,98 @@ class DocumentService:
             logger.error(f"Error searching documents: {e}")
             return []
     
+    def _lexical_search(self, query: str, user_id: int, limit: int, parent_db: Session) -> List[Tuple[str, float]]:
+        """BM25 search on a worker thread with its own session on the caller's engine."""
+        db = Session(bind=parent_db.get_bind(), autoflush=False)
+        try:
+            return search_chunks(db, query, user_id, limit)
+        except Exception as e:
+            logger.warning(f"Full-text search failed, using vector results only: {e}")
+            return []
+        finally:
+            db.close()
+
+    def _fuse_results(
+        self,
+        query: str,
+        user_id: int,
+        vector_results: List[Dict[str, Any]],
+        lexical_hits: List[Tuple[str, float]],
+        similarity_threshold: float,
+        db: Session
+    ) -> List[Dict[str, Any]]:
+        """Merge vector and BM25 hits with reciprocal rank fusion.
+
+        Chunks found only by BM25 are loaded in one query and given their
+        exact cosine similarity to the (cached) query embedding, so
+        similarity_score keeps its meaning for every result. They are kept
+        only if that similarity reaches lexical_floor * similarity_threshold.
+
+        Args:
+            query: Search query
+            user_id: User ID
+            vector_results: Results of the vector search, best first
+            lexical_hits: (chunk_id, BM25 score) pairs, best first
+            similarity_threshold: Minimum similarity of the vector search
+            db: Database session
+
+        Returns:
+            Results ordered by fused rank
+        """
+        fused = reciprocal_rank_fusion(
+            [[result['chunk_id'] for result in vector_results], [chunk_id for chunk_id, _ in lexical_hits]],
+            k=self.rrf_k
+        )
+        results = {result['chunk_id']: result for result in vector_results}
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in results]
+        if missing:
+            rows = (
+                db.query(DocumentChunk, Document)
+                .join(Document, Document.id == DocumentChunk.document_id)
+                .filter(DocumentChunk.id.in_(missing), Document.user_id == user_id)
+                .all()
+            )
+            query_embedding = embedding_service.create_embeddings([query])[0] if rows else None
+            min_similarity = similarity_threshold * self.lexical_floor
+            for chunk, document in rows:
+                vector = decode_embedding(chunk.embedding_vector)
+                similarity = (
+                    float(np.dot(vector, query_embedding))
+                    if vector is not None and vector.shape == query_embedding.shape else 0.0
+                )
+                if similarity < min_similarity:
+                    continue  # Shares words with the query but not its meaning
+                results[chunk.id] = {
+                    'chunk_id': chunk.id,
+                    'document_id': chunk.document_id,
+                    'document_filename': document.filename,
+                    'text_content': chunk.text_content,
+                    'chunk_type': chunk.chunk_type,
+                    'chunk_index': chunk.chunk_index,
+                    'similarity_score': similarity,
+                    'metadata': chunk.doc_metadata,
+                    'document_metadata': document.doc_metadata
+                }
+
+        lexical_scores = dict(lexical_hits)
+        fused_results = []
+        for chunk_id, score in fused:
+            if chunk_id not in results:
+                continue  # Deleted, not the caller's or below the lexical floor
+            result = results[chunk_id]
+            result['rrf_score'] = score
+            result['bm25_score'] = lexical_scores.get(chunk_id)
+            fused_results.append(result)
+        return fused_results
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Lazily create the pool that runs lexical searches."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="document-search")
+        return self._executor
+
     def get_document_content(self, document_id: str, user_id: int, db: Session = None) -> Optional[str]:
         """Get the full text content of a document.
         
@@ -0,0 +1,190 @@
+"""
+Dynamic micro-batching of embedding requests.
+
+Concurrent chats each embed a short query. Encoding them one by one pays the
+model's per-call overhead every time, so requests that arrive while another
+encode is in flight are queued for a few milliseconds and encoded together
+in one call. Each caller gets back exactly the rows for its own texts.
+
+When nothing is queued or being encoded, a request is encoded directly on
+the caller's thread, so an idle service adds no latency. Requests that
+already fill a batch (document ingestion) are always encoded directly.
+
+Configuration (environment variables):
+    - EMBEDDING_BATCH_WAIT_MS: How long the first queued request waits for others;
+      0 disables batching (default: 5)
+    - EMBEDDING_MAX_BATCH_SIZE: Maximum texts per batched encode call (default: 32)
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    """One caller's texts waiting in the queue."""
+
+    __slots__ = ('texts', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+
+
+class EmbeddingBatcher:
+    """Merges concurrent encode calls into batched model invocations."""
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 max_wait_ms: Optional[float] = None, max_batch_size: Optional[int] = None):
+        """Initialize the batcher.
+
+        Args:
+            encode: Function embedding a list of texts into one row per text
+            max_wait_ms: How long the first queued request waits for others
+            max_batch_size: Maximum texts per batched encode call
+        """
+        self._encode = encode
+        self.max_wait = (
+            max_wait_ms if max_wait_ms is not None else float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '5'))
+        ) / 1000
+        self.max_batch_size = max_batch_size or int(os.getenv('EMBEDDING_MAX_BATCH_SIZE', '32'))
+
+        self._cond = threading.Condition()
+        self._queue: Deque[_Request] = deque()
+        self._queued_texts = 0
+        self._in_flight = 0  # Direct encodes and batches currently running
+        self._worker: Optional[threading.Thread] = None
+        self._stats = {'direct': 0, 'batches': 0, 'batched_requests': 0, 'batched_texts': 0,
+                       'max_batch': 0, 'queue_time_sum': 0.0, 'queue_time_max': 0.0}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, batched with other callers' when the model is busy.
+
+        Args:
+            texts: List of text strings to embed
+
+        Returns:
+            numpy array with one embedding per text
+        """
+        with self._cond:
+            direct = (
+                self.max_wait <= 0
+                or len(texts) >= self.max_batch_size
+                or (not self._in_flight and not self._queue)
+            )
+            if direct:
+                self._in_flight += 1
+                self._stats['direct'] += 1
+            else:
+                request = _Request(list(texts))
+                self._queue.append(request)
+                self._queued_texts += len(request.texts)
+                self._ensure_worker()
+                self._cond.notify_all()
+
+        if direct:
+            try:
+                return self._encode(texts)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                # Give other requests until the oldest one's deadline to join the batch
+                deadline = self._queue[0].enqueued_at + self.max_wait
+                while self._queued_texts < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take_batch()
+                self._in_flight += 1
+            try:
+                self._encode_batch(batch)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+
+    def _take_batch(self) -> List[_Request]:
+        batch, size = [], 0
+        while self._queue and (not batch or size + len(self._queue[0].texts) <= self.max_batch_size):
+            request = self._queue.popleft()
+            batch.append(request)
+            size += len(request.texts)
+        self._queued_texts -= size
+        return batch
+
+    def _encode_batch(self, batch: List[_Request]) -> None:
+        started = time.monotonic()
+        texts = [text for request in batch for text in request.texts]
+        try:
+            embeddings = self._encode(texts)
+        except BaseException as e:
+            logger.error(f"Batched encode of {len(texts)} texts failed: {e}")
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        offset = 0
+        for request in batch:
+            request.result = embeddings[offset:offset + len(request.texts)]
+            offset += len(request.texts)
+            request.done.set()
+
+        queue_times = [started - request.enqueued_at for request in batch]
+        with self._cond:
+            self._stats['batches'] += 1
+            self._stats['batched_requests'] += len(batch)
+            self._stats['batched_texts'] += len(texts)
+            self._stats['max_batch'] = max(self._stats['max_batch'], len(texts))
+            self._stats['queue_time_sum'] += sum(queue_times)
+            self._stats['queue_time_max'] = max(self._stats['queue_time_max'], max(queue_times))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching statistics.
+
+        Returns:
+            Dictionary with direct/batched call counts, batch sizes and queue times
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            queued = len(self._queue)
+        batches = stats['batches']
+        return {
+            'direct_encodes': stats['direct'],
+            'batches': batches,
+            'batched_requests': stats['batched_requests'],
+            'mean_batch_size': round(stats['batched_texts'] / batches, 2) if batches else None,
+            'max_batch_size': stats['max_batch'],
+            'mean_queue_ms': (
+                round(stats['queue_time_sum'] / stats['batched_requests'] * 1000, 3)
+                if stats['batched_requests'] else None
+            ),
+            'max_queue_ms': round(stats['queue_time_max'] * 1000, 3),
+            'queued_requests': queued
+        }
@@ -0,0 +1,149 @@
+"""
+LRU + TTL cache of query embeddings.
+
+A chat turn embeds the user's message more than once (backstory retrieval,
+then document search), and short messages such as "continue" or "thanks"
+recur across turns. Query embeddings are therefore cached, keyed by a hash of
+the model identity and the normalized text, so repeats skip the model call.
+
+Text is normalized to Unicode NFC with runs of whitespace collapsed and the
+ends stripped. Case is kept, since the model may be case-sensitive. Entries
+expire after EMBEDDING_CACHE_TTL seconds, and the least recently used ones
+are evicted when the cached vectors exceed the memory cap. Document chunks
+are embedded once at ingestion and are not cached.
+
+Configuration (environment variables):
+    - EMBEDDING_CACHE_MB: Memory cap for cached query embeddings; 0 disables the cache (default: 16)
+    - EMBEDDING_CACHE_TTL: Seconds a cached embedding stays valid (default: 3600)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Approximate bytes per entry beyond the vector itself (key, tuple, array header)
+_ENTRY_OVERHEAD = 256
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different spellings share a cache entry."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def cache_key(model_id: str, text: str) -> str:
+    """Cache key for a text embedded by a model.
+
+    Args:
+        model_id: Model name (and backend) that produced the embedding
+        text: Text as passed to the model
+
+    Returns:
+        Hex digest of the model identity and normalized text
+    """
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of embedding vectors with expiry and a memory cap."""
+
+    def __init__(self, max_mb: Optional[float] = None, ttl_seconds: Optional[float] = None):
+        """Initialize the cache.
+
+        Args:
+            max_mb: Memory cap for cached vectors; 0 disables the cache
+            ttl_seconds: Seconds an entry stays valid
+        """
+        self.max_bytes = int(
+            (max_mb if max_mb is not None else float(os.getenv('EMBEDDING_CACHE_MB', '16'))) * 1024 * 1024
+        )
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv('EMBEDDING_CACHE_TTL', '3600'))
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()  # key -> (vector, expires at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _entry_bytes(vector: np.ndarray) -> int:
+        return vector.nbytes + _ENTRY_OVERHEAD
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Cached vector for a key, or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        """Store a vector, evicting the least recently used entries over the memory cap.
+
+        Args:
+            key: Key from cache_key()
+            vector: Embedding; a read-only copy is stored
+        """
+        if not self.enabled:
+            return
+        vector = np.array(vector, copy=True)
+        vector.flags.writeable = False
+        size = self._entry_bytes(vector)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def _remove(self, key: str) -> None:
+        vector, _ = self._entries.pop(key)
+        self._bytes -= self._entry_bytes(vector)
+
+    def clear(self) -> None:
+        """Drop all entries, e.g. after the model changes."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate, size and eviction counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            entries, size = len(self._entries), self._bytes
+        lookups = stats['hits'] + stats['misses']
+        return {
+            **stats,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+        }
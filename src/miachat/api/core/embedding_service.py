@@ -1,111 +1,436 @@
 """
 Vector embedding service for RAG functionality with FAISS integration.
+
+Vectors are partitioned per user (see vector_index.IndexPartition), so a
+search only scans the caller's own chunks. Partitions are loaded lazily and
+the least recently used ones are evicted when the cache exceeds its memory cap.
+Partitions that grow past FAISS_ANN_THRESHOLD switch from the exact index to
+an approximate one (see vector_index for the FAISS_ANN_* settings).
+With FAISS_SHARED_INDEX, several worker processes share the partition
+files: indexes are memory-mapped, so their pages are shared through the OS
+cache, and each process polls the directory's GENERATION file to reload
+partitions another process has checkpointed.
+
+Partitions stored with quantized codes (FAISS_QUANTIZATION) are searched for
+FAISS_RESCORE_FACTOR times as many candidates, which are rescored exactly
+against the float vectors loaded with the hits.
+
+The embedding model is loaded on first use rather than at import, so the
+app starts serving before torch and the weights are loaded; warm_up() loads
+it in the background and get_readiness() reports when it is done. Index
+partitions are likewise only loaded when a user first searches or uploads.
+
+Query and chunk texts are encoded through an EmbeddingBatcher, which merges
+concurrent requests into single model calls (see embedding_batcher for the
+EMBEDDING_BATCH_* settings). The model runs on PyTorch or, with
+EMBEDDING_BACKEND=onnx, on ONNX Runtime (see onnx_embeddings). With
+EMBEDDING_MODEL_DIR it is loaded offline from a hash-pinned local copy (see
+model_artifacts). Query embeddings are kept in an LRU cache keyed by the
+normalized text and model, so a message embedded for backstory retrieval is
+reused by document search (see embedding_cache for the EMBEDDING_CACHE_*
+settings); ingestion bypasses the cache.
+
+Configuration (environment variables):
+    - FAISS_INDEX_PATH: Path prefix for index files (default: ./data/faiss_index)
+    - FAISS_PARTITION_MEMORY_MB: Memory cap for loaded user partitions (default: 512)
+    - FAISS_COMPACT_DEAD_RATIO: Share of removed vectors that triggers compaction (default: 0.25)
+    - FAISS_REBUILD_BATCH_SIZE: Rows streamed per batch during index rebuilds (default: 1000)
+    - FAISS_RESCORE_FACTOR: Candidates per result fetched from quantized partitions (default: 4)
+    - FAISS_GENERATION_POLL_INTERVAL: Seconds between checks for partitions checkpointed by
+      other processes when FAISS_SHARED_INDEX is enabled (default: 2)
+    - DOCUMENT_ACCESS_FLUSH_INTERVAL: Seconds between batched document access-count writes
+      and checks for partitions due a checkpoint (default: 30)
+    - VECTOR_SERVICE_URL: Delegate to the vector-search sidecar at this address instead of
+      loading the model in this process (see vector_client and api/vector_service.py)
 """
 
-import json
 import os
 import hashlib
 import logging
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
+from sqlalchemy import bindparam, func, update
 from sqlalchemy.orm import Session
 from ...database.models import Document, DocumentChunk
-from ...database.config import get_db
+from ...database.config import get_db, db_config
+from ...database.embedding_codec import encode_embedding, decode_embedding, decode_embeddings
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache, cache_key
+from .model_artifacts import (
+    ModelArtifactError, model_dir, read_manifest, resolve_model, verify_export_dir, within_model_dir
+)
+from .onnx_embeddings import (
+    OnnxEmbeddingModel, embedding_backend, export_onnx_model, onnx_model_dir, onnx_model_exists, onnx_quantize
+)
+from .vector_index import IndexPartition, read_directory_generation
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
     """Service for creating and managing vector embeddings with FAISS."""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", index_path: str = None):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", index_path: str = None,
+                 max_partition_memory_mb: Optional[float] = None,
+                 access_flush_interval: Optional[float] = None,
+                 compact_dead_ratio: Optional[float] = None):
         """Initialize the embedding service.
 
         Args:
             model_name: SentenceTransformer model name for embeddings
             index_path: Path to store FAISS index files
+            max_partition_memory_mb: Memory cap for loaded user partitions
+            access_flush_interval: Seconds between batched access-count writes
+            compact_dead_ratio: Share of removed vectors that triggers compaction
         """
         self.model_name = model_name
         # Use environment variable or default to local ./data directory
         self.index_path = index_path or os.getenv("FAISS_INDEX_PATH", "./data/faiss_index")
-        self.embedding_model = None
-        self.faiss_index = None
-        self.chunk_id_mapping = {}  # Maps FAISS index position to chunk ID
-        self.dimension = 384  # Default for all-MiniLM-L6-v2
+        self.partition_dir = f"{self.index_path}_users"
+        self.backend = embedding_backend()
+        # The model is loaded on first use (or by warm_up()), not at import time
+        self._embedding_model = None
+        self._dimension = 384  # Default for all-MiniLM-L6-v2
+        self._model_lock = threading.Lock()
+        self._model_error: Optional[str] = None
+        self.model_load_seconds: Optional[float] = None
+        self._warmup_thread: Optional[threading.Thread] = None
+        # Concurrent encode calls are merged into batched model invocations
+        self.batcher = EmbeddingBatcher(self._encode)
+        # Repeated queries are answered from the cache; entries are per model and backend
+        self.query_cache = EmbeddingCache()
+        self._cache_model_id = (
+            f"{model_name}:{self.backend}{'-int8' if self.backend == 'onnx' and onnx_quantize() else ''}"
+        )
+
+        # Loaded user partitions, least recently used first
+        self.max_partition_memory = int(
+            (max_partition_memory_mb or float(os.getenv("FAISS_PARTITION_MEMORY_MB", "512"))) * 1024 * 1024
+        )
+        self._partitions: "OrderedDict[int, IndexPartition]" = OrderedDict()
+        self._partitions_lock = threading.RLock()
+        self._partition_load_locks: Dict[int, threading.Lock] = {}
+        self._partition_stats = {'hits': 0, 'loads': 0, 'builds': 0, 'evictions': 0, 'compactions': 0,
+                                 'ann_switches': 0, 'quantizations': 0, 'refreshes': 0}
+        self.compact_dead_ratio = compact_dead_ratio or float(os.getenv("FAISS_COMPACT_DEAD_RATIO", "0.25"))
+
+        # Quantized partitions return extra candidates that are rescored exactly
+        self.rescore_factor = int(os.getenv("FAISS_RESCORE_FACTOR", "4"))
+        self._rescore_lock = threading.Lock()
+        self._rescore_stats = {'searches': 0, 'recall_sum': 0.0}
+
+        # Other worker processes' checkpoints are picked up by polling GENERATION
+        self.shared_index = os.getenv("FAISS_SHARED_INDEX", "false").lower() == "true"
+        self.generation_poll_interval = float(os.getenv("FAISS_GENERATION_POLL_INTERVAL", "2"))
+        self._seen_generation = None
+        self._generation_checked_at = 0.0
+
+        # Background rebuilds write shadow partitions and swap them in when done
+        self.rebuild_batch_size = int(os.getenv("FAISS_REBUILD_BATCH_SIZE", "1000"))
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_touched: Optional[set] = None  # Users written to while a rebuild runs
+        self._rebuild_status: Dict[str, Any] = {'state': 'idle'}
+
+        # Document access tracking, buffered so searches never write to the database
+        self.access_flush_interval = access_flush_interval or float(
+            os.getenv("DOCUMENT_ACCESS_FLUSH_INTERVAL", "30")
+        )
+        self._pending_access: Dict[str, Tuple[int, datetime]] = {}  # document_id -> (count, last access)
+        self._access_lock = threading.Lock()
+        self._access_stop = threading.Event()
+        self._access_flusher: Optional[threading.Thread] = None
         
         # Ensure index directory exists
-        index_dir = os.path.dirname(self.index_path)
-        if index_dir:
-            os.makedirs(index_dir, exist_ok=True)
-        
-        self._initialize_model()
-        self._load_or_create_index()
-    
+        os.makedirs(self.partition_dir, exist_ok=True)
+
+    @property
+    def embedding_model(self):
+        """The embedding model, loaded on first access."""
+        if self._embedding_model is None:
+            self._initialize_model()
+        return self._embedding_model
+
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension of the model (loads it if needed)."""
+        if self._embedding_model is None:
+            self._initialize_model()
+        return self._dimension
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether the model is loaded and requests will not wait for it."""
+        return self._embedding_model is not None
+
     def _initialize_model(self):
-        """Initialize the sentence transformer model."""
-        try:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self.embedding_model = SentenceTransformer(self.model_name)
-            self.dimension = self.embedding_model.get_sentence_embedding_dimension()
-            logger.info(f"Model loaded successfully. Embedding dimension: {self.dimension}")
-        except Exception as e:
-            logger.error(f"Failed to load embedding model: {e}")
-            raise
+        """Initialize the embedding model on the configured backend (once)."""
+        with self._model_lock:
+            if self._embedding_model is not None:
+                return
+            try:
+                logger.info(f"Loading embedding model: {self.model_name} ({self.backend})")
+                started = time.perf_counter()
+                if self.backend == 'onnx':
+                    model = self._load_onnx_model()
+                else:
+                    # Resolved before the import, which reads the hub's offline flags
+                    source = resolve_model(self.model_name)
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(source)
+                self._dimension = model.get_sentence_embedding_dimension()
+                self.model_load_seconds = time.perf_counter() - started
+                self._embedding_model = model
+                self._model_error = None
+                logger.info(
+                    f"Model loaded successfully in {self.model_load_seconds:.2f}s. "
+                    f"Embedding dimension: {self._dimension}"
+                )
+            except Exception as e:
+                self._model_error = str(e)
+                logger.error(f"Failed to load embedding model: {e}")
+                raise
+
+    def warm_up(self) -> None:
+        """Load the model on a background thread, so startup does not wait for it (idempotent)."""
+        if self.is_ready or (self._warmup_thread is not None and self._warmup_thread.is_alive()):
+            return
+
+        def load():
+            try:
+                self._initialize_model()
+            except Exception:
+                pass  # Logged by _initialize_model; the next request retries
+
+        self._warmup_thread = threading.Thread(target=load, name="embedding-model-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    def get_readiness(self) -> Dict[str, Any]:
+        """Model loading state for the readiness endpoint."""
+        return {
+            'ready': self.is_ready,
+            'model_name': self.model_name,
+            'backend': self.backend,
+            'model_dir': model_dir(),
+            'load_seconds': round(self.model_load_seconds, 3) if self.model_load_seconds is not None else None,
+            'error': self._model_error
+        }
     
-    def _load_or_create_index(self):
-        """Load existing FAISS index or create a new one."""
-        index_file = f"{self.index_path}.index"
-        mapping_file = f"{self.index_path}_mapping.json"
-        
-        try:
-            if os.path.exists(index_file) and os.path.exists(mapping_file):
-                # Load existing index
-                logger.info(f"Loading existing FAISS index from {index_file}")
-                self.faiss_index = faiss.read_index(index_file)
-                
-                with open(mapping_file, 'r') as f:
-                    # Convert string keys back to integers
-                    mapping_data = json.load(f)
-                    self.chunk_id_mapping = {int(k): v for k, v in mapping_data.items()}
-                
-                logger.info(f"Loaded FAISS index with {self.faiss_index.ntotal} vectors")
+    def _load_onnx_model(self) -> OnnxEmbeddingModel:
+        """Load the ONNX export of the model, exporting it from PyTorch on first use.
+
+        An export inside EMBEDDING_MODEL_DIR is verified with that directory.
+        One elsewhere is verified against the manifest written at export time;
+        with EMBEDDING_MODEL_DIR set, an export without one is not loaded.
+        """
+        directory = onnx_model_dir(self.model_name)
+        quantize = onnx_quantize()
+        source = resolve_model(self.model_name)
+        pinned = within_model_dir(directory)
+
+        if onnx_model_exists(directory, quantize):
+            if not pinned and (model_dir() is not None or read_manifest(directory) is not None):
+                verify_export_dir(directory)
+        elif pinned:
+            # Exporting into the pinned directory would change its hash
+            raise ModelArtifactError(
+                f"No ONNX export in {directory}; fetch it with scripts/fetch_embedding_model.py --onnx"
+            )
+        else:
+            logger.info(f"No ONNX export of {self.model_name} in {directory}, exporting it")
+            from sentence_transformers import SentenceTransformer
+            export_onnx_model(SentenceTransformer(source), directory, quantize, model_name=self.model_name)
+        return OnnxEmbeddingModel(directory, quantize=quantize)
+
+    # ------------------------------------------------------------------
+    # Per-user index partitions
+    # ------------------------------------------------------------------
+
+    def _get_partition(self, user_id: int, db: Session) -> IndexPartition:
+        """Get a user's index partition, loading or building it on first use.
+
+        Args:
+            user_id: Owner of the partition
+            db: Database session (used when the partition has to be built)
+
+        Returns:
+            The user's partition, marked most recently used
+        """
+        if self.shared_index:
+            self._poll_generation()
+        with self._partitions_lock:
+            partition = self._partitions.get(user_id)
+            if partition is not None:
+                self._partitions.move_to_end(user_id)
+                self._partition_stats['hits'] += 1
+                return partition
+            load_lock = self._partition_load_locks.setdefault(user_id, threading.Lock())
+
+        # Load outside the cache lock so other users' searches are not blocked
+        with load_lock:
+            with self._partitions_lock:
+                partition = self._partitions.get(user_id)
+            if partition is not None:
+                return partition
+
+            partition = IndexPartition.load(user_id, self.dimension, self.partition_dir)
+            if partition is not None:
+                self._partition_stats['loads'] += 1
             else:
-                # Create new index
-                logger.info("Creating new FAISS index")
-                self.faiss_index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
-                self.chunk_id_mapping = {}
-                
-        except Exception as e:
-            logger.error(f"Error loading FAISS index: {e}")
-            # Fallback to new index
-            self.faiss_index = faiss.IndexFlatIP(self.dimension)
-            self.chunk_id_mapping = {}
-    
-    def _save_index(self):
-        """Save FAISS index and mapping to disk."""
-        try:
-            index_file = f"{self.index_path}.index"
-            mapping_file = f"{self.index_path}_mapping.json"
-            
-            faiss.write_index(self.faiss_index, index_file)
-            
-            with open(mapping_file, 'w') as f:
-                # Convert integer keys to strings for JSON serialization
-                mapping_data = {str(k): v for k, v in self.chunk_id_mapping.items()}
-                json.dump(mapping_data, f)
-            
-            logger.info(f"Saved FAISS index with {self.faiss_index.ntotal} vectors")
-            
-        except Exception as e:
-            logger.error(f"Error saving FAISS index: {e}")
+                partition = self._build_partition(user_id, db)
+
+            with self._partitions_lock:
+                self._partitions[user_id] = partition
+                self._evict_partitions()
+            return partition
+
+    def _poll_generation(self):
+        """Reload loaded partitions that another process has checkpointed since the last poll."""
+        now = time.monotonic()
+        if now - self._generation_checked_at < self.generation_poll_interval:
+            return
+        self._generation_checked_at = now
+        generation = read_directory_generation(self.partition_dir)
+        if generation == self._seen_generation:
+            return
+
+        with self._partitions_lock:
+            partitions = list(self._partitions.items())
+        current = True
+        for user_id, partition in partitions:
+            try:
+                if not os.path.exists(partition.checkpoint_file):
+                    # Removed or replaced by a rebuild; load again on next use
+                    with self._partitions_lock:
+                        if self._partitions.get(user_id) is partition:
+                            del self._partitions[user_id]
+                elif partition.refresh():
+                    self._partition_stats['refreshes'] += 1
+            except Exception as e:
+                # Retried on the next poll (the writer may still be replacing files)
+                logger.debug(f"Could not reload index partition for user {user_id}: {e}")
+                current = False
+        if current:
+            self._seen_generation = generation
+
+    def _build_partition(self, user_id: int, db: Session) -> IndexPartition:
+        """Build a user's partition from the embeddings stored in the database."""
+        partition = IndexPartition(user_id, self.dimension, self.partition_dir, private=True)
+
+        batch = []
+        for row in self._embedding_rows(db, user_id):
+            batch.append(row)
+            if len(batch) >= self.rebuild_batch_size:
+                self._add_rows(partition, batch)
+                batch = []
+        self._add_rows(partition, batch)
+        self._maybe_switch_index(partition, checkpoint=False)
+        partition.share()
+        partition.checkpoint()
+
+        self._partition_stats['builds'] += 1
+        logger.info(f"Built index partition for user {user_id} with {partition.ntotal} vectors")
+        return partition
+
+    def _embedding_rows(self, db: Session, user_id: Optional[int] = None):
+        """Stream (user_id, id, embedding_vector) rows for embedded chunks, grouped by user."""
+        query = (
+            db.query(Document.user_id, DocumentChunk.id, DocumentChunk.embedding_vector)
+            .join(Document, Document.id == DocumentChunk.document_id)
+            .filter(DocumentChunk.embedding_vector.isnot(None))
+        )
+        if user_id is not None:
+            query = query.filter(Document.user_id == user_id)
+        return query.order_by(Document.user_id).yield_per(self.rebuild_batch_size)
+
+    def _add_rows(self, partition: IndexPartition, rows: List[Any]) -> int:
+        """Decode a batch of embedding rows into a partition."""
+        if not rows:
+            return 0
+        embeddings, kept = decode_embeddings((row.embedding_vector for row in rows), self.dimension)
+        if len(kept) < len(rows):
+            logger.warning(f"Skipped {len(rows) - len(kept)} invalid embedding vectors for user {partition.user_id}")
+        partition.add([rows[position].id for position in kept], embeddings)
+        return len(kept)
+
+    def _mark_written(self, user_id: int):
+        """Note a write to a user's vectors so a running rebuild does not overwrite it."""
+        with self._partitions_lock:
+            if self._rebuild_touched is not None:
+                self._rebuild_touched.add(user_id)
+
+    def _evict_partitions(self):
+        """Evict least recently used partitions until under the memory cap.
+
+        Changes are already on disk (delta log or checkpoint), so eviction
+        only drops partitions from memory. Caller must hold _partitions_lock.
+        """
+        memory = sum(p.memory_bytes() for p in self._partitions.values())
+        while memory > self.max_partition_memory and len(self._partitions) > 1:
+            user_id, partition = self._partitions.popitem(last=False)
+            memory -= partition.memory_bytes()
+            self._partition_stats['evictions'] += 1
+            logger.debug(f"Evicted index partition for user {user_id}")
+
+    def _maybe_compact(self, partition: IndexPartition) -> int:
+        """Compact a partition once enough of it is tombstoned.
+
+        Returns:
+            Number of vectors physically removed
+        """
+        if partition.dead_count == 0 or partition.dead_ratio() < self.compact_dead_ratio:
+            return 0
+        removed = partition.compact()
+        partition.checkpoint()
+        self._partition_stats['compactions'] += 1
+        logger.info(f"Compacted index partition for user {partition.user_id}: removed {removed} dead vectors")
+        return removed
+
+    def _maybe_switch_index(self, partition: IndexPartition, checkpoint: bool = True) -> bool:
+        """Convert a partition to the approximate index or quantize it once it crosses a threshold.
+
+        Returns:
+            True if the partition was converted
+        """
+        if partition.wants_ann():
+            partition.convert(partition.ann.kind)
+            self._partition_stats['ann_switches'] += 1
+        elif partition.wants_quantization():
+            partition.convert(partition.kind)
+            self._partition_stats['quantizations'] += 1
+        else:
+            return False
+        if checkpoint:
+            partition.checkpoint()
+        return True
+
+    def _drop_partition(self, user_id: int):
+        """Forget a user's partition so it is rebuilt from the database on next use."""
+        with self._partitions_lock:
+            partition = self._partitions.pop(user_id, None)
+        (partition or IndexPartition(user_id, self.dimension, self.partition_dir)).delete_files()
+
+    def _user_ids_with_embeddings(self, db: Session) -> List[int]:
+        """Users that own at least one embedded chunk."""
+        rows = (
+            db.query(Document.user_id)
+            .join(DocumentChunk, DocumentChunk.document_id == Document.id)
+            .filter(DocumentChunk.embedding_vector.isnot(None))
+            .distinct()
+            .all()
+        )
+        return [row.user_id for row in rows]
     
-    def create_embeddings(self, texts: List[str]) -> np.ndarray:
+    def create_embeddings(self, texts: List[str], cache: bool = True) -> np.ndarray:
         """Create embeddings for a list of texts.
         
         Args:
             texts: List of text strings to embed
+            cache: Look up and store the embeddings in the query cache; ingestion
+                of document or backstory chunks passes False
             
         Returns:
             numpy array of embeddings
@@ -113,13 +438,29 @@ class EmbeddingService:
         try:
             if not texts:
                 return np.array([])
-            
-            embeddings = self.embedding_model.encode(texts, normalize_embeddings=True)
-            return embeddings
+            if not cache or not self.query_cache.enabled:
+                return self.batcher.encode(texts)
+
+            keys = [cache_key(self._cache_model_id, text) for text in texts]
+            vectors = [self.query_cache.get(key) for key in keys]
+            # Encode each distinct missing text once
+            missing: Dict[str, str] = {}
+            for key, text, vector in zip(keys, texts, vectors):
+                if vector is None:
+                    missing.setdefault(key, text)
+            if missing:
+                encoded = dict(zip(missing, self.batcher.encode(list(missing.values()))))
+                for key, vector in encoded.items():
+                    self.query_cache.put(key, vector)
+                vectors = [encoded[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+            return np.stack(vectors)
             
         except Exception as e:
             logger.error(f"Error creating embeddings: {e}")
             raise
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.embedding_model.encode(texts, normalize_embeddings=True)
     
     def add_document_embeddings(self, document_id: str, chunks: List[Dict[str, Any]], db: Session = None) -> bool:
         """Add embeddings for document chunks to the FAISS index.
@@ -136,30 +477,41 @@ class EmbeddingService:
             db = next(get_db())
         
         try:
+            user_id = db.query(Document.user_id).filter(Document.id == document_id).scalar()
+            if user_id is None:
+                logger.warning(f"Document {document_id} not found")
+                return False
+
             texts = [chunk['text_content'] for chunk in chunks]
-            embeddings = self.create_embeddings(texts)
+            embeddings = self.create_embeddings(texts, cache=False)
             
             if len(embeddings) == 0:
                 logger.warning(f"No embeddings created for document {document_id}")
                 return False
             
-            # Add to FAISS index
-            current_index = self.faiss_index.ntotal
-            self.faiss_index.add(embeddings)
+            # Load the partition before storing vectors, so a partition built
+            # from the database now does not already contain them
+            self._mark_written(user_id)
+            partition = self._get_partition(user_id, db)
             
-            # Update chunk records with embeddings and add to mapping
+            # Update chunk records with embeddings
+            chunk_ids = []
+            added = []
             for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
                 chunk_obj = db.query(DocumentChunk).filter(DocumentChunk.id == chunk['id']).first()
                 if chunk_obj:
-                    # Store embedding as JSON string
-                    chunk_obj.embedding_vector = json.dumps(embedding.tolist())
-                    
-                    # Add to index mapping
-                    faiss_idx = current_index + i
-                    self.chunk_id_mapping[faiss_idx] = chunk['id']
+                    chunk_obj.embedding_vector = encode_embedding(embedding)
+                    chunk_ids.append(chunk['id'])
+                    added.append(i)
             
             db.commit()
-            self._save_index()
+            
+            # Add to the user's partition (appended to its delta log)
+            partition.add(chunk_ids, embeddings[added])
+            if not self._maybe_switch_index(partition):
+                partition.maybe_checkpoint()
+            with self._partitions_lock:
+                self._evict_partitions()
             
             logger.info(f"Added {len(embeddings)} embeddings for document {document_id}")
             return True
@@ -193,8 +545,9 @@ class EmbeddingService:
             db = next(get_db())
         
         try:
-            if self.faiss_index.ntotal == 0:
-                logger.warning("FAISS index is empty")
+            # Only the caller's partition is searched (all partitions if no user is given)
+            user_ids = [user_id] if user_id else self._user_ids_with_embeddings(db)
+            if not user_ids:
                 return []
             
             # Create query embedding
@@ -202,36 +555,45 @@ class EmbeddingService:
             if len(query_embedding) == 0:
                 return []
             
-            # Search FAISS index
-            scores, indices = self.faiss_index.search(query_embedding, min(top_k * 2, self.faiss_index.ntotal))
+            # Search the partitions (extra hits cover chunks deleted since the last build)
+            hits = []
+            rescore = False
+            for partition_user_id in user_ids:
+                partition = self._get_partition(partition_user_id, db)
+                if partition.lossy:
+                    rescore = True
+                    hits.extend(partition.search(query_embedding, top_k * self.rescore_factor))
+                else:
+                    hits.extend(partition.search(query_embedding, top_k * 2))
+            
+            if not rescore:
+                # Approximate scores are only thresholded after rescoring
+                hits = [(chunk_id, similarity) for chunk_id, similarity in hits if similarity >= similarity_threshold]
+            hits.sort(key=lambda hit: hit[1], reverse=True)
+            if not hits:
+                return []
+            
+            # Hydrate all hits with one query (chunks joined to their documents)
+            rows = (
+                db.query(DocumentChunk, Document)
+                .join(Document, Document.id == DocumentChunk.document_id)
+                .filter(DocumentChunk.id.in_([chunk_id for chunk_id, _ in hits]))
+                .all()
+            )
+            hydrated = {chunk.id: (chunk, document) for chunk, document in rows}
+            if rescore:
+                hits = self._rescore(query_embedding[0], hits, hydrated, top_k, similarity_threshold)
             
             results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx == -1:  # Invalid index
-                    continue
-                
-                similarity = float(score)
-                if similarity < similarity_threshold:
-                    continue
+            for chunk_id, similarity in hits:
+                if chunk_id not in hydrated:
+                    continue  # Deleted since the partition was built
+                chunk, document = hydrated[chunk_id]
                 
-                # Get chunk ID from mapping
-                chunk_id = self.chunk_id_mapping.get(int(idx))
-                if not chunk_id:
-                    continue
-                
-                # Get chunk from database
-                chunk = db.query(DocumentChunk).filter(DocumentChunk.id == chunk_id).first()
-                if not chunk:
-                    continue
-                
-                # Get document and check user ownership if specified
-                document = chunk.document
+                # Check user ownership if specified
                 if user_id and document.user_id != user_id:
                     continue
                 
-                # Update document access tracking
-                document.mark_accessed()
-                
                 result = {
                     'chunk_id': chunk.id,
                     'document_id': chunk.document_id,
@@ -244,12 +606,11 @@ class EmbeddingService:
                     'document_metadata': document.doc_metadata
                 }
                 results.append(result)
+                if len(results) == top_k:
+                    break
             
-            # Sort by similarity score and limit results
-            results.sort(key=lambda x: x['similarity_score'], reverse=True)
-            results = results[:top_k]
-            
-            db.commit()
+            # Access tracking is buffered and written in batches by the flusher
+            self._record_access(result['document_id'] for result in results)
             
             logger.info(f"Found {len(results)} similar chunks for query: '{query[:50]}...'")
             return results
@@ -258,11 +619,47 @@ class EmbeddingService:
             logger.error(f"Error searching similar chunks: {e}")
             return []
     
+    def _rescore(self, query_embedding: np.ndarray, hits: List[Tuple[str, float]],
+                 hydrated: Dict[str, Tuple[Any, Any]], top_k: int,
+                 similarity_threshold: float) -> List[Tuple[str, float]]:
+        """Rescore candidates from quantized partitions against their stored float vectors.
+
+        Also records how many of the quantized top-k survive rescoring, the
+        recall the quantized index would have had on its own.
+
+        Args:
+            query_embedding: Query vector
+            hits: (chunk_id, approximate similarity) candidates, best first
+            hydrated: Chunk ID -> (chunk, document) for the candidates
+            top_k: Number of results wanted
+            similarity_threshold: Minimum exact similarity
+
+        Returns:
+            (chunk_id, exact similarity) pairs above the threshold, best first
+        """
+        approximate = [chunk_id for chunk_id, _ in hits if chunk_id in hydrated][:top_k]
+        exact = []
+        for chunk_id, similarity in hits:
+            if chunk_id not in hydrated:
+                continue
+            vector = decode_embedding(hydrated[chunk_id][0].embedding_vector)
+            if vector is not None and vector.shape[0] == self.dimension:
+                similarity = float(np.dot(query_embedding, vector.astype(np.float32)))
+            exact.append((chunk_id, similarity))
+        exact.sort(key=lambda hit: hit[1], reverse=True)
+
+        best = {chunk_id for chunk_id, _ in exact[:top_k]}
+        if best:
+            with self._rescore_lock:
+                self._rescore_stats['searches'] += 1
+                self._rescore_stats['recall_sum'] += len(best.intersection(approximate)) / len(best)
+        return [(chunk_id, similarity) for chunk_id, similarity in exact if similarity >= similarity_threshold]
+
     def remove_document_embeddings(self, document_id: str, db: Session = None) -> bool:
         """Remove embeddings for a document from the FAISS index.
         
-        Note: FAISS doesn't support efficient deletion, so this marks chunks as removed
-        and rebuilds the index periodically.
+        The vectors are tombstoned in the owner's partition and stop matching
+        immediately; they are physically removed when the partition is compacted.
         
         Args:
             document_id: Document ID to remove
@@ -277,6 +674,7 @@ class EmbeddingService:
         try:
             # Get all chunks for the document
             chunks = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).all()
+            chunk_ids = [chunk.id for chunk in chunks]
             
             # Clear embedding vectors in database
             for chunk in chunks:
@@ -284,11 +682,14 @@ class EmbeddingService:
             
             db.commit()
             
-            # Note: For efficiency, we don't rebuild the FAISS index immediately.
-            # The chunks will be filtered out during search since they won't be found in the database.
-            # A periodic rebuild process should be implemented to clean up the index.
-            
-            logger.info(f"Marked embeddings for removal for document {document_id}")
+            user_id = db.query(Document.user_id).filter(Document.id == document_id).scalar()
+            if user_id is not None and chunk_ids:
+                self._mark_written(user_id)
+                partition = self._get_partition(user_id, db)
+                removed = partition.remove(chunk_ids)
+                if not self._maybe_compact(partition):
+                    partition.maybe_checkpoint()
+                logger.info(f"Removed {removed} embeddings for document {document_id}")
             return True
             
         except Exception as e:
@@ -299,58 +700,213 @@ class EmbeddingService:
     def rebuild_index(self, db: Session = None) -> bool:
         """Rebuild the FAISS index from all document chunks in the database.
         
+        Embeddings are streamed in batches into shadow partitions in a
+        separate directory. Searches keep using the current partitions until
+        the finished set is swapped in under the partition lock. Users whose
+        vectors change during the rebuild are rebuilt from the database on
+        next use instead, so no concurrent write is lost. Meant to run as a
+        background job; progress is available from get_rebuild_status().
+        
         Args:
             db: Database session
             
         Returns:
-            True if successful, False otherwise
+            True if successful, False otherwise (including when a rebuild is already running)
         """
+        if not self._rebuild_lock.acquire(blocking=False):
+            logger.warning("Index rebuild already in progress")
+            return False
+
         if db is None:
             db = next(get_db())
-        
+
+        shadow_dir = f"{self.partition_dir}.rebuild"
         try:
-            logger.info("Rebuilding FAISS index from database")
-            
-            # Create new index
-            new_index = faiss.IndexFlatIP(self.dimension)
-            new_mapping = {}
-            
-            # Get all chunks with embeddings
-            chunks = db.query(DocumentChunk).filter(DocumentChunk.embedding_vector.isnot(None)).all()
-            
-            if not chunks:
-                logger.info("No chunks with embeddings found")
-                self.faiss_index = new_index
-                self.chunk_id_mapping = new_mapping
-                self._save_index()
-                return True
-            
-            # Collect embeddings
-            embeddings = []
-            for i, chunk in enumerate(chunks):
-                try:
-                    embedding_vector = json.loads(chunk.embedding_vector)
-                    embeddings.append(embedding_vector)
-                    new_mapping[i] = chunk.id
-                except (json.JSONDecodeError, TypeError):
-                    logger.warning(f"Invalid embedding vector for chunk {chunk.id}")
-                    continue
-            
-            if embeddings:
-                embeddings_array = np.array(embeddings, dtype=np.float32)
-                new_index.add(embeddings_array)
-            
-            # Replace current index
-            self.faiss_index = new_index
-            self.chunk_id_mapping = new_mapping
-            self._save_index()
-            
-            logger.info(f"Rebuilt FAISS index with {len(embeddings)} embeddings")
+            logger.info("Rebuilding FAISS index partitions from database")
+            started = datetime.utcnow()
+            users_total = len(self._user_ids_with_embeddings(db))
+            self._set_rebuild_status(
+                state='running', started_at=started.isoformat(), finished_at=None,
+                users_total=users_total, users_done=0, vectors=0, error=None
+            )
+
+            shutil.rmtree(shadow_dir, ignore_errors=True)
+            os.makedirs(shadow_dir)
+            with self._partitions_lock:
+                self._rebuild_touched = set()
+
+            # Stream rows (ordered by user) into one shadow partition at a time
+            partition = None
+            batch = []
+            vectors = 0
+            users_done = 0
+            for row in self._embedding_rows(db):
+                if partition is None or row.user_id != partition.user_id:
+                    if partition is not None:
+                        vectors += self._add_rows(partition, batch)
+                        self._maybe_switch_index(partition, checkpoint=False)
+                        partition.checkpoint()
+                        users_done += 1
+                        self._set_rebuild_status(users_done=users_done, vectors=vectors)
+                    partition = IndexPartition(row.user_id, self.dimension, shadow_dir, private=True)
+                    batch = []
+                batch.append(row)
+                if len(batch) >= self.rebuild_batch_size:
+                    vectors += self._add_rows(partition, batch)
+                    batch = []
+            if partition is not None:
+                vectors += self._add_rows(partition, batch)
+                self._maybe_switch_index(partition, checkpoint=False)
+                partition.checkpoint()
+                users_done += 1
+
+            self._swap_in_partitions(shadow_dir)
+
+            finished = datetime.utcnow()
+            self._set_rebuild_status(
+                state='completed', finished_at=finished.isoformat(), users_done=users_done, vectors=vectors,
+                duration_seconds=round((finished - started).total_seconds(), 3)
+            )
+            logger.info(f"Rebuilt FAISS index with {vectors} embeddings for {users_done} users")
             return True
             
         except Exception as e:
             logger.error(f"Error rebuilding FAISS index: {e}")
+            self._set_rebuild_status(state='failed', finished_at=datetime.utcnow().isoformat(), error=str(e))
+            shutil.rmtree(shadow_dir, ignore_errors=True)
             return False
+
+        finally:
+            with self._partitions_lock:
+                self._rebuild_touched = None
+            self._rebuild_lock.release()
+
+    def _swap_in_partitions(self, shadow_dir: str):
+        """Atomically replace the partition directory with a finished rebuild."""
+        retired_dir = f"{self.partition_dir}.old"
+        shutil.rmtree(retired_dir, ignore_errors=True)
+        with self._partitions_lock:
+            # Shadow copies of users written to during the rebuild are stale
+            for user_id in self._rebuild_touched:
+                IndexPartition(user_id, self.dimension, shadow_dir).delete_files()
+            os.rename(self.partition_dir, retired_dir)
+            os.rename(shadow_dir, self.partition_dir)
+            # Loaded partitions belong to the old generation; reload lazily
+            self._partitions.clear()
+        shutil.rmtree(retired_dir, ignore_errors=True)
+
+    def _set_rebuild_status(self, **fields):
+        with self._partitions_lock:
+            self._rebuild_status = {**self._rebuild_status, **fields}
+
+    def get_rebuild_status(self) -> Dict[str, Any]:
+        """Progress of the current or last index rebuild.
+
+        Returns:
+            Dictionary with state (idle, running, completed, failed) and progress counters
+        """
+        with self._partitions_lock:
+            return dict(self._rebuild_status)
+    
+    # ------------------------------------------------------------------
+    # Document access tracking
+    # ------------------------------------------------------------------
+
+    def _record_access(self, document_ids) -> None:
+        """Count a search hit per document; written to the database by flush_access_counts."""
+        now = datetime.utcnow()
+        with self._access_lock:
+            for document_id in document_ids:
+                count, _ = self._pending_access.get(document_id, (0, now))
+                self._pending_access[document_id] = (count + 1, now)
+
+    def flush_access_counts(self, db: Session = None) -> int:
+        """Write buffered document access counts in one batched UPDATE.
+
+        Args:
+            db: Database session (a new one is used if not given)
+
+        Returns:
+            Number of documents updated
+        """
+        with self._access_lock:
+            pending, self._pending_access = self._pending_access, {}
+        if not pending:
+            return 0
+
+        own_session = db is None
+        db = db or db_config.get_session()
+        try:
+            db.execute(
+                update(Document.__table__)
+                .where(Document.__table__.c.id == bindparam('doc_id'))
+                .values(
+                    access_count=func.coalesce(Document.__table__.c.access_count, 0) + bindparam('hits'),
+                    last_accessed=bindparam('accessed_at')
+                ),
+                [
+                    {'doc_id': document_id, 'hits': count, 'accessed_at': accessed_at}
+                    for document_id, (count, accessed_at) in pending.items()
+                ]
+            )
+            db.commit()
+            return len(pending)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Failed to flush document access counts: {e}")
+            # Put the counts back so they are retried on the next flush
+            self._record_pending(pending)
+            return 0
+        finally:
+            if own_session:
+                db.close()
+
+    def _record_pending(self, pending: Dict[str, Tuple[int, datetime]]) -> None:
+        with self._access_lock:
+            for document_id, (count, accessed_at) in pending.items():
+                current, latest = self._pending_access.get(document_id, (0, accessed_at))
+                self._pending_access[document_id] = (current + count, max(latest, accessed_at))
+
+    def start(self) -> None:
+        """Start the background flusher for access counts and index checkpoints (idempotent)."""
+        if self._access_flusher is not None and self._access_flusher.is_alive():
+            return
+        self._access_stop.clear()
+        self._access_flusher = threading.Thread(
+            target=self._flush_loop,
+            name="document-access-flusher",
+            daemon=True
+        )
+        self._access_flusher.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write any remaining access counts."""
+        self._access_stop.set()
+        if self._access_flusher is not None:
+            self._access_flusher.join(timeout=5)
+            self._access_flusher = None
+        self.flush_access_counts()
+
+    def _flush_loop(self) -> None:
+        while not self._access_stop.wait(self.access_flush_interval):
+            self.flush_access_counts()
+            self.checkpoint_partitions()
+
+    def checkpoint_partitions(self) -> int:
+        """Fold aged or oversized delta logs of loaded partitions into checkpoints.
+
+        Returns:
+            Number of partitions checkpointed
+        """
+        with self._partitions_lock:
+            partitions = list(self._partitions.values())
+        checkpointed = 0
+        for partition in partitions:
+            try:
+                checkpointed += partition.maybe_checkpoint()
+            except Exception as e:
+                logger.warning(f"Checkpoint of index partition for user {partition.user_id} failed: {e}")
+        return checkpointed
     
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the embedding service.
@@ -358,13 +914,65 @@ class EmbeddingService:
         Returns:
             Dictionary with service statistics
         """
+        with self._partitions_lock:
+            partitions = list(self._partitions.values())
+            partition_stats = dict(self._partition_stats)
+        with self._rescore_lock:
+            rescore_stats = dict(self._rescore_stats)
+        loaded_vectors = sum(p.live_count for p in partitions)
+        memory = sum(p.memory_bytes() for p in partitions)
+        full_precision_memory = sum(p.full_precision_bytes() for p in partitions)
+
         return {
             'model_name': self.model_name,
-            'embedding_dimension': self.dimension,
-            'total_vectors': self.faiss_index.ntotal if self.faiss_index else 0,
+            'embedding_backend': (
+                f"{self.backend}-int8" if getattr(self._embedding_model, 'quantized', False) else self.backend
+            ),
+            'embedding_dimension': self._dimension,
+            'model_loaded': self.is_ready,
+            'model_load_seconds': self.model_load_seconds,
+            'total_vectors': loaded_vectors,
             'index_path': self.index_path,
-            'mapping_size': len(self.chunk_id_mapping)
+            'mapping_size': loaded_vectors,
+            'live_vectors': loaded_vectors,
+            'dead_vectors': sum(p.dead_count for p in partitions),
+            'partitions_loaded': len(partitions),
+            'partitions_mapped': sum(p.mapped for p in partitions),
+            'partition_refreshes': partition_stats['refreshes'],
+            'partition_memory_bytes': memory,
+            'partition_memory_limit_bytes': self.max_partition_memory,
+            'partition_hits': partition_stats['hits'],
+            'partition_loads': partition_stats['loads'],
+            'partition_builds': partition_stats['builds'],
+            'partition_evictions': partition_stats['evictions'],
+            'compactions': partition_stats['compactions'],
+            'ann_switches': partition_stats['ann_switches'],
+            'index_kinds': dict(Counter(p.kind for p in partitions)),
+            'index_codecs': dict(Counter(p.codec for p in partitions)),
+            'quantizations': partition_stats['quantizations'],
+            'full_precision_memory_bytes': full_precision_memory,
+            'memory_reduction': round(full_precision_memory / memory, 2) if memory else None,
+            'rescored_searches': rescore_stats['searches'],
+            'quantized_recall_at_k': (
+                round(rescore_stats['recall_sum'] / rescore_stats['searches'], 4)
+                if rescore_stats['searches'] else None
+            ),
+            'pending_access_updates': len(self._pending_access),
+            'embedding_batching': self.batcher.get_stats(),
+            'query_cache': self.query_cache.get_stats()
         }
 
+def create_embedding_service():
+    """Create the embedding service for this process.
+
+    Returns:
+        RemoteEmbeddingService when VECTOR_SERVICE_URL points at a sidecar,
+        otherwise an in-process EmbeddingService
+    """
+    if os.getenv('VECTOR_SERVICE_URL'):
+        from .vector_client import RemoteEmbeddingService
+        return RemoteEmbeddingService()
+    return EmbeddingService()
+
 # Global embedding service instance
-embedding_service = EmbeddingService()
\ No newline at end of file
+embedding_service = create_embedding_service()
\ No newline at end of file
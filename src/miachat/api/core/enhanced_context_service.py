@@ -8,14 +8,43 @@ Provides unified context orchestration combining:
 - Natural language document reference parsing
 - Reasoning chain generation
 - Conflict detection between sources
+
+Independent sources are fetched concurrently on bounded worker pools, each
+with its own database session. Sources that call external services (calendar,
+web search) run on a separate pool, so slow network calls never hold up the
+local sources of other turns. Environment variables:
+- CONTEXT_CONCURRENT_ASSEMBLY: Set to "false" to fetch sources sequentially (default: true)
+- CONTEXT_MAX_WORKERS: Size of the shared pool for local sources (default: 32)
+- CONTEXT_NETWORK_WORKERS: Size of the shared pool for network-bound sources (default: 16)
+- CONTEXT_ASSEMBLY_BUDGET_MS: Time budget for network-bound sources (default: 800)
+- CONTEXT_LOCAL_DEADLINE_MS: Deadline for local sources such as conversation
+  memory, backstory and documents, which may load an index on first use (default: 5000)
+- CONTEXT_FORCED_SEARCH_DEADLINE_MS: Deadline for explicitly requested web searches (default: 8000)
+- CONTEXT_LATE_RESULT_TTL: Seconds a late-arriving source result stays reusable (default: 300)
+
+Network sources that miss their soft deadline are dropped from the turn
+instead of delaying the reply; local sources only give up after the much
+longer local deadline, and documents pinned to the session or requested for
+comprehensive analysis are always waited for. Fetches that have not started
+yet are cancelled. Running ones whose result does not depend on the message
+(e.g. calendar) are cached when they arrive, for the next turn.
 """
 
 import logging
+import os
 import re
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass, field
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from ...database.config import get_db
+from ...database.fulltext import fulltext_available, search_document_titles
 from .document_service import document_service
 from .embedding_service import embedding_service
 from .memory_service import memory_service
@@ -31,15 +60,56 @@ from ...database.models import PersonaGoogleSyncConfig
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class SourceResult:
+    """What one context source contributes to the assembled context."""
+    updates: Dict[str, Any] = field(default_factory=dict)
+    reasoning: List[Dict[str, Any]] = field(default_factory=list)
+    skipped: bool = False
+
+
+@dataclass
+class ContextSource:
+    """One independently fetchable piece of context."""
+    name: str
+    fetch: Callable[[Session], SourceResult]
+    needs_db: bool = True
+    # Identifies the inputs, so a late result is only reused for the same request.
+    # None for sources whose result depends on the message: those are never reused.
+    cache_key: Optional[Tuple] = None
+    # Overrides the configured soft deadline (and may exceed the total budget)
+    deadline_ms: Optional[float] = None
+    # Calls an external service; runs on the network pool under the assembly budget
+    network: bool = False
+    # Always waited for, never dropped
+    required: bool = False
+
+
 class EnhancedContextService:
     """Service for intelligent context synthesis and reasoning."""
 
+    # Soft deadlines (ms from start of assembly) for sources that call out to
+    # the network, capped by the assembly budget. Local sources have the local
+    # deadline unless listed here.
+    DEFAULT_SOURCE_DEADLINES_MS = {
+        'calendar': 500,
+        'web_search': 700,
+    }
+    LATE_RESULT_CACHE_SIZE = 256
+
     def __init__(
         self,
         max_context_chunks: int = 10,
         similarity_threshold: float = 0.35,  # Lowered for better recall
         max_context_length: int = 8000,  # Increased for richer context
-        max_recent_interactions: int = 4  # Focus on last 4 interactions
+        max_recent_interactions: int = 4,  # Focus on last 4 interactions
+        concurrent_assembly: Optional[bool] = None,
+        max_source_workers: Optional[int] = None,
+        max_network_workers: Optional[int] = None,
+        assembly_budget_ms: Optional[float] = None,
+        local_deadline_ms: Optional[float] = None,
+        source_deadlines_ms: Optional[Dict[str, float]] = None
     ):
         """Initialize the Enhanced Context Service.
 
@@ -48,12 +118,39 @@ class EnhancedContextService:
             similarity_threshold: Minimum similarity score for including chunks
             max_context_length: Maximum total character length of document context
             max_recent_interactions: Maximum recent chat interactions to include
+            concurrent_assembly: Fetch sources in parallel (defaults to CONTEXT_CONCURRENT_ASSEMBLY)
+            max_source_workers: Worker pool size for local source fetches (defaults to CONTEXT_MAX_WORKERS)
+            max_network_workers: Worker pool size for network-bound sources (defaults to CONTEXT_NETWORK_WORKERS)
+            assembly_budget_ms: Budget for network-bound source fetches (defaults to CONTEXT_ASSEMBLY_BUDGET_MS)
+            local_deadline_ms: Deadline for local source fetches (defaults to CONTEXT_LOCAL_DEADLINE_MS)
+            source_deadlines_ms: Per-source soft deadlines, merged over DEFAULT_SOURCE_DEADLINES_MS
         """
         self.max_context_chunks = max_context_chunks
         self.similarity_threshold = similarity_threshold
         self.max_context_length = max_context_length
         self.max_recent_interactions = max_recent_interactions
 
+        if concurrent_assembly is None:
+            concurrent_assembly = os.getenv('CONTEXT_CONCURRENT_ASSEMBLY', 'true').lower() != 'false'
+        self.concurrent_assembly = concurrent_assembly
+        # Sized for several concurrent turns (up to seven local sources each)
+        self.max_source_workers = max_source_workers or int(os.getenv('CONTEXT_MAX_WORKERS', '32'))
+        self.max_network_workers = max_network_workers or int(os.getenv('CONTEXT_NETWORK_WORKERS', '16'))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._network_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+        # Deadlines and graceful degradation (concurrent path only)
+        self.assembly_budget_ms = assembly_budget_ms or float(os.getenv('CONTEXT_ASSEMBLY_BUDGET_MS', '800'))
+        self.local_deadline_ms = local_deadline_ms or float(os.getenv('CONTEXT_LOCAL_DEADLINE_MS', '5000'))
+        self.source_deadlines_ms = {**self.DEFAULT_SOURCE_DEADLINES_MS, **(source_deadlines_ms or {})}
+        self.forced_search_deadline_ms = float(os.getenv('CONTEXT_FORCED_SEARCH_DEADLINE_MS', '8000'))
+        self.late_result_ttl = float(os.getenv('CONTEXT_LATE_RESULT_TTL', '300'))
+        self._late_results: "OrderedDict[Tuple, Tuple[float, SourceResult]]" = OrderedDict()
+        self._late_results_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {'assemblies': 0, 'degraded_assemblies': 0, 'sources': {}}
+        self._stats_lock = threading.Lock()
+
         # Context budget allocation (percentages)
         self.context_budget = {
             'user_profile': 0.10, # 10% for user's "About You" profile (highest priority)
@@ -90,10 +187,19 @@ class EnhancedContextService:
         enable_reasoning: bool = True,
         force_document_ids: Optional[List[str]] = None,
         force_search: bool = False,
-        db: Session = None
+        db: Session = None,
+        concurrent: Optional[bool] = None
     ) -> Dict[str, Any]:
         """Get enhanced context with intelligent synthesis and reasoning.
 
+        Independent sources (conversation memory, documents, user profile,
+        setting, tracking, calendar, backstory, facts, web search) are fetched
+        in parallel and merged in a fixed order, so the result is identical to
+        fetching them one after another.
+        Sources that miss their deadline are listed in 'skipped_sources' and
+        noted in the reasoning chain; forced and comprehensive document
+        context is never skipped.
+
         Args:
             user_message: Current user message
             user_id: User ID for document access
@@ -106,6 +212,7 @@ class EnhancedContextService:
             force_document_ids: Optional list of document IDs to always include (for session persistence)
             force_search: If True, always perform web search (bypasses intent detection)
             db: Database session
+            concurrent: Override the service's concurrent_assembly setting for this call
 
         Returns:
             Dictionary with enhanced context and reasoning information
@@ -113,6 +220,9 @@ class EnhancedContextService:
         if db is None:
             db = next(get_db())
 
+        if concurrent is None:
+            concurrent = self.concurrent_assembly
+
         try:
             context = {
                 'conversation_history': [],
@@ -132,7 +242,8 @@ class EnhancedContextService:
                 'context_summary': '',
                 'reasoning_chain': [],
                 'conflicts_detected': [],
-                'sources': []
+                'sources': [],
+                'skipped_sources': []  # Sources dropped for missing their deadline
             }
 
             # Generate reasoning chain if enabled
@@ -152,202 +263,30 @@ class EnhancedContextService:
                     'thought': f"Detected document references: {doc_references}"
                 })
 
-            # Get recent conversation context (focused on last 4 interactions)
-            if include_conversation_history and conversation_id:
-                recent_context = self._get_recent_conversation_context(
-                    conversation_id=conversation_id,
-                    user_message=user_message,
-                    db=db
-                )
-                context['recent_interactions'] = recent_context
+            # Fetch every source, then merge in plan order
+            sources = self._plan_context_sources(
+                user_message=user_message,
+                user_id=user_id,
+                conversation_id=conversation_id,
+                character_id=character_id,
+                include_conversation_history=include_conversation_history,
+                include_documents=include_documents,
+                comprehensive_analysis=comprehensive_analysis,
+                force_document_ids=force_document_ids,
+                force_search=force_search,
+                doc_references=doc_references
+            )
+            if concurrent and len(sources) > 1:
+                results = self._fetch_sources_concurrently(sources, db)
+            else:
+                results = [source.fetch(db) for source in sources]
 
+            for source, result in zip(sources, results):
+                if result.skipped:
+                    context['skipped_sources'].append(source.name)
+                context.update(result.updates)
                 if enable_reasoning:
-                    context['reasoning_chain'].append({
-                        'step': 'conversation_context',
-                        'thought': f"Retrieved {len(recent_context)} recent conversation interactions"
-                    })
-
-                # Get broader semantic context for relevant historical insights
-                semantic_context = memory_service.get_context(
-                    conversation_id=conversation_id,
-                    current_message=user_message,
-                    context_window=8,  # Broader search for semantic relevance
-                    db=db
-                )
-                context['semantic_context'] = semantic_context
-
-                if enable_reasoning and semantic_context:
-                    context['reasoning_chain'].append({
-                        'step': 'semantic_memory',
-                        'thought': f"Found {len(semantic_context)} semantically relevant past interactions"
-                    })
-
-            # Get relevant documents based on references and semantic search
-            if include_documents:
-                document_context = self._get_intelligent_document_context(
-                    query=user_message,
-                    user_id=user_id,
-                    db=db,
-                    conversation_id=conversation_id,
-                    character_id=character_id,
-                    document_references=doc_references,
-                    comprehensive_analysis=comprehensive_analysis,
-                    reasoning_chain=context['reasoning_chain'] if enable_reasoning else None,
-                    force_document_ids=force_document_ids
-                )
-                context.update(document_context)
-
-            # Get simplified context system data (user profile, setting, backstory, facts)
-            if character_id:
-                # Get user profile context (highest priority - explicitly set by user)
-                user_profile_ctx = user_profile_service.format_user_profile_context(character_id)
-                if user_profile_ctx:
-                    context['user_profile_context'] = user_profile_ctx
-                    if enable_reasoning:
-                        context['reasoning_chain'].append({
-                            'step': 'user_profile_context',
-                            'thought': "Retrieved user's 'About You' profile"
-                        })
-
-                # Get setting context
-                setting_ctx = setting_service.format_setting_context(character_id)
-                if setting_ctx:
-                    context['setting_context'] = setting_ctx
-                    if enable_reasoning:
-                        context['reasoning_chain'].append({
-                            'step': 'setting_context',
-                            'thought': "Retrieved character setting/world context"
-                        })
-
-                # Get tracking context (goals, todos, habits)
-                try:
-                    tracking_ctx = tracking_service.get_tracking_context(
-                        user_id=user_id,
-                        character_id=character_id,
-                        db=db
-                    )
-                    if tracking_ctx:
-                        context['tracking_context'] = tracking_ctx
-                        if enable_reasoning:
-                            context['reasoning_chain'].append({
-                                'step': 'tracking_context',
-                                'thought': "Retrieved user's goals, todos, and habits"
-                            })
-                except Exception as e:
-                    logger.warning(f"Failed to get tracking context: {e}")
-
-                # Get calendar context (only if enabled for this persona)
-                try:
-                    # Check if calendar access is enabled for this persona
-                    sync_config = db.query(PersonaGoogleSyncConfig).filter_by(
-                        user_id=user_id,
-                        character_id=character_id
-                    ).first()
-
-                    if sync_config and sync_config.calendar_sync_enabled:
-                        calendar_ctx = google_calendar_service.get_calendar_context(
-                            user_id=user_id,
-                            db=db,
-                            days_ahead=7,
-                            max_events=10
-                        )
-                        if calendar_ctx:
-                            context['calendar_context'] = calendar_ctx
-                            if enable_reasoning:
-                                context['reasoning_chain'].append({
-                                    'step': 'calendar_context',
-                                    'thought': "Retrieved user's upcoming calendar events"
-                                })
-                except Exception as e:
-                    logger.warning(f"Failed to get calendar context: {e}")
-
-                # Get relevant backstory chunks
-                backstory_chunks = backstory_service.get_relevant_backstory(
-                    character_id=character_id,
-                    user_id=user_id,
-                    query=user_message,
-                    db=db,
-                    top_k=2
-                )
-                if backstory_chunks:
-                    context['backstory_context'] = backstory_chunks
-                    if enable_reasoning:
-                        context['reasoning_chain'].append({
-                            'step': 'backstory_retrieval',
-                            'thought': f"Retrieved {len(backstory_chunks)} relevant backstory chunks"
-                        })
-
-                # Get user facts
-                user_facts = fact_extraction_service.get_user_facts(
-                    user_id=user_id,
-                    character_id=character_id,
-                    db=db
-                )
-                if user_facts:
-                    context['user_facts'] = user_facts
-                    if enable_reasoning:
-                        context['reasoning_chain'].append({
-                            'step': 'user_facts',
-                            'thought': f"Retrieved {len(user_facts)} known facts about user"
-                        })
-
-            # Web search if force_search=True or (character has capability and search intent detected)
-            if character_id:
-                try:
-                    from .character_manager import character_manager
-                    character = character_manager.get_character(character_id)
-                    logger.debug(f"Web search check - character_id={character_id}, character found={character is not None}")
-
-                    if character:
-                        has_capability = web_search_service.check_capability(character)
-                        logger.debug(f"Web search capability check: {has_capability}, capabilities={character.get('capabilities', {})}")
-
-                        # Determine if we should search
-                        should_search = False
-                        search_query = user_message
-                        search_type = 'web'
-
-                        if force_search and has_capability:
-                            # User explicitly requested search via button
-                            should_search = True
-                            logger.warning(f"[SEARCH] Force search enabled - searching for: '{user_message[:50]}...'")
-                        elif has_capability:
-                            # Check if message implies search intent (auto-detection fallback)
-                            search_intent = web_search_service.detect_search_intent(user_message)
-                            logger.debug(f"Search intent: should_search={search_intent.should_search}, type={search_intent.intent_type}")
-                            if search_intent.should_search:
-                                should_search = True
-                                search_query = search_intent.query or user_message
-                                search_type = search_intent.intent_type or 'web'
-
-                        if should_search:
-                            # Perform the search
-                            if search_type == 'current_events':
-                                results = web_search_service.search_news(
-                                    query=search_query,
-                                    max_results=5,
-                                    timelimit='w'
-                                )
-                            else:
-                                results = web_search_service.search(
-                                    query=search_query,
-                                    max_results=5
-                                )
-
-                            if results:
-                                # Convert SearchResult objects to dicts for serialization
-                                context['web_search_results'] = [r.to_dict() for r in results]
-                                context['web_search_context'] = web_search_service.format_results_for_context(
-                                    results, search_query, max_chars=int(self.max_context_length * self.context_budget['web_search'])
-                                )
-                                if enable_reasoning:
-                                    context['reasoning_chain'].append({
-                                        'step': 'web_search',
-                                        'thought': f"Performed web search for '{search_query}' - found {len(results)} results"
-                                    })
-                                logger.warning(f"[SEARCH] Web search SUCCESS: {len(results)} results for '{search_query[:30]}...'")
-                except Exception as e:
-                    logger.warning(f"Web search failed: {e}", exc_info=True)
+                    context['reasoning_chain'].extend(result.reasoning)
 
             # Detect conflicts between sources
             if enable_reasoning:
@@ -413,6 +352,480 @@ class EnhancedContextService:
                 'error': str(e)
             }
 
+    # ------------------------------------------------------------------
+    # Context sources
+    # ------------------------------------------------------------------
+
+    def _plan_context_sources(
+        self,
+        user_message: str,
+        user_id: int,
+        conversation_id: Optional[int],
+        character_id: Optional[str],
+        include_conversation_history: bool,
+        include_documents: bool,
+        comprehensive_analysis: bool,
+        force_document_ids: Optional[List[str]],
+        force_search: bool,
+        doc_references: List[Dict[str, Any]]
+    ) -> List[ContextSource]:
+        """Decide which sources to fetch for this turn.
+
+        Returns:
+            Ordered list of sources. The order is the merge order.
+        """
+        sources = []
+
+        if include_conversation_history and conversation_id:
+            sources.append(ContextSource(
+                'conversation',
+                partial(self._fetch_conversation_source, conversation_id, user_message)
+            ))
+
+        if include_documents:
+            sources.append(ContextSource(
+                'documents',
+                partial(
+                    self._fetch_document_source,
+                    query=user_message,
+                    user_id=user_id,
+                    conversation_id=conversation_id,
+                    character_id=character_id,
+                    document_references=doc_references,
+                    comprehensive_analysis=comprehensive_analysis,
+                    force_document_ids=force_document_ids
+                ),
+                # Documents the session pinned or the user asked to analyze are worth waiting for
+                required=bool(force_document_ids) or comprehensive_analysis
+            ))
+
+        if character_id:
+            sources.extend([
+                ContextSource('user_profile', partial(self._fetch_user_profile_source, character_id),
+                              needs_db=False, cache_key=(character_id,)),
+                ContextSource('setting', partial(self._fetch_setting_source, character_id),
+                              needs_db=False, cache_key=(character_id,)),
+                ContextSource('tracking', partial(self._fetch_tracking_source, user_id, character_id),
+                              cache_key=(user_id, character_id)),
+                ContextSource('calendar', partial(self._fetch_calendar_source, user_id, character_id),
+                              cache_key=(user_id, character_id), network=True),
+                ContextSource('backstory', partial(self._fetch_backstory_source, user_id, character_id, user_message)),
+                ContextSource('user_facts', partial(self._fetch_user_facts_source, user_id, character_id),
+                              cache_key=(user_id, character_id)),
+                ContextSource('web_search', partial(self._fetch_web_search_source, character_id, user_message, force_search),
+                              needs_db=False, network=True,
+                              # An explicit search request is worth waiting for
+                              deadline_ms=self.forced_search_deadline_ms if force_search else None),
+            ])
+
+        return sources
+
+    def _fetch_sources_concurrently(self, sources: List[ContextSource], db: Session) -> List[SourceResult]:
+        """Fetch sources on the bounded worker pools under the assembly budget.
+
+        Each source that touches the database gets its own session bound to the
+        caller's engine, since a Session must not be shared between threads.
+        Results come back in plan order. A source that misses its deadline is
+        dropped from this turn. If it has not started, it is cancelled so it
+        does not occupy a worker other turns are waiting for; if it is running
+        and has a cache_key, its result is cached when it finishes and served
+        the next time that source runs late.
+        If a source raises in time, the failure propagates as it would have on
+        the sequential path.
+        """
+        started = time.monotonic()
+
+        futures = [
+            self._get_executor(source.network).submit(self._run_source, source, db if source.needs_db else None)
+            for source in sources
+        ]
+
+        results = []
+        degraded = False
+        for source, future in zip(sources, futures):
+            deadline_ms = self._source_deadline_ms(source)
+            timeout = None
+            if deadline_ms is not None:
+                timeout = max(0.0, started + deadline_ms / 1000.0 - time.monotonic())
+
+            try:
+                result = future.result(timeout=timeout)
+            except FuturesTimeoutError:
+                degraded = True
+                if future.cancel():
+                    self._record_source(source.name, 'cancelled')
+                else:
+                    future.add_done_callback(partial(self._store_late_result, source))
+                results.append(self._late_source_fallback(source, deadline_ms))
+                continue
+            except Exception:
+                self._record_source(source.name, 'failed', time.monotonic() - started)
+                raise
+
+            self._record_source(source.name, 'completed', time.monotonic() - started)
+            results.append(result)
+
+        with self._stats_lock:
+            self._stats['assemblies'] += 1
+            if degraded:
+                self._stats['degraded_assemblies'] += 1
+
+        return results
+
+    def _source_deadline_ms(self, source: ContextSource) -> Optional[float]:
+        """Deadline for a source, measured from the start of assembly; None to wait for it."""
+        if source.required:
+            return None
+        if source.deadline_ms is not None:
+            return source.deadline_ms
+        if source.network:
+            return min(self.source_deadlines_ms.get(source.name, self.assembly_budget_ms), self.assembly_budget_ms)
+        return self.source_deadlines_ms.get(source.name, self.local_deadline_ms)
+
+    def _late_source_fallback(self, source: ContextSource, deadline_ms: float) -> SourceResult:
+        """Build the stand-in for a source that missed its deadline.
+
+        Uses the cached late result from a previous turn when there is one,
+        otherwise contributes nothing except a note in the reasoning chain.
+        """
+        self._record_source(source.name, 'timed_out')
+        logger.warning(f"Context source '{source.name}' missed its {deadline_ms:.0f}ms deadline; dropping it for this turn")
+
+        cached = self._get_late_result(source)
+        if cached is not None:
+            self._record_source(source.name, 'served_from_cache')
+            return SourceResult(
+                updates=dict(cached.updates),
+                reasoning=[{
+                    'step': 'source_timeout',
+                    'thought': f"{source.name} context exceeded {deadline_ms:.0f}ms; using the result from an earlier turn"
+                }] + list(cached.reasoning),
+                skipped=False
+            )
+
+        return SourceResult(
+            reasoning=[{
+                'step': 'source_timeout',
+                'thought': f"Skipped {source.name} context: no result within {deadline_ms:.0f}ms"
+            }],
+            skipped=True
+        )
+
+    def _store_late_result(self, source: ContextSource, future: Future) -> None:
+        """Cache a result that arrived after its deadline for the next turn."""
+        if source.cache_key is None or future.cancelled() or future.exception() is not None:
+            return
+        with self._late_results_lock:
+            key = (source.name,) + source.cache_key
+            self._late_results[key] = (time.monotonic(), future.result())
+            self._late_results.move_to_end(key)
+            while len(self._late_results) > self.LATE_RESULT_CACHE_SIZE:
+                self._late_results.popitem(last=False)
+        self._record_source(source.name, 'late_arrivals')
+
+    def _get_late_result(self, source: ContextSource) -> Optional[SourceResult]:
+        """Look up a cached late result that is still within its TTL."""
+        if source.cache_key is None:
+            return None
+        key = (source.name,) + source.cache_key
+        with self._late_results_lock:
+            entry = self._late_results.get(key)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            if time.monotonic() - stored_at > self.late_result_ttl:
+                del self._late_results[key]
+                return None
+            return result
+
+    def _record_source(self, name: str, outcome: str, elapsed: Optional[float] = None) -> None:
+        """Update per-source counters."""
+        with self._stats_lock:
+            source_stats = self._stats['sources'].setdefault(name, {
+                'completed': 0, 'failed': 0, 'timed_out': 0, 'cancelled': 0,
+                'late_arrivals': 0, 'served_from_cache': 0, 'total_ms': 0.0
+            })
+            source_stats[outcome] += 1
+            if elapsed is not None:
+                source_stats['total_ms'] += elapsed * 1000.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get context assembly statistics.
+
+        Returns:
+            Dictionary with budget settings, assembly counts and per-source outcomes
+        """
+        with self._stats_lock:
+            sources = {}
+            for name, counts in self._stats['sources'].items():
+                finished = counts['completed'] + counts['failed']
+                sources[name] = {
+                    **{k: v for k, v in counts.items() if k != 'total_ms'},
+                    'avg_ms': round(counts['total_ms'] / finished, 1) if finished else None
+                }
+            stats = {
+                'concurrent_assembly': self.concurrent_assembly,
+                'assembly_budget_ms': self.assembly_budget_ms,
+                'local_deadline_ms': self.local_deadline_ms,
+                'source_deadlines_ms': dict(self.source_deadlines_ms),
+                'assemblies': self._stats['assemblies'],
+                'degraded_assemblies': self._stats['degraded_assemblies'],
+                'sources': sources
+            }
+        with self._late_results_lock:
+            stats['cached_late_results'] = len(self._late_results)
+        return stats
+
+    def _run_source(self, source: ContextSource, parent_db: Optional[Session]) -> SourceResult:
+        """Run one source on a worker thread with its own database session."""
+        source_db = self._source_session(parent_db)
+        try:
+            return source.fetch(source_db)
+        except Exception:
+            logger.debug(f"Context source '{source.name}' failed", exc_info=True)
+            raise
+        finally:
+            if source_db is not None and source_db is not parent_db:
+                source_db.close()
+
+    @staticmethod
+    def _source_session(parent_db: Optional[Session]) -> Optional[Session]:
+        """Open a session on the same engine as the caller's session.
+
+        Anything that is not a SQLAlchemy Session (e.g. a test double) is
+        passed through unchanged.
+        """
+        if isinstance(parent_db, Session):
+            return Session(bind=parent_db.get_bind(), autoflush=False)
+        return parent_db
+
+    def _get_executor(self, network: bool = False) -> ThreadPoolExecutor:
+        """Lazily create the bounded pools shared by all context requests.
+
+        Args:
+            network: Return the pool for sources that call external services
+        """
+        with self._executor_lock:
+            if network:
+                if self._network_executor is None:
+                    self._network_executor = ThreadPoolExecutor(
+                        max_workers=self.max_network_workers,
+                        thread_name_prefix="context-network"
+                    )
+                return self._network_executor
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_source_workers,
+                    thread_name_prefix="context-source"
+                )
+            return self._executor
+
+    def _fetch_conversation_source(self, conversation_id: int, user_message: str, db: Session) -> SourceResult:
+        """Recent interactions plus semantically relevant history."""
+        result = SourceResult()
+
+        # Get recent conversation context (focused on last 4 interactions)
+        recent_context = self._get_recent_conversation_context(
+            conversation_id=conversation_id,
+            user_message=user_message,
+            db=db
+        )
+        result.updates['recent_interactions'] = recent_context
+        result.reasoning.append({
+            'step': 'conversation_context',
+            'thought': f"Retrieved {len(recent_context)} recent conversation interactions"
+        })
+
+        # Get broader semantic context for relevant historical insights
+        semantic_context = memory_service.get_context(
+            conversation_id=conversation_id,
+            current_message=user_message,
+            context_window=8,  # Broader search for semantic relevance
+            db=db
+        )
+        result.updates['semantic_context'] = semantic_context
+
+        if semantic_context:
+            result.reasoning.append({
+                'step': 'semantic_memory',
+                'thought': f"Found {len(semantic_context)} semantically relevant past interactions"
+            })
+
+        return result
+
+    def _fetch_document_source(self, db: Session, **kwargs) -> SourceResult:
+        """Relevant documents based on references and semantic search."""
+        result = SourceResult()
+        result.updates = self._get_intelligent_document_context(
+            db=db,
+            reasoning_chain=result.reasoning,
+            **kwargs
+        )
+        return result
+
+    def _fetch_user_profile_source(self, character_id: str, db: Session) -> SourceResult:
+        """User's "About You" profile (highest priority - explicitly set by user)."""
+        result = SourceResult()
+        user_profile_ctx = user_profile_service.format_user_profile_context(character_id)
+        if user_profile_ctx:
+            result.updates['user_profile_context'] = user_profile_ctx
+            result.reasoning.append({
+                'step': 'user_profile_context',
+                'thought': "Retrieved user's 'About You' profile"
+            })
+        return result
+
+    def _fetch_setting_source(self, character_id: str, db: Session) -> SourceResult:
+        """Character setting/world context."""
+        result = SourceResult()
+        setting_ctx = setting_service.format_setting_context(character_id)
+        if setting_ctx:
+            result.updates['setting_context'] = setting_ctx
+            result.reasoning.append({
+                'step': 'setting_context',
+                'thought': "Retrieved character setting/world context"
+            })
+        return result
+
+    def _fetch_tracking_source(self, user_id: int, character_id: str, db: Session) -> SourceResult:
+        """Goals, todos and habits."""
+        result = SourceResult()
+        try:
+            tracking_ctx = tracking_service.get_tracking_context(
+                user_id=user_id,
+                character_id=character_id,
+                db=db
+            )
+            if tracking_ctx:
+                result.updates['tracking_context'] = tracking_ctx
+                result.reasoning.append({
+                    'step': 'tracking_context',
+                    'thought': "Retrieved user's goals, todos, and habits"
+                })
+        except Exception as e:
+            logger.warning(f"Failed to get tracking context: {e}")
+        return result
+
+    def _fetch_calendar_source(self, user_id: int, character_id: str, db: Session) -> SourceResult:
+        """Upcoming calendar events (only if enabled for this persona)."""
+        result = SourceResult()
+        try:
+            # Check if calendar access is enabled for this persona
+            sync_config = db.query(PersonaGoogleSyncConfig).filter_by(
+                user_id=user_id,
+                character_id=character_id
+            ).first()
+
+            if sync_config and sync_config.calendar_sync_enabled:
+                calendar_ctx = google_calendar_service.get_calendar_context(
+                    user_id=user_id,
+                    db=db,
+                    days_ahead=7,
+                    max_events=10
+                )
+                if calendar_ctx:
+                    result.updates['calendar_context'] = calendar_ctx
+                    result.reasoning.append({
+                        'step': 'calendar_context',
+                        'thought': "Retrieved user's upcoming calendar events"
+                    })
+        except Exception as e:
+            logger.warning(f"Failed to get calendar context: {e}")
+        return result
+
+    def _fetch_backstory_source(self, user_id: int, character_id: str, user_message: str, db: Session) -> SourceResult:
+        """Relevant backstory chunks."""
+        result = SourceResult()
+        backstory_chunks = backstory_service.get_relevant_backstory(
+            character_id=character_id,
+            user_id=user_id,
+            query=user_message,
+            db=db,
+            top_k=2
+        )
+        if backstory_chunks:
+            result.updates['backstory_context'] = backstory_chunks
+            result.reasoning.append({
+                'step': 'backstory_retrieval',
+                'thought': f"Retrieved {len(backstory_chunks)} relevant backstory chunks"
+            })
+        return result
+
+    def _fetch_user_facts_source(self, user_id: int, character_id: str, db: Session) -> SourceResult:
+        """Known facts about the user."""
+        result = SourceResult()
+        user_facts = fact_extraction_service.get_user_facts(
+            user_id=user_id,
+            character_id=character_id,
+            db=db
+        )
+        if user_facts:
+            result.updates['user_facts'] = user_facts
+            result.reasoning.append({
+                'step': 'user_facts',
+                'thought': f"Retrieved {len(user_facts)} known facts about user"
+            })
+        return result
+
+    def _fetch_web_search_source(self, character_id: str, user_message: str, force_search: bool, db: Session) -> SourceResult:
+        """Web search if force_search=True or (character has capability and search intent detected)."""
+        result = SourceResult()
+        try:
+            from .character_manager import character_manager
+            character = character_manager.get_character(character_id)
+            logger.debug(f"Web search check - character_id={character_id}, character found={character is not None}")
+
+            if character:
+                has_capability = web_search_service.check_capability(character)
+                logger.debug(f"Web search capability check: {has_capability}, capabilities={character.get('capabilities', {})}")
+
+                # Determine if we should search
+                should_search = False
+                search_query = user_message
+                search_type = 'web'
+
+                if force_search and has_capability:
+                    # User explicitly requested search via button
+                    should_search = True
+                    logger.warning(f"[SEARCH] Force search enabled - searching for: '{user_message[:50]}...'")
+                elif has_capability:
+                    # Check if message implies search intent (auto-detection fallback)
+                    search_intent = web_search_service.detect_search_intent(user_message)
+                    logger.debug(f"Search intent: should_search={search_intent.should_search}, type={search_intent.intent_type}")
+                    if search_intent.should_search:
+                        should_search = True
+                        search_query = search_intent.query or user_message
+                        search_type = search_intent.intent_type or 'web'
+
+                if should_search:
+                    # Perform the search
+                    if search_type == 'current_events':
+                        results = web_search_service.search_news(
+                            query=search_query,
+                            max_results=5,
+                            timelimit='w'
+                        )
+                    else:
+                        results = web_search_service.search(
+                            query=search_query,
+                            max_results=5
+                        )
+
+                    if results:
+                        # Convert SearchResult objects to dicts for serialization
+                        result.updates['web_search_results'] = [r.to_dict() for r in results]
+                        result.updates['web_search_context'] = web_search_service.format_results_for_context(
+                            results, search_query, max_chars=int(self.max_context_length * self.context_budget['web_search'])
+                        )
+                        result.reasoning.append({
+                            'step': 'web_search',
+                            'thought': f"Performed web search for '{search_query}' - found {len(results)} results"
+                        })
+                        logger.warning(f"[SEARCH] Web search SUCCESS: {len(results)} results for '{search_query[:30]}...'")
+        except Exception as e:
+            logger.warning(f"Web search failed: {e}", exc_info=True)
+        return result
+
     def _parse_document_references(self, user_message: str) -> List[Dict[str, Any]]:
         """Parse natural language references to documents in user message.
 
@@ -525,7 +938,7 @@ class EnhancedContextService:
                     force_document_ids, user_id, db, reasoning_chain
                 )
                 all_chunks.extend(forced_chunks)
-                if reasoning_chain:
+                if reasoning_chain is not None:
                     reasoning_chain.append({
                         'step': 'session_document_persistence',
                         'thought': f"Including {len(forced_chunks)} chunks from {len(force_document_ids)} session documents"
@@ -652,30 +1065,27 @@ class EnhancedContextService:
                         Document.is_processed == 1
                     ).order_by(Document.upload_date.desc()).limit(2).all()
                 else:
-                    # Specific document name search
-                    matching_docs = db.query(Document).filter(
-                        Document.user_id == user_id,
-                        Document.is_processed == 1,
-                        Document.original_filename.ilike(f'%{extracted_name}%')
-                    ).all()
-
-                    if not matching_docs:
-                        # Try searching in document content
-                        matching_docs = db.query(Document).filter(
+                    recent_docs = []
+                    if fulltext_available(db):
+                        # Match the name against the full-text index of titles
+                        document_ids = search_document_titles(db, extracted_name, user_id, limit=2,
+                                                              processed_only=True)
+                        documents = {
+                            doc.id: doc for doc in db.query(Document).filter(Document.id.in_(document_ids)).all()
+                        } if document_ids else {}
+                        recent_docs = [documents[doc_id] for doc_id in document_ids if doc_id in documents]
+
+                    if not recent_docs:
+                        # Substring search on the filename or metadata title; also finds
+                        # names inside longer words (e.g. "budget" in 2024budget_final.pdf)
+                        recent_docs = db.query(Document).filter(
                             Document.user_id == user_id,
-                            Document.is_processed == 1
-                        ).all()
-
-                        # Filter by content similarity
-                        content_matches = []
-                        for doc in matching_docs:
-                            if any(extracted_name in (doc.doc_metadata or {}).get('title', '').lower() or
-                                  extracted_name in doc.original_filename.lower() for _ in [None]):
-                                content_matches.append(doc)
-
-                        matching_docs = content_matches
-
-                    recent_docs = matching_docs[:2]  # Limit to most relevant
+                            Document.is_processed == 1,
+                            or_(
+                                Document.original_filename.ilike(f'%{extracted_name}%'),
+                                Document.doc_metadata['title'].as_string().ilike(f'%{extracted_name}%')
+                            )
+                        ).limit(2).all()  # Limit to most relevant
 
                 # Get chunks from matching documents
                 for doc in recent_docs:
@@ -762,7 +1172,7 @@ class EnhancedContextService:
                 session_documents = base_query.order_by(Document.upload_date.desc()).limit(1).all()
                 recent_documents = session_documents
 
-                if reasoning_chain:
+                if reasoning_chain is not None:
                     reasoning_chain.append({
                         'step': 'session_filtering',
                         'thought': f"Prioritizing {len(session_documents)} most recent documents for session-focused analysis"
@@ -23,19 +23,8 @@ from typing import Dict, List, Any, Optional, Union, Tuple
 from enum import Enum
 from dataclasses import dataclass
 
-# PDF generation
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
-
-# Word document generation
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.style import WD_STYLE_TYPE
+# reportlab (PDF) and python-docx (Word) are imported by the export methods
+# that use them, so importing this module does not load them
 
 logger = logging.getLogger(__name__)
 
@@ -1348,6 +1337,12 @@ class ExportService:
         include_timestamps: bool
     ) -> io.BytesIO:
         """Export conversation to PDF format."""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER
+
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(
             buffer,
@@ -1459,6 +1454,12 @@ class ExportService:
         original_message_count: int
     ) -> io.BytesIO:
         """Export summary to PDF format."""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(
             buffer,
@@ -1570,6 +1571,10 @@ class ExportService:
         include_timestamps: bool
     ) -> io.BytesIO:
         """Export conversation to Word document format."""
+        from docx import Document
+        from docx.shared import Pt, RGBColor
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+
         doc = Document()
 
         # Add title
@@ -1639,6 +1644,10 @@ class ExportService:
         original_message_count: int
     ) -> io.BytesIO:
         """Export summary to Word document format."""
+        from docx import Document
+        from docx.shared import Pt, RGBColor
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+
         doc = Document()
 
         # Add title
@@ -2159,6 +2168,12 @@ class ExportService:
         doc_type_name: str
     ) -> io.BytesIO:
         """Export generated content as PDF."""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_LEFT, TA_CENTER
+
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(
             buffer,
@@ -2270,6 +2285,10 @@ class ExportService:
         doc_type_name: str
     ) -> io.BytesIO:
         """Export generated content as Word document."""
+        from docx import Document
+        from docx.shared import Pt, RGBColor
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+
         doc = Document()
 
         # Add title
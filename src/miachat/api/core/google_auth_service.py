@@ -11,19 +11,20 @@ Handles OAuth2 flow for Google Calendar and Tasks APIs:
 import os
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any
 
 # Allow HTTP for local development (required for localhost OAuth)
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from sqlalchemy.orm import Session
 
 from miachat.database.models import GoogleCredentials, User
 
+if TYPE_CHECKING:
+    # The Google client libraries are loaded when a user connects or syncs
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import Flow
+
 logger = logging.getLogger(__name__)
 
 # Google API scopes (openid is added automatically by Google)
@@ -133,7 +134,7 @@ class GoogleAuthService:
         logger.info(f"Google credentials stored for user {user_id} ({google_email})")
         return google_creds
 
-    def get_credentials(self, user_id: int, db: Session) -> Optional[Credentials]:
+    def get_credentials(self, user_id: int, db: Session) -> Optional["Credentials"]:
         """Get valid Google credentials for a user.
 
         Automatically refreshes expired tokens.
@@ -153,6 +154,9 @@ class GoogleAuthService:
         if not google_creds:
             return None
 
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
+
         credentials = Credentials(
             token=google_creds.access_token,
             refresh_token=google_creds.refresh_token,
@@ -249,8 +253,10 @@ class GoogleAuthService:
             'connected_at': google_creds.created_at.isoformat() if google_creds.created_at else None
         }
 
-    def _create_flow(self) -> Flow:
+    def _create_flow(self) -> "Flow":
         """Create an OAuth2 flow instance."""
+        from google_auth_oauthlib.flow import Flow
+
         client_config = {
             'web': {
                 'client_id': self.client_id,
@@ -267,9 +273,10 @@ class GoogleAuthService:
             redirect_uri=self.redirect_uri
         )
 
-    def _get_user_email(self, credentials: Credentials) -> Optional[str]:
+    def _get_user_email(self, credentials: "Credentials") -> Optional[str]:
         """Get the user's email from Google."""
         try:
+            from googleapiclient.discovery import build
             service = build('oauth2', 'v2', credentials=credentials)
             user_info = service.userinfo().get().execute()
             return user_info.get('email')
@@ -10,11 +10,13 @@ Handles read/write operations for Google Calendar:
 
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
 
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+
+if TYPE_CHECKING:
+    # The Google client libraries are loaded when a service is first built
+    from google.oauth2.credentials import Credentials
 from sqlalchemy.orm import Session
 
 from miachat.api.core.google_auth_service import google_auth_service
@@ -29,8 +31,9 @@ class GoogleCalendarService:
         self.api_name = 'calendar'
         self.api_version = 'v3'
 
-    def _get_service(self, credentials: Credentials):
+    def _get_service(self, credentials: "Credentials"):
         """Build the Google Calendar API service."""
+        from googleapiclient.discovery import build
         return build(self.api_name, self.api_version, credentials=credentials)
 
     # =========================================================================
@@ -39,7 +42,7 @@ class GoogleCalendarService:
 
     def list_calendars(
         self,
-        credentials: Credentials
+        credentials: "Credentials"
     ) -> List[Dict[str, Any]]:
         """List all calendars for the user.
 
@@ -75,7 +78,7 @@ class GoogleCalendarService:
 
     def get_upcoming_events(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         calendar_id: str = 'primary',
         days_ahead: int = 7,
         max_results: int = 50
@@ -118,7 +121,7 @@ class GoogleCalendarService:
 
     def get_event(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         calendar_id: str,
         event_id: str
     ) -> Optional[Dict[str, Any]]:
@@ -147,7 +150,7 @@ class GoogleCalendarService:
 
     def create_event(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         calendar_id: str = 'primary',
         summary: str = '',
         description: Optional[str] = None,
@@ -238,7 +241,7 @@ class GoogleCalendarService:
 
     def delete_event(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         calendar_id: str,
         event_id: str
     ) -> bool:
@@ -9,11 +9,13 @@ Handles CRUD operations for Google Tasks:
 
 import logging
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
 
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+
+if TYPE_CHECKING:
+    # The Google client libraries are loaded when a service is first built
+    from google.oauth2.credentials import Credentials
 from sqlalchemy.orm import Session
 
 from miachat.database.models import PersonaGoogleSyncConfig, TodoItem
@@ -29,8 +31,9 @@ class GoogleTasksService:
         self.api_name = 'tasks'
         self.api_version = 'v1'
 
-    def _get_service(self, credentials: Credentials):
+    def _get_service(self, credentials: "Credentials"):
         """Build the Google Tasks API service."""
+        from googleapiclient.discovery import build
         return build(self.api_name, self.api_version, credentials=credentials)
 
     # =========================================================================
@@ -39,7 +42,7 @@ class GoogleTasksService:
 
     def list_tasklists(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         max_results: int = 100
     ) -> List[Dict[str, Any]]:
         """List all task lists for the user.
@@ -61,7 +64,7 @@ class GoogleTasksService:
 
     def get_or_create_tasklist(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         list_name: str
     ) -> Dict[str, Any]:
         """Get existing task list by name or create a new one.
@@ -93,7 +96,7 @@ class GoogleTasksService:
 
     def delete_tasklist(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         tasklist_id: str
     ) -> bool:
         """Delete a task list.
@@ -120,7 +123,7 @@ class GoogleTasksService:
 
     def list_tasks(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         tasklist_id: str,
         show_completed: bool = True,
         show_deleted: bool = False,
@@ -153,7 +156,7 @@ class GoogleTasksService:
 
     def get_task(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         tasklist_id: str,
         task_id: str
     ) -> Optional[Dict[str, Any]]:
@@ -178,7 +181,7 @@ class GoogleTasksService:
 
     def create_task(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         tasklist_id: str,
         title: str,
         notes: Optional[str] = None,
@@ -223,7 +226,7 @@ class GoogleTasksService:
 
     def update_task(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         tasklist_id: str,
         task_id: str,
         title: Optional[str] = None,
@@ -280,7 +283,7 @@ class GoogleTasksService:
 
     def delete_task(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         tasklist_id: str,
         task_id: str
     ) -> bool:
@@ -308,7 +311,7 @@ class GoogleTasksService:
 
     def complete_task(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         tasklist_id: str,
         task_id: str
     ) -> Dict[str, Any]:
@@ -331,7 +334,7 @@ class GoogleTasksService:
 
     def uncomplete_task(
         self,
-        credentials: Credentials,
+        credentials: "Credentials",
         tasklist_id: str,
         task_id: str
     ) -> Dict[str, Any]:
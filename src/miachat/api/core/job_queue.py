@@ -0,0 +1,543 @@
+"""
+Durable background job queue for post-turn work.
+
+Jobs are rows in the application database (background_jobs table), so they
+survive restarts. A bounded pool of worker threads claims and runs them with
+their own database sessions, off the event loop.
+
+Features:
+- Registered job types with a handler per type (sync or async)
+- Retries with exponential backoff
+- Coalescing: a pending job with the same type and coalesce key absorbs new
+  work instead of queueing a duplicate (e.g. one fact extraction per user
+  and persona, however many messages arrive before it runs)
+- Queue depth and latency statistics for the admin endpoint
+
+Configuration (environment variables):
+    - JOB_QUEUE_WORKERS: Number of worker threads (default: 2)
+    - JOB_QUEUE_POLL_INTERVAL: Seconds between idle polls (default: 2)
+    - JOB_QUEUE_BACKOFF_BASE: Seconds before the first retry (default: 5)
+    - JOB_QUEUE_BACKOFF_MAX: Maximum retry delay in seconds (default: 300)
+    - JOB_QUEUE_RETENTION_HOURS: How long finished jobs are kept (default: 168)
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+from ...database.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobType:
+    """A registered kind of background job."""
+    name: str
+    handler: Callable[[Dict[str, Any], Session], Any]
+    max_attempts: int = 3
+    # Combines a pending job's payload with a new one when coalescing.
+    # None keeps the pending payload unchanged.
+    merge: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None
+
+
+class JobQueue:
+    """SQL-backed job queue with a bounded worker pool."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        workers: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        retention_hours: Optional[float] = None
+    ):
+        """Initialize the job queue.
+
+        Args:
+            session_factory: Callable returning a new database session (defaults to db_config.get_session)
+            workers: Number of worker threads
+            poll_interval: Seconds a worker sleeps when the queue is empty
+            backoff_base: Delay before the first retry, doubled for each further attempt
+            backoff_max: Upper bound for the retry delay
+            retention_hours: How long succeeded/failed jobs are kept
+        """
+        self._session_factory = session_factory
+        self.workers = workers or int(os.getenv('JOB_QUEUE_WORKERS', '2'))
+        self.poll_interval = poll_interval or float(os.getenv('JOB_QUEUE_POLL_INTERVAL', '2'))
+        self.backoff_base = backoff_base if backoff_base is not None else float(os.getenv('JOB_QUEUE_BACKOFF_BASE', '5'))
+        self.backoff_max = backoff_max or float(os.getenv('JOB_QUEUE_BACKOFF_MAX', '300'))
+        self.retention_hours = retention_hours or float(os.getenv('JOB_QUEUE_RETENTION_HOURS', '168'))
+
+        self._job_types: Dict[str, JobType] = {}
+        self._threads: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._last_prune = datetime.min
+
+    # ------------------------------------------------------------------
+    # Registration and enqueueing
+    # ------------------------------------------------------------------
+
+    def register(
+        self,
+        name: str,
+        handler: Callable[[Dict[str, Any], Session], Any],
+        max_attempts: int = 3,
+        merge: Optional[Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None
+    ) -> None:
+        """Register a job type.
+
+        Args:
+            name: Job type name
+            handler: Called as handler(payload, db); may be a coroutine function.
+                The return value (JSON-serializable) is stored as the job result.
+            max_attempts: Attempts before the job is marked failed
+            merge: Optional payload merge used when coalescing
+        """
+        self._job_types[name] = JobType(name, handler, max_attempts, merge)
+
+    def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        user_id: Optional[int] = None,
+        coalesce_key: Optional[str] = None,
+        db: Optional[Session] = None
+    ) -> int:
+        """Add a job to the queue, or fold it into a matching pending job.
+
+        Args:
+            job_type: Registered job type
+            payload: JSON-serializable job input
+            user_id: Owning user, if any
+            coalesce_key: Pending jobs of the same type with this key are merged
+            db: Optional session to use (committed by this call)
+
+        Returns:
+            ID of the job that will carry out the work
+        """
+        spec = self._job_types.get(job_type)
+        if spec is None:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        session = db or self._new_session()
+        try:
+            if coalesce_key:
+                pending = session.query(BackgroundJob).filter(
+                    BackgroundJob.job_type == job_type,
+                    BackgroundJob.coalesce_key == coalesce_key,
+                    BackgroundJob.status == 'pending'
+                ).order_by(BackgroundJob.id.asc()).first()
+                if pending is not None:
+                    if spec.merge:
+                        pending.payload = spec.merge(dict(pending.payload or {}), payload)
+                        flag_modified(pending, 'payload')
+                    session.commit()
+                    logger.debug(f"Coalesced {job_type} into job {pending.id} ({coalesce_key})")
+                    return pending.id
+
+            job = BackgroundJob(
+                job_type=job_type,
+                user_id=user_id,
+                coalesce_key=coalesce_key,
+                payload=payload,
+                status='pending',
+                max_attempts=spec.max_attempts,
+                run_after=datetime.utcnow()
+            )
+            session.add(job)
+            session.commit()
+            logger.debug(f"Enqueued {job_type} job {job.id}")
+            job_id = job.id
+        finally:
+            if db is None:
+                session.close()
+
+        self._wake_event.set()
+        return job_id
+
+    def get_job(self, job_id: int, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+        """Get a job as a dictionary, or None if it does not exist."""
+        session = db or self._new_session()
+        try:
+            job = session.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+            return job.to_dict() if job else None
+        finally:
+            if db is None:
+                session.close()
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Re-queue interrupted jobs and start the worker threads (idempotent)."""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+
+        self._requeue_interrupted()
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the workers. A job in progress finishes (or is re-queued on next start)."""
+        self._stop_event.set()
+        self._wake_event.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def run_pending(self, limit: Optional[int] = None) -> int:
+        """Run due jobs on the calling thread until none are left.
+
+        Args:
+            limit: Optional maximum number of jobs to run
+
+        Returns:
+            Number of jobs run
+        """
+        count = 0
+        while limit is None or count < limit:
+            if not self._run_next():
+                break
+            count += 1
+        return count
+
+    def _worker_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                ran = self._run_next()
+                self._maybe_prune()
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+                ran = False
+            if not ran:
+                self._wake_event.wait(self.poll_interval)
+                self._wake_event.clear()
+
+    def _run_next(self) -> bool:
+        """Claim and run one due job. Returns False if nothing was due."""
+        session = self._new_session()
+        try:
+            job = self._claim(session)
+            if job is None:
+                return False
+
+            spec = self._job_types.get(job.job_type)
+            try:
+                if spec is None:
+                    raise ValueError(f"No handler registered for job type '{job.job_type}'")
+                result = spec.handler(dict(job.payload or {}), session)
+                if inspect.isawaitable(result):
+                    result = asyncio.run(result)
+            except Exception as e:
+                session.rollback()
+                self._record_failure(session, job, e)
+                return True
+
+            job.status = 'succeeded'
+            # Results go into a JSON column; stringify anything exotic (datetimes)
+            job.result = json.loads(json.dumps(result, default=str))
+            job.last_error = None
+            job.finished_at = datetime.utcnow()
+            session.commit()
+            logger.debug(f"Job {job.id} ({job.job_type}) succeeded")
+            return True
+        finally:
+            session.close()
+
+    def _claim(self, session: Session) -> Optional[BackgroundJob]:
+        """Atomically move the next due pending job to running."""
+        while True:
+            now = datetime.utcnow()
+            candidate = session.query(BackgroundJob.id).filter(
+                BackgroundJob.status == 'pending',
+                BackgroundJob.run_after <= now
+            ).order_by(BackgroundJob.run_after.asc(), BackgroundJob.id.asc()).first()
+            if candidate is None:
+                return None
+
+            claimed = session.query(BackgroundJob).filter(
+                BackgroundJob.id == candidate.id,
+                BackgroundJob.status == 'pending'
+            ).update({
+                'status': 'running',
+                'started_at': now,
+                'attempts': BackgroundJob.attempts + 1
+            }, synchronize_session=False)
+            session.commit()
+            if claimed:
+                return session.query(BackgroundJob).filter(BackgroundJob.id == candidate.id).first()
+            # Another worker won the race; try the next one
+
+    def _record_failure(self, session: Session, job: BackgroundJob, error: Exception) -> None:
+        """Schedule a retry with backoff, or mark the job failed."""
+        job = session.query(BackgroundJob).filter(BackgroundJob.id == job.id).first()
+        job.last_error = str(error)[:2000]
+        if job.attempts < job.max_attempts:
+            delay = min(self.backoff_base * (2 ** (job.attempts - 1)), self.backoff_max)
+            job.status = 'pending'
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning(f"Job {job.id} ({job.job_type}) failed (attempt {job.attempts}/{job.max_attempts}), "
+                           f"retrying in {delay:.0f}s: {error}")
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            logger.error(f"Job {job.id} ({job.job_type}) failed permanently: {error}")
+        session.commit()
+
+    def _requeue_interrupted(self) -> None:
+        """Jobs left running by a previous process are put back in the queue."""
+        session = self._new_session()
+        try:
+            count = session.query(BackgroundJob).filter(
+                BackgroundJob.status == 'running'
+            ).update({'status': 'pending', 'run_after': datetime.utcnow()}, synchronize_session=False)
+            session.commit()
+            if count:
+                logger.info(f"Re-queued {count} interrupted background jobs")
+        except Exception as e:
+            logger.warning(f"Could not re-queue interrupted jobs: {e}")
+        finally:
+            session.close()
+
+    def _maybe_prune(self) -> None:
+        """Delete old finished jobs, at most once an hour."""
+        now = datetime.utcnow()
+        if now - self._last_prune < timedelta(hours=1):
+            return
+        self._last_prune = now
+
+        session = self._new_session()
+        try:
+            cutoff = now - timedelta(hours=self.retention_hours)
+            deleted = session.query(BackgroundJob).filter(
+                BackgroundJob.status.in_(('succeeded', 'failed')),
+                BackgroundJob.finished_at < cutoff
+            ).delete(synchronize_session=False)
+            session.commit()
+            if deleted:
+                logger.info(f"Pruned {deleted} finished background jobs")
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+
+    def get_stats(self, db: Optional[Session] = None, window_minutes: int = 60) -> Dict[str, Any]:
+        """Get queue depth and latency statistics.
+
+        Args:
+            db: Optional database session
+            window_minutes: Window for latency figures over recently finished jobs
+
+        Returns:
+            Dictionary with per-type depth and latency
+        """
+        from sqlalchemy import func
+
+        session = db or self._new_session()
+        try:
+            now = datetime.utcnow()
+            by_type: Dict[str, Dict[str, Any]] = {}
+
+            rows = session.query(
+                BackgroundJob.job_type, BackgroundJob.status, func.count(BackgroundJob.id)
+            ).group_by(BackgroundJob.job_type, BackgroundJob.status).all()
+            for job_type, status, count in rows:
+                by_type.setdefault(job_type, {})[status] = count
+
+            oldest = dict(session.query(
+                BackgroundJob.job_type, func.min(BackgroundJob.created_at)
+            ).filter(BackgroundJob.status == 'pending').group_by(BackgroundJob.job_type).all())
+
+            since = now - timedelta(minutes=window_minutes)
+            finished = session.query(BackgroundJob).filter(
+                BackgroundJob.status.in_(('succeeded', 'failed')),
+                BackgroundJob.finished_at >= since
+            ).order_by(BackgroundJob.finished_at.desc()).limit(1000).all()
+
+            waits: Dict[str, List[float]] = {}
+            runs: Dict[str, List[float]] = {}
+            for job in finished:
+                if job.started_at and job.created_at:
+                    waits.setdefault(job.job_type, []).append((job.started_at - job.created_at).total_seconds())
+                if job.finished_at and job.started_at:
+                    runs.setdefault(job.job_type, []).append((job.finished_at - job.started_at).total_seconds())
+
+            job_types = {}
+            for name in sorted(set(by_type) | set(self._job_types)):
+                counts = by_type.get(name, {})
+                job_types[name] = {
+                    'pending': counts.get('pending', 0),
+                    'running': counts.get('running', 0),
+                    'succeeded': counts.get('succeeded', 0),
+                    'failed': counts.get('failed', 0),
+                    'oldest_pending_seconds': round((now - oldest[name]).total_seconds(), 1) if name in oldest else None,
+                    'avg_wait_seconds': _mean(waits.get(name)),
+                    'avg_run_seconds': _mean(runs.get(name)),
+                    'p95_run_seconds': _percentile(runs.get(name), 0.95)
+                }
+
+            return {
+                'workers': self.workers,
+                'workers_alive': sum(1 for thread in self._threads if thread.is_alive()),
+                'queue_depth': sum(t['pending'] + t['running'] for t in job_types.values()),
+                'latency_window_minutes': window_minutes,
+                'job_types': job_types
+            }
+        finally:
+            if db is None:
+                session.close()
+
+    def _new_session(self) -> Session:
+        if self._session_factory is None:
+            from ...database.config import db_config
+            self._session_factory = db_config.get_session
+        return self._session_factory()
+
+
+def _mean(values: Optional[List[float]]) -> Optional[float]:
+    if not values:
+        return None
+    return round(sum(values) / len(values), 3)
+
+
+def _percentile(values: Optional[List[float]], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+# =============================================================================
+# Built-in job types
+# =============================================================================
+
+def _run_title_generation(payload: Dict[str, Any], db: Session) -> Optional[str]:
+    """Generate a conversation title with the user's LLM settings.
+
+    The config (including any API key) is looked up here rather than stored
+    in the payload, which is persisted in background_jobs.
+    """
+    from .conversation_service import conversation_service
+    from .settings_service import settings_service
+
+    model_config = None
+    if payload.get('user_id') is not None:
+        model_config = settings_service.get_llm_config(payload['user_id'], db)
+        if model_config.get('error'):
+            model_config = None
+    return conversation_service.generate_title_with_llm(payload['conversation_id'], db, model_config)
+
+
+def _merge_exchanges(pending: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Append the new job's exchanges/messages to the pending job's."""
+    for key in ('exchanges', 'messages'):
+        if key in new:
+            pending[key] = list(pending.get(key, [])) + list(new[key])
+    return pending
+
+
+async def _run_fact_extraction(payload: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Check for fact corrections, then extract new facts.
+
+    Exchanges are only coalesced within one conversation and are handled in
+    one pass, so a burst of messages costs one extraction call: the combined
+    user messages are checked and extracted from, with the transcript of all
+    exchanges (each reply next to its own message) as the assistant side.
+    """
+    from .fact_extraction_service import fact_extraction_service
+
+    exchanges = payload.get('exchanges', [])
+    if not exchanges:
+        return {'deleted': 0, 'extracted': 0}
+
+    user_message = "\n".join(e['user_message'] for e in exchanges)
+    transcript = "\n\n".join(
+        f"User: {e['user_message']}\nAssistant: {e['assistant_response']}" for e in exchanges
+    )
+
+    deleted_facts = await fact_extraction_service.delete_facts_from_message(
+        user_message=user_message,
+        user_id=payload['user_id'],
+        character_id=payload['character_id'],
+        db=db
+    )
+    if deleted_facts:
+        logger.info(f"Deleted {len(deleted_facts)} facts via chat correction")
+
+    extracted = await fact_extraction_service.extract_facts_from_message(
+        user_message=user_message,
+        assistant_response=transcript,
+        user_id=payload['user_id'],
+        character_id=payload['character_id'],
+        conversation_id=exchanges[0].get('conversation_id'),
+        message_id=None,
+        db=db
+    )
+    return {'deleted': len(deleted_facts), 'extracted': len(extracted)}
+
+
+async def _run_sidebar_extraction(payload: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Create calendar events mentioned in chat messages.
+
+    Events are created in the user's calendar as each message is handled, so
+    the job is never retried (a retry would create the earlier messages'
+    events again). A message that fails is logged and skipped instead of
+    aborting the rest of a coalesced batch.
+    """
+    from .sidebar_extraction_service import sidebar_extraction_service
+
+    calendar_events = []
+    failed = 0
+    for item in payload.get('messages', []):
+        try:
+            calendar_events.extend(await sidebar_extraction_service.extract_calendar_events(
+                message=item['message'],
+                user_id=payload['user_id'],
+                character_id=payload['character_id'],
+                db=db,
+                conversation_context=item.get('conversation_context')
+            ))
+        except Exception as e:
+            failed += 1
+            db.rollback()
+            logger.warning(f"Calendar extraction failed for user {payload['user_id']}: {e}")
+    return {'calendar_events': calendar_events, 'failed': failed}
+
+
+def _run_index_rebuild(payload: Dict[str, Any], db: Session) -> Dict[str, Any]:
+    """Rebuild the document embedding index into shadow partitions and swap it in."""
+    from .embedding_service import embedding_service
+    if not embedding_service.rebuild_index(db=db):
+        status = embedding_service.get_rebuild_status()
+        raise RuntimeError(status.get('error') or "Index rebuild did not run")
+    return embedding_service.get_rebuild_status()
+
+
+# Global job queue instance
+job_queue = JobQueue()
+job_queue.register('title_generation', _run_title_generation, max_attempts=2)
+job_queue.register('fact_extraction', _run_fact_extraction, max_attempts=3, merge=_merge_exchanges)
+job_queue.register('sidebar_extraction', _run_sidebar_extraction, max_attempts=1, merge=_merge_exchanges)
+job_queue.register('index_rebuild', _run_index_rebuild, max_attempts=1)
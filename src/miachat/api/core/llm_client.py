@@ -5,6 +5,12 @@ Supports Ollama, OpenAI, Anthropic, and OpenRouter with a privacy-first design.
 Ollama (local) is the default provider ensuring data never leaves your machine
 unless you explicitly configure cloud providers.
 
+Both a blocking API (generate_response_with_config) and an async API
+(agenerate_response_with_config, astream_response_with_config) are provided.
+The async API runs on one shared HTTP/1.1 keep-alive connection pool per
+provider so that a slow model never blocks the event loop serving other
+requests.
+
 Configuration:
     All settings can be configured via environment variables:
     - OLLAMA_HOST, OLLAMA_PORT: Local Ollama server
@@ -12,7 +18,13 @@ Configuration:
     - ANTHROPIC_API_KEY, ANTHROPIC_API_ENDPOINT: Anthropic configuration
     - OPENROUTER_API_KEY, OPENROUTER_API_ENDPOINT: OpenRouter configuration
     - LLM_DEFAULT_MODEL: Default model for Ollama
-    - LLM_REQUEST_TIMEOUT: Request timeout in seconds
+    - LLM_REQUEST_TIMEOUT: Request timeout in seconds (also the default read timeout)
+    - LLM_CONNECT_TIMEOUT: Async connect timeout in seconds
+    - LLM_READ_TIMEOUT: Async read timeout in seconds
+    - LLM_TOTAL_TIMEOUT: Async wall-clock budget for a whole request in seconds
+    - LLM_POOL_MAX_CONNECTIONS: Max open connections per provider pool
+    - LLM_POOL_MAX_KEEPALIVE: Max idle keep-alive connections per provider pool
+    - LLM_POOL_KEEPALIVE_EXPIRY: Seconds an idle pooled connection is kept
 
 Security:
     - API keys are never logged
@@ -20,15 +32,20 @@ Security:
     - Configurable endpoints allow proxy usage for added security
 """
 
+import asyncio
+import json
 import os
 import logging
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Callable, AsyncIterator
+from dataclasses import dataclass, field
 from enum import Enum
 
+import httpx
 import requests
 from requests.exceptions import RequestException, Timeout, ConnectionError
 
+from .provider_health import provider_health
+
 logger = logging.getLogger(__name__)
 
 
@@ -73,9 +90,24 @@ class ProviderDefaults:
     DEFAULT_TOP_K: int = 40
     DEFAULT_REPEAT_PENALTY: float = 1.1
 
+    # Async connection pool defaults (per provider)
+    CONNECT_TIMEOUT: float = 10.0
+    TOTAL_TIMEOUT: float = 180.0
+    POOL_MAX_CONNECTIONS: int = 20
+    POOL_MAX_KEEPALIVE: int = 10
+    POOL_KEEPALIVE_EXPIRY: float = 30.0
+
 
 DEFAULTS = ProviderDefaults()
 
+# Display names used in log and error messages
+PROVIDER_LABELS: Dict[str, str] = {
+    LLMProvider.OLLAMA.value: "Ollama",
+    LLMProvider.OPENAI.value: "OpenAI",
+    LLMProvider.ANTHROPIC.value: "Anthropic",
+    LLMProvider.OPENROUTER.value: "OpenRouter",
+}
+
 
 class LLMError(Exception):
     """Base exception for LLM client errors."""
@@ -92,6 +124,14 @@ class ProviderConfigurationError(LLMError):
     pass
 
 
+@dataclass
+class ProviderRequest:
+    """A fully prepared HTTP request for a provider's chat endpoint."""
+    url: str
+    payload: Dict[str, Any]
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
 # =============================================================================
 # LLM Client Implementation
 # =============================================================================
@@ -115,10 +155,15 @@ class LLMClient:
         ...     system_prompt="You are a helpful assistant.",
         ...     model_config={"provider": "ollama", "model": "llama3.1:8b"}
         ... )
+        >>> response = await client.agenerate_response_with_config(...)
     """
 
-    def __init__(self) -> None:
-        """Initialize the LLM client with configuration from environment."""
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        """Initialize the LLM client with configuration from environment.
+
+        Args:
+            transport: Optional httpx transport for the async pools (used by tests)
+        """
         # Ollama configuration (local, private)
         ollama_host = os.getenv('OLLAMA_HOST', DEFAULTS.OLLAMA_HOST)
         ollama_port = os.getenv('OLLAMA_PORT', DEFAULTS.OLLAMA_PORT)
@@ -138,6 +183,24 @@ class LLMClient:
         # Request timeout
         self.request_timeout: int = int(os.getenv('LLM_REQUEST_TIMEOUT', str(DEFAULTS.REQUEST_TIMEOUT)))
 
+        # Async per-phase timeouts and pool limits
+        self.connect_timeout: float = float(os.getenv('LLM_CONNECT_TIMEOUT', str(DEFAULTS.CONNECT_TIMEOUT)))
+        self.read_timeout: float = float(os.getenv('LLM_READ_TIMEOUT', str(self.request_timeout)))
+        self.total_timeout: float = float(os.getenv('LLM_TOTAL_TIMEOUT', str(DEFAULTS.TOTAL_TIMEOUT)))
+        self.pool_max_connections: int = int(os.getenv('LLM_POOL_MAX_CONNECTIONS', str(DEFAULTS.POOL_MAX_CONNECTIONS)))
+        self.pool_max_keepalive: int = int(os.getenv('LLM_POOL_MAX_KEEPALIVE', str(DEFAULTS.POOL_MAX_KEEPALIVE)))
+        self.pool_keepalive_expiry: float = float(os.getenv('LLM_POOL_KEEPALIVE_EXPIRY', str(DEFAULTS.POOL_KEEPALIVE_EXPIRY)))
+
+        # One shared async connection pool per provider, bound to the event loop
+        # that created it (pools cannot be shared across loops)
+        self._transport = transport
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # =========================================================================
+    # Blocking API
+    # =========================================================================
+
     def generate_response_with_config(
         self,
         messages: List[Dict[str, str]],
@@ -147,6 +210,9 @@ class LLMClient:
         """
         Generate a response using the specified model configuration.
 
+        Blocks the calling thread until the provider responds. Prefer
+        agenerate_response_with_config from async code.
+
         Args:
             messages: List of message dictionaries with 'role' and 'content' keys
             system_prompt: System prompt for the character/context
@@ -185,18 +251,365 @@ class LLMClient:
         messages: List[Dict[str, str]],
         system_prompt: Optional[str],
         model_config: Dict[str, Any]
+    ) -> str:
+        """Generate response using local Ollama (fully private)."""
+        return self._generate(LLMProvider.OLLAMA.value, self._prepare_ollama, messages, system_prompt, model_config)
+
+    def _generate_openai(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        model_config: Dict[str, Any]
+    ) -> str:
+        """Generate response using OpenAI API (cloud)."""
+        return self._generate(LLMProvider.OPENAI.value, self._prepare_openai, messages, system_prompt, model_config)
+
+    def _generate_anthropic(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        model_config: Dict[str, Any]
+    ) -> str:
+        """Generate response using Anthropic API (cloud)."""
+        return self._generate(LLMProvider.ANTHROPIC.value, self._prepare_anthropic, messages, system_prompt, model_config)
+
+    def _generate_openrouter(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        model_config: Dict[str, Any]
+    ) -> str:
+        """Generate response using OpenRouter API (cloud, multi-provider)."""
+        return self._generate(LLMProvider.OPENROUTER.value, self._prepare_openrouter, messages, system_prompt, model_config)
+
+    def _generate(
+        self,
+        provider: str,
+        prepare: Callable[..., ProviderRequest],
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        model_config: Dict[str, Any]
     ) -> str:
         """
-        Generate response using local Ollama (fully private).
+        Send a prepared request with the blocking requests library.
 
         Args:
+            provider: Provider identifier
+            prepare: Request builder for the provider
             messages: Conversation messages
-            system_prompt: System prompt to prepend
+            system_prompt: System prompt
             model_config: Model configuration parameters
 
         Returns:
             Generated response or error message
         """
+        label = PROVIDER_LABELS[provider]
+        try:
+            request = prepare(messages, system_prompt, model_config)
+        except ProviderConfigurationError as e:
+            return str(e)
+
+        try:
+            response = requests.post(
+                request.url,
+                headers=request.headers or None,
+                json=request.payload,
+                timeout=self.request_timeout
+            )
+            logger.debug(f"[{label}] Response status: {response.status_code}")
+            response.raise_for_status()
+            self._record_health(provider)
+            return self._parse_response(provider, response.json())
+
+        except Timeout:
+            logger.error(f"{label} request timed out after {self.request_timeout}s")
+            self._record_health(provider, 'timeout')
+            return self._error_message(provider, 'timeout')
+        except ConnectionError:
+            logger.error(f"Cannot connect to {label} at {request.url}")
+            self._record_health(provider, 'connect')
+            return self._error_message(provider, 'connect')
+        except RequestException as e:
+            logger.error(f"{label} request error: {e}")
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            self._record_health(provider, 'request', status)
+            return self._error_message(provider, 'request')
+        except (KeyError, IndexError, ValueError) as e:
+            logger.error(f"{label} response parsing error: {e}")
+            return self._error_message(provider, 'parse')
+
+    # =========================================================================
+    # Async API (pooled, non-blocking)
+    # =========================================================================
+
+    async def agenerate_response_with_config(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        model_config: Dict[str, Any]
+    ) -> str:
+        """
+        Async version of generate_response_with_config.
+
+        Uses the provider's shared keep-alive connection pool and enforces
+        connect/read timeouts per phase plus a total wall-clock budget, so a
+        slow model only delays the awaiting request.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            system_prompt: System prompt for the character/context
+            model_config: Configuration dict with 'provider', 'model', and optional parameters
+
+        Returns:
+            Generated response text, or an error message string (never raises)
+        """
+        provider = model_config.get('provider')
+
+        if not provider:
+            logger.error("No LLM provider specified in model_config")
+            return "No LLM provider configured. Please add an API key (OpenRouter, OpenAI, or Anthropic) in Settings."
+
+        prepare = self._request_builders().get(provider)
+        if not prepare:
+            logger.error(f"Unknown provider '{provider}'")
+            return f"Unknown LLM provider '{provider}'. Supported providers: OpenRouter, OpenAI, Anthropic."
+
+        label = PROVIDER_LABELS[provider]
+        try:
+            request = prepare(messages, system_prompt, model_config)
+        except ProviderConfigurationError as e:
+            return str(e)
+
+        try:
+            client = self._get_async_client(provider)
+            response = await asyncio.wait_for(
+                client.post(request.url, headers=request.headers, json=request.payload),
+                timeout=self.total_timeout
+            )
+            logger.debug(f"[{label}] Response status: {response.status_code}")
+            response.raise_for_status()
+            self._record_health(provider)
+            return self._parse_response(provider, response.json())
+
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            logger.error(f"{label} request timed out (connect={self.connect_timeout}s, "
+                         f"read={self.read_timeout}s, total={self.total_timeout}s)")
+            self._record_health(provider, 'timeout')
+            return self._error_message(provider, 'timeout')
+        except httpx.ConnectError:
+            logger.error(f"Cannot connect to {label} at {request.url}")
+            self._record_health(provider, 'connect')
+            return self._error_message(provider, 'connect')
+        except httpx.HTTPError as e:
+            logger.error(f"{label} request error: {e}")
+            self._record_health(provider, 'request', self._http_status(e))
+            return self._error_message(provider, 'request')
+        except (KeyError, IndexError, ValueError) as e:
+            logger.error(f"{label} response parsing error: {e}")
+            return self._error_message(provider, 'parse')
+
+    async def astream_response_with_config(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        model_config: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response as text deltas from the provider's streaming API.
+
+        Ollama streams newline-delimited JSON; OpenAI, OpenRouter and Anthropic
+        stream server-sent events. Each yielded string is the next chunk of the
+        completion as it arrives.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            system_prompt: System prompt for the character/context
+            model_config: Configuration dict with 'provider', 'model', and optional parameters
+
+        Yields:
+            Text deltas in order
+
+        Raises:
+            ProviderConfigurationError: If the provider is missing, unknown or lacks a key
+            ProviderConnectionError: If the request fails; the message is user-facing
+        """
+        provider = model_config.get('provider')
+
+        if not provider:
+            logger.error("No LLM provider specified in model_config")
+            raise ProviderConfigurationError(
+                "No LLM provider configured. Please add an API key (OpenRouter, OpenAI, or Anthropic) in Settings."
+            )
+
+        prepare = self._request_builders().get(provider)
+        if not prepare:
+            logger.error(f"Unknown provider '{provider}'")
+            raise ProviderConfigurationError(
+                f"Unknown LLM provider '{provider}'. Supported providers: OpenRouter, OpenAI, Anthropic."
+            )
+
+        label = PROVIDER_LABELS[provider]
+        request = prepare(messages, system_prompt, model_config)
+        request.payload["stream"] = True
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.total_timeout
+
+        try:
+            client = self._get_async_client(provider)
+            async with client.stream(
+                "POST", request.url, headers=request.headers, json=request.payload
+            ) as response:
+                logger.debug(f"[{label}] Stream status: {response.status_code}")
+                response.raise_for_status()
+                self._record_health(provider)
+                async for line in response.aiter_lines():
+                    if loop.time() > deadline:
+                        raise asyncio.TimeoutError()
+                    delta = self._parse_stream_line(provider, line)
+                    if delta:
+                        yield delta
+
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            logger.error(f"{label} stream timed out (connect={self.connect_timeout}s, "
+                         f"read={self.read_timeout}s, total={self.total_timeout}s)")
+            self._record_health(provider, 'timeout')
+            raise ProviderConnectionError(self._error_message(provider, 'timeout'))
+        except httpx.ConnectError:
+            logger.error(f"Cannot connect to {label} at {request.url}")
+            self._record_health(provider, 'connect')
+            raise ProviderConnectionError(self._error_message(provider, 'connect'))
+        except httpx.HTTPError as e:
+            logger.error(f"{label} stream error: {e}")
+            self._record_health(provider, 'request', self._http_status(e))
+            raise ProviderConnectionError(self._error_message(provider, 'request'))
+        except (KeyError, IndexError, ValueError) as e:
+            logger.error(f"{label} stream parsing error: {e}")
+            raise ProviderConnectionError(self._error_message(provider, 'parse'))
+
+    def _parse_stream_line(self, provider: str, line: str) -> str:
+        """
+        Extract the text delta from one line of a provider stream.
+
+        Args:
+            provider: Provider identifier
+            line: Raw line (NDJSON for Ollama, SSE for cloud providers)
+
+        Returns:
+            Text delta, or '' for keep-alives, event names and control messages
+
+        Raises:
+            ProviderConnectionError: If the provider reports an error mid-stream
+            ValueError: If a data line is not valid JSON
+        """
+        line = line.strip()
+        if not line:
+            return ''
+
+        if provider == LLMProvider.OLLAMA.value:
+            chunk = json.loads(line)
+            if chunk.get('error'):
+                logger.error(f"Ollama stream error: {chunk['error']}")
+                raise ProviderConnectionError(self._error_message(provider, 'request'))
+            return chunk.get('message', {}).get('content', '')
+
+        # Server-sent events: only 'data:' lines carry payloads
+        if not line.startswith('data:'):
+            return ''
+        data = line[len('data:'):].strip()
+        if not data or data == '[DONE]':
+            return ''
+        chunk = json.loads(data)
+
+        if provider == LLMProvider.ANTHROPIC.value:
+            if chunk.get('type') == 'error':
+                logger.error(f"Anthropic stream error: {chunk.get('error', {}).get('message')}")
+                raise ProviderConnectionError(self._error_message(provider, 'request'))
+            if chunk.get('type') == 'content_block_delta':
+                return chunk.get('delta', {}).get('text', '')
+            return ''
+
+        # OpenAI-compatible (OpenAI, OpenRouter)
+        if chunk.get('error'):
+            error_msg = chunk['error'].get('message', 'Unknown error')
+            logger.error(f"{PROVIDER_LABELS[provider]} stream error: {error_msg}")
+            raise ProviderConnectionError(f"Error from {PROVIDER_LABELS[provider]}: {error_msg}")
+        choices = chunk.get('choices') or []
+        if not choices:
+            return ''
+        return choices[0].get('delta', {}).get('content') or ''
+
+    def _get_async_client(self, provider: str) -> httpx.AsyncClient:
+        """Get (or lazily create) the shared connection pool for a provider.
+
+        Pools are tied to the running event loop; if the loop has changed
+        (e.g. a test created a fresh loop) the old pools are discarded.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_clients = {}
+            self._async_loop = loop
+
+        client = self._async_clients.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    connect=self.connect_timeout,
+                    read=self.read_timeout,
+                    write=self.connect_timeout,
+                    pool=self.connect_timeout
+                ),
+                limits=httpx.Limits(
+                    max_connections=self.pool_max_connections,
+                    max_keepalive_connections=self.pool_max_keepalive,
+                    keepalive_expiry=self.pool_keepalive_expiry
+                ),
+                http2=False,
+                transport=self._transport
+            )
+            self._async_clients[provider] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close all async connection pools (call on application shutdown)."""
+        clients = list(self._async_clients.values())
+        self._async_clients = {}
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing LLM connection pool: {e}")
+
+    # =========================================================================
+    # Request builders and response parsers (shared by sync and async paths)
+    # =========================================================================
+
+    def _request_builders(self) -> Dict[str, Callable[..., ProviderRequest]]:
+        """Map provider identifiers to their request builders."""
+        return {
+            LLMProvider.OLLAMA.value: self._prepare_ollama,
+            LLMProvider.OPENAI.value: self._prepare_openai,
+            LLMProvider.ANTHROPIC.value: self._prepare_anthropic,
+            LLMProvider.OPENROUTER.value: self._prepare_openrouter,
+        }
+
+    def _prepare_ollama(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        model_config: Dict[str, Any]
+    ) -> ProviderRequest:
+        """
+        Build an Ollama /api/chat request (fully private).
+
+        Args:
+            messages: Conversation messages
+            system_prompt: System prompt to prepend
+            model_config: Model configuration parameters
+
+        Returns:
+            Prepared provider request
+        """
         model = model_config.get('model', self.default_model)
 
         # Prepare messages with system prompt
@@ -217,37 +630,16 @@ class LLMClient:
             }
         }
 
-        try:
-            response = requests.post(
-                f"{self.ollama_url}/api/chat",
-                json=payload,
-                timeout=self.request_timeout
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result.get('message', {}).get('content', '')
+        return ProviderRequest(url=f"{self.ollama_url}/api/chat", payload=payload)
 
-        except Timeout:
-            logger.error(f"Ollama request timed out after {self.request_timeout}s")
-            return "Request timed out. The model may be loading or the server is busy."
-        except ConnectionError:
-            logger.error(f"Cannot connect to Ollama at {self.ollama_url}")
-            return "Cannot connect to Ollama. Is the server running?"
-        except RequestException as e:
-            logger.error(f"Ollama request error: {e}")
-            return "Failed to generate response. Please try again."
-        except (KeyError, ValueError) as e:
-            logger.error(f"Ollama response parsing error: {e}")
-            return "Received invalid response from Ollama."
-
-    def _generate_openai(
+    def _prepare_openai(
         self,
         messages: List[Dict[str, str]],
         system_prompt: Optional[str],
         model_config: Dict[str, Any]
-    ) -> str:
+    ) -> ProviderRequest:
         """
-        Generate response using OpenAI API (cloud).
+        Build an OpenAI chat completions request (cloud).
 
         Args:
             messages: Conversation messages
@@ -255,12 +647,17 @@ class LLMClient:
             model_config: Model configuration (can include 'api_key' override)
 
         Returns:
-            Generated response or error message
+            Prepared provider request
+
+        Raises:
+            ProviderConfigurationError: If no API key is available
         """
         # Check for API key in model_config first, then fall back to instance variable
         api_key = model_config.get('api_key') or self.openai_key
         if not api_key:
-            return "OpenAI API key not configured. Set OPENAI_API_KEY or configure in Settings."
+            raise ProviderConfigurationError(
+                "OpenAI API key not configured. Set OPENAI_API_KEY or configure in Settings."
+            )
 
         model = model_config.get('model', DEFAULTS.OPENAI_MODEL)
 
@@ -282,39 +679,16 @@ class LLMClient:
         }
 
         logger.info(f"[OpenAI/CLOUD] Using model {model}")
+        return ProviderRequest(url=self.openai_endpoint, payload=payload, headers=headers)
 
-        try:
-            response = requests.post(
-                self.openai_endpoint,
-                headers=headers,
-                json=payload,
-                timeout=self.request_timeout
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result['choices'][0]['message']['content']
-
-        except Timeout:
-            logger.error(f"OpenAI request timed out after {self.request_timeout}s")
-            return "Request timed out. Please try again."
-        except ConnectionError:
-            logger.error("Cannot connect to OpenAI API")
-            return "Cannot connect to OpenAI. Check your internet connection."
-        except RequestException as e:
-            logger.error(f"OpenAI request error: {e}")
-            return "Failed to generate response. Please try again."
-        except (KeyError, ValueError) as e:
-            logger.error(f"OpenAI response parsing error: {e}")
-            return "Received invalid response from OpenAI."
-
-    def _generate_anthropic(
+    def _prepare_anthropic(
         self,
         messages: List[Dict[str, str]],
         system_prompt: Optional[str],
         model_config: Dict[str, Any]
-    ) -> str:
+    ) -> ProviderRequest:
         """
-        Generate response using Anthropic API (cloud).
+        Build an Anthropic messages request (cloud).
 
         Args:
             messages: Conversation messages
@@ -322,12 +696,17 @@ class LLMClient:
             model_config: Model configuration (can include 'api_key' override)
 
         Returns:
-            Generated response or error message
+            Prepared provider request
+
+        Raises:
+            ProviderConfigurationError: If no API key is available
         """
         # Check for API key in model_config first, then fall back to instance variable
         api_key = model_config.get('api_key') or self.anthropic_key
         if not api_key:
-            return "Anthropic API key not configured. Set ANTHROPIC_API_KEY or configure in Settings."
+            raise ProviderConfigurationError(
+                "Anthropic API key not configured. Set ANTHROPIC_API_KEY or configure in Settings."
+            )
 
         model = model_config.get('model', DEFAULTS.ANTHROPIC_MODEL)
 
@@ -357,39 +736,16 @@ class LLMClient:
         }
 
         logger.info(f"[Anthropic/CLOUD] Using model {model}")
+        return ProviderRequest(url=self.anthropic_endpoint, payload=payload, headers=headers)
 
-        try:
-            response = requests.post(
-                self.anthropic_endpoint,
-                headers=headers,
-                json=payload,
-                timeout=self.request_timeout
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result['content'][0]['text']
-
-        except Timeout:
-            logger.error(f"Anthropic request timed out after {self.request_timeout}s")
-            return "Request timed out. Please try again."
-        except ConnectionError:
-            logger.error("Cannot connect to Anthropic API")
-            return "Cannot connect to Anthropic. Check your internet connection."
-        except RequestException as e:
-            logger.error(f"Anthropic request error: {e}")
-            return "Failed to generate response. Please try again."
-        except (KeyError, ValueError) as e:
-            logger.error(f"Anthropic response parsing error: {e}")
-            return "Received invalid response from Anthropic."
-
-    def _generate_openrouter(
+    def _prepare_openrouter(
         self,
         messages: List[Dict[str, str]],
         system_prompt: Optional[str],
         model_config: Dict[str, Any]
-    ) -> str:
+    ) -> ProviderRequest:
         """
-        Generate response using OpenRouter API (cloud, multi-provider).
+        Build an OpenRouter chat completions request (cloud, multi-provider).
 
         OpenRouter provides access to 100+ models through a single API.
 
@@ -399,12 +755,17 @@ class LLMClient:
             model_config: Model configuration (can include 'api_key' override)
 
         Returns:
-            Generated response or error message
+            Prepared provider request
+
+        Raises:
+            ProviderConfigurationError: If no API key is available
         """
         # Check for API key in model_config first, then fall back to instance variable
         api_key = model_config.get('api_key') or self.openrouter_key
         if not api_key:
-            return "OpenRouter API key not configured. Set OPENROUTER_API_KEY or configure in Settings."
+            raise ProviderConfigurationError(
+                "OpenRouter API key not configured. Set OPENROUTER_API_KEY or configure in Settings."
+            )
 
         model = model_config.get('model', DEFAULTS.OPENROUTER_MODEL)
 
@@ -428,43 +789,95 @@ class LLMClient:
         }
 
         logger.info(f"[OpenRouter/CLOUD] Using model {model}")
-        logger.debug(f"[OpenRouter/CLOUD] Payload: {payload}")
+        return ProviderRequest(url=self.openrouter_endpoint, payload=payload, headers=headers)
 
-        try:
-            response = requests.post(
-                self.openrouter_endpoint,
-                headers=headers,
-                json=payload,
-                timeout=self.request_timeout
-            )
-            logger.info(f"[OpenRouter/CLOUD] Response status: {response.status_code}")
-            response.raise_for_status()
-            result = response.json()
+    def _parse_response(self, provider: str, result: Dict[str, Any]) -> str:
+        """
+        Extract the completion text from a provider's JSON response.
 
+        Args:
+            provider: Provider identifier
+            result: Decoded JSON body
+
+        Returns:
+            Response text (or a provider error message for OpenRouter)
+
+        Raises:
+            KeyError, IndexError: If the response does not have the expected shape
+        """
+        if provider == LLMProvider.OLLAMA.value:
+            return result.get('message', {}).get('content', '')
+
+        if provider == LLMProvider.ANTHROPIC.value:
+            return result['content'][0]['text']
+
+        if provider == LLMProvider.OPENROUTER.value:
             # Check for errors in the response (OpenRouter returns 200 but with error in choices)
             if result.get('choices') and result['choices'][0].get('error'):
                 error_info = result['choices'][0]['error']
                 error_msg = error_info.get('message', 'Unknown error')
-                provider = error_info.get('metadata', {}).get('provider_name', 'provider')
-                logger.error(f"[OpenRouter/CLOUD] Provider error from {provider}: {error_msg}")
-                return f"Error from {provider}: {error_msg}"
+                upstream = error_info.get('metadata', {}).get('provider_name', 'provider')
+                logger.error(f"[OpenRouter/CLOUD] Provider error from {upstream}: {error_msg}")
+                return f"Error from {upstream}: {error_msg}"
 
             content = result['choices'][0]['message']['content'] if result.get('choices') else ''
             logger.info(f"[OpenRouter/CLOUD] Response content length: {len(content) if content else 0}")
             return content or ''
 
-        except Timeout:
-            logger.error(f"OpenRouter request timed out after {self.request_timeout}s")
+        return result['choices'][0]['message']['content']
+
+    def _record_health(self, provider: str, failure: Optional[str] = None, status: Optional[int] = None) -> None:
+        """
+        Report the outcome of a real call to the provider health registry.
+
+        Timeouts, connection failures and 5xx responses mark the provider
+        unhealthy. Client errors (bad key, bad request) say nothing about the
+        provider itself and are not recorded.
+
+        Args:
+            provider: Provider identifier
+            failure: Error kind ('timeout', 'connect', 'request'), or None on success
+            status: HTTP status code for 'request' failures, if any
+        """
+        target = self.ollama_url if provider == LLMProvider.OLLAMA.value else None
+        if failure is None:
+            provider_health.mark_healthy(provider, target)
+        elif failure != 'request' or status is None or status >= 500:
+            provider_health.mark_unhealthy(provider, target, f"{failure}{f' ({status})' if status else ''}")
+
+    @staticmethod
+    def _http_status(error: httpx.HTTPError) -> Optional[int]:
+        """Status code of an httpx error, if it carries a response."""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code
+        return None
+
+    @staticmethod
+    def _error_message(provider: str, kind: str) -> str:
+        """
+        Build the user-facing error string for a failed provider call.
+
+        Args:
+            provider: Provider identifier
+            kind: One of 'timeout', 'connect', 'request', 'parse'
+
+        Returns:
+            Sanitized error message
+        """
+        label = PROVIDER_LABELS.get(provider, provider)
+        is_local = provider == LLMProvider.OLLAMA.value
+
+        if kind == 'timeout':
+            if is_local:
+                return "Request timed out. The model may be loading or the server is busy."
             return "Request timed out. Please try again."
-        except ConnectionError:
-            logger.error("Cannot connect to OpenRouter API")
-            return "Cannot connect to OpenRouter. Check your internet connection."
-        except RequestException as e:
-            logger.error(f"OpenRouter request error: {e}")
-            return "Failed to generate response. Please try again."
-        except (KeyError, ValueError) as e:
-            logger.error(f"OpenRouter response parsing error: {e}")
-            return "Received invalid response from OpenRouter."
+        if kind == 'connect':
+            if is_local:
+                return "Cannot connect to Ollama. Is the server running?"
+            return f"Cannot connect to {label}. Check your internet connection."
+        if kind == 'parse':
+            return f"Received invalid response from {label}."
+        return "Failed to generate response. Please try again."
 
     def generate_response(
         self,
@@ -527,11 +940,8 @@ class LLMClient:
         """
         try:
             if provider == LLMProvider.OLLAMA.value:
-                response = requests.get(
-                    f"{self.ollama_url}/api/tags",
-                    timeout=5
-                )
-                return response.ok
+                # Served from the health registry's cache
+                return provider_health.get(provider, self.ollama_url).healthy
             elif provider == LLMProvider.OPENAI.value:
                 return bool(self.openai_key)
             elif provider == LLMProvider.ANTHROPIC.value:
@@ -0,0 +1,226 @@
+"""
+Pinned, offline embedding model artifacts.
+
+By default the embedding model is resolved by name through the Hugging Face
+hub cache, which can probe the network at startup and fails or stalls in
+air-gapped containers. With EMBEDDING_MODEL_DIR set, the model is loaded
+only from that directory: the hub is switched to offline mode, the files are
+checked against a content hash before loading, and a missing or altered
+artifact is an error rather than a reason to download. huggingface_hub and
+transformers read the offline flags when they are first imported, so the
+flags are set as soon as this module is imported.
+
+The content hash is a SHA-256 over every file's relative path and bytes, in
+path order. fetch_model() (scripts/fetch_embedding_model.py) saves a model
+into a directory and writes its hash to MANIFEST.json; the Docker image can
+run it at build time (build arg PREBAKE_EMBEDDING_MODEL=true), so containers
+start with the model on disk.
+
+An ONNX export (see onnx_embeddings) inside EMBEDDING_MODEL_DIR is covered by
+the directory's hash. An export elsewhere gets its own MANIFEST.json when it
+is written and is verified against it with verify_export_dir().
+
+Configuration (environment variables):
+    - EMBEDDING_MODEL_DIR: Directory holding the saved model; unset resolves the
+      model by name through the hub cache as before
+    - EMBEDDING_MODEL_SHA256: Expected content hash; defaults to the hash recorded
+      in the directory's MANIFEST.json
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'MANIFEST.json'
+_CHUNK_SIZE = 1024 * 1024
+
+
+class ModelArtifactError(Exception):
+    """Raised when a pinned model artifact is missing or does not match its hash."""
+    pass
+
+
+def model_dir() -> Optional[str]:
+    """Configured local model directory, if any."""
+    return os.getenv('EMBEDDING_MODEL_DIR') or None
+
+
+def within_model_dir(path: str) -> bool:
+    """Whether a path lies inside the configured model directory."""
+    directory = model_dir()
+    if directory is None:
+        return False
+    directory, path = os.path.realpath(directory), os.path.realpath(path)
+    return os.path.commonpath([directory, path]) == directory
+
+
+def enable_offline_mode() -> None:
+    """Keep the Hugging Face libraries from contacting the hub."""
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
+
+
+def content_hash(directory: str) -> str:
+    """SHA-256 over the relative paths and contents of all files in a directory.
+
+    The manifest and hidden files are left out, so writing the manifest does
+    not change the hash it records.
+
+    Args:
+        directory: Model directory
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if name.startswith('.') or (root == directory and name == MANIFEST_FILE):
+                continue
+            paths.append(os.path.relpath(os.path.join(root, name), directory))
+    for path in sorted(paths):
+        digest.update(path.replace(os.sep, '/').encode('utf-8') + b'\0')
+        with open(os.path.join(directory, path), 'rb') as f:
+            for block in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(directory: str) -> Optional[dict]:
+    """Manifest written by write_manifest, or None if there is none."""
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(directory: str, model_name: str) -> str:
+    """Record a directory's content hash in its MANIFEST.json.
+
+    Args:
+        directory: Model directory
+        model_name: Name the model was fetched as
+
+    Returns:
+        The recorded hash
+    """
+    sha256 = content_hash(directory)
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump({'model_name': model_name, 'sha256': sha256}, f, indent=2)
+    return sha256
+
+
+def verify_model_dir(directory: str, expected_sha256: Optional[str] = None) -> str:
+    """Check that a model directory is present and matches its pinned hash.
+
+    Args:
+        directory: Model directory
+        expected_sha256: Pinned hash; defaults to EMBEDDING_MODEL_SHA256, then to the manifest
+
+    Returns:
+        The verified hash
+
+    Raises:
+        ModelArtifactError: If the directory is missing, unpinned or altered
+    """
+    if not os.path.isdir(directory):
+        raise ModelArtifactError(f"Embedding model directory {directory} does not exist")
+
+    expected = expected_sha256 or os.getenv('EMBEDDING_MODEL_SHA256')
+    if not expected:
+        manifest = read_manifest(directory)
+        expected = manifest.get('sha256') if manifest else None
+    if not expected:
+        raise ModelArtifactError(
+            f"No hash to verify {directory} against: set EMBEDDING_MODEL_SHA256 "
+            f"or write {MANIFEST_FILE} with scripts/fetch_embedding_model.py"
+        )
+
+    started = time.perf_counter()
+    actual = content_hash(directory)
+    if actual != expected.lower():
+        raise ModelArtifactError(
+            f"Embedding model in {directory} does not match its pinned hash "
+            f"(expected {expected[:12]}..., found {actual[:12]}...)"
+        )
+    logger.info(f"Verified embedding model in {directory} ({actual[:12]}...) in {time.perf_counter() - started:.2f}s")
+    return actual
+
+
+def verify_export_dir(directory: str) -> str:
+    """Check a derived artifact (e.g. an ONNX export) against its own manifest.
+
+    Unlike verify_model_dir, EMBEDDING_MODEL_SHA256 is not used, since it pins
+    the model directory rather than the export.
+
+    Args:
+        directory: Export directory
+
+    Returns:
+        The verified hash
+
+    Raises:
+        ModelArtifactError: If the export has no manifest or was altered
+    """
+    manifest = read_manifest(directory)
+    if not manifest or not manifest.get('sha256'):
+        raise ModelArtifactError(f"No {MANIFEST_FILE} to verify the export in {directory} against")
+    return verify_model_dir(directory, manifest['sha256'])
+
+
+def resolve_model(model_name: str) -> str:
+    """Name or path to load the embedding model from.
+
+    With EMBEDDING_MODEL_DIR set, verifies the directory and switches the
+    Hugging Face libraries to offline mode, so loading never touches the
+    network. Otherwise returns the model name unchanged.
+
+    Args:
+        model_name: Configured model name
+
+    Returns:
+        Local directory or model name
+
+    Raises:
+        ModelArtifactError: If the configured directory fails verification
+    """
+    directory = model_dir()
+    if directory is None:
+        return model_name
+    enable_offline_mode()
+    verify_model_dir(directory)
+    return directory
+
+
+def fetch_model(model_name: str, directory: str) -> str:
+    """Download a model once and save it as a pinned local artifact.
+
+    Meant for build time (Docker image or deploy step), not for serving.
+
+    Args:
+        model_name: Model to download through the hub
+        directory: Directory to save it in
+
+    Returns:
+        Content hash recorded in the manifest
+    """
+    from sentence_transformers import SentenceTransformer
+
+    SentenceTransformer(model_name, device='cpu').save(directory)
+    sha256 = write_manifest(directory, model_name)
+    logger.info(f"Saved {model_name} to {directory} ({sha256})")
+    return sha256
+
+
+# The hub libraries read the offline flags when first imported, which may be
+# before the model is resolved
+if model_dir() is not None:
+    enable_offline_mode()
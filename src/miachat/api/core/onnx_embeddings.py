@@ -0,0 +1,246 @@
+"""
+ONNX Runtime backend for sentence embeddings.
+
+On CPU-only hosts, running the SentenceTransformer through PyTorch is the
+dominant cost of ingestion and of every query embedding. This backend runs
+the same transformer exported to ONNX (optionally with int8 weights) and
+applies the model's pooling and normalisation in numpy. It needs only
+onnxruntime and tokenizers at serving time, not torch.
+
+The export is made once from the PyTorch model and stored next to the other
+data files, with a MANIFEST.json of its content hash that is checked when it
+is loaded (see model_artifacts), so later starts load it directly:
+
+    python scripts/benchmark_embeddings.py --backends torch onnx onnx-int8
+
+exports the default model as a side effect and compares the backends.
+
+Configuration (environment variables):
+    - EMBEDDING_BACKEND: torch or onnx (default: torch)
+    - EMBEDDING_ONNX_DIR: Directory of the exported model
+      (default: ./data/onnx/<model name>)
+    - EMBEDDING_ONNX_QUANTIZE: Use int8-quantized weights (default: false)
+    - EMBEDDING_ONNX_THREADS: Intra-op threads for ONNX Runtime; 0 lets it choose (default: 0)
+"""
+
+import inspect
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .model_artifacts import write_manifest
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'onnx')
+MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model_int8.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+CONFIG_FILE = 'embedding_config.json'
+_INPUT_NAMES = ('input_ids', 'attention_mask', 'token_type_ids')
+
+
+def embedding_backend() -> str:
+    """Configured embedding backend name."""
+    backend = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown EMBEDDING_BACKEND '{backend}', using torch")
+        return 'torch'
+    return backend
+
+
+def onnx_model_dir(model_name: str) -> str:
+    """Directory holding the ONNX export of a model."""
+    return os.getenv('EMBEDDING_ONNX_DIR') or os.path.join('./data/onnx', model_name.replace('/', '--'))
+
+
+def onnx_quantize() -> bool:
+    """Whether the int8-quantized export is used."""
+    return os.getenv('EMBEDDING_ONNX_QUANTIZE', 'false').lower() == 'true'
+
+
+def onnx_model_exists(directory: str, quantize: bool = False) -> bool:
+    """Whether a directory holds a complete export (with int8 weights, if requested)."""
+    model_file = QUANTIZED_MODEL_FILE if quantize else MODEL_FILE
+    return all(os.path.exists(os.path.join(directory, name)) for name in (model_file, TOKENIZER_FILE, CONFIG_FILE))
+
+
+def export_onnx_model(model, directory: str, quantize: bool = False, model_name: Optional[str] = None) -> None:
+    """Export a loaded SentenceTransformer to ONNX.
+
+    Writes the transformer graph, the fast tokenizer and the pooling settings.
+    Only the first step needs torch; the int8 copy is made with ONNX Runtime's
+    dynamic quantization.
+
+    The export is assembled in a staging directory next to the target, with a
+    MANIFEST.json of its content hash, and then swapped in. An interrupted
+    export therefore never leaves a partial directory that later starts take
+    for a finished one.
+
+    Args:
+        model: SentenceTransformer whose first module is the transformer
+        directory: Output directory
+        quantize: Also write int8-quantized weights
+        model_name: Name recorded in the manifest
+    """
+    if onnx_model_exists(directory, quantize):
+        return
+    directory = os.path.abspath(directory)
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f'.{os.path.basename(directory)}.', dir=parent)
+    try:
+        if onnx_model_exists(directory):
+            # Only the int8 copy is missing; start from the finished export
+            shutil.copytree(directory, staging, dirs_exist_ok=True)
+        else:
+            _write_export(model, staging)
+            logger.info(f"Exported embedding model to {directory}")
+
+        if quantize and not os.path.exists(os.path.join(staging, QUANTIZED_MODEL_FILE)):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(os.path.join(staging, MODEL_FILE), os.path.join(staging, QUANTIZED_MODEL_FILE),
+                             weight_type=QuantType.QInt8)
+            logger.info(f"Wrote int8-quantized embedding model to {directory}")
+
+        write_manifest(staging, model_name or type(model).__name__)
+        _replace_directory(staging, directory)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _write_export(model, directory: str) -> None:
+    """Write the ONNX graph, tokenizer and pooling settings of a model into a directory."""
+    import torch
+
+    transformer = model[0].auto_model.eval()
+    sample = model.tokenizer(["An example sentence"], return_tensors='pt')
+    input_names = [name for name in _INPUT_NAMES if name in sample]
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+    options = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(), tuple(sample[name] for name in input_names), os.path.join(directory, MODEL_FILE),
+            input_names=input_names, output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes, opset_version=14, **options
+        )
+
+    model.tokenizer.save_pretrained(directory)
+    with open(os.path.join(directory, CONFIG_FILE), 'w') as f:
+        json.dump({
+            'pooling': _pooling_mode(model),
+            'max_seq_length': model.max_seq_length,
+            'dimension': model.get_sentence_embedding_dimension(),
+            'pad_token': model.tokenizer.pad_token,
+            'pad_token_id': model.tokenizer.pad_token_id
+        }, f)
+
+
+def _replace_directory(staging: str, directory: str) -> None:
+    """Move a finished staging directory into place, retiring any previous contents."""
+    if not os.path.exists(directory):
+        os.rename(staging, directory)
+        return
+    retired = f"{staging}.old"
+    os.rename(directory, retired)
+    os.rename(staging, directory)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def _pooling_mode(model) -> str:
+    pooling = model[1] if len(model) > 1 else None
+    if pooling is None:
+        return 'mean'
+    # sentence-transformers 2.x exposes get_pooling_mode_str(), later versions pooling_mode
+    mode = pooling.get_pooling_mode_str() if hasattr(pooling, 'get_pooling_mode_str') else pooling.pooling_mode
+    if mode not in ('mean', 'cls'):
+        raise ValueError(f"Pooling mode {mode!r} is not supported by the ONNX backend (mean or cls only)")
+    return mode
+
+
+class OnnxEmbeddingModel:
+    """Sentence embedding model run by ONNX Runtime.
+
+    Has the subset of the SentenceTransformer interface EmbeddingService uses.
+    """
+
+    def __init__(self, directory: str, quantize: bool = False, threads: Optional[int] = None):
+        """Load an exported model.
+
+        Args:
+            directory: Directory written by export_onnx_model
+            quantize: Load the int8-quantized weights
+            threads: Intra-op threads; 0 lets ONNX Runtime choose
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(directory, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.quantized = quantize
+
+        options = ort.SessionOptions()
+        threads = threads if threads is not None else int(os.getenv('EMBEDDING_ONNX_THREADS', '0'))
+        if threads:
+            options.intra_op_num_threads = threads
+        model_file = QUANTIZED_MODEL_FILE if quantize else MODEL_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(directory, model_file), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.config['pad_token_id'], pad_token=self.config['pad_token'])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, batch_size: int = 32) -> np.ndarray:
+        """Embed texts.
+
+        Args:
+            texts: List of text strings to embed
+            normalize_embeddings: Scale each embedding to unit length
+            batch_size: Texts per model call; texts are sorted by length so batches pad little
+
+        Returns:
+            float32 array with one row per text
+        """
+        embeddings = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            positions = order[start:start + batch_size]
+            embeddings[positions] = self._encode_batch([texts[i] for i in positions])
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs: Dict[str, np.ndarray] = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+        if self.config['pooling'] == 'cls':
+            return hidden[:, 0]
+        mask = inputs['attention_mask'][:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
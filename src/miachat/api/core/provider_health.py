@@ -0,0 +1,313 @@
+"""
+Provider health registry for MinouChat.
+
+Keeps a cached view of which LLM providers are reachable so the chat path
+never has to probe a provider before sending a message.
+
+- Ollama targets (one per base URL) are probed via /api/tags by a background
+  refresher and revalidated on read when the cached entry is stale
+  (stale-while-revalidate). The probe also records which models are pulled.
+- Cloud providers are not probed (availability is "has an API key"), but a
+  failed real call marks them unhealthy for a cool-down period.
+- Any failed real LLM call marks its provider unhealthy immediately; a
+  successful one marks it healthy again.
+
+Configuration (environment variables):
+    - PROVIDER_HEALTH_REFRESH_INTERVAL: Seconds between background probes (default: 15)
+    - PROVIDER_HEALTH_FRESH_TTL: Seconds a probe result is served without revalidating (default: 30)
+    - PROVIDER_HEALTH_MAX_STALE: Seconds after which a read blocks on a fresh probe (default: 300)
+    - PROVIDER_HEALTH_PROBE_TIMEOUT: Probe request timeout in seconds (default: 2)
+    - PROVIDER_HEALTH_UNHEALTHY_COOLDOWN: Seconds an unprobed provider stays unhealthy after a failure (default: 30)
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def default_ollama_url() -> str:
+    """Ollama base URL from the environment."""
+    return f"http://{os.getenv('OLLAMA_HOST', 'localhost')}:{os.getenv('OLLAMA_PORT', '11434')}"
+
+
+@dataclass
+class ProviderHealth:
+    """Cached health of one provider target."""
+    provider: str
+    target: str
+    healthy: bool
+    checked_at: float  # time.monotonic() of the last probe or call
+    checked_at_wall: datetime
+    source: str  # 'probe' or 'call'
+    models: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def age(self) -> float:
+        """Seconds since this entry was last updated."""
+        return time.monotonic() - self.checked_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for the status API."""
+        return {
+            'provider': self.provider,
+            'target': self.target or None,
+            'healthy': self.healthy,
+            'source': self.source,
+            'checked_at': self.checked_at_wall.isoformat(),
+            'age_seconds': round(self.age(), 1),
+            'models': self.models,
+            'error': self.error
+        }
+
+
+class ProviderHealthRegistry:
+    """Cached provider availability with a background refresher."""
+
+    def __init__(
+        self,
+        refresh_interval: Optional[float] = None,
+        fresh_ttl: Optional[float] = None,
+        max_stale: Optional[float] = None,
+        probe_timeout: Optional[float] = None,
+        unhealthy_cooldown: Optional[float] = None
+    ):
+        """Initialize the registry.
+
+        Args:
+            refresh_interval: Seconds between background probes
+            fresh_ttl: Seconds a probe result is served without revalidating
+            max_stale: Seconds after which a read waits for a fresh probe
+            probe_timeout: Timeout for a single probe request
+            unhealthy_cooldown: How long a failed call keeps an unprobed provider unhealthy
+        """
+        self.refresh_interval = refresh_interval or float(os.getenv('PROVIDER_HEALTH_REFRESH_INTERVAL', '15'))
+        self.fresh_ttl = fresh_ttl or float(os.getenv('PROVIDER_HEALTH_FRESH_TTL', '30'))
+        self.max_stale = max_stale or float(os.getenv('PROVIDER_HEALTH_MAX_STALE', '300'))
+        self.probe_timeout = probe_timeout or float(os.getenv('PROVIDER_HEALTH_PROBE_TIMEOUT', '2'))
+        self.unhealthy_cooldown = unhealthy_cooldown or float(os.getenv('PROVIDER_HEALTH_UNHEALTHY_COOLDOWN', '30'))
+
+        self._entries: Dict[Tuple[str, str], ProviderHealth] = {}
+        self._lock = threading.Lock()
+        self._revalidating: set = set()
+
+        # Providers that can be actively probed
+        self._probers: Dict[str, Callable[[str], Tuple[bool, List[str], Optional[str]]]] = {
+            'ollama': self._probe_ollama,
+        }
+
+        self._stop_event = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, provider: str, target: Optional[str] = None) -> Optional[ProviderHealth]:
+        """Get the cached health of a provider target.
+
+        For probeable providers this never returns None: a missing or very
+        old entry is probed synchronously, a merely stale one is returned
+        as-is while a background probe refreshes it.
+
+        Args:
+            provider: Provider name
+            target: Base URL for local providers; ignored for cloud providers
+
+        Returns:
+            Cached health, or None if nothing is known about an unprobed provider
+        """
+        key = self._key(provider, target)
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if provider not in self._probers:
+            return entry
+
+        if entry is None or entry.age() > self.max_stale:
+            return self.refresh(provider, key[1])
+        if entry.age() > self.fresh_ttl:
+            self._revalidate_in_background(provider, key[1])
+        return entry
+
+    def is_available(self, provider: str, target: Optional[str] = None, model: Optional[str] = None) -> bool:
+        """Whether a provider should be used for the next call.
+
+        Args:
+            provider: Provider name
+            target: Base URL for local providers
+            model: Optional model that must be present (Ollama only)
+
+        Returns:
+            True if the provider is believed to be healthy
+        """
+        entry = self.get(provider, target)
+        if entry is None:
+            return True
+
+        if provider not in self._probers:
+            # A failed call only benches an unprobed provider for the cool-down
+            return entry.healthy or entry.age() > self.unhealthy_cooldown
+
+        if not entry.healthy:
+            return False
+        # Only trust the model list once a probe has produced one
+        known_models = entry.models or entry.source == 'probe'
+        if model and known_models and model not in entry.models:
+            logger.warning(f"{provider} model '{model}' not found. Available: {entry.models[:5]}...")
+            return False
+        return True
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """All cached entries, for the status API."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return [entry.to_dict() for entry in sorted(entries, key=lambda e: (e.provider, e.target))]
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def mark_unhealthy(self, provider: str, target: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Record a failed real call. Takes effect immediately."""
+        key = self._key(provider, target)
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = self._entry(
+                key, False, 'call', previous.models if previous else [], error
+            )
+        # Probeable providers come back through the next refresh or stale read
+        logger.warning(f"Marked {provider} unhealthy{' at ' + key[1] if key[1] else ''}: {error}")
+
+    def mark_healthy(self, provider: str, target: Optional[str] = None) -> None:
+        """Record a successful real call."""
+        key = self._key(provider, target)
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None and previous.healthy and previous.source == 'probe':
+                # Keep the probe's model list; just refresh the timestamp
+                previous.checked_at = time.monotonic()
+                return
+            self._entries[key] = self._entry(key, True, 'call', previous.models if previous else [], None)
+
+    def refresh(self, provider: str, target: Optional[str] = None) -> Optional[ProviderHealth]:
+        """Probe a provider target now and cache the result."""
+        prober = self._probers.get(provider)
+        if prober is None:
+            return self.get(provider, target)
+
+        key = self._key(provider, target)
+        healthy, models, error = prober(key[1])
+        entry = self._entry(key, healthy, 'probe', models, error)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def register(self, provider: str, target: Optional[str] = None) -> None:
+        """Make sure the background refresher knows about a target."""
+        if provider in self._probers:
+            self._revalidate_in_background(provider, self._key(provider, target)[1])
+
+    # ------------------------------------------------------------------
+    # Background refresher
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the background refresher (idempotent)."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop_event.clear()
+        self.register('ollama', default_ollama_url())
+        self._refresher = threading.Thread(
+            target=self._refresh_loop,
+            name="provider-health-refresher",
+            daemon=True
+        )
+        self._refresher.start()
+        logger.info(f"Provider health refresher started (every {self.refresh_interval}s)")
+
+    def stop(self) -> None:
+        """Stop the background refresher."""
+        self._stop_event.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=self.probe_timeout + 1)
+            self._refresher = None
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.wait(self.refresh_interval):
+            with self._lock:
+                targets = [key for key in self._entries if key[0] in self._probers]
+            for provider, target in targets:
+                if self._stop_event.is_set():
+                    return
+                try:
+                    self.refresh(provider, target)
+                except Exception as e:
+                    logger.warning(f"Health probe for {provider} {target} failed: {e}")
+
+    def _revalidate_in_background(self, provider: str, target: str) -> None:
+        key = (provider, target)
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def revalidate():
+            try:
+                self.refresh(provider, target)
+            except Exception as e:
+                logger.warning(f"Health probe for {provider} {target} failed: {e}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=revalidate, name="provider-health-probe", daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _probe_ollama(self, base_url: str) -> Tuple[bool, List[str], Optional[str]]:
+        """Probe an Ollama server via /api/tags."""
+        try:
+            response = requests.get(f"{base_url}/api/tags", timeout=self.probe_timeout)
+            if not response.ok:
+                return False, [], f"HTTP {response.status_code}"
+            models = [m.get('name', '') for m in response.json().get('models', [])]
+            return True, models, None
+        except requests.exceptions.RequestException as e:
+            return False, [], type(e).__name__
+        except ValueError:
+            return False, [], "Invalid response"
+
+    @staticmethod
+    def _key(provider: str, target: Optional[str]) -> Tuple[str, str]:
+        if provider == 'ollama':
+            return provider, (target or default_ollama_url()).rstrip('/')
+        # Cloud providers are tracked per provider, not per endpoint
+        return provider, ''
+
+    @staticmethod
+    def _entry(key: Tuple[str, str], healthy: bool, source: str,
+               models: List[str], error: Optional[str]) -> ProviderHealth:
+        return ProviderHealth(
+            provider=key[0],
+            target=key[1],
+            healthy=healthy,
+            checked_at=time.monotonic(),
+            checked_at_wall=datetime.now(timezone.utc),
+            source=source,
+            models=list(models),
+            error=error
+        )
+
+
+# Global provider health registry
+provider_health = ProviderHealthRegistry()
@@ -8,6 +8,7 @@ import logging
 import os
 from ...database.models import UserSettings, User
 from ...database.config import get_db
+from .provider_health import provider_health
 
 logger = logging.getLogger(__name__)
 
@@ -524,9 +525,10 @@ class SettingsService:
                 - model: str - configured model name
                 - message: str - human-readable status message
                 - needs_setup: bool - whether user needs to configure LLM settings
-        """
-        import requests
 
+        Provider reachability comes from the provider health registry's cache,
+        so this never makes a network call on the chat path.
+        """
         settings = self.get_user_settings(user_id, db)
 
         if not settings:
@@ -548,36 +550,24 @@ class SettingsService:
 
         if provider == "ollama":
             ollama_url = settings.ollama_url or f"http://{os.getenv('OLLAMA_HOST', 'localhost')}:{os.getenv('OLLAMA_PORT', '11434')}"
-            try:
-                response = requests.get(f"{ollama_url}/api/tags", timeout=5)
-                if response.ok:
-                    available = True
-                    message = f"Ollama is running with model {model}"
-                else:
-                    message = "Ollama is not responding. Please ensure Ollama is running."
-            except requests.exceptions.RequestException:
-                message = "Cannot connect to Ollama. Please ensure Ollama is running."
-
-        elif provider == "openai":
-            if settings.openai_api_key:
+            health = provider_health.get("ollama", ollama_url)
+            if health.healthy:
                 available = True
-                message = f"OpenAI configured with model {model}"
+                message = f"Ollama is running with model {model}"
+            elif health.error and health.error.startswith("HTTP"):
+                message = "Ollama is not responding. Please ensure Ollama is running."
             else:
-                message = "OpenAI API key not configured. Please add your API key in Settings."
+                message = "Cannot connect to Ollama. Please ensure Ollama is running."
 
-        elif provider == "anthropic":
-            if settings.anthropic_api_key:
-                available = True
-                message = f"Anthropic configured with model {model}"
+        elif provider in ("openai", "anthropic", "openrouter"):
+            label = {"openai": "OpenAI", "anthropic": "Anthropic", "openrouter": "OpenRouter"}[provider]
+            if not getattr(settings, f"{provider}_api_key"):
+                message = f"{label} API key not configured. Please add your API key in Settings."
+            elif not provider_health.is_available(provider):
+                message = f"{label} is temporarily unavailable (a recent request failed). Please try again shortly."
             else:
-                message = "Anthropic API key not configured. Please add your API key in Settings."
-
-        elif provider == "openrouter":
-            if settings.openrouter_api_key:
                 available = True
-                message = f"OpenRouter configured with model {model}"
-            else:
-                message = "OpenRouter API key not configured. Please add your API key in Settings."
+                message = f"{label} configured with model {model}"
 
         else:
             message = f"Unknown provider: {provider}"
@@ -608,8 +598,6 @@ class SettingsService:
                 - model: str
                 - message: str
         """
-        import requests
-
         # Check if character has its own config
         has_character_config = (
             character_model_config and
@@ -679,42 +667,25 @@ class SettingsService:
         user_id: int,
         db: Session
     ) -> bool:
-        """Check if a specific provider is available."""
-        import requests
-
+        """Check if a specific provider is available (from the provider health cache)."""
         user_settings = self.get_user_settings(user_id, db)
 
         if provider == "ollama":
             ollama_url = config.get('api_url') or (user_settings.ollama_url if user_settings else None) or f"http://{os.getenv('OLLAMA_HOST', 'localhost')}:{os.getenv('OLLAMA_PORT', '11434')}"
-            model = config.get('model', '')
-            try:
-                response = requests.get(f"{ollama_url}/api/tags", timeout=5)
-                if not response.ok:
-                    return False
-                # Check if the specific model exists
-                if model:
-                    available_models = response.json().get('models', [])
-                    model_names = [m.get('name', '') for m in available_models]
-                    # Check for exact match only
-                    if model not in model_names:
-                        logger.warning(f"Ollama model '{model}' not found. Available: {model_names[:5]}...")
-                        return False
-                return True
-            except Exception as e:
-                logger.warning(f"Error checking Ollama availability: {e}")
-                return False
+            # Exact model match against the models the last probe saw
+            return provider_health.is_available("ollama", ollama_url, model=config.get('model', ''))
 
         elif provider == "openai":
             api_key = config.get('api_key') or (user_settings.openai_api_key if user_settings else None)
-            return bool(api_key)
+            return bool(api_key) and provider_health.is_available(provider)
 
         elif provider == "anthropic":
             api_key = config.get('api_key') or (user_settings.anthropic_api_key if user_settings else None)
-            return bool(api_key)
+            return bool(api_key) and provider_health.is_available(provider)
 
         elif provider == "openrouter":
             api_key = config.get('api_key') or (user_settings.openrouter_api_key if user_settings else None)
-            return bool(api_key)
+            return bool(api_key) and provider_health.is_available(provider)
 
         return False
 
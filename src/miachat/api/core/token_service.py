@@ -5,11 +5,39 @@ Provides multi-provider token counting and intelligent budget allocation.
 
 import os
 import logging
+import threading
 from typing import Dict, Any, Optional, List
-import tiktoken
 
 logger = logging.getLogger(__name__)
 
+_encoder = None
+_encoder_loaded = False
+_encoder_lock = threading.Lock()
+
+
+def get_encoder():
+    """Get the shared cl100k_base tiktoken encoder, loading it on first use.
+
+    tiktoken and its encoding tables are only loaded when something is first
+    counted or chunked, and token counting and document chunking share one
+    encoder.
+
+    Returns:
+        The encoder, or None if it could not be loaded (callers approximate)
+    """
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        with _encoder_lock:
+            if not _encoder_loaded:
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding("cl100k_base")
+                    logger.info("Loaded cl100k_base token encoding")
+                except Exception as e:
+                    logger.warning(f"Failed to load tiktoken encoder: {e}, using approximate counting")
+                _encoder_loaded = True
+    return _encoder
+
 
 class TokenService:
     """Service for token counting and context budget management across LLM providers."""
@@ -109,13 +137,10 @@ class TokenService:
         """
         self.default_context_limit = default_context_limit
 
-        # Initialize tiktoken encoder (cl100k_base works for most modern models)
-        try:
-            self.encoder = tiktoken.get_encoding("cl100k_base")
-            logger.info("TokenService initialized with cl100k_base encoding")
-        except Exception as e:
-            logger.warning(f"Failed to load tiktoken encoder: {e}, using approximate counting")
-            self.encoder = None
+    @property
+    def encoder(self):
+        """tiktoken encoder (cl100k_base works for most modern models), loaded on first use."""
+        return get_encoder()
 
     def count_tokens(self, text: str) -> int:
         """Count tokens in text.
@@ -0,0 +1,205 @@
+"""
+Client for the vector-search sidecar process.
+
+RemoteEmbeddingService has the same public interface as EmbeddingService but
+forwards every call to a separate local process (miachat.api.vector_service)
+that owns the embedding model and FAISS partitions. API workers then load
+neither, and their embedding and search work no longer competes with request
+handling for the GIL.
+
+The sidecar opens its own database sessions, so callers must commit
+documents and chunks before calling add_document_embeddings (the upload
+path already does). The ``db`` arguments are accepted for compatibility and
+ignored.
+
+Configuration (environment variables):
+    - VECTOR_SERVICE_URL: Sidecar address, e.g. unix:///tmp/minouchat-vectors.sock
+      or http://127.0.0.1:8765. Unset (the default) keeps everything in-process.
+    - VECTOR_SERVICE_TIMEOUT: Seconds to wait for a sidecar response (default: 120)
+"""
+
+import base64
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+def encode_array(array: np.ndarray) -> Dict[str, Any]:
+    """Pack a float32 matrix for JSON transport."""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {'shape': list(array.shape), 'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def decode_array(payload: Dict[str, Any]) -> np.ndarray:
+    """Unpack a matrix packed by encode_array."""
+    return np.frombuffer(base64.b64decode(payload['data']), dtype=np.float32).reshape(payload['shape'])
+
+
+class RemoteEmbeddingService:
+    """EmbeddingService interface backed by the vector-search sidecar."""
+
+    def __init__(self, url: Optional[str] = None, client: Optional[httpx.Client] = None):
+        """Initialize the client.
+
+        Args:
+            url: Sidecar address (unix:///path or http://host:port); defaults to VECTOR_SERVICE_URL
+            client: Preconfigured HTTP client (used by tests)
+        """
+        self.url = url or os.getenv('VECTOR_SERVICE_URL', '')
+        if client is None:
+            timeout = float(os.getenv('VECTOR_SERVICE_TIMEOUT', '120'))
+            if self.url.startswith('unix://'):
+                transport = httpx.HTTPTransport(uds=self.url[len('unix://'):])
+                client = httpx.Client(transport=transport, base_url='http://vector-service', timeout=timeout)
+            else:
+                client = httpx.Client(base_url=self.url, timeout=timeout)
+        self._client = client
+
+    def _call(self, method: str, path: str, **kwargs) -> Any:
+        response = self._client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    # ------------------------------------------------------------------
+    # EmbeddingService interface
+    # ------------------------------------------------------------------
+
+    def create_embeddings(self, texts: List[str], cache: bool = True) -> np.ndarray:
+        """Create embeddings for a list of texts.
+
+        Args:
+            texts: List of text strings to embed
+            cache: Use the sidecar's query cache
+
+        Returns:
+            numpy array of embeddings
+        """
+        if not texts:
+            return np.array([])
+        try:
+            return decode_array(self._call('POST', '/embeddings', json={'texts': list(texts), 'cache': cache}))
+        except Exception as e:
+            logger.error(f"Error creating embeddings: {e}")
+            raise
+
+    def add_document_embeddings(self, document_id: str, chunks: List[Dict[str, Any]], db: Session = None) -> bool:
+        """Create and store embeddings for document chunks.
+
+        Args:
+            document_id: Document ID (committed before the call)
+            chunks: List of chunk dictionaries with id and text_content
+            db: Ignored; the sidecar uses its own session
+
+        Returns:
+            True if successful, False otherwise
+        """
+        payload = {'chunks': [{'id': chunk['id'], 'text_content': chunk['text_content']} for chunk in chunks]}
+        try:
+            return self._call('POST', f'/documents/{document_id}/embeddings', json=payload)['ok']
+        except Exception as e:
+            logger.error(f"Error adding document embeddings via vector service: {e}")
+            return False
+
+    def search_similar_chunks(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        top_k: int = 5,
+        similarity_threshold: float = 0.3,
+        db: Session = None
+    ) -> List[Dict[str, Any]]:
+        """Search for similar document chunks using vector similarity.
+
+        Args:
+            query: Search query text
+            user_id: Optional user ID to filter results to user's documents
+            top_k: Number of results to return
+            similarity_threshold: Minimum similarity score (0-1)
+            db: Ignored; the sidecar uses its own session
+
+        Returns:
+            List of similar chunks with metadata and similarity scores
+        """
+        payload = {'query': query, 'user_id': user_id, 'top_k': top_k, 'similarity_threshold': similarity_threshold}
+        try:
+            return self._call('POST', '/search', json=payload)['results']
+        except Exception as e:
+            logger.error(f"Error searching similar chunks via vector service: {e}")
+            return []
+
+    def remove_document_embeddings(self, document_id: str, db: Session = None) -> bool:
+        """Remove embeddings for a document from the index.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            return self._call('DELETE', f'/documents/{document_id}/embeddings')['ok']
+        except Exception as e:
+            logger.error(f"Error removing document embeddings via vector service: {e}")
+            return False
+
+    def rebuild_index(self, db: Session = None) -> bool:
+        """Rebuild every partition in the sidecar.
+
+        Returns:
+            True if the rebuild completed, False if it failed or one was already running
+        """
+        try:
+            return self._call('POST', '/rebuild')['ok']
+        except Exception as e:
+            logger.error(f"Error rebuilding index via vector service: {e}")
+            return False
+
+    def get_rebuild_status(self) -> Dict[str, Any]:
+        """Progress of the current or last index rebuild."""
+        return self._call('GET', '/rebuild/status')
+
+    def flush_access_counts(self, db: Session = None) -> int:
+        """Write the sidecar's buffered document access counts.
+
+        Returns:
+            Number of documents updated
+        """
+        return self._call('POST', '/flush')['flushed']
+
+    def checkpoint_partitions(self) -> int:
+        """Checkpoint the sidecar's partitions that are due one."""
+        return self._call('POST', '/checkpoint')['checkpointed']
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get statistics about the embedding service, as reported by the sidecar."""
+        return {**self._call('GET', '/stats'), 'vector_service_url': self.url}
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether the sidecar has its model loaded."""
+        return self.get_readiness()['ready']
+
+    def warm_up(self) -> None:
+        """No-op: the sidecar warms its model up when it starts."""
+
+    def get_readiness(self) -> Dict[str, Any]:
+        """Model loading state of the sidecar; not ready while it is unreachable."""
+        try:
+            return self._call('GET', '/ready')
+        except Exception as e:
+            return {'ready': False, 'error': f"Vector service unreachable: {e}"}
+
+    def start(self) -> None:
+        """Check that the sidecar is reachable; its background work runs in its own process."""
+        try:
+            self._call('GET', '/health')
+            logger.info(f"Using vector service at {self.url}")
+        except Exception as e:
+            logger.warning(f"Vector service at {self.url} is not reachable yet: {e}")
+
+    def stop(self) -> None:
+        """Close the connection pool."""
+        self._client.close()
@@ -0,0 +1,1027 @@
+"""
+Per-user FAISS index partitions for document search.
+
+Each user's document chunks live in their own partition, so a search only
+scans the caller's vectors and never has to discard other users' hits.
+Partitions are persisted under ``{FAISS_INDEX_PATH}_users/`` and loaded on
+demand by EmbeddingService, which keeps recently used ones in an LRU cache.
+
+Vectors are stored under int64 labels in an IndexIDMap2. Removing a chunk
+tombstones its label: the vector is excluded from searches immediately and
+physically removed by compact(), which EmbeddingService runs once the share
+of dead vectors crosses a threshold.
+
+Reads are lock-free. A partition publishes an immutable PartitionSnapshot
+(index, label mapping, tombstones and a version number); searches run on
+whichever snapshot is current when they start. Writers serialize on the
+partition lock, apply their change to a copy and publish it as the next
+generation. Tombstoning shares the index with the previous generation, so
+only adds and compaction pay for copying the vectors.
+
+Persistence is crash-safe and incremental:
+- ``{user_id}.ckpt`` is a checkpoint: a binary header and label mapping
+  followed by the serialized FAISS index, written to a temp file and
+  renamed into place, so it is always either the old or the new version.
+- ``{user_id}.log`` is an append-only delta log of adds and removes since
+  the checkpoint. Each record carries a CRC, and a torn tail left by a
+  crash is dropped on replay.
+- Loading a partition reads the checkpoint and replays the log onto it. The
+  log carries the checkpoint generation it belongs to, so a log left behind
+  by a checkpoint interrupted before the log was reset is ignored.
+- The FAISS index itself is written next to the checkpoint as
+  ``{user_id}.{generation}.index`` and loaded memory-mapped
+  (IO_FLAG_MMAP_IFC), so flat and scalar-quantized codes are paged in from
+  the OS cache and shared by every process that maps the same file. Writers
+  never modify a mapped index; they copy it to the heap first, and the next
+  checkpoint maps the new file again.
+- Every checkpoint rewrites ``GENERATION`` in the partition directory.
+  Processes sharing the directory poll it to notice checkpoints written by
+  others (see EmbeddingService).
+
+With FAISS_SHARED_INDEX enabled (several uvicorn workers), writes to a
+partition are serialized across processes with a file lock. The writer
+reloads the latest checkpoint before changing the partition, and checkpoints
+straight afterwards instead of appending to a per-process delta log.
+
+Small partitions use an exact flat index. Once a partition holds
+FAISS_ANN_THRESHOLD live vectors it is converted to an approximate index
+(HNSW, IVF or IVF-PQ), trained on a sample of its vectors. The index kind is
+part of the serialized index, so checkpoints need no extra metadata.
+scripts/benchmark_vector_index.py measures recall and latency per setting.
+
+With FAISS_QUANTIZATION set, partitions of FAISS_QUANTIZE_MIN_VECTORS or more
+store int8 (sq8) or 4-bit (sq4) codes instead of float32, trained per
+dimension on their own vectors; this applies to flat, HNSW and IVF indexes.
+Quantized scores are approximate, so EmbeddingService rescores candidates
+against the full-precision vectors in the database. A quantized partition
+that is later converted is rebuilt from its decoded vectors.
+
+Configuration (environment variables):
+    - FAISS_ANN_INDEX: Approximate index for large partitions: hnsw, ivf, ivfpq or none (default: hnsw)
+    - FAISS_ANN_THRESHOLD: Live vectors at which a partition switches to the approximate index (default: 50000)
+    - FAISS_HNSW_M: HNSW graph degree (default: 32)
+    - FAISS_HNSW_EF_CONSTRUCTION: HNSW build-time search depth (default: 80)
+    - FAISS_HNSW_EF_SEARCH: HNSW query-time search depth (default: 64)
+    - FAISS_IVF_NLIST: IVF cells; 0 derives it from the vector count (default: 0)
+    - FAISS_IVF_NPROBE: IVF cells visited per query (default: 16)
+    - FAISS_PQ_M: PQ sub-quantizers; 0 uses one per 8 dimensions (default: 0)
+    - FAISS_PQ_BITS: Bits per PQ code (default: 8)
+    - FAISS_ANN_TRAIN_SAMPLE: Vectors sampled to train IVF/PQ and quantizers (default: 100000)
+    - FAISS_QUANTIZATION: Scalar quantization of stored vectors: sq8, sq4 or none (default: none)
+    - FAISS_QUANTIZE_MIN_VECTORS: Live vectors at which a partition is quantized (default: 1000)
+    - FAISS_CHECKPOINT_LOG_MB: Delta log size that triggers a checkpoint (default: 8)
+    - FAISS_CHECKPOINT_INTERVAL: Seconds after which a non-empty log is checkpointed on the next write (default: 300)
+    - FAISS_LOG_FSYNC: fsync the delta log after every write (default: true)
+    - FAISS_MMAP: Memory-map checkpointed indexes (default: true)
+    - FAISS_SHARED_INDEX: Partitions are shared by several worker processes (default: false)
+"""
+
+import glob
+import logging
+import os
+import struct
+import threading
+import time
+import weakref
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, FAISS_SHARED_INDEX unsupported
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint: magic, version, dimension, log generation, next label,
+# label count, dead count, chunk-ID bytes, then either the index bytes
+# (version 1) or the generation of the separate index file (version 2)
+_CKPT_HEADER = struct.Struct('<4sHIqqqqqq')
+_CKPT_MAGIC = b'MVCK'
+_CKPT_VERSION = 2
+_CKPT_EMBEDDED_INDEX = 1
+
+GENERATION_FILE = 'GENERATION'
+
+# Flat code arrays are mapped; faiss < 1.8 has no flag for them and reads into memory
+_MMAP_FLAGS = getattr(faiss, 'IO_FLAG_MMAP_IFC', 0) | faiss.IO_FLAG_READ_ONLY
+
+# Log file: magic, generation. Records: type, payload length, payload CRC32
+_LOG_HEADER = struct.Struct('<4sq')
+_LOG_MAGIC = b'MVLG'
+_RECORD_HEADER = struct.Struct('<cII')
+_RECORD_ADD = b'A'
+_RECORD_REMOVE = b'R'
+
+
+def _pack_strings(values: List[str]) -> Tuple[np.ndarray, bytes]:
+    """Pack strings as (offsets, concatenated UTF-8 bytes)."""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, b''.join(encoded)
+
+
+def _unpack_strings(offsets: np.ndarray, data: bytes) -> List[str]:
+    return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+def read_directory_generation(directory: str) -> Optional[str]:
+    """Token rewritten by every checkpoint in a partition directory, or None if absent."""
+    try:
+        with open(os.path.join(directory, GENERATION_FILE)) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _copy_index(index, mapped: bool):
+    """Heap copy of an index that a writer may modify.
+
+    clone_index would keep viewing a mapped index's codes, and resizing a
+    view aborts the process, so mapped indexes are copied via serialization.
+    """
+    if mapped:
+        return faiss.deserialize_index(faiss.serialize_index(index))
+    return faiss.clone_index(index)
+
+
+# ----------------------------------------------------------------------
+# Index kinds
+# ----------------------------------------------------------------------
+
+ANN_KINDS = ('hnsw', 'ivf', 'ivfpq')
+
+_QUANTIZER_TYPES = {
+    'sq8': faiss.ScalarQuantizer.QT_8bit,
+    'sq4': faiss.ScalarQuantizer.QT_4bit,
+}
+
+_SEARCH_PARAMETER_TYPES = {
+    'flat': faiss.SearchParameters,
+    'hnsw': faiss.SearchParametersHNSW,
+    'ivf': faiss.SearchParametersIVF,
+    'ivfpq': faiss.SearchParametersIVF,
+}
+
+
+@dataclass(frozen=True)
+class AnnConfig:
+    """Settings for approximate and quantized partition indexes."""
+    kind: str = 'hnsw'  # hnsw, ivf, ivfpq or none
+    threshold: int = 50000
+    hnsw_m: int = 32
+    ef_construction: int = 80
+    ef_search: int = 64
+    nlist: int = 0
+    nprobe: int = 16
+    pq_m: int = 0
+    pq_bits: int = 8
+    train_sample: int = 100000
+    quantization: str = 'none'  # sq8, sq4 or none
+    quantize_min_vectors: int = 1000
+
+    @classmethod
+    def from_env(cls) -> 'AnnConfig':
+        """Read the settings from FAISS_* environment variables."""
+        kind = os.getenv('FAISS_ANN_INDEX', 'hnsw').lower()
+        if kind not in ANN_KINDS + ('none',):
+            logger.warning(f"Unknown FAISS_ANN_INDEX '{kind}', using hnsw")
+            kind = 'hnsw'
+        quantization = os.getenv('FAISS_QUANTIZATION', 'none').lower()
+        if quantization not in tuple(_QUANTIZER_TYPES) + ('none',):
+            logger.warning(f"Unknown FAISS_QUANTIZATION '{quantization}', storing float32")
+            quantization = 'none'
+        return cls(
+            kind=kind,
+            threshold=int(os.getenv('FAISS_ANN_THRESHOLD', '50000')),
+            hnsw_m=int(os.getenv('FAISS_HNSW_M', '32')),
+            ef_construction=int(os.getenv('FAISS_HNSW_EF_CONSTRUCTION', '80')),
+            ef_search=int(os.getenv('FAISS_HNSW_EF_SEARCH', '64')),
+            nlist=int(os.getenv('FAISS_IVF_NLIST', '0')),
+            nprobe=int(os.getenv('FAISS_IVF_NPROBE', '16')),
+            pq_m=int(os.getenv('FAISS_PQ_M', '0')),
+            pq_bits=int(os.getenv('FAISS_PQ_BITS', '8')),
+            train_sample=int(os.getenv('FAISS_ANN_TRAIN_SAMPLE', '100000')),
+            quantization=quantization,
+            quantize_min_vectors=int(os.getenv('FAISS_QUANTIZE_MIN_VECTORS', '1000'))
+        )
+
+    def search_tuning(self, kind: str) -> Dict[str, int]:
+        """Query-time parameters for an index kind."""
+        if kind == 'hnsw':
+            return {'efSearch': self.ef_search}
+        if kind in ('ivf', 'ivfpq'):
+            return {'nprobe': self.nprobe}
+        return {}
+
+
+def index_kind(index) -> str:
+    """Kind of a partition index: flat, hnsw, ivf or ivfpq."""
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return 'ivfpq'
+    if isinstance(inner, faiss.IndexIVF):
+        return 'ivf'
+    return 'flat'
+
+
+def index_codec(index) -> str:
+    """How a partition index stores vectors: float32, sq8, sq4 or pq."""
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return 'pq'
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        for codec, qtype in _QUANTIZER_TYPES.items():
+            if inner.sq.qtype == qtype:
+                return codec
+        return 'sq'
+    return 'float32'
+
+
+def build_index(kind: str, dimension: int, vectors: np.ndarray, labels: np.ndarray,
+                config: AnnConfig):
+    """Build a labelled partition index of the given kind from vectors.
+
+    IVF, PQ and scalar quantizers are trained on a random sample of the
+    vectors. config.quantization selects the codes of flat, HNSW and IVF
+    indexes.
+
+    Args:
+        kind: flat, hnsw, ivf or ivfpq
+        dimension: Embedding dimension
+        vectors: float32 matrix of shape (n, dimension)
+        labels: int64 labels for the vectors
+        config: Approximate index settings
+
+    Returns:
+        An IndexIDMap2 holding the vectors
+    """
+    n = len(vectors)
+    qtype = _QUANTIZER_TYPES.get(config.quantization)
+    if kind == 'flat':
+        if qtype is None:
+            inner = faiss.IndexFlatIP(dimension)
+        else:
+            inner = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+    elif kind == 'hnsw':
+        if qtype is None:
+            inner = faiss.IndexHNSWFlat(dimension, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            inner = faiss.IndexHNSWSQ(dimension, qtype, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        inner.hnsw.efConstruction = config.ef_construction
+    elif kind in ('ivf', 'ivfpq'):
+        nlist = config.nlist or int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n // 39))  # FAISS wants ~39 training points per cell
+        quantizer = faiss.IndexFlatIP(dimension)
+        if kind == 'ivf' and qtype is None:
+            inner = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        elif kind == 'ivf':
+            inner = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+        else:
+            pq_m = config.pq_m or next(m for m in range(max(1, dimension // 8), 0, -1) if dimension % m == 0)
+            pq_bits = max(1, min(config.pq_bits, int(np.log2(max(n, 2)))))
+            inner = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_bits, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"unknown index kind {kind!r}")
+
+    if not inner.is_trained:
+        sample = vectors
+        if n > config.train_sample:
+            rows = np.random.default_rng(0).choice(n, config.train_sample, replace=False)
+            sample = vectors[np.sort(rows)]
+        inner.train(sample)
+
+    index = faiss.IndexIDMap2(inner)
+    if n:
+        index.add_with_ids(vectors, labels)
+    return index
+
+
+def _bytes_per_vector(index, dimension: int) -> int:
+    """Approximate memory per stored vector, excluding the label mapping."""
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.downcast_index(inner.storage).code_size + inner.hnsw.nb_neighbors(0) * 4 + 8
+    if isinstance(inner, faiss.IndexIVF):
+        return inner.code_size + 8  # Codes plus the stored list IDs
+    return inner.code_size
+
+
+@dataclass(frozen=True)
+class PartitionSnapshot:
+    """An immutable generation of a partition: index, label mapping and tombstones.
+
+    Searches run against a snapshot without taking the partition lock.
+    Writers never modify a published snapshot; they build and publish a new
+    one, so a reader always sees an index and mapping that belong together.
+    """
+    index: object
+    labels: Dict[int, str]  # FAISS label -> chunk ID (live and dead)
+    chunk_labels: Dict[str, int]  # chunk ID -> live FAISS label
+    dead: FrozenSet[int]  # Tombstoned labels still in the index
+    next_label: int
+    version: int
+    kind: str = 'flat'
+    codec: str = 'float32'
+    mapped: bool = False  # Index is a read-only memory map of a checkpoint file
+    tuning: Dict[str, int] = field(default_factory=dict)  # efSearch / nprobe
+    selector: object = None  # Filter skipping tombstones (kept with the selector it wraps)
+
+    @property
+    def live_count(self) -> int:
+        return self.index.ntotal - len(self.dead)
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Search this generation; see IndexPartition.search."""
+        if self.live_count == 0:
+            return []
+        k = min(k, self.live_count)
+        params = self._search_parameters(k)
+        if params is not None:
+            scores, labels = self.index.search(query, k, params=params)
+        else:
+            scores, labels = self.index.search(query, k)
+
+        return [
+            (self.labels[label], float(score))
+            for score, label in zip(scores[0], labels[0].tolist())
+            if label >= 0 and label not in self.dead
+        ]
+
+    def _search_parameters(self, k: int):
+        # Built per call: IndexIDMap2 swaps the selector inside the parameters
+        # while it searches, so concurrent readers must not share them
+        options = dict(self.tuning)
+        if 'efSearch' in options:
+            options['efSearch'] = max(options['efSearch'], k)
+        if self.dead:
+            options['sel'] = self.selector[0]
+        if not options:
+            return None
+        return _SEARCH_PARAMETER_TYPES[self.kind](**options)
+
+
+class _WorkingState:
+    """Mutable copy of a snapshot that a writer edits before publishing it."""
+
+    def __init__(self, index, labels: Dict[int, str], chunk_labels: Dict[str, int],
+                 dead: Set[int], next_label: int, mapped: bool = False):
+        self.index = index
+        self.labels = labels
+        self.chunk_labels = chunk_labels
+        self.dead = dead
+        self.next_label = next_label
+        self.mapped = mapped
+
+    def add(self, labels: np.ndarray, chunk_ids: List[str], vectors: np.ndarray) -> None:
+        if self.mapped:
+            self.index = _copy_index(self.index, mapped=True)
+            self.mapped = False
+        self.tombstone(chunk_ids)
+        self.index.add_with_ids(vectors, labels)
+        for label, chunk_id in zip(labels.tolist(), chunk_ids):
+            self.labels[label] = chunk_id
+            self.chunk_labels[chunk_id] = label
+        self.next_label = max(self.next_label, int(labels[-1]) + 1)
+
+    def tombstone(self, chunk_ids: Iterable[str]) -> int:
+        removed = 0
+        for chunk_id in chunk_ids:
+            label = self.chunk_labels.pop(chunk_id, None)
+            if label is not None:
+                self.dead.add(label)
+                removed += 1
+        return removed
+
+
+class IndexPartition:
+    """A FAISS index holding one user's chunk vectors."""
+
+    def __init__(self, user_id: int, dimension: int, directory: str, private: bool = False,
+                 ann: Optional[AnnConfig] = None):
+        """Initialize an empty partition.
+
+        Args:
+            user_id: Owner of the vectors
+            dimension: Embedding dimension
+            directory: Directory the partition is persisted in
+            private: Partition is still being built and not visible to readers,
+                so writes may edit it in place until share() is called
+            ann: Approximate index settings; defaults to the environment
+        """
+        self.user_id = user_id
+        self.dimension = dimension
+        self.directory = directory
+        self.private = private
+        self.ann = ann or AnnConfig.from_env()
+        self.mmap = os.getenv('FAISS_MMAP', 'true').lower() == 'true'
+        self.shared = os.getenv('FAISS_SHARED_INDEX', 'false').lower() == 'true' and fcntl is not None
+        self.lock = threading.RLock()  # Serializes writers; readers use snapshots
+        self.last_used = time.monotonic()
+        self._version = 0
+        self._snapshot = self._freeze(_WorkingState(self._new_index(dimension), {}, {}, set(), 0))
+
+        # Journaling starts once the partition has a checkpoint on disk
+        self.generation = 0
+        self.journaling = False
+        self.log_bytes = 0
+        self.checkpointed_at = time.monotonic()
+        self.checkpoint_log_bytes = int(float(os.getenv('FAISS_CHECKPOINT_LOG_MB', '8')) * 1024 * 1024)
+        self.checkpoint_interval = float(os.getenv('FAISS_CHECKPOINT_INTERVAL', '300'))
+        self.fsync = os.getenv('FAISS_LOG_FSYNC', 'true').lower() == 'true'
+        self._checkpoint_stat: Optional[Tuple[int, int]] = None  # (inode, mtime) last read or written
+        self._checkpointed_version = None
+        self._index_on_disk: Optional[Tuple[weakref.ref, int]] = None  # (index, file generation)
+
+    @property
+    def checkpoint_file(self) -> str:
+        return os.path.join(self.directory, f"{self.user_id}.ckpt")
+
+    def index_file(self, generation: int) -> str:
+        return os.path.join(self.directory, f"{self.user_id}.{generation}.index")
+
+    @property
+    def lock_file(self) -> str:
+        return os.path.join(self.directory, f"{self.user_id}.lock")
+
+    @property
+    def log_file(self) -> str:
+        return os.path.join(self.directory, f"{self.user_id}.log")
+
+    def snapshot(self) -> PartitionSnapshot:
+        """The current published generation."""
+        return self._snapshot
+
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def labels(self) -> Dict[int, str]:
+        return self._snapshot.labels
+
+    @property
+    def chunk_labels(self) -> Dict[str, int]:
+        return self._snapshot.chunk_labels
+
+    @property
+    def dead(self) -> FrozenSet[int]:
+        return self._snapshot.dead
+
+    @property
+    def next_label(self) -> int:
+        return self._snapshot.next_label
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def kind(self) -> str:
+        """Index kind: flat, hnsw, ivf or ivfpq."""
+        return self._snapshot.kind
+
+    @property
+    def codec(self) -> str:
+        """Vector storage: float32, sq8, sq4 or pq."""
+        return self._snapshot.codec
+
+    @property
+    def mapped(self) -> bool:
+        """Whether the index is served from a memory-mapped checkpoint file."""
+        return self._snapshot.mapped
+
+    @property
+    def lossy(self) -> bool:
+        """Whether search scores are approximate because vectors are compressed."""
+        return self._snapshot.codec != 'float32'
+
+    @property
+    def ntotal(self) -> int:
+        """Vectors in the index, including tombstoned ones."""
+        return self._snapshot.index.ntotal
+
+    @property
+    def live_count(self) -> int:
+        return self._snapshot.live_count
+
+    @property
+    def dead_count(self) -> int:
+        return len(self._snapshot.dead)
+
+    def dead_ratio(self) -> float:
+        """Share of the index taken up by tombstoned vectors."""
+        snapshot = self._snapshot
+        return len(snapshot.dead) / snapshot.index.ntotal if snapshot.index.ntotal else 0.0
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the vectors and ID mapping."""
+        index = self._snapshot.index
+        return index.ntotal * (_bytes_per_vector(index, self.dimension) + 64)
+
+    def full_precision_bytes(self) -> int:
+        """Memory the partition would take as a float32 flat index."""
+        return self.ntotal * (self.dimension * 4 + 64)
+
+    @staticmethod
+    def _new_index(dimension: int):
+        # Inner product for cosine similarity, addressed by our own labels
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    # ------------------------------------------------------------------
+    # Generations
+    # ------------------------------------------------------------------
+
+    def share(self) -> None:
+        """Make a privately built partition safe for concurrent readers."""
+        with self.lock:
+            self.private = False
+
+    def _working_copy(self, copy_index: bool) -> _WorkingState:
+        """Copy the current snapshot for editing; the index is cloned only if it will change."""
+        snapshot = self._snapshot
+        if self.private:
+            # No reader can hold this snapshot, so building a large partition
+            # does not pay for a copy per batch
+            return _WorkingState(snapshot.index, snapshot.labels, snapshot.chunk_labels,
+                                 set(snapshot.dead), snapshot.next_label, snapshot.mapped)
+        return _WorkingState(
+            _copy_index(snapshot.index, snapshot.mapped) if copy_index else snapshot.index,
+            dict(snapshot.labels),
+            dict(snapshot.chunk_labels),
+            set(snapshot.dead),
+            snapshot.next_label,
+            snapshot.mapped and not copy_index
+        )
+
+    def _freeze(self, state: _WorkingState) -> PartitionSnapshot:
+        selector = None
+        if state.dead:
+            dead = np.fromiter(state.dead, dtype=np.int64, count=len(state.dead))
+            batch = faiss.IDSelectorBatch(len(dead), faiss.swig_ptr(dead))
+            selector = (faiss.IDSelectorNot(batch), batch)
+        kind = index_kind(state.index)
+        self._version += 1
+        return PartitionSnapshot(
+            index=state.index,
+            labels=state.labels,
+            chunk_labels=state.chunk_labels,
+            dead=frozenset(state.dead),
+            next_label=state.next_label,
+            version=self._version,
+            kind=kind,
+            codec=index_codec(state.index),
+            mapped=state.mapped,
+            tuning=self.ann.search_tuning(kind),
+            selector=selector
+        )
+
+    def _publish(self, state: _WorkingState) -> None:
+        # A single reference assignment: readers see the old or the new generation
+        self._snapshot = self._freeze(state)
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add(self, chunk_ids: List[str], embeddings: np.ndarray) -> None:
+        """Add vectors for the given chunks, replacing any existing vector for a chunk."""
+        if len(chunk_ids) == 0:
+            return
+        with self._writing():
+            chunk_ids = list(chunk_ids)
+            state = self._working_copy(copy_index=True)
+            labels = np.arange(state.next_label, state.next_label + len(chunk_ids), dtype=np.int64)
+            vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+            state.add(labels, chunk_ids, vectors)
+            if self.journaling and not self.shared:
+                offsets, data = _pack_strings(chunk_ids)
+                self._append(_RECORD_ADD, [
+                    struct.pack('<q', len(labels)), labels.tobytes(), offsets.tobytes(), data, vectors.tobytes()
+                ])
+            self._publish(state)
+
+    def remove(self, chunk_ids: Iterable[str]) -> int:
+        """Tombstone the vectors of the given chunks.
+
+        Returns:
+            Number of vectors removed
+        """
+        with self._writing():
+            chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id in self._snapshot.chunk_labels]
+            if not chunk_ids:
+                return 0
+            # Tombstones leave the index itself untouched, so it is shared
+            state = self._working_copy(copy_index=False)
+            removed = state.tombstone(chunk_ids)
+            if self.journaling and not self.shared:
+                offsets, data = _pack_strings(chunk_ids)
+                self._append(_RECORD_REMOVE, [struct.pack('<q', len(chunk_ids)), offsets.tobytes(), data])
+            self._publish(state)
+            return removed
+
+    def compact(self) -> int:
+        """Physically remove tombstoned vectors from the index.
+
+        Callers should checkpoint afterwards; the log still describes the
+        uncompacted index, which replays to the same live set.
+
+        Returns:
+            Number of vectors removed
+        """
+        with self._writing():
+            if not self._snapshot.dead:
+                return 0
+            if self._snapshot.kind == 'hnsw':
+                # HNSW graphs do not support removal; rebuild from the live vectors
+                removed = len(self._snapshot.dead)
+                self._publish(self._rebuilt('hnsw'))
+                return removed
+            state = self._working_copy(copy_index=True)
+            removed = state.index.remove_ids(np.fromiter(state.dead, dtype=np.int64, count=len(state.dead)))
+            for label in state.dead:
+                state.labels.pop(label, None)
+            state.dead.clear()
+            self._publish(state)
+            return removed
+
+    def tune(self, ann: AnnConfig) -> None:
+        """Apply new approximate index settings; query-time ones take effect on the next search."""
+        with self.lock:
+            self.ann = ann
+            self._publish(self._working_copy(copy_index=False))
+
+    def wants_ann(self) -> bool:
+        """Whether the partition has grown past the approximate index threshold."""
+        return (self.ann.kind != 'none' and self._snapshot.kind == 'flat'
+                and self.live_count >= self.ann.threshold)
+
+    def wants_quantization(self) -> bool:
+        """Whether a float32 partition has grown enough to be quantized."""
+        return (self.ann.quantization != 'none' and self._snapshot.codec == 'float32'
+                and self._snapshot.kind in ('flat', 'hnsw')
+                and self.live_count >= self.ann.quantize_min_vectors)
+
+    def convert(self, kind: str) -> None:
+        """Rebuild the index as the given kind from its live vectors.
+
+        Tombstoned vectors are dropped. Callers should checkpoint afterwards.
+
+        Args:
+            kind: flat, hnsw, ivf or ivfpq
+        """
+        with self._writing():
+            if self._snapshot.kind in ('ivf', 'ivfpq'):
+                # IVF indexes keep no direct map, and PQ codes are lossy
+                raise ValueError(f"cannot convert a {self._snapshot.kind} index; rebuild it from the database")
+            started = time.monotonic()
+            self._publish(self._rebuilt(kind))
+            logger.info(f"Converted index partition for user {self.user_id} to {kind}/{self.codec} "
+                        f"({self.live_count} vectors) in {time.monotonic() - started:.2f}s")
+
+    def _rebuilt(self, kind: str) -> _WorkingState:
+        """A working state holding only the live vectors, in a new index of the given kind."""
+        snapshot = self._snapshot
+        labels = faiss.vector_to_array(snapshot.index.id_map)
+        vectors = faiss.downcast_index(snapshot.index.index).reconstruct_n(0, snapshot.index.ntotal)
+        if snapshot.dead:
+            live = ~np.isin(labels, np.fromiter(snapshot.dead, dtype=np.int64, count=len(snapshot.dead)))
+            labels, vectors = labels[live], vectors[live]
+        index = build_index(kind, self.dimension, np.ascontiguousarray(vectors), labels, self.ann)
+        return _WorkingState(
+            index,
+            {label: snapshot.labels[label] for label in labels.tolist()},
+            dict(snapshot.chunk_labels),
+            set(),
+            snapshot.next_label
+        )
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Search the partition.
+
+        Lock-free: runs against the snapshot current when the call starts.
+
+        Args:
+            query: Query embedding of shape (1, dimension)
+            k: Number of neighbours to return
+
+        Returns:
+            List of (chunk_id, similarity) pairs, best first
+        """
+        self.last_used = time.monotonic()
+        return self._snapshot.search(query, k)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def needs_checkpoint(self) -> bool:
+        """Whether the delta log has grown or aged enough to fold into a checkpoint."""
+        if not self.journaling:
+            return True
+        if self.log_bytes == 0:
+            return False
+        return (self.log_bytes >= self.checkpoint_log_bytes
+                or time.monotonic() - self.checkpointed_at >= self.checkpoint_interval)
+
+    def maybe_checkpoint(self) -> bool:
+        """Checkpoint if needs_checkpoint(); returns True if one was written."""
+        with self.lock:
+            if not self.needs_checkpoint():
+                return False
+            self.checkpoint()
+            return True
+
+    def checkpoint(self) -> None:
+        """Write a full checkpoint atomically and start a fresh delta log.
+
+        Does nothing if the partition is unchanged since its last checkpoint.
+        """
+        with self.lock:
+            snapshot = self._snapshot
+            if snapshot.version == self._checkpointed_version and os.path.exists(self.checkpoint_file):
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            generation = self.generation + 1
+
+            # Tombstone-only changes keep the index, so its file is reused
+            written_index, index_generation = self._index_on_disk or (None, None)
+            if written_index is None or written_index() is not snapshot.index \
+                    or not os.path.exists(self.index_file(index_generation)):
+                index_generation = generation
+                self._write_index(snapshot.index, self.index_file(index_generation))
+
+            labels = np.fromiter(snapshot.labels.keys(), dtype=np.int64, count=len(snapshot.labels))
+            offsets, data = _pack_strings(list(snapshot.labels.values()))
+            dead = np.fromiter(snapshot.dead, dtype=np.int64, count=len(snapshot.dead))
+            header = _CKPT_HEADER.pack(
+                _CKPT_MAGIC, _CKPT_VERSION, self.dimension, generation, snapshot.next_label,
+                len(labels), len(dead), len(data), index_generation
+            )
+            self._write_atomic(self.checkpoint_file, [
+                header, labels.tobytes(), offsets.tobytes(), data, dead.tobytes()
+            ])
+            # The old log is now covered by the checkpoint; a crash before
+            # this point leaves a log whose generation no longer matches
+            self._write_atomic(self.log_file, [_LOG_HEADER.pack(_LOG_MAGIC, generation)])
+            self._remove_index_files(keep=index_generation)
+
+            self.generation = generation
+            self.journaling = True
+            self.log_bytes = 0
+            self.checkpointed_at = time.monotonic()
+            self._checkpoint_stat = self._stat_checkpoint()
+
+            if self.mmap and not snapshot.mapped and not self.private:
+                # Serve the file just written, so the heap copy can be freed
+                state = self._working_copy(copy_index=False)
+                state.index, state.mapped = self._read_index(self.index_file(index_generation)), True
+                self._publish(state)
+            self._index_on_disk = (weakref.ref(self._snapshot.index), index_generation)
+            self._checkpointed_version = self._snapshot.version
+            self._write_atomic(os.path.join(self.directory, GENERATION_FILE),
+                               [f"{time.time_ns()}-{os.getpid()}-{self.user_id}".encode()])
+
+    def refresh(self) -> bool:
+        """Reload the partition if another process wrote a newer checkpoint.
+
+        Returns:
+            True if a newer checkpoint was loaded
+        """
+        with self.lock:
+            stat = self._stat_checkpoint()
+            if stat is None or stat == self._checkpoint_stat:
+                return False
+            state = self._read_checkpoint()
+            self._replay_log(state)
+            self._publish(state)
+            self._checkpointed_version = self._snapshot.version
+            logger.debug(f"Reloaded index partition for user {self.user_id} at generation {self.generation}")
+            return True
+
+    @contextmanager
+    def _writing(self):
+        """Hold the partition lock, and in shared mode the cross-process writer lock.
+
+        Shared-mode writers first catch up with checkpoints written by other
+        processes and checkpoint their own change before releasing the lock.
+        """
+        with self.lock:
+            if not self.shared or self.private:
+                yield
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.lock_file, 'a+b') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    self.refresh()
+                    yield
+                    self.checkpoint()
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _stat_checkpoint(self) -> Optional[Tuple[int, int]]:
+        # Checkpoints are replaced by rename, so a new write is a new inode
+        try:
+            stat = os.stat(self.checkpoint_file)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _read_index(self, path: str):
+        if self.mmap:
+            return faiss.read_index(path, _MMAP_FLAGS)
+        return faiss.read_index(path)
+
+    def _write_index(self, index, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        faiss.write_index(index, tmp_path)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _remove_index_files(self, keep: Optional[int] = None) -> None:
+        # Processes still mapping a removed file keep their pages until they reload
+        for path in glob.glob(os.path.join(self.directory, f"{self.user_id}.*.index")):
+            if keep is None or path != self.index_file(keep):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _write_atomic(self, path: str, chunks: List[bytes]) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _append(self, record_type: bytes, parts: List[bytes]) -> None:
+        payload = b''.join(parts)
+        with open(self.log_file, 'ab') as f:
+            f.write(_RECORD_HEADER.pack(record_type, len(payload), zlib.crc32(payload)))
+            f.write(payload)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.log_bytes += _RECORD_HEADER.size + len(payload)
+
+    def delete_files(self) -> None:
+        """Remove the persisted partition."""
+        for path in (self.checkpoint_file, self.log_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self._remove_index_files()
+        self._index_on_disk = None
+
+    @classmethod
+    def load(cls, user_id: int, dimension: int, directory: str) -> Optional['IndexPartition']:
+        """Load a persisted partition: read the checkpoint and replay the delta log.
+
+        Returns:
+            The partition, or None if it is missing or unreadable
+        """
+        partition = cls(user_id, dimension, directory)
+        if not os.path.exists(partition.checkpoint_file):
+            return None
+
+        try:
+            state = partition._read_checkpoint()
+        except Exception as e:
+            logger.warning(f"Could not load index partition for user {user_id}: {e}")
+            return None
+
+        # Records are applied to one working copy, published once at the end
+        try:
+            replayed = partition._replay_log(state)
+        except Exception as e:
+            # The checkpoint is intact; only the log tail is lost
+            logger.warning(f"Could not replay index log for user {user_id}: {e}")
+            state = partition._read_checkpoint()
+            replayed = 0
+        partition._publish(state)
+        partition._checkpointed_version = None if replayed else partition._snapshot.version
+        if replayed:
+            logger.info(f"Replayed {replayed} index log records for user {user_id}")
+        return partition
+
+    def _read_checkpoint(self) -> _WorkingState:
+        with open(self.checkpoint_file, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+
+        (magic, version, dimension, generation, next_label,
+         n_labels, n_dead, n_chunk_bytes, index_field) = _CKPT_HEADER.unpack_from(data)
+        if magic != _CKPT_MAGIC or version not in (_CKPT_VERSION, _CKPT_EMBEDDED_INDEX):
+            raise ValueError("not a partition checkpoint")
+        if dimension != self.dimension:
+            raise ValueError(f"dimension {dimension} != {self.dimension}")
+
+        offset = _CKPT_HEADER.size
+        labels = np.frombuffer(data, dtype=np.int64, count=n_labels, offset=offset)
+        offset += labels.nbytes
+        offsets = np.frombuffer(data, dtype=np.int64, count=n_labels + 1, offset=offset)
+        offset += offsets.nbytes
+        chunk_ids = _unpack_strings(offsets, data[offset:offset + n_chunk_bytes])
+        offset += n_chunk_bytes
+        dead = np.frombuffer(data, dtype=np.int64, count=n_dead, offset=offset)
+        offset += dead.nbytes
+        mapped = False
+        self._index_on_disk = None
+        if version == _CKPT_EMBEDDED_INDEX:
+            if len(data) - offset != index_field:
+                raise ValueError("truncated checkpoint")
+            index = faiss.deserialize_index(np.frombuffer(data, dtype=np.uint8, offset=offset))
+        else:
+            if len(data) != offset:
+                raise ValueError("truncated checkpoint")
+            index = self._read_index(self.index_file(index_field))
+            mapped = self.mmap
+
+        labels = dict(zip(labels.tolist(), chunk_ids))
+        dead = set(dead.tolist())
+        if index.ntotal != len(labels) or not dead <= labels.keys():
+            raise ValueError("checkpoint mapping does not match index")
+
+        chunk_labels = {chunk_id: label for label, chunk_id in labels.items() if label not in dead}
+        self.generation = generation
+        self.journaling = True
+        self._checkpoint_stat = (stat.st_ino, stat.st_mtime_ns)
+        if version != _CKPT_EMBEDDED_INDEX:
+            self._index_on_disk = (weakref.ref(index), index_field)
+        return _WorkingState(index, labels, chunk_labels, dead, next_label, mapped)
+
+    def _replay_log(self, state: _WorkingState) -> int:
+        """Apply delta log records written since the checkpoint to a loaded state.
+
+        Returns:
+            Number of records replayed
+        """
+        if not os.path.exists(self.log_file):
+            self._write_atomic(self.log_file, [_LOG_HEADER.pack(_LOG_MAGIC, self.generation)])
+            return 0
+
+        with open(self.log_file, 'rb') as f:
+            data = f.read()
+
+        magic, generation = _LOG_HEADER.unpack_from(data) if len(data) >= _LOG_HEADER.size else (None, None)
+        if magic != _LOG_MAGIC or generation != self.generation:
+            # Left over from before the last checkpoint: already applied
+            self._write_atomic(self.log_file, [_LOG_HEADER.pack(_LOG_MAGIC, self.generation)])
+            return 0
+
+        offset = _LOG_HEADER.size
+        replayed = 0
+        while offset + _RECORD_HEADER.size <= len(data):
+            record_type, length, crc = _RECORD_HEADER.unpack_from(data, offset)
+            start = offset + _RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+            self._apply_record(state, record_type, payload)
+            offset = start + length
+            replayed += 1
+
+        if offset != len(data):
+            # Torn write from a crash: drop it so new records follow valid ones
+            logger.warning(f"Dropping {len(data) - offset} bytes of incomplete index log for user {self.user_id}")
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(offset)
+
+        self.log_bytes = offset - _LOG_HEADER.size
+        return replayed
+
+    def _apply_record(self, state: _WorkingState, record_type: bytes, payload: bytes) -> None:
+        (count,) = struct.unpack_from('<q', payload)
+        offset = 8
+        if record_type == _RECORD_ADD:
+            labels = np.frombuffer(payload, dtype=np.int64, count=count, offset=offset)
+            offset += labels.nbytes
+        offsets = np.frombuffer(payload, dtype=np.int64, count=count + 1, offset=offset)
+        offset += offsets.nbytes
+        chunk_ids = _unpack_strings(offsets, payload[offset:offset + int(offsets[-1])])
+        offset += int(offsets[-1])
+
+        if record_type == _RECORD_ADD:
+            vectors = np.frombuffer(payload, dtype=np.float32, count=count * self.dimension, offset=offset)
+            state.add(labels.copy(), chunk_ids, vectors.reshape(count, self.dimension).copy())
+        elif record_type == _RECORD_REMOVE:
+            state.tombstone(chunk_ids)
+        else:
+            raise ValueError(f"unknown log record type {record_type!r}")
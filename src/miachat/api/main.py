@@ -18,7 +18,9 @@ from starlette.middleware.sessions import SessionMiddleware
 from .core.templates import render_template
 from .core.static import mount_static_files
 from .core.character_manager import character_manager
-from .core.llm_client import llm_client
+from .core.llm_client import llm_client, LLMError
+from .core.provider_health import provider_health
+from .core.job_queue import job_queue
 from sqlalchemy.orm import Session
 from ..database.config import get_db
 from ..database.models import Base, Conversation, Message
@@ -27,19 +29,22 @@ from .core.settings_service import settings_service
 from .core.style_overrides import get_style_overrides
 from .core.conversation_service import conversation_service
 from .core.enhanced_context_service import enhanced_context_service
+from .core.embedding_service import embedding_service
 from .routes.auth import router as auth_router
 from .routes.documents import router as documents_router
 from .routes.setup import router as setup_router, reset_router
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 import logging
 import os
 from starlette.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 import json
 import re
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from collections import defaultdict
 import time
 
@@ -562,6 +567,9 @@ app.include_router(google_tasks_router)
 from .routes.google_calendar import router as google_calendar_router
 app.include_router(google_calendar_router)
 
+from .routes.jobs import router as jobs_router
+app.include_router(jobs_router)
+
 # Import new services for chat integration
 from .core.token_service import token_service
 from .core.world_info_service import world_info_service
@@ -578,6 +586,21 @@ async def startup_event():
     from ..database.config import db_config
     db_config.init_db()
     logger.info("Database initialized with migrations")
+    provider_health.start()
+    job_queue.start()
+    embedding_service.start()
+    # Load the embedding model in the background; /api/ready reports when it is done
+    if os.getenv("EMBEDDING_WARMUP", "true").lower() == "true":
+        embedding_service.warm_up()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and release pooled LLM connections on shutdown"""
+    job_queue.stop()
+    provider_health.stop()
+    embedding_service.stop()
+    await llm_client.aclose()
 
 # Pydantic models
 class ChatRequest(BaseModel):
@@ -609,6 +632,11 @@ class ChatResponse(BaseModel):
     tracking_cards: Optional[List[Dict[str, Any]]] = None
     # Web search results (clickable sources)
     web_search_results: Optional[List[Dict[str, Any]]] = None
+    # ID of the persisted assistant message
+    message_id: Optional[int] = None
+    # Token for sidebar extractions still running in the background;
+    # poll /api/chat/extractions/{token} for sidebar_extractions and tracking_cards
+    pending_extractions: Optional[str] = None
 
 class CharacterCreateRequest(BaseModel):
     name: str
@@ -913,6 +941,12 @@ async def health_check():
         logger.error(f"Health check failed: {e}")
         return {"status": "unhealthy", "error": str(e)}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness check: 503 until the embedding model has finished loading."""
+    readiness = embedding_service.get_readiness()
+    return JSONResponse(status_code=200 if readiness['ready'] else 503, content=readiness)
+
 @app.get("/api/characters/examples")
 async def get_example_characters():
     """Get available example characters that users can import."""
@@ -1430,144 +1464,168 @@ async def get_tags():
     """Get all available tags."""
     return character_manager.get_tags()
 
-@app.post("/api/chat")
-async def chat(request: ChatRequest, request_obj: Request, db = Depends(get_db)):
-    """Send a message to a character and get a response with conversation memory."""
-    # DEBUG: Log incoming request
-    logger.warning(f"[CHAT DEBUG] Received request: message='{request.message[:30]}...', search={request.search}, use_documents={request.use_documents}")
-
-    try:
-        # Get current user
-        current_user = await get_current_user_from_session(request_obj, db)
-        if not current_user:
-            return JSONResponse(status_code=401, content={"error": "Authentication required"})
-
-        # Get character
-        character = character_manager.get_character(request.character_id)
-        if not character:
-            return JSONResponse(status_code=404, content={"error": "Character not found"})
-
-        # Handle session management
-        session_id = request.session_id
-        migration_available = False
+@dataclass
+class ChatTurn:
+    """Everything assembled for one chat turn before the LLM is called."""
+    user_id: int
+    session_id: str
+    character: Dict[str, Any]
+    character_name: str
+    messages: List[Dict[str, str]]
+    model_config: Dict[str, Any]
+    enhanced_context: Dict[str, Any]
+    reasoning_chain: List[Dict[str, Any]]
+    document_context_used: bool = False
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    context_summary: Optional[str] = None
+    using_default_llm: bool = False
+    llm_provider: Optional[str] = None
+    llm_model: Optional[str] = None
+    llm_message: Optional[str] = None
 
-        if session_id:
-            # Continue existing session
-            session = conversation_service.get_session(session_id, db)
-            if not session or session.get("character_id") != request.character_id:
-                session_id = None  # Invalid session, create new one
 
-        if not session_id:
-            # Create new session
-            session = conversation_service.create_session(
-                request.character_id,
-                str(current_user.id),
-                db
-            )
-            session_id = session["session_id"]
-        
-        # Initialize Enhanced Context variables
-        enhanced_context = {}
-        enhanced_prompt = None
-        document_context_used = False
-        sources = []
-        context_summary = None
-        reasoning_chain = []
+async def _prepare_chat_turn(request: ChatRequest, request_obj: Request, db: Session) -> Union[ChatTurn, JSONResponse]:
+    """Authenticate, resolve the session and assemble context and messages for a chat turn.
 
-        # Always get enhanced context for intelligent conversation
-        try:
-            # Import Enhanced Context Service
-            from .core.enhanced_context_service import enhanced_context_service
+    Shared by /api/chat and /api/chat/stream so both endpoints build exactly
+    the same prompt.
 
-            # Log search flag
-            if request.search:
-                logger.warning(f"[SEARCH] Web search requested for message: '{request.message[:50]}...'")
+    Returns:
+        The prepared turn, or a JSONResponse explaining why the turn cannot proceed
+    """
+    # Get current user
+    current_user = await get_current_user_from_session(request_obj, db)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "Authentication required"})
 
-            # Detect if this is a comprehensive document analysis request
-            comprehensive_analysis = _should_use_comprehensive_analysis(request.message)
+    # Get character
+    character = character_manager.get_character(request.character_id)
+    if not character:
+        return JSONResponse(status_code=404, content={"error": "Character not found"})
 
-            # Get session documents for context persistence (from previous uploads)
-            session_document_ids = conversation_service.get_session_document_ids(session_id, db)
-            if session_document_ids:
-                logger.info(f"Including {len(session_document_ids)} session documents in context")
+    # Handle session management
+    session_id = request.session_id
+    migration_available = False
 
-            # Get enhanced context with conversation history, semantic memory, and documents
-            enhanced_context = enhanced_context_service.get_enhanced_context(
-                user_message=request.message,
-                user_id=current_user.id,
-                conversation_id=session_id,
-                character_id=request.character_id,
-                include_conversation_history=True,  # Always include conversation context
-                include_documents=request.use_documents,  # Include documents if requested
-                comprehensive_analysis=comprehensive_analysis,
-                enable_reasoning=True,  # Enable reasoning for transparency
-                force_document_ids=session_document_ids if session_document_ids else None,
-                force_search=request.search,  # User explicitly requested web search
-                db=db
-            )
+    if session_id:
+        # Continue existing session
+        session = conversation_service.get_session(session_id, db)
+        if not session or session.get("character_id") != request.character_id:
+            session_id = None  # Invalid session, create new one
+
+    if not session_id:
+        # Create new session
+        session = conversation_service.create_session(
+            request.character_id,
+            str(current_user.id),
+            db
+        )
+        session_id = session["session_id"]
+    
+    # Initialize Enhanced Context variables
+    enhanced_context = {}
+    enhanced_prompt = None
+    document_context_used = False
+    sources = []
+    context_summary = None
+    reasoning_chain = []
+
+    # Always get enhanced context for intelligent conversation
+    try:
+        # Import Enhanced Context Service
+        from .core.enhanced_context_service import enhanced_context_service
+
+        # Log search flag
+        if request.search:
+            logger.warning(f"[SEARCH] Web search requested for message: '{request.message[:50]}...'")
+
+        # Detect if this is a comprehensive document analysis request
+        comprehensive_analysis = _should_use_comprehensive_analysis(request.message)
+
+        # Get session documents for context persistence (from previous uploads)
+        session_document_ids = conversation_service.get_session_document_ids(session_id, db)
+        if session_document_ids:
+            logger.info(f"Including {len(session_document_ids)} session documents in context")
+
+        # Get enhanced context with conversation history, semantic memory, and documents.
+        # Source fetches block, so run them off the event loop.
+        enhanced_context = await run_in_threadpool(
+            enhanced_context_service.get_enhanced_context,
+            user_message=request.message,
+            user_id=current_user.id,
+            conversation_id=session_id,
+            character_id=request.character_id,
+            include_conversation_history=True,  # Always include conversation context
+            include_documents=request.use_documents,  # Include documents if requested
+            comprehensive_analysis=comprehensive_analysis,
+            enable_reasoning=True,  # Enable reasoning for transparency
+            force_document_ids=session_document_ids if session_document_ids else None,
+            force_search=request.search,  # User explicitly requested web search
+            db=db
+        )
 
-            # Extract context information
-            document_chunks = enhanced_context.get('document_chunks', [])
-            reasoning_chain = enhanced_context.get('reasoning_chain', [])
-            conflicts_detected = enhanced_context.get('conflicts_detected', [])
-            document_references = enhanced_context.get('document_references', [])
+        # Extract context information
+        document_chunks = enhanced_context.get('document_chunks', [])
+        reasoning_chain = enhanced_context.get('reasoning_chain', [])
+        conflicts_detected = enhanced_context.get('conflicts_detected', [])
+        document_references = enhanced_context.get('document_references', [])
 
-            # Check if we have relevant document context
-            if document_chunks:
-                # Additional relevance check for documents
-                # Session documents (forced) are always relevant, others need similarity >= 0.5
-                relevant_chunks = [chunk for chunk in document_chunks
-                                 if chunk.get('is_session_document', False) or chunk.get('similarity_score', 0) >= 0.5]
+        # Check if we have relevant document context
+        if document_chunks:
+            # Additional relevance check for documents
+            # Session documents (forced) are always relevant, others need similarity >= 0.5
+            relevant_chunks = [chunk for chunk in document_chunks
+                             if chunk.get('is_session_document', False) or chunk.get('similarity_score', 0) >= 0.5]
 
-                if relevant_chunks or comprehensive_analysis or session_document_ids:
-                    document_context_used = True
-                    sources = enhanced_context.get('sources', [])
-                    context_summary = enhanced_context.get('context_summary', '')
+            if relevant_chunks or comprehensive_analysis or session_document_ids:
+                document_context_used = True
+                sources = enhanced_context.get('sources', [])
+                context_summary = enhanced_context.get('context_summary', '')
 
-                    logger.info(f"Enhanced context enabled for {character['name']}: "
-                              f"{len(enhanced_context.get('recent_interactions', []))} recent interactions, "
-                              f"{len(relevant_chunks)} relevant document chunks, "
-                              f"{len(document_references)} document references detected")
-                else:
-                    logger.info(f"Enhanced context with conversation history but no relevant documents for: '{request.message}'")
+                logger.info(f"Enhanced context enabled for {character['name']}: "
+                          f"{len(enhanced_context.get('recent_interactions', []))} recent interactions, "
+                          f"{len(relevant_chunks)} relevant document chunks, "
+                          f"{len(document_references)} document references detected")
             else:
-                # Even without documents, we have conversation context
-                recent_interactions = enhanced_context.get('recent_interactions', [])
-                semantic_context = enhanced_context.get('semantic_context', [])
+                logger.info(f"Enhanced context with conversation history but no relevant documents for: '{request.message}'")
+        else:
+            # Even without documents, we have conversation context
+            recent_interactions = enhanced_context.get('recent_interactions', [])
+            semantic_context = enhanced_context.get('semantic_context', [])
 
-                if recent_interactions or semantic_context:
-                    logger.info(f"Enhanced conversation context for {character['name']}: "
-                              f"{len(recent_interactions)} recent interactions, "
-                              f"{len(semantic_context)} semantic memories")
+            if recent_interactions or semantic_context:
+                logger.info(f"Enhanced conversation context for {character['name']}: "
+                          f"{len(recent_interactions)} recent interactions, "
+                          f"{len(semantic_context)} semantic memories")
 
-        except Exception as e:
-            logger.warning(f"Enhanced context generation failed, falling back to regular chat: {e}")
-        
-        # Build messages array
-        messages = []
+    except Exception as e:
+        logger.warning(f"Enhanced context generation failed, falling back to regular chat: {e}")
+    
+    # Build messages array
+    messages = []
 
-        # Add system prompt (always)
-        system_prompt_text = character.get('system_prompt') or character.get('persona', 'You are a helpful AI assistant.')
+    # Add system prompt (always)
+    system_prompt_text = character.get('system_prompt') or character.get('persona', 'You are a helpful AI assistant.')
 
-        # Add response formatting guidelines to ensure direct, conversational responses
-        character_name = character.get('name', 'Assistant')
-        system_prompt_text += f"""
+    # Add response formatting guidelines to ensure direct, conversational responses
+    character_name = character.get('name', 'Assistant')
+    system_prompt_text += f"""
 
 RESPONSE FORMAT: Respond directly in first person as {character_name}. Do not use dialogue labels, character names followed by colons, or script formatting. Provide only your single response to the user."""
 
-        # Add style overrides (only for styles that differ from category defaults)
-        try:
-            category = character.get('category', 'Other')
-            communication_style = character.get('communication_style', {})
-            style_overrides = get_style_overrides(category, communication_style)
-            if style_overrides:
-                system_prompt_text += f"\n\n{style_overrides}"
-                logger.info(f"Applied style overrides for category '{category}'")
-        except Exception as e:
-            logger.warning(f"Failed to apply style overrides: {e}")
+    # Add style overrides (only for styles that differ from category defaults)
+    try:
+        category = character.get('category', 'Other')
+        communication_style = character.get('communication_style', {})
+        style_overrides = get_style_overrides(category, communication_style)
+        if style_overrides:
+            system_prompt_text += f"\n\n{style_overrides}"
+            logger.info(f"Applied style overrides for category '{category}'")
+    except Exception as e:
+        logger.warning(f"Failed to apply style overrides: {e}")
 
-        # Add universal response guidelines for all personas
-        response_guidelines = """
+    # Add universal response guidelines for all personas
+    response_guidelines = """
 ## CRITICAL: RESPONSE GUIDELINES (MUST FOLLOW)
 
 **RULE 1 - QUESTION LIMIT:** When asking questions or exploring ideas, ask MAXIMUM 2-3 questions per response. NEVER ask more than 3 questions. If you want to cover multiple topics, pick the most important 2-3 and save the rest for later.
@@ -1586,44 +1644,44 @@ RIGHT (focused):
 
 When PRESENTING analysis or completed thoughts (not asking questions), longer responses are acceptable.
 """
-        system_prompt_text += f"\n\n{response_guidelines}"
+    system_prompt_text += f"\n\n{response_guidelines}"
 
-        # Add companion mode enhancements for romantic relationships
-        if character.get('companion_mode'):
-            companion_prompt = _build_companion_prompt(character)
-            if companion_prompt:
-                system_prompt_text += f"\n\n{companion_prompt}"
-                logger.info("Applied companion mode enhancements")
+    # Add companion mode enhancements for romantic relationships
+    if character.get('companion_mode'):
+        companion_prompt = _build_companion_prompt(character)
+        if companion_prompt:
+            system_prompt_text += f"\n\n{companion_prompt}"
+            logger.info("Applied companion mode enhancements")
 
-        # Add fallback instruction for when no relevant documents are found
-        if request.use_documents and not document_context_used:
-            system_prompt_text += "\n\nIMPORTANT: If the user asks about specific information that you don't have access to in your training data or the user's documents, politely acknowledge that you don't have access to this information and offer to help find it through web search or other research methods when those capabilities become available."
+    # Add fallback instruction for when no relevant documents are found
+    if request.use_documents and not document_context_used:
+        system_prompt_text += "\n\nIMPORTANT: If the user asks about specific information that you don't have access to in your training data or the user's documents, politely acknowledge that you don't have access to this information and offer to help find it through web search or other research methods when those capabilities become available."
 
-        # Add time-aware context for the persona
-        try:
-            from .core.reminder_service import reminder_service
-            from datetime import datetime
-            time_context = reminder_service.get_context_for_chat(
-                db=db,
-                user_id=current_user.id,
-                persona_name=character.get('name', 'Assistant')
-            )
+    # Add time-aware context for the persona
+    try:
+        from .core.reminder_service import reminder_service
+        from datetime import datetime
+        time_context = reminder_service.get_context_for_chat(
+            db=db,
+            user_id=current_user.id,
+            persona_name=character.get('name', 'Assistant')
+        )
 
-            # Always include explicit current date to help LLM with time awareness
-            current_date = datetime.now()
-            date_str = current_date.strftime('%B %d, %Y')  # e.g., "December 19, 2025"
-            year = current_date.year
+        # Always include explicit current date to help LLM with time awareness
+        current_date = datetime.now()
+        date_str = current_date.strftime('%B %d, %Y')  # e.g., "December 19, 2025"
+        year = current_date.year
 
-            time_prompt = f"\n\n**CRITICAL - CURRENT DATE**: Today is {date_str}. We are in the year {year}. When discussing 'this year' or 'the past year' or doing a 'year review', you are discussing {year} (the current year), NOT {year - 1}."
-            if time_context:
-                time_prompt += f"\n{time_context}"
-            system_prompt_text += time_prompt
+        time_prompt = f"\n\n**CRITICAL - CURRENT DATE**: Today is {date_str}. We are in the year {year}. When discussing 'this year' or 'the past year' or doing a 'year review', you are discussing {year} (the current year), NOT {year - 1}."
+        if time_context:
+            time_prompt += f"\n{time_context}"
+        system_prompt_text += time_prompt
 
-        except Exception as e:
-            logger.warning(f"Failed to get time context for chat: {e}")
+    except Exception as e:
+        logger.warning(f"Failed to get time context for chat: {e}")
 
-        # Add artifact generation capabilities
-        artifact_instructions = """
+    # Add artifact generation capabilities
+    artifact_instructions = """
 
 ARTIFACT GENERATION CAPABILITIES:
 You can help users create and generate various types of documents and files. When a user asks you to create, generate, write, or export any kind of document, you should:
@@ -1658,345 +1716,499 @@ Example response: "I can help you create that document! Based on your request, t
 
 You should be proactive about offering to create documents when it would be helpful for organizing or presenting information, but always direct users to the proper artifact generation interface."""
 
-        system_prompt_text += artifact_instructions
+    system_prompt_text += artifact_instructions
 
-        # --- Check LLM availability and get config ---
-        llm_status = settings_service.check_character_llm_status(
-            current_user.id,
-            character.get('model_config'),
-            db
+    # --- Check LLM availability and get config ---
+    # An unseen or stale provider is probed with a blocking HTTP request
+    llm_status = await run_in_threadpool(
+        settings_service.check_character_llm_status,
+        current_user.id,
+        character.get('model_config'),
+        db
+    )
+
+    # If no LLM is available, return error
+    if not llm_status['available']:
+        return JSONResponse(
+            status_code=503,
+            content={"error": llm_status['message'], "needs_llm_setup": True}
         )
 
-        # If no LLM is available, return error
-        if not llm_status['available']:
+    # Track if using default LLM (for notification to user)
+    using_default_llm = llm_status.get('using_default', False)
+    llm_provider = llm_status.get('provider')
+    llm_model = llm_status.get('model')
+    llm_message = llm_status.get('message') if using_default_llm else None
+
+    # --- Enhanced RAG: Add Persistent Memory and World Info ---
+    try:
+        # Get model configuration - use system default if character's LLM is unavailable
+        if using_default_llm:
+            # Character's LLM unavailable, use system default config
+            model_config = settings_service.get_llm_config(current_user.id, db)
+        else:
+            # Use character's config (with fallback logic)
+            model_config = _resolve_model_config(character.get('model_config'), current_user.id, db)
+
+        # Check if LLM config has an error (no cloud provider configured)
+        if model_config.get('error'):
             return JSONResponse(
                 status_code=503,
-                content={"error": llm_status['message'], "needs_llm_setup": True}
+                content={"error": model_config['error'], "needs_llm_setup": True}
             )
 
-        # Track if using default LLM (for notification to user)
-        using_default_llm = llm_status.get('using_default', False)
-        llm_provider = llm_status.get('provider')
-        llm_model = llm_status.get('model')
-        llm_message = llm_status.get('message') if using_default_llm else None
+        model = model_config.get('model')
+        provider = model_config.get('provider')
 
-        # --- Enhanced RAG: Add Persistent Memory and World Info ---
-        try:
-            # Get model configuration - use system default if character's LLM is unavailable
-            if using_default_llm:
-                # Character's LLM unavailable, use system default config
-                model_config = settings_service.get_llm_config(current_user.id, db)
-            else:
-                # Use character's config (with fallback logic)
-                model_config = _resolve_model_config(character.get('model_config'), current_user.id, db)
-
-            # Check if LLM config has an error (no cloud provider configured)
-            if model_config.get('error'):
-                return JSONResponse(
-                    status_code=503,
-                    content={"error": model_config['error'], "needs_llm_setup": True}
-                )
+        # Calculate token budgets
+        budgets = token_service.calculate_budget(model, provider)
 
-            model = model_config.get('model')
-            provider = model_config.get('provider')
+        # Get persistent memory (always-injected context)
+        persistent_memory_context = persistent_memory_service.build_memory_context(
+            user_id=current_user.id,
+            character_id=request.character_id,
+            token_budget=budgets.get('persistent_memory', 800),
+            insertion_position='after_system_prompt',
+            format_style='sections',
+            db=db
+        )
 
-            # Calculate token budgets
-            budgets = token_service.calculate_budget(model, provider)
+        if persistent_memory_context:
+            system_prompt_text += f"\n\n{persistent_memory_context}"
+            logger.info(f"Added persistent memory: {token_service.count_tokens(persistent_memory_context)} tokens")
 
-            # Get persistent memory (always-injected context)
-            persistent_memory_context = persistent_memory_service.build_memory_context(
-                user_id=current_user.id,
-                character_id=request.character_id,
-                token_budget=budgets.get('persistent_memory', 800),
-                insertion_position='after_system_prompt',
-                format_style='sections',
-                db=db
-            )
-
-            if persistent_memory_context:
-                system_prompt_text += f"\n\n{persistent_memory_context}"
-                logger.info(f"Added persistent memory: {token_service.count_tokens(persistent_memory_context)} tokens")
+        # Get World Info entries triggered by the user message
+        triggered_world_info = world_info_service.find_triggered_entries(
+            text=request.message,
+            user_id=current_user.id,
+            character_id=request.character_id,
+            token_budget=budgets.get('world_info', 1600),
+            context={'message_count': len(enhanced_context.get('recent_interactions', []))},
+            db=db
+        )
 
-            # Get World Info entries triggered by the user message
-            triggered_world_info = world_info_service.find_triggered_entries(
-                text=request.message,
-                user_id=current_user.id,
-                character_id=request.character_id,
+        if triggered_world_info:
+            world_info_context = world_info_service.build_world_info_context(
+                triggered_entries=triggered_world_info,
                 token_budget=budgets.get('world_info', 1600),
-                context={'message_count': len(enhanced_context.get('recent_interactions', []))},
-                db=db
+                format_style='sections'
             )
+            system_prompt_text += f"\n\n{world_info_context}"
+            triggered_keywords = [kw for entry in triggered_world_info for kw in entry.get('matched_keywords', [])]
+            logger.info(f"Added World Info: {len(triggered_world_info)} entries, triggered by: {triggered_keywords[:5]}")
 
-            if triggered_world_info:
-                world_info_context = world_info_service.build_world_info_context(
-                    triggered_entries=triggered_world_info,
-                    token_budget=budgets.get('world_info', 1600),
-                    format_style='sections'
-                )
-                system_prompt_text += f"\n\n{world_info_context}"
-                triggered_keywords = [kw for entry in triggered_world_info for kw in entry.get('matched_keywords', [])]
-                logger.info(f"Added World Info: {len(triggered_world_info)} entries, triggered by: {triggered_keywords[:5]}")
+    except Exception as e:
+        logger.warning(f"Enhanced RAG (World Info/Memory) failed: {e}")
+    # --- End Enhanced RAG ---
+
+    messages.append({"role": "system", "content": system_prompt_text})
+
+    # Use Enhanced Context Service for intelligent message construction
+    if enhanced_context:
+        # Create enhanced prompt using the Enhanced Context Service
+        # NOTE: character_instructions not passed - they're already in the system message
+        enhanced_prompt = enhanced_context_service.format_enhanced_prompt(
+            user_message=request.message,
+            context=enhanced_context,
+            character_instructions=None,  # Already in system message, don't duplicate
+            show_reasoning=False  # Don't show reasoning in chat (save for artifacts)
+        )
+
+        # Add the enhanced prompt as the user message
+        messages.append({"role": "user", "content": enhanced_prompt})
+
+        logger.info(f"Using Enhanced Context Service for {character['name']}: "
+                   f"{len(enhanced_context.get('recent_interactions', []))} recent interactions, "
+                   f"{len(enhanced_context.get('semantic_context', []))} semantic memories, "
+                   f"{len(enhanced_context.get('document_chunks', []))} document chunks")
+
+    else:
+        # Fallback to simple conversation history and current message
+        try:
+            # Fallback conversation history from database
+            history = conversation_service.get_conversation_history(session_id, limit=8, db=db)
+            for msg in history:
+                messages.append({"role": msg.get("role", "user"), "content": msg.get("content", "")})
+
+            logger.info(f"Using fallback conversation history: {len(history)} messages for {character['name']}")
 
         except Exception as e:
-            logger.warning(f"Enhanced RAG (World Info/Memory) failed: {e}")
-        # --- End Enhanced RAG ---
-
-        messages.append({"role": "system", "content": system_prompt_text})
-
-        # Use Enhanced Context Service for intelligent message construction
-        if enhanced_context:
-            # Create enhanced prompt using the Enhanced Context Service
-            # NOTE: character_instructions not passed - they're already in the system message
-            enhanced_prompt = enhanced_context_service.format_enhanced_prompt(
-                user_message=request.message,
-                context=enhanced_context,
-                character_instructions=None,  # Already in system message, don't duplicate
-                show_reasoning=False  # Don't show reasoning in chat (save for artifacts)
-            )
+            logger.warning(f"Fallback conversation history failed: {e}")
 
-            # Add the enhanced prompt as the user message
-            messages.append({"role": "user", "content": enhanced_prompt})
+        # Add current user message
+        messages.append({"role": "user", "content": request.message})
 
-            logger.info(f"Using Enhanced Context Service for {character['name']}: "
-                       f"{len(enhanced_context.get('recent_interactions', []))} recent interactions, "
-                       f"{len(enhanced_context.get('semantic_context', []))} semantic memories, "
-                       f"{len(enhanced_context.get('document_chunks', []))} document chunks")
+    # model_config and provider were already set based on using_default_llm check above
 
-        else:
-            # Fallback to simple conversation history and current message
-            try:
-                # Fallback conversation history from database
-                history = conversation_service.get_conversation_history(session_id, limit=8, db=db)
-                for msg in history:
-                    messages.append({"role": msg.get("role", "user"), "content": msg.get("content", "")})
+    # Log privacy information
+    if provider == 'ollama':
+        logger.info(f"Using LOCAL Ollama for {character['name']} - FULLY PRIVATE")
+    else:
+        logger.info(f"Using CLOUD provider {provider} for {character['name']} - data may be processed externally")
+
+    return ChatTurn(
+        user_id=current_user.id,
+        session_id=session_id,
+        character=character,
+        character_name=character_name,
+        messages=messages,
+        model_config=model_config,
+        enhanced_context=enhanced_context,
+        reasoning_chain=reasoning_chain,
+        document_context_used=document_context_used,
+        sources=sources,
+        context_summary=context_summary,
+        using_default_llm=using_default_llm,
+        llm_provider=llm_provider,
+        llm_model=llm_model,
+        llm_message=llm_message
+    )
 
-                logger.info(f"Using fallback conversation history: {len(history)} messages for {character['name']}")
 
-            except Exception as e:
-                logger.warning(f"Fallback conversation history failed: {e}")
+def _build_tracking_cards(sidebar_extractions: Optional[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Build interactive tracking cards from sidebar extractions.
 
-            # Add current user message
-            messages.append({"role": "user", "content": request.message})
+    Returns:
+        List of cards, or None if there is nothing to show
+    """
+    if not sidebar_extractions:
+        return None
+
+    tracking_cards = []
+    for goal in sidebar_extractions.get('goals', []):
+        progress = 0
+        if goal.get('target_value') and goal.get('current_value'):
+            progress = min(100, int((goal['current_value'] / goal['target_value']) * 100))
+        # Detect completion-based goals (daily check-in style)
+        unit = (goal.get('unit') or '').lower()
+        completion_units = ['days', 'day', 'times', 'sessions', 'workouts', 'entries', 'essays']
+        goal_type = 'completion' if unit in completion_units else 'numeric'
+        tracking_cards.append({
+            'type': 'goal',
+            'id': goal.get('id'),
+            'title': goal.get('title', ''),
+            'target_value': goal.get('target_value'),
+            'unit': goal.get('unit'),
+            'current_value': goal.get('current_value', 0),
+            'progress': progress,
+            'goal_type': goal_type
+        })
+    for habit in sidebar_extractions.get('habits', []):
+        tracking_cards.append({
+            'type': 'habit',
+            'id': habit.get('id'),
+            'title': habit.get('title', ''),
+            'frequency': habit.get('frequency', 'daily'),
+            'streak': habit.get('current_streak', 0),
+            'completed_today': habit.get('completed_today', False)
+        })
+    for todo in sidebar_extractions.get('todos', []):
+        tracking_cards.append({
+            'type': 'todo',
+            'id': todo.get('id'),
+            'text': todo.get('text', ''),
+            'priority': todo.get('priority', 2),
+            'is_completed': todo.get('is_completed', False)
+        })
 
-        # model_config and provider were already set based on using_default_llm check above
+    # Don't return empty list
+    return tracking_cards or None
 
-        # Log privacy information
-        if provider == 'ollama':
-            logger.info(f"Using LOCAL Ollama for {character['name']} - FULLY PRIVATE")
-        else:
-            logger.info(f"Using CLOUD provider {provider} for {character['name']} - data may be processed externally")
 
-        response = llm_client.generate_response_with_config(
-            messages=messages,
-            system_prompt=None,  # System prompt already included in messages
-            model_config=model_config
-        )
+async def _complete_chat_turn(turn: ChatTurn, request: ChatRequest, response: str, db: Session) -> ChatResponse:
+    """Persist a generated reply and run the post-turn hooks (title, facts, calendar, usage).
 
-        # Clean any dialogue script formatting from the response
-        response = _clean_dialogue_formatting(response, character_name)
+    Args:
+        turn: The prepared chat turn
+        request: Original chat request
+        response: Raw LLM response text
+        db: Database session
 
-        # Save messages to database
-        conversation_service.save_message(session_id, "user", request.message, db)
-        conversation_service.save_message(session_id, "assistant", response, db)
+    Returns:
+        The ChatResponse for the client
+    """
+    user_id = turn.user_id
+    session_id = turn.session_id
+    character = turn.character
+    character_name = turn.character_name
+    model_config = turn.model_config
+    enhanced_context = turn.enhanced_context
+    reasoning_chain = turn.reasoning_chain
+    document_context_used = turn.document_context_used
+    sources = turn.sources
+    context_summary = turn.context_summary
+    using_default_llm = turn.using_default_llm
+    llm_provider = turn.llm_provider
+    llm_model = turn.llm_model
+    llm_message = turn.llm_message
+
+    # Clean any dialogue script formatting from the response
+    response = _clean_dialogue_formatting(response, character_name)
+
+    # Save messages to database
+    conversation_service.save_message(session_id, "user", request.message, db)
+    assistant_message = conversation_service.save_message(session_id, "assistant", response, db)
+
+    # Generate title for new conversations (after first exchange)
+    try:
+        session_data = conversation_service.get_session(session_id, db)
+        if session_data:
+            conv_id = session_data.get("conversation_id")
+            if conv_id:
+                # Check if conversation needs a title (only on first exchange)
+                conv = db.query(Conversation).filter(Conversation.id == conv_id).first()
+                msg_count = db.query(Message).filter(Message.conversation_id == conv_id).count()
+                logger.warning(f"[TITLE DEBUG] conv_id={conv_id}, msg_count={msg_count}, title='{conv.title if conv else None}'")
+                # Generate title if this is the first exchange (2 messages) and no custom title set
+                if conv and msg_count == 2 and (not conv.title or conv.title == "New conversation" or conv.title.startswith("Session with")):
+                    # Use character's model config for title generation
+                    logger.warning(f"[TITLE DEBUG] Triggering async title generation for conversation {conv_id}")
+                    conversation_service.generate_title_async(conv_id, user_id)
+    except Exception as e:
+        logger.warning(f"Title generation trigger failed: {e}")
 
-        # Generate title for new conversations (after first exchange)
-        try:
-            session_data = conversation_service.get_session(session_id, db)
-            if session_data:
-                conv_id = session_data.get("conversation_id")
-                if conv_id:
-                    # Check if conversation needs a title (only on first exchange)
-                    conv = db.query(Conversation).filter(Conversation.id == conv_id).first()
-                    msg_count = db.query(Message).filter(Message.conversation_id == conv_id).count()
-                    logger.warning(f"[TITLE DEBUG] conv_id={conv_id}, msg_count={msg_count}, title='{conv.title if conv else None}'")
-                    # Generate title if this is the first exchange (2 messages) and no custom title set
-                    if conv and msg_count == 2 and (not conv.title or conv.title == "New conversation" or conv.title.startswith("Session with")):
-                        # Use character's model config for title generation
-                        logger.warning(f"[TITLE DEBUG] Triggering async title generation for conversation {conv_id}")
-                        conversation_service.generate_title_async(conv_id, model_config)
-        except Exception as e:
-            logger.warning(f"Title generation trigger failed: {e}")
+    # Fact extraction hook - automatically learn facts from conversation
+    try:
+        # Only extract from substantive exchanges (message > 20 chars)
+        if len(request.message) >= 20:
+            # Durable background job (fact deletion check, then extraction);
+            # exchanges queued while one is pending for this conversation are coalesced
+            job_queue.enqueue(
+                'fact_extraction',
+                {
+                    'user_id': user_id,
+                    'character_id': request.character_id,
+                    'exchanges': [{
+                        'user_message': request.message,
+                        'assistant_response': response,
+                        'conversation_id': session_id
+                    }]
+                },
+                user_id=user_id,
+                coalesce_key=f"facts:{user_id}:{request.character_id}:{session_id}"
+            )
+            logger.debug(f"Queued fact extraction for conversation {session_id}")
+    except Exception as e:
+        # Don't fail the chat if fact extraction fails
+        logger.warning(f"Fact extraction hook failed: {e}")
 
-        # Fact extraction hook - automatically learn facts from conversation
-        try:
-            # Only extract from substantive exchanges (message > 20 chars)
-            if len(request.message) >= 20:
-                import asyncio
-
-                # Create a background task with its own database session
-                # to avoid using the request's session which will be closed
-                async def background_fact_extraction(
-                    user_message: str,
-                    assistant_response: str,
-                    user_id: int,
-                    character_id: str,
-                    conversation_id: str
-                ):
-                    """Run fact deletion check and extraction with a dedicated database session."""
-                    from ..database.config import db_config
-                    bg_db = db_config.get_session()
-                    try:
-                        # First, check if user wants to delete/correct a fact
-                        deleted_facts = await fact_extraction_service.delete_facts_from_message(
-                            user_message=user_message,
-                            user_id=user_id,
-                            character_id=character_id,
-                            db=bg_db
-                        )
-                        if deleted_facts:
-                            logger.info(f"Deleted {len(deleted_facts)} facts via chat correction")
-
-                        # Then extract new facts
-                        await fact_extraction_service.extract_facts_from_message(
-                            user_message=user_message,
-                            assistant_response=assistant_response,
-                            user_id=user_id,
-                            character_id=character_id,
-                            conversation_id=conversation_id,
-                            message_id=None,
-                            db=bg_db
-                        )
-                    except Exception as ex:
-                        logger.warning(f"Background fact extraction failed: {ex}")
-                    finally:
-                        bg_db.close()
-
-                # Run fact extraction in background (non-blocking)
-                asyncio.create_task(
-                    background_fact_extraction(
-                        user_message=request.message,
-                        assistant_response=response,
-                        user_id=current_user.id,
-                        character_id=request.character_id,
-                        conversation_id=session_id
-                    )
+    # Calendar extraction hook - ONLY calendar events (todos/goals/habits/life areas are manual-only).
+    # Extraction is a second LLM round trip, so it runs as a background job; the
+    # client collects the result via /api/chat/extractions/{pending_extractions}.
+    pending_extractions = None
+    try:
+        if len(request.message) >= 10:
+            from .core.sidebar_extraction_service import sidebar_extraction_service
+
+            # Only check for calendar extraction
+            if sidebar_extraction_service.should_extract_calendar_events(request.message):
+                conversation_context = []
+                if enhanced_context:
+                    recent = enhanced_context.get('recent_interactions', [])
+                    conversation_context = [
+                        {'role': msg.get('role', 'user'), 'content': msg.get('content', '')}
+                        for msg in recent[-6:]
+                    ]
+
+                job_id = job_queue.enqueue(
+                    'sidebar_extraction',
+                    {
+                        'user_id': user_id,
+                        'character_id': request.character_id,
+                        'messages': [{
+                            'message': request.message,
+                            'conversation_context': conversation_context
+                        }]
+                    },
+                    user_id=user_id,
+                    coalesce_key=f"sidebar:{user_id}:{request.character_id}"
                 )
-                logger.debug(f"Triggered fact extraction for conversation {session_id}")
-        except Exception as e:
-            # Don't fail the chat if fact extraction fails
-            logger.warning(f"Fact extraction hook failed: {e}")
+                pending_extractions = str(job_id)
+                logger.info(f"Queued calendar extraction (job {job_id})")
+    except Exception as e:
+        logger.warning(f"Calendar extraction failed: {e}")
 
-        # Calendar extraction hook - ONLY calendar events (todos/goals/habits/life areas are manual-only)
-        sidebar_extractions = None
+    # Log reasoning context for debugging (don't save to conversation)
+    if reasoning_chain:
         try:
-            if len(request.message) >= 10:
-                from .core.sidebar_extraction_service import sidebar_extraction_service
-
-                # Only check for calendar extraction
-                if sidebar_extraction_service.should_extract_calendar_events(request.message):
-                    conversation_context = []
-                    if enhanced_context:
-                        recent = enhanced_context.get('recent_interactions', [])
-                        conversation_context = [
-                            {'role': msg.get('role', 'user'), 'content': msg.get('content', '')}
-                            for msg in recent[-6:]
-                        ]
-
-                    calendar_events = await sidebar_extraction_service.extract_calendar_events(
-                        message=request.message,
-                        user_id=current_user.id,
-                        character_id=request.character_id,
-                        db=db,
-                        conversation_context=conversation_context
-                    )
-
-                    if calendar_events:
-                        sidebar_extractions = {'calendar_events': calendar_events}
-                        logger.info(f"Created {len(calendar_events)} calendar event(s)")
+            reasoning_summary = " → ".join([
+                f"{step['step']}: {step['thought'][:50]}"
+                for step in reasoning_chain[-3:]
+            ])
+            logger.debug(f"Reasoning chain for {character['name']}: {reasoning_summary}")
         except Exception as e:
-            logger.warning(f"Calendar extraction failed: {e}")
+            logger.warning(f"Failed to log reasoning chain: {e}")
+    
+    # Update character usage
+    character_manager.update_character(request.character_id, {
+        'last_used': datetime.now(timezone.utc).isoformat(),
+        'conversation_count': character.get('conversation_count', 0) + 1,
+        'total_messages': character.get('total_messages', 0) + 1
+    })
+    
+    logger.info(f"Generated response for {character['name']}: {response[:100]}...")
+
+    return ChatResponse(
+        response=response,
+        character_name=character['name'],
+        character_id=character['id'],
+        session_id=session_id,
+        character_version=1,  # Simplified: no version tracking
+        migration_available=False,
+        document_context_used=document_context_used,
+        sources=sources,
+        context_summary=context_summary if document_context_used else None,
+        context_summary_full=enhanced_context.get('context_summary', '') if document_context_used else None,
+        # LLM info for frontend notification
+        llm_provider=llm_provider,
+        llm_model=llm_model,
+        using_default_llm=using_default_llm,
+        llm_message=llm_message,
+        # Sidebar extractions still running in the background
+        pending_extractions=pending_extractions,
+        # Web search results for clickable sources
+        web_search_results=enhanced_context.get('web_search_results'),
+        # Persisted assistant message
+        message_id=assistant_message.id if assistant_message else None
+    )
 
-        # Log reasoning context for debugging (don't save to conversation)
-        if reasoning_chain:
-            try:
-                reasoning_summary = " → ".join([
-                    f"{step['step']}: {step['thought'][:50]}"
-                    for step in reasoning_chain[-3:]
-                ])
-                logger.debug(f"Reasoning chain for {character['name']}: {reasoning_summary}")
-            except Exception as e:
-                logger.warning(f"Failed to log reasoning chain: {e}")
-        
-        # Update character usage
-        character_manager.update_character(request.character_id, {
-            'last_used': datetime.now(timezone.utc).isoformat(),
-            'conversation_count': character.get('conversation_count', 0) + 1,
-            'total_messages': character.get('total_messages', 0) + 1
-        })
-        
-        logger.info(f"Generated response for {character['name']}: {response[:100]}...")
 
-        # Build tracking cards from sidebar extractions
-        tracking_cards = None
-        if sidebar_extractions:
-            tracking_cards = []
-            for goal in sidebar_extractions.get('goals', []):
-                progress = 0
-                if goal.get('target_value') and goal.get('current_value'):
-                    progress = min(100, int((goal['current_value'] / goal['target_value']) * 100))
-                # Detect completion-based goals (daily check-in style)
-                unit = (goal.get('unit') or '').lower()
-                completion_units = ['days', 'day', 'times', 'sessions', 'workouts', 'entries', 'essays']
-                goal_type = 'completion' if unit in completion_units else 'numeric'
-                tracking_cards.append({
-                    'type': 'goal',
-                    'id': goal.get('id'),
-                    'title': goal.get('title', ''),
-                    'target_value': goal.get('target_value'),
-                    'unit': goal.get('unit'),
-                    'current_value': goal.get('current_value', 0),
-                    'progress': progress,
-                    'goal_type': goal_type
-                })
-            for habit in sidebar_extractions.get('habits', []):
-                tracking_cards.append({
-                    'type': 'habit',
-                    'id': habit.get('id'),
-                    'title': habit.get('title', ''),
-                    'frequency': habit.get('frequency', 'daily'),
-                    'streak': habit.get('current_streak', 0),
-                    'completed_today': habit.get('completed_today', False)
-                })
-            for todo in sidebar_extractions.get('todos', []):
-                tracking_cards.append({
-                    'type': 'todo',
-                    'id': todo.get('id'),
-                    'text': todo.get('text', ''),
-                    'priority': todo.get('priority', 2),
-                    'is_completed': todo.get('is_completed', False)
-                })
-            # Don't return empty list
-            if not tracking_cards:
-                tracking_cards = None
-
-        return ChatResponse(
-            response=response,
-            character_name=character['name'],
-            character_id=character['id'],
-            session_id=session_id,
-            character_version=1,  # Simplified: no version tracking
-            migration_available=False,
-            document_context_used=document_context_used,
-            sources=sources,
-            context_summary=context_summary if document_context_used else None,
-            context_summary_full=enhanced_context.get('context_summary', '') if document_context_used else None,
-            # LLM info for frontend notification
-            llm_provider=llm_provider,
-            llm_model=llm_model,
-            using_default_llm=using_default_llm,
-            llm_message=llm_message,
-            # Sidebar document extractions
-            sidebar_extractions=sidebar_extractions,
-            # Interactive tracking cards
-            tracking_cards=tracking_cards,
-            # Web search results for clickable sources
-            web_search_results=enhanced_context.get('web_search_results')
+@app.post("/api/chat")
+async def chat(request: ChatRequest, request_obj: Request, db = Depends(get_db)):
+    """Send a message to a character and get a response with conversation memory."""
+    # DEBUG: Log incoming request
+    logger.warning(f"[CHAT DEBUG] Received request: message='{request.message[:30]}...', search={request.search}, use_documents={request.use_documents}")
+
+    try:
+        turn = await _prepare_chat_turn(request, request_obj, db)
+        if isinstance(turn, JSONResponse):
+            return turn
+
+        response = await llm_client.agenerate_response_with_config(
+            messages=turn.messages,
+            system_prompt=None,  # System prompt already included in messages
+            model_config=turn.model_config
         )
-        
+
+        return await _complete_chat_turn(turn, request, response, db)
+
     except Exception as e:
         logger.error(f"Error in chat: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+
+# Result keys of a sidebar extraction job that carry extracted items
+SIDEBAR_EXTRACTION_KEYS = ('calendar_events', 'todos', 'goals', 'habits', 'life_areas')
+
+
+@app.get("/api/chat/extractions/{token}")
+async def get_chat_extractions(token: str, request_obj: Request, db = Depends(get_db)):
+    """Collect the result of a deferred sidebar extraction.
+
+    Returns:
+        - status: pending, running, succeeded or failed
+        - sidebar_extractions: extracted items once succeeded (None if nothing was found)
+        - tracking_cards: interactive cards for the extracted items, if any
+        - failed_messages: number of messages whose extraction failed
+    """
+    current_user = await get_current_user_from_session(request_obj, db)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "Authentication required"})
+
+    job = job_queue.get_job(int(token), db=db) if token.isdigit() else None
+    if not job or job['job_type'] != 'sidebar_extraction' or job['user_id'] != current_user.id:
+        return JSONResponse(status_code=404, content={"error": "Extraction not found"})
+
+    sidebar_extractions = None
+    failed_messages = 0
+    if job['status'] == 'succeeded':
+        result = job['result'] or {}
+        sidebar_extractions = {k: result[k] for k in SIDEBAR_EXTRACTION_KEYS if result.get(k)} or None
+        failed_messages = result.get('failed', 0)
+
+    return {
+        "status": job['status'],
+        "sidebar_extractions": sidebar_extractions,
+        "tracking_cards": _build_tracking_cards(sidebar_extractions),
+        "failed_messages": failed_messages
+    }
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, request_obj: Request, db = Depends(get_db)):
+    """Stream a chat reply as server-sent events.
+
+    Events, in order:
+        - context: session and context metadata (sources, web results, LLM info)
+        - token: {"delta": str} for each chunk of text as the provider produces it
+        - done: the full ChatResponse payload, including the persisted message_id
+        - error: {"error": str} if generation fails (no done event follows)
+
+    Persistence, dialogue cleanup and post-turn hooks run once the stream completes.
+    """
+    logger.info(f"[CHAT STREAM] Received request: message='{request.message[:30]}...', search={request.search}")
+
+    try:
+        turn = await _prepare_chat_turn(request, request_obj, db)
+    except Exception as e:
+        logger.error(f"Error preparing chat stream: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    if isinstance(turn, JSONResponse):
+        return turn
+
+    async def event_stream():
+        yield _sse_event("context", {
+            "session_id": turn.session_id,
+            "character_id": turn.character['id'],
+            "character_name": turn.character['name'],
+            "document_context_used": turn.document_context_used,
+            "sources": turn.sources,
+            "context_summary": turn.context_summary if turn.document_context_used else None,
+            "web_search_results": turn.enhanced_context.get('web_search_results'),
+            "llm_provider": turn.llm_provider,
+            "llm_model": turn.llm_model,
+            "using_default_llm": turn.using_default_llm,
+            "llm_message": turn.llm_message
+        })
+
+        parts: List[str] = []
+        try:
+            async for delta in llm_client.astream_response_with_config(
+                messages=turn.messages,
+                system_prompt=None,  # System prompt already included in messages
+                model_config=turn.model_config
+            ):
+                parts.append(delta)
+                yield _sse_event("token", {"delta": delta})
+        except LLMError as e:
+            yield _sse_event("error", {"error": str(e)})
+            return
+
+        # Finish the turn on a dedicated session rather than relying on the
+        # request-scoped session staying open for the whole streaming body
+        from ..database.config import db_config
+        stream_db = db_config.get_session()
+        try:
+            chat_response = await _complete_chat_turn(turn, request, "".join(parts), stream_db)
+            yield _sse_event("done", chat_response.dict())
+        except Exception as e:
+            logger.error(f"Error completing chat stream: {e}")
+            yield _sse_event("error", {"error": "Failed to save the response. Please try again."})
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/characters/{character_id}/greeting")
 async def get_personalized_greeting(character_id: str, request: Request, db = Depends(get_db)):
     """Generate a personalized greeting from a character based on user profile and facts.
@@ -2312,7 +2524,9 @@ async def chat_with_document(
                 # Include the just-uploaded document in forced context
                 force_doc_ids = [uploaded_document['id']] if uploaded_document else None
 
-                rag_context = enhanced_context_service.get_enhanced_context(
+                # Source fetches block, so run them off the event loop
+                rag_context = await run_in_threadpool(
+                    enhanced_context_service.get_enhanced_context,
                     user_message=enhanced_message,
                     user_id=current_user.id,
                     conversation_id=None,
@@ -2466,7 +2680,7 @@ You should be proactive about offering to create documents when it would be help
 
         # Generate response
         system_prompt_for_llm = character.get('system_prompt') or character.get('persona', 'You are a helpful AI assistant.')
-        response = llm_client.generate_response_with_config(
+        response = await llm_client.agenerate_response_with_config(
             messages=messages,
             system_prompt=system_prompt_for_llm,
             model_config=model_config
@@ -2485,7 +2699,7 @@ You should be proactive about offering to create documents when it would be help
                     conv = db.query(Conversation).filter(Conversation.id == conv_id).first()
                     msg_count = db.query(Message).filter(Message.conversation_id == conv_id).count()
                     if conv and msg_count == 2 and (not conv.title or conv.title == "New conversation" or conv.title.startswith("Session with")):
-                        conversation_service.generate_title_async(conv_id, model_config)
+                        conversation_service.generate_title_async(conv_id, current_user.id)
         except Exception as e:
             logger.warning(f"Title generation trigger failed: {e}")
 
@@ -2579,7 +2793,7 @@ The output should be the system prompt ONLY - no preamble, no "Here is...", no e
 
 Write in second person ("You are..."). Be specific and actionable. Aim for 150-400 words."""
 
-    response = llm_client.generate_response_with_config(
+    response = await llm_client.agenerate_response_with_config(
         messages=[{"role": "user", "content": prompt}],
         system_prompt="You are an expert at writing detailed, effective system prompts for AI personas. You create character cards that bring out the best in AI assistants - making them engaging, knowledgeable, and true to their intended role.",
         model_config=model_config
@@ -2633,7 +2847,7 @@ IMPORTANT: Only use the following traits: {', '.join(FIXED_TRAITS)}. Only use th
 Backstory: {request.backstory}
 Category: {request.category or ''}
 """
-    response = llm_client.generate_response_with_config(
+    response = await llm_client.agenerate_response_with_config(
         messages=[{"role": "user", "content": prompt}],
         system_prompt="You are an expert at analyzing character backstories and suggesting realistic, balanced personality traits and communication styles in JSON format.",
         model_config=model_config
@@ -2749,12 +2963,15 @@ async def get_llm_status(request: Request, db = Depends(get_db)):
         - model: str - configured model name
         - message: str - human-readable status message
         - needs_setup: bool - whether user needs to configure LLM settings
+        - providers: list - cached health of every known provider (from the
+          provider health registry; no provider is probed by this request)
     """
     current_user = await get_current_user_from_session(request, db)
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    status = settings_service.check_llm_status(current_user.id, db)
+    status = await run_in_threadpool(settings_service.check_llm_status, current_user.id, db)
+    status['providers'] = provider_health.snapshot()
     return status
 
 @app.get("/api/characters/{character_id}/llm-status")
@@ -2780,7 +2997,8 @@ async def get_character_llm_status(character_id: str, request: Request, db = Dep
         raise HTTPException(status_code=404, detail="Character not found")
 
     character_model_config = character.get('model_config')
-    status = settings_service.check_character_llm_status(
+    status = await run_in_threadpool(
+        settings_service.check_character_llm_status,
         current_user.id,
         character_model_config,
         db
@@ -13,6 +13,7 @@ from ...database.models import User, Document
 from ..core.document_service import document_service
 from ..core.enhanced_context_service import enhanced_context_service
 from ..core.embedding_service import embedding_service
+from ..core.job_queue import job_queue
 from ..core.clerk_auth import get_current_user_from_session
 from fastapi import Request
 
@@ -437,23 +438,37 @@ async def get_embedding_stats(
             detail=str(e)
         )
 
-@router.post("/admin/rebuild-index")
+@router.get("/stats/context-assembly")
+async def get_context_assembly_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """Get context assembly statistics (per-source latency, timeouts, late results)."""
+    try:
+        return enhanced_context_service.get_stats()
+
+    except Exception as e:
+        logger.error(f"Error in context assembly stats endpoint: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@router.post("/admin/rebuild-index", status_code=status.HTTP_202_ACCEPTED)
 async def rebuild_embedding_index(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Rebuild the FAISS embedding index (admin function)."""
+    """Start a background rebuild of the FAISS embedding index (admin function).
+
+    Searches keep using the current index until the rebuilt one is swapped in.
+    Poll /admin/rebuild-index/status for progress.
+    """
     try:
         # Note: In a real system, this should be protected with admin permissions
-        success = embedding_service.rebuild_index(db=db)
-        
-        if success:
-            return {"message": "Embedding index rebuilt successfully"}
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to rebuild embedding index"
-            )
+        job_id = job_queue.enqueue(
+            'index_rebuild', {}, user_id=current_user.id, coalesce_key='index_rebuild', db=db
+        )
+        return {"message": "Embedding index rebuild started", "job_id": job_id}
             
     except Exception as e:
         logger.error(f"Error in rebuild index endpoint: {e}")
@@ -462,6 +477,31 @@ async def rebuild_embedding_index(
             detail=str(e)
         )
 
+@router.get("/admin/rebuild-index/status")
+async def get_rebuild_index_status(
+    job_id: Optional[int] = Query(None, description="Job ID returned when the rebuild was started"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get progress of the current or last embedding index rebuild."""
+    try:
+        result = {"rebuild": embedding_service.get_rebuild_status()}
+        if job_id is not None:
+            job = job_queue.get_job(job_id, db=db)
+            if not job or job['job_type'] != 'index_rebuild':
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rebuild job not found")
+            result["job"] = job
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in rebuild index status endpoint: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
 @router.get("/formats/supported")
 async def get_supported_formats():
     """Get list of supported document formats."""
@@ -0,0 +1,32 @@
+"""
+Background job API routes.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+
+from ...database.config import get_db
+from ..core.clerk_auth import get_current_user_from_session
+from ..core.job_queue import job_queue
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("/admin/stats")
+async def get_job_queue_stats(
+    window_minutes: int = 60,
+    request: Request = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Queue depth and job latency per job type (admin function).
+
+    Args:
+        window_minutes: Window for latency figures over recently finished jobs
+    """
+    # Note: In a real system, this should be protected with admin permissions
+    current_user = await get_current_user_from_session(request, db)
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    return job_queue.get_stats(db=db, window_minutes=window_minutes)
@@ -0,0 +1,178 @@
+"""
+Vector-search sidecar process.
+
+Owns the embedding model and the FAISS partitions for every API worker on
+the host. Workers reach it through RemoteEmbeddingService
+(core/vector_client.py) when VECTOR_SERVICE_URL is set, so the model is
+loaded once instead of once per worker, and concurrent requests from all
+workers are encoded and searched in one place.
+
+Usage:
+    python -m miachat.api.vector_service --socket /tmp/minouchat-vectors.sock
+    python -m miachat.api.vector_service --host 127.0.0.1 --port 8765
+
+Then start the API workers with
+VECTOR_SERVICE_URL=unix:///tmp/minouchat-vectors.sock (or http://127.0.0.1:8765).
+"""
+
+import argparse
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Depends, FastAPI
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .core.vector_client import encode_array
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingsRequest(BaseModel):
+    texts: List[str]
+    cache: bool = True
+
+
+class ChunkPayload(BaseModel):
+    id: str
+    text_content: str
+
+
+class AddEmbeddingsRequest(BaseModel):
+    chunks: List[ChunkPayload]
+
+
+class SearchRequest(BaseModel):
+    query: str
+    user_id: Optional[int] = None
+    top_k: int = 5
+    similarity_threshold: float = 0.3
+
+
+def create_app(service, session_factory: Optional[Callable[[], Session]] = None) -> FastAPI:
+    """Create the sidecar application around an in-process embedding service.
+
+    Args:
+        service: EmbeddingService that does the work
+        session_factory: Database session factory; defaults to the application's
+
+    Returns:
+        FastAPI application
+    """
+    if session_factory is None:
+        from ..database.config import db_config
+        session_factory = db_config.SessionLocal
+
+    app = FastAPI(title="MinouChat vector service")
+
+    def get_session():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.on_event("startup")
+    async def startup_event():
+        service.start()
+        service.warm_up()
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        # Write buffered access counts through this app's database before stopping
+        db = session_factory()
+        try:
+            service.flush_access_counts(db)
+        finally:
+            db.close()
+        service.stop()
+
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        return {'status': 'ok'}
+
+    @app.get("/ready")
+    async def ready() -> Dict[str, Any]:
+        return service.get_readiness()
+
+    @app.post("/embeddings")
+    async def create_embeddings(request: EmbeddingsRequest) -> Dict[str, Any]:
+        embeddings = await run_in_threadpool(service.create_embeddings, request.texts, request.cache)
+        return encode_array(embeddings)
+
+    @app.post("/documents/{document_id}/embeddings")
+    async def add_document_embeddings(document_id: str, request: AddEmbeddingsRequest,
+                                      db: Session = Depends(get_session)) -> Dict[str, Any]:
+        chunks = [chunk.dict() for chunk in request.chunks]
+        ok = await run_in_threadpool(service.add_document_embeddings, document_id, chunks, db)
+        return {'ok': ok}
+
+    @app.delete("/documents/{document_id}/embeddings")
+    async def remove_document_embeddings(document_id: str, db: Session = Depends(get_session)) -> Dict[str, Any]:
+        ok = await run_in_threadpool(service.remove_document_embeddings, document_id, db)
+        return {'ok': ok}
+
+    @app.post("/search")
+    async def search(request: SearchRequest, db: Session = Depends(get_session)) -> Dict[str, Any]:
+        results = await run_in_threadpool(
+            service.search_similar_chunks,
+            request.query, request.user_id, request.top_k, request.similarity_threshold, db
+        )
+        for result in results:
+            result['similarity_score'] = float(result['similarity_score'])
+        return {'results': results}
+
+    @app.post("/rebuild")
+    async def rebuild(db: Session = Depends(get_session)) -> Dict[str, Any]:
+        ok = await run_in_threadpool(service.rebuild_index, db)
+        return {'ok': ok}
+
+    @app.get("/rebuild/status")
+    async def rebuild_status() -> Dict[str, Any]:
+        return service.get_rebuild_status()
+
+    @app.post("/flush")
+    async def flush(db: Session = Depends(get_session)) -> Dict[str, Any]:
+        flushed = await run_in_threadpool(service.flush_access_counts, db)
+        return {'flushed': flushed}
+
+    @app.post("/checkpoint")
+    async def checkpoint() -> Dict[str, Any]:
+        checkpointed = await run_in_threadpool(service.checkpoint_partitions)
+        return {'checkpointed': checkpointed}
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        return await run_in_threadpool(service.get_stats)
+
+    return app
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="MinouChat vector-search sidecar")
+    parser.add_argument('--socket', help="Unix socket path to listen on")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    # The sidecar itself always embeds and searches in-process
+    os.environ.pop('VECTOR_SERVICE_URL', None)
+
+    import uvicorn
+    from .core.embedding_service import embedding_service
+
+    logging.basicConfig(level=logging.INFO)
+    app = create_app(embedding_service)
+    if args.socket:
+        uvicorn.run(app, uds=args.socket)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
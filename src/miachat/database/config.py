@@ -2,6 +2,7 @@
 Database configuration and connection management.
 """
 
+import logging
 import os
 from pathlib import Path
 from typing import Optional
@@ -11,6 +12,8 @@ from sqlalchemy.pool import QueuePool
 
 from .models import Base
 
+logger = logging.getLogger(__name__)
+
 class DatabaseConfig:
     """Database configuration manager."""
     
@@ -81,7 +84,9 @@ class DatabaseConfig:
 
     def _run_migrations(self):
         """Run any pending database migrations."""
-        from sqlalchemy import text, inspect
+        from sqlalchemy import text, inspect, LargeBinary
+        from .embedding_codec import migrate_json_embeddings
+        from .fulltext import ensure_fulltext_index
 
         with self.get_session() as session:
             inspector = inspect(self.engine)
@@ -99,6 +104,28 @@ class DatabaseConfig:
                         # Column may already exist or other error - ignore
                         session.rollback()
 
+            # Migration: Convert JSON-text embeddings to the binary format
+            for table in ('document_chunks', 'backstory_chunks'):
+                if table not in inspector.get_table_names():
+                    continue
+                try:
+                    if self.engine.dialect.name != 'sqlite':
+                        column = next(c for c in inspector.get_columns(table) if c['name'] == 'embedding_vector')
+                        if not isinstance(column['type'], LargeBinary):
+                            session.execute(text(
+                                f"ALTER TABLE {table} ALTER COLUMN embedding_vector "
+                                f"TYPE BYTEA USING convert_to(embedding_vector, 'UTF8')"
+                            ))
+                            session.commit()
+                    migrate_json_embeddings(session, table)
+                except Exception as e:
+                    # Unconverted rows stay readable; retry on next startup
+                    session.rollback()
+                    logger.warning(f"Embedding storage migration for {table} failed: {e}")
+
+        # Migration: Full-text index over document chunks (SQLite only)
+        ensure_fulltext_index(self.engine)
+
 # Global database configuration instance
 db_config = DatabaseConfig()
 
@@ -0,0 +1,178 @@
+"""
+Binary storage format for embedding vectors.
+
+Embeddings are stored as a small header followed by the raw little-endian
+vector bytes, so readers can wrap them with np.frombuffer instead of parsing
+JSON. A 384-dim float32 vector takes ~1.5KB (float16: ~0.8KB) instead of
+the 8-10KB of its JSON text.
+
+Layout: b'EV' + version byte + dtype code (b'f' float32, b'e' float16) + data
+
+Rows written before the binary format (JSON text) are still readable and are
+converted in batches by migrate_json_embeddings() at startup.
+
+Configuration (environment variables):
+    - EMBEDDING_STORAGE_DTYPE: float32 or float16 (default: float32)
+"""
+
+import json
+import logging
+import os
+from typing import Iterable, Optional, Union
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'EV'
+VERSION = 1
+HEADER_SIZE = 4
+
+_DTYPE_CODES = {
+    'float32': b'f',
+    'float16': b'e',
+}
+_CODE_DTYPES = {
+    ord(b'f'): np.dtype('<f4'),
+    ord(b'e'): np.dtype('<f2'),
+}
+
+
+def storage_dtype() -> str:
+    """Configured storage dtype for new embeddings."""
+    dtype = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32').lower()
+    if dtype not in _DTYPE_CODES:
+        logger.warning(f"Unknown EMBEDDING_STORAGE_DTYPE '{dtype}', using float32")
+        return 'float32'
+    return dtype
+
+
+def encode_embedding(vector: Union[np.ndarray, Iterable[float]], dtype: Optional[str] = None) -> bytes:
+    """Encode a vector for storage.
+
+    Args:
+        vector: Embedding vector
+        dtype: 'float32' or 'float16'; defaults to EMBEDDING_STORAGE_DTYPE
+
+    Returns:
+        Header plus raw vector bytes
+    """
+    dtype = dtype or storage_dtype()
+    array = np.asarray(vector, dtype=_CODE_DTYPES[ord(_DTYPE_CODES[dtype])]).ravel()
+    return MAGIC + bytes([VERSION]) + _DTYPE_CODES[dtype] + array.tobytes()
+
+
+def decode_embedding(value: Union[bytes, memoryview, str, None]) -> Optional[np.ndarray]:
+    """Decode a stored embedding.
+
+    Binary values are returned as a read-only np.frombuffer view over the
+    stored bytes (no copy), in the dtype they were stored in. Legacy JSON
+    text is parsed into a new float32 array.
+
+    Args:
+        value: Column value (binary, or JSON text from before the migration)
+
+    Returns:
+        1-D vector, or None if the value is empty or malformed
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, str):
+        return _decode_json(value)
+
+    buffer = memoryview(value)
+    if len(buffer) >= HEADER_SIZE and buffer[:2] == MAGIC:
+        dtype = _CODE_DTYPES.get(buffer[3])
+        if dtype is None or (len(buffer) - HEADER_SIZE) % dtype.itemsize:
+            return None
+        return np.frombuffer(buffer, dtype=dtype, offset=HEADER_SIZE)
+
+    # JSON stored in a binary column (e.g. after a TEXT -> BYTEA type change)
+    if len(buffer) and buffer[0] == ord('['):
+        return _decode_json(bytes(buffer).decode('utf-8', errors='replace'))
+    return None
+
+
+def decode_embeddings(values: Iterable, dimension: int) -> tuple:
+    """Decode many stored embeddings into one float32 matrix.
+
+    Args:
+        values: Column values
+        dimension: Expected vector dimension; other vectors are skipped
+
+    Returns:
+        (matrix of shape (n, dimension), list of input positions that were kept)
+    """
+    values = list(values)
+    matrix = np.empty((len(values), dimension), dtype=np.float32)
+    kept = []
+    for position, value in enumerate(values):
+        vector = decode_embedding(value)
+        if vector is None or vector.shape[0] != dimension:
+            continue
+        matrix[len(kept)] = vector
+        kept.append(position)
+    return matrix[:len(kept)], kept
+
+
+def _decode_json(value: str) -> Optional[np.ndarray]:
+    try:
+        return np.asarray(json.loads(value), dtype=np.float32).ravel()
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return None
+
+
+def migrate_json_embeddings(session: Session, table: str, batch_size: int = 500) -> int:
+    """Convert JSON-text embeddings in a table to the binary format.
+
+    Runs in committed batches, so an interrupted migration resumes where it
+    stopped on the next startup.
+
+    Args:
+        session: Database session
+        table: Table with an embedding_vector column
+        batch_size: Rows converted per transaction
+
+    Returns:
+        Number of rows converted
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # Legacy rows are the only ones stored as TEXT
+        legacy_filter = "typeof(embedding_vector) = 'text'"
+    else:
+        # JSON arrays start with '['
+        legacy_filter = "substring(embedding_vector from 1 for 1) = '\\x5b'::bytea"
+
+    dtype = storage_dtype()
+    converted = 0
+    last_id = None
+    while True:
+        query = f"SELECT id, embedding_vector FROM {table} WHERE embedding_vector IS NOT NULL AND {legacy_filter}"
+        params = {'limit': batch_size}
+        if last_id is not None:
+            query += " AND id > :last_id"
+            params['last_id'] = last_id
+        rows = session.execute(text(query + " ORDER BY id LIMIT :limit"), params).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row_id, value in rows:
+            vector = decode_embedding(value)
+            updates.append({
+                'id': row_id,
+                'value': encode_embedding(vector, dtype) if vector is not None else None
+            })
+        session.execute(text(f"UPDATE {table} SET embedding_vector = :value WHERE id = :id"), updates)
+        session.commit()
+
+        converted += len(rows)
+        last_id = rows[-1][0]
+
+    if converted:
+        logger.info(f"Converted {converted} JSON embeddings in {table} to {dtype} binary")
+    return converted
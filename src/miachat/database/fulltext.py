@@ -0,0 +1,269 @@
+"""
+SQLite FTS5 full-text index over document chunks.
+
+Vector search misses exact terms (names, codes, identifiers) that the
+embedding model does not represent well, and filename lookups used to fall
+back to ``ilike('%name%')`` scans over every document a user owns. The
+document_chunks_fts virtual table indexes each chunk's text together with its
+document's title (original filename plus doc_metadata['title']), so both are
+answered from an inverted index and ranked with BM25.
+
+The index is kept in sync by triggers on document_chunks and documents, so
+every writer (ORM, raw SQL, migrations) updates it in the same transaction.
+FTS rows share the rowid of their chunk; rebuild_fulltext_index() re-syncs
+the table should the chunk rowids ever change (e.g. after a VACUUM).
+
+Only SQLite builds with FTS5 are supported; on other databases
+fulltext_available() is False and callers fall back to their previous
+queries.
+"""
+
+import logging
+import math
+import re
+import unicodedata
+import weakref
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'document_chunks_fts'
+
+# BM25 column weights in declaration order; title matches count half as much as text
+RANK = 'bm25(0.0, 0.0, 0.0, 0.5, 1.0)'
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can could did do does for from had has have how i if in into is it its "
+    "me my of on or our so than that the their them then there these they this to was we were what when "
+    "where which who why will with would you your".split()
+)
+
+
+def _title(alias: str) -> str:
+    """SQL expression for a document's searchable title."""
+    return (
+        f"{alias}.original_filename || ' ' || coalesce(CASE WHEN json_valid({alias}.doc_metadata) "
+        f"THEN json_extract({alias}.doc_metadata, '$.title') END, '')"
+    )
+
+
+_CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+    chunk_id UNINDEXED, document_id UNINDEXED, user_id UNINDEXED, title, text_content,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+_INSERT_CHUNK = f"""
+    INSERT INTO {FTS_TABLE}(rowid, chunk_id, document_id, user_id, title, text_content)
+    SELECT new.rowid, new.id, new.document_id, d.user_id, {_title('d')}, new.text_content
+    FROM documents d WHERE d.id = new.document_id;
+"""
+
+_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_chunk_insert AFTER INSERT ON document_chunks BEGIN
+        {_INSERT_CHUNK}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_chunk_delete AFTER DELETE ON document_chunks BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_chunk_update
+    AFTER UPDATE OF document_id, text_content ON document_chunks BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid;
+        {_INSERT_CHUNK}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_document_update
+    AFTER UPDATE OF original_filename, doc_metadata, user_id ON documents BEGIN
+        UPDATE {FTS_TABLE} SET title = {_title('new')}, user_id = new.user_id
+        WHERE rowid IN (SELECT rowid FROM document_chunks WHERE document_id = new.id);
+    END
+    """,
+]
+
+_BACKFILL = f"""
+INSERT INTO {FTS_TABLE}(rowid, chunk_id, document_id, user_id, title, text_content)
+SELECT c.rowid, c.id, c.document_id, d.user_id, {_title('d')}, c.text_content
+FROM document_chunks c JOIN documents d ON d.id = c.document_id
+"""
+
+# Engines known to have the index, so searches skip the schema check
+_available_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def ensure_fulltext_index(engine: Engine) -> bool:
+    """Create the FTS5 table and its triggers if missing, filling it from existing chunks.
+
+    Args:
+        engine: Database engine (after the ORM tables were created)
+
+    Returns:
+        True if the index is available
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+            ).first()
+            if not exists:
+                conn.execute(text(_CREATE_TABLE))
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', :rank)"),
+                             {'rank': RANK})
+                rows = conn.execute(text(_BACKFILL)).rowcount
+                logger.info(f"Created full-text index over {rows} document chunks")
+            for trigger in _TRIGGERS:
+                conn.execute(text(trigger))
+    except OperationalError as e:
+        # SQLite builds without FTS5 keep working on vector search alone
+        logger.warning(f"Full-text index unavailable: {e}")
+        return False
+    _available_engines.add(engine)
+    return True
+
+
+def rebuild_fulltext_index(db: Session) -> int:
+    """Repopulate the index from document_chunks.
+
+    Args:
+        db: Database session; the caller commits
+
+    Returns:
+        Number of chunks indexed
+    """
+    db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    return db.execute(text(_BACKFILL)).rowcount
+
+
+def fulltext_available(db: Session) -> bool:
+    """Whether the session's database has the full-text index."""
+    if not isinstance(db, Session):
+        return False
+    engine = db.get_bind()
+    if engine in _available_engines:
+        return True
+    if engine.dialect.name != 'sqlite':
+        return False
+    exists = db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+    ).first()
+    if exists:
+        _available_engines.add(engine)
+    return bool(exists)
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip diacritics, as the unicode61 tokenizer does."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def query_tokens(query: str) -> List[str]:
+    """Distinct search tokens of a query, without stopwords unless nothing else is left."""
+    tokens = list(dict.fromkeys(_TOKEN.findall(_fold(query))))
+    return [token for token in tokens if token not in _STOPWORDS] or tokens
+
+
+def match_query(query: str, match_all: bool = False, prefix: bool = False) -> Optional[str]:
+    """Build an FTS5 MATCH expression from free text.
+
+    Every token is quoted, so user input cannot inject FTS5 syntax. Stopwords
+    are dropped unless nothing else is left.
+
+    Args:
+        query: Free text
+        match_all: Require every token (AND) instead of any (OR)
+        prefix: Match tokens as prefixes (for partial filenames)
+
+    Returns:
+        MATCH expression, or None if the text has no tokens
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return None
+    terms = [f'"{token}"{"*" if prefix else ""}' for token in tokens]
+    return (' AND ' if match_all else ' OR ').join(terms)
+
+
+def search_chunks(db: Session, query: str, user_id: int, limit: int = 10,
+                  min_coverage: float = 0.5) -> List[Tuple[str, float]]:
+    """Rank a user's chunks against a query with BM25.
+
+    Any query token can match, but a chunk is only returned if it contains at
+    least min_coverage of the query's distinct tokens (and at least one), so a
+    chat message sharing a single common word with a chunk does not pull it in.
+
+    Args:
+        db: Database session
+        query: Search text
+        user_id: Owner of the documents searched
+        limit: Maximum number of chunks
+        min_coverage: Share of the query's tokens a chunk must contain
+
+    Returns:
+        (chunk_id, score) pairs, best first; higher scores are better
+    """
+    tokens = query_tokens(query)
+    expression = match_query(query)
+    if expression is None:
+        return []
+    required = max(1, math.ceil(min_coverage * len(tokens)))
+    rows = db.execute(
+        text(f"SELECT chunk_id, -rank, title, text_content FROM {FTS_TABLE} "
+             f"WHERE {FTS_TABLE} MATCH :expression AND user_id = :user_id ORDER BY rank LIMIT :limit"),
+        # Over-fetch, since weakly covered chunks are dropped below
+        {'expression': expression, 'user_id': user_id, 'limit': limit * 4}
+    ).all()
+
+    hits = []
+    for chunk_id, score, title, content in rows:
+        chunk_tokens = set(_TOKEN.findall(_fold(f"{title} {content}")))
+        if sum(token in chunk_tokens for token in tokens) >= required:
+            hits.append((chunk_id, float(score)))
+            if len(hits) == limit:
+                break
+    return hits
+
+
+def search_document_titles(db: Session, name: str, user_id: int, limit: int = 2,
+                           processed_only: bool = False) -> List[str]:
+    """Find a user's documents whose title has a word starting with each word of a name.
+
+    Words are matched as prefixes, not substrings: "budget" does not match
+    "2024budget_final.pdf", so callers may want a substring fallback.
+
+    Args:
+        db: Database session
+        name: Document name as referred to by the user, e.g. "budget report"
+        user_id: Owner of the documents
+        limit: Maximum number of documents
+        processed_only: Only return documents whose processing finished
+
+    Returns:
+        Document IDs, best match first
+    """
+    expression = match_query(name, match_all=True, prefix=True)
+    if expression is None:
+        return []
+    # Filtered before the LIMIT, so unprocessed documents cannot crowd out processed ones
+    processed = "AND document_id IN (SELECT id FROM documents WHERE is_processed = 1) " if processed_only else ""
+    rows = db.execute(
+        text(f"SELECT document_id, min(rank) AS best FROM {FTS_TABLE} "
+             f"WHERE {FTS_TABLE} MATCH :expression AND user_id = :user_id {processed}"
+             f"GROUP BY document_id ORDER BY best LIMIT :limit"),
+        {'expression': f"title : ({expression})", 'user_id': user_id, 'limit': limit}
+    ).all()
+    return [document_id for document_id, _ in rows]
@@ -4,7 +4,7 @@ Database models for MiaChat.
 
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Table, Text, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, LargeBinary, Table, Text, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.ext.mutable import MutableDict
 
@@ -305,7 +305,7 @@ class DocumentChunk(Base):
     start_char = Column(Integer)  # Character position in original document
     end_char = Column(Integer)
     word_count = Column(Integer)
-    embedding_vector = Column(Text)  # JSON-serialized vector embedding
+    embedding_vector = Column(LargeBinary)  # Binary vector, see embedding_codec
     created_at = Column(DateTime, default=datetime.utcnow)
     doc_metadata = Column(MutableDict.as_mutable(JSON), default=dict)
     
@@ -635,7 +635,7 @@ class BackstoryChunk(Base):
     text_content = Column(Text, nullable=False)
 
     # Embedding for semantic search
-    embedding_vector = Column(Text)  # JSON-serialized vector
+    embedding_vector = Column(LargeBinary)  # Binary vector, see embedding_codec
 
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -1273,3 +1273,49 @@ class TodoGoogleTaskMapping(Base):
             'sync_status': self.sync_status
         }
 
+
+
+class BackgroundJob(Base):
+    """Durable background job (post-turn work such as titles and fact extraction).
+
+    Jobs survive restarts: pending jobs are picked up again on startup and
+    jobs that were running when the process stopped are re-queued.
+    """
+    __tablename__ = 'background_jobs'
+
+    id = Column(Integer, primary_key=True)
+    job_type = Column(String(50), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
+
+    # Pending jobs with the same type and key are merged into one
+    coalesce_key = Column(String(255), nullable=True, index=True)
+
+    payload = Column(JSON, nullable=False, default=dict)
+    result = Column(JSON, nullable=True)
+
+    status = Column(String(20), nullable=False, default='pending', index=True)  # pending, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    last_error = Column(Text, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    run_after = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'user_id': self.user_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'result': self.result,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,175 @@
+"""
+Unit tests for the chat endpoints in miachat.api.main.
+"""
+
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from miachat.api import main
+from miachat.api.core.llm_client import LLMError
+from miachat.api.main import ChatRequest, ChatTurn
+from miachat.database.config import get_db
+
+CHARACTER = {'id': 'c1', 'name': 'Mia', 'system_prompt': 'You are Mia.', 'model_config': None}
+
+
+@pytest.fixture
+def turn_services():
+    """Stub the user, character, session and context lookups of a chat turn."""
+    conversations = MagicMock()
+    conversations.get_session.return_value = None
+    conversations.create_session.return_value = {'session_id': 's1'}
+    conversations.get_session_document_ids.return_value = []
+    characters = MagicMock()
+    characters.get_character.return_value = dict(CHARACTER)
+
+    with patch.object(main, 'get_current_user_from_session', AsyncMock(return_value=SimpleNamespace(id=1))), \
+            patch.object(main, 'character_manager', characters), \
+            patch.object(main, 'conversation_service', conversations), \
+            patch('miachat.api.core.enhanced_context_service.enhanced_context_service.get_enhanced_context',
+                  return_value={}):
+        yield SimpleNamespace(conversations=conversations, characters=characters)
+
+
+class TestPrepareChatTurn:
+    """Tests for the shared turn preparation of /api/chat and /api/chat/stream."""
+
+    def test_llm_status_checked_off_event_loop(self, turn_services):
+        """Test that the provider status check, which may probe over HTTP, runs on a worker thread."""
+        loop_thread = threading.get_ident()
+        checked_on = []
+
+        def check(user_id, model_config, db):
+            checked_on.append(threading.get_ident())
+            return {'available': False, 'message': "No LLM configured"}
+
+        with patch.object(main.settings_service, 'check_character_llm_status', side_effect=check):
+            result = asyncio.run(main._prepare_chat_turn(
+                ChatRequest(message="hello", character_id='c1'), MagicMock(), MagicMock()
+            ))
+
+        assert result.status_code == 503
+        assert checked_on and checked_on[0] != loop_thread
+
+
+def prepared_turn():
+    return ChatTurn(user_id=1, session_id='s1', character=dict(CHARACTER), character_name='Mia',
+                    messages=[{'role': 'user', 'content': 'hello'}], model_config={'provider': 'ollama'},
+                    enhanced_context={}, reasoning_chain=[], llm_provider='ollama', llm_model='m')
+
+
+def parse_events(body):
+    """Split a text/event-stream body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@pytest.fixture
+def stream_client(turn_services):
+    """Client for /api/chat/stream with a prepared turn and stubbed persistence."""
+    turn_services.conversations.save_message.side_effect = [SimpleNamespace(id=41), SimpleNamespace(id=42)]
+    stream_db = MagicMock()
+    main.app.dependency_overrides[get_db] = lambda: MagicMock()
+    try:
+        with patch.object(main, '_prepare_chat_turn', AsyncMock(return_value=prepared_turn())), \
+                patch('miachat.database.config.db_config.get_session', return_value=stream_db):
+            yield SimpleNamespace(client=TestClient(main.app), conversations=turn_services.conversations,
+                                  stream_db=stream_db)
+    finally:
+        main.app.dependency_overrides.pop(get_db, None)
+
+
+def stream_reply(*deltas, error=None):
+    """Stand-in for llm_client.astream_response_with_config yielding deltas, then optionally failing."""
+    async def astream(messages, system_prompt, model_config):
+        for delta in deltas:
+            yield delta
+        if error:
+            raise error
+    return astream
+
+
+class TestChatStream:
+    """Tests for the server-sent events of /api/chat/stream."""
+
+    def test_events_ordered_and_reply_persisted_once(self, stream_client):
+        """Test that context, tokens and done arrive in order and the reply is saved exactly once."""
+        with patch.object(main.llm_client, 'astream_response_with_config', stream_reply("Hi ", "there")):
+            response = stream_client.client.post('/api/chat/stream', json={'message': 'hello', 'character_id': 'c1'})
+
+        events = parse_events(response.text)
+        assert response.headers['content-type'].startswith('text/event-stream')
+        assert [event for event, _ in events] == ['context', 'token', 'token', 'done']
+        assert [data['delta'] for event, data in events if event == 'token'] == ["Hi ", "there"]
+        done = events[-1][1]
+        assert done['response'] == "Hi there"
+        assert done['message_id'] == 42
+        assert [c.args[1:3] for c in stream_client.conversations.save_message.call_args_list] == [
+            ('user', 'hello'), ('assistant', 'Hi there')
+        ]
+        stream_client.stream_db.close.assert_called_once()
+
+    def test_llm_error_mid_stream_persists_nothing(self, stream_client):
+        """Test that a provider failure after some tokens ends with an error event and saves no messages."""
+        failing = stream_reply("Hi ", error=LLMError("provider went away"))
+        with patch.object(main.llm_client, 'astream_response_with_config', failing):
+            response = stream_client.client.post('/api/chat/stream', json={'message': 'hello', 'character_id': 'c1'})
+
+        events = parse_events(response.text)
+        assert [event for event, _ in events] == ['context', 'token', 'error']
+        assert "provider went away" in events[-1][1]['error']
+        stream_client.conversations.save_message.assert_not_called()
+
+
+class TestChatWithDocument:
+    """Tests for /api/chat/with-document."""
+
+    def test_context_assembled_off_event_loop(self, turn_services):
+        """Test that context assembly, which blocks on its sources, does not run on the event loop."""
+        on_loop = []
+
+        def get_context(**kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return {}
+
+        main.app.dependency_overrides[get_db] = lambda: MagicMock()
+        try:
+            with patch('miachat.api.core.enhanced_context_service.enhanced_context_service.get_enhanced_context',
+                       side_effect=get_context):
+                TestClient(main.app).post('/api/chat/with-document', data={'message': 'hello', 'character_id': 'c1'})
+        finally:
+            main.app.dependency_overrides.pop(get_db, None)
+
+        assert on_loop == [False]
+
+
+class TestChatExtractions:
+    """Tests for collecting deferred sidebar extractions."""
+
+    def test_only_extracted_items_returned(self, turn_services):
+        """Test that job bookkeeping such as the failure count is reported apart from the extractions."""
+        job = {'job_type': 'sidebar_extraction', 'user_id': 1, 'status': 'succeeded',
+               'result': {'calendar_events': [{'title': 'Dentist'}], 'failed': 1}}
+        main.app.dependency_overrides[get_db] = lambda: MagicMock()
+        try:
+            with patch.object(main.job_queue, 'get_job', return_value=job), \
+                    patch.object(main, '_build_tracking_cards', return_value=None):
+                body = TestClient(main.app).get('/api/chat/extractions/7').json()
+        finally:
+            main.app.dependency_overrides.pop(get_db, None)
+
+        assert body['sidebar_extractions'] == {'calendar_events': [{'title': 'Dentist'}]}
+        assert body['failed_messages'] == 1
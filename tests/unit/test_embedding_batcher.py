@@ -0,0 +1,147 @@
+"""
+Unit tests for EmbeddingBatcher - micro-batching of concurrent encode calls.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from miachat.api.core.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingEncoder:
+    """Encodes each text as [len(text), index of call]; the first call can be held open."""
+
+    def __init__(self, hold_first=False, fail=False):
+        self.calls = []
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        self.hold_first = hold_first
+        self.fail = fail
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        self.entered.set()
+        if self.hold_first and len(self.calls) == 1:
+            self.release.wait(5)
+        elif self.fail:
+            raise RuntimeError("model failed")
+        return np.array([[len(text), len(self.calls)] for text in texts], dtype=np.float32)
+
+
+def wait_for_queue(batcher, requests):
+    """Block until the batcher has the given number of requests queued."""
+    deadline = time.monotonic() + 5
+    while batcher.get_stats()['queued_requests'] < requests:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def run_in_threads(batcher, texts_per_caller):
+    """Start one encode call per text list; returns (threads, results by position)."""
+    results = [None] * len(texts_per_caller)
+
+    def call(position, texts):
+        try:
+            results[position] = batcher.encode(texts)
+        except Exception as e:
+            results[position] = e
+
+    threads = [threading.Thread(target=call, args=(i, texts)) for i, texts in enumerate(texts_per_caller)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class TestEmbeddingBatcher:
+    """Tests for gathering concurrent requests into one encode call."""
+
+    def test_idle_request_encoded_directly(self):
+        """Test that a request with nothing in flight skips the queue."""
+        encoder = RecordingEncoder()
+        batcher = EmbeddingBatcher(encoder, max_wait_ms=50, max_batch_size=8)
+
+        result = batcher.encode(["abc"])
+
+        assert result.tolist() == [[3, 1]]
+        stats = batcher.get_stats()
+        assert stats['direct_encodes'] == 1
+        assert stats['batches'] == 0
+
+    def test_concurrent_requests_share_one_encode(self):
+        """Test that requests arriving while the model is busy are encoded together and routed back."""
+        encoder = RecordingEncoder(hold_first=True)
+        batcher = EmbeddingBatcher(encoder, max_wait_ms=300, max_batch_size=8)
+        busy, _ = run_in_threads(batcher, [["x"]])
+        encoder.entered.wait(5)
+
+        threads, results = run_in_threads(batcher, [["a"], ["bb", "ccc"], ["dddd"]])
+        wait_for_queue(batcher, 3)
+        encoder.release.set()
+        for thread in busy + threads:
+            thread.join(5)
+
+        assert len(encoder.calls) == 2
+        assert sorted(encoder.calls[1]) == ["a", "bb", "ccc", "dddd"]
+        assert [r[:, 0].tolist() for r in results] == [[1], [2, 3], [4]]
+        stats = batcher.get_stats()
+        assert stats['batches'] == 1
+        assert stats['batched_requests'] == 3
+        assert stats['mean_batch_size'] == 4
+        assert stats['mean_queue_ms'] > 0
+
+    def test_batches_capped_at_max_size(self):
+        """Test that a full queue is split into batches of at most max_batch_size texts."""
+        encoder = RecordingEncoder(hold_first=True)
+        batcher = EmbeddingBatcher(encoder, max_wait_ms=20, max_batch_size=2)
+        busy, _ = run_in_threads(batcher, [["x"]])
+        encoder.entered.wait(5)
+
+        threads, results = run_in_threads(batcher, [["a"], ["b"], ["c"]])
+        for thread in threads:
+            thread.join(5)
+        encoder.release.set()
+        for thread in busy + threads:
+            thread.join(5)
+
+        assert all(len(call) <= 2 for call in encoder.calls)
+        assert sorted(text for call in encoder.calls[1:] for text in call) == ["a", "b", "c"]
+        assert all(r.shape == (1, 2) for r in results)
+        assert batcher.get_stats()['max_batch_size'] == 2
+
+    def test_large_request_encoded_directly(self):
+        """Test that a request filling a batch by itself is not queued behind others."""
+        encoder = RecordingEncoder(hold_first=True)
+        batcher = EmbeddingBatcher(encoder, max_wait_ms=1000, max_batch_size=4)
+        busy, _ = run_in_threads(batcher, [["x"]])
+        encoder.entered.wait(5)
+
+        result = batcher.encode(["a", "b", "c", "d"])
+        encoder.release.set()
+        busy[0].join(5)
+
+        assert result.shape == (4, 2)
+        assert batcher.get_stats()['direct_encodes'] == 2
+
+    def test_failure_raised_in_every_caller(self):
+        """Test that a failed batched encode raises in each waiting caller."""
+        encoder = RecordingEncoder(hold_first=True, fail=True)
+        batcher = EmbeddingBatcher(encoder, max_wait_ms=300, max_batch_size=8)
+        busy, _ = run_in_threads(batcher, [["x"]])
+        encoder.entered.wait(5)
+
+        threads, results = run_in_threads(batcher, [["a"], ["b"]])
+        wait_for_queue(batcher, 2)
+        encoder.release.set()
+        for thread in busy + threads:
+            thread.join(5)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_zero_wait_disables_batching(self):
+        """Test that EMBEDDING_BATCH_WAIT_MS=0 encodes every request directly."""
+        batcher = EmbeddingBatcher(RecordingEncoder(), max_wait_ms=0, max_batch_size=8)
+        for _ in range(3):
+            batcher.encode(["a"])
+        assert batcher.get_stats()['direct_encodes'] == 3
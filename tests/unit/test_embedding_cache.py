@@ -0,0 +1,142 @@
+"""
+Unit tests for the query-embedding cache.
+"""
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from miachat.api.core.embedding_cache import EmbeddingCache, cache_key, normalize_text
+from miachat.api.core.embedding_service import EmbeddingService
+
+DIMENSION = 8
+
+
+class CountingModel:
+    """Stand-in SentenceTransformer that records every text it encodes."""
+
+    encoded = []
+
+    def __init__(self, name):
+        pass
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def encode(self, texts, normalize_embeddings=True):
+        self.encoded.extend(texts)
+        return np.array([np.full(DIMENSION, len(text), dtype=np.float32) for text in texts])
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Embedding service with a counting model and a 1 MB query cache."""
+    monkeypatch.setenv('EMBEDDING_CACHE_MB', '1')
+    CountingModel.encoded = []
+    with patch('sentence_transformers.SentenceTransformer', CountingModel):
+        yield EmbeddingService(index_path=str(tmp_path / 'faiss_index'))
+
+
+def vector(value, size=DIMENSION):
+    return np.full(size, value, dtype=np.float32)
+
+
+class TestCacheKeys:
+    """Tests for text normalization and keys."""
+
+    def test_whitespace_and_unicode_form_normalized(self):
+        """Test that spacing and composed/decomposed characters share a key."""
+        assert normalize_text("  café \n  au   lait ") == "café au lait"
+        assert cache_key('m', "thanks ") == cache_key('m', "thanks")
+
+    def test_case_and_model_distinguished(self):
+        """Test that case and the model name are part of the key."""
+        assert len({cache_key('m', "Thanks"), cache_key('m', "thanks"), cache_key('other', "thanks")}) == 3
+
+
+class TestEmbeddingCache:
+    """Tests for LRU eviction, expiry and metrics."""
+
+    def test_hit_rate_counted(self):
+        """Test that hits and misses are counted into the hit rate."""
+        cache = EmbeddingCache(max_mb=1, ttl_seconds=60)
+        assert cache.get('a') is None
+        cache.put('a', vector(1))
+        assert np.array_equal(cache.get('a'), vector(1))
+        cache.get('a')
+
+        stats = cache.get_stats()
+        assert (stats['hits'], stats['misses'], stats['hit_rate'], stats['entries']) == (2, 1, 0.6667, 1)
+
+    def test_least_recently_used_evicted_at_memory_cap(self):
+        """Test that the memory cap evicts the entry used longest ago."""
+        cache = EmbeddingCache(max_mb=0, ttl_seconds=60)
+        cache.max_bytes = 3 * (vector(0, 256).nbytes + 256)
+        for key in 'abc':
+            cache.put(key, vector(0, 256))
+        cache.get('a')
+        cache.put('d', vector(0, 256))
+
+        assert cache.get('b') is None
+        assert all(cache.get(key) is not None for key in 'acd')
+        assert cache.get_stats()['evictions'] == 1
+        assert cache.get_stats()['bytes'] <= cache.max_bytes
+
+    def test_expired_entries_dropped(self):
+        """Test that entries are not returned after the TTL."""
+        cache = EmbeddingCache(max_mb=1, ttl_seconds=30)
+        with patch('miachat.api.core.embedding_cache.time.monotonic', return_value=100.0):
+            cache.put('a', vector(1))
+        with patch('miachat.api.core.embedding_cache.time.monotonic', return_value=131.0):
+            assert cache.get('a') is None
+
+        assert cache.get_stats()['expirations'] == 1
+        assert cache.get_stats()['entries'] == 0
+
+    def test_cached_vectors_read_only(self):
+        """Test that callers cannot modify a cached vector in place."""
+        cache = EmbeddingCache(max_mb=1, ttl_seconds=60)
+        original = vector(1)
+        cache.put('a', original)
+        original[0] = 5
+
+        assert cache.get('a')[0] == 1
+        with pytest.raises(ValueError):
+            cache.get('a')[0] = 2
+
+    def test_zero_size_disables_cache(self):
+        """Test that EMBEDDING_CACHE_MB=0 stores nothing."""
+        cache = EmbeddingCache(max_mb=0)
+        cache.put('a', vector(1))
+        assert not cache.enabled
+        assert cache.get('a') is None
+
+
+class TestServiceCaching:
+    """Tests for query caching in EmbeddingService.create_embeddings."""
+
+    def test_repeated_query_encoded_once(self, service):
+        """Test that the same message embedded twice in a turn reaches the model once."""
+        first = service.create_embeddings(["continue"])
+        second = service.create_embeddings(["continue "])
+
+        assert CountingModel.encoded == ["continue"]
+        assert np.array_equal(first, second)
+        assert service.get_stats()['query_cache']['hits'] == 1
+
+    def test_only_missing_texts_encoded(self, service):
+        """Test that a batch encodes only uncached, distinct texts and keeps input order."""
+        service.create_embeddings(["hi"])
+        embeddings = service.create_embeddings(["thanks", "hi", "thanks"])
+
+        assert CountingModel.encoded == ["hi", "thanks"]
+        assert [row[0] for row in embeddings] == [6, 2, 6]
+
+    def test_ingestion_bypasses_cache(self, service):
+        """Test that chunk embeddings requested with cache=False are neither read nor stored."""
+        service.create_embeddings(["chunk"], cache=False)
+        service.create_embeddings(["chunk"], cache=False)
+
+        assert CountingModel.encoded == ["chunk", "chunk"]
+        assert service.get_stats()['query_cache']['entries'] == 0
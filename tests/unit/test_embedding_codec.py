@@ -0,0 +1,92 @@
+"""
+Unit tests for the binary embedding storage format.
+"""
+
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from miachat.database.embedding_codec import (
+    decode_embedding, decode_embeddings, encode_embedding, migrate_json_embeddings
+)
+
+
+class TestEncodeDecode:
+    """Tests for encoding and decoding single vectors."""
+
+    def test_float32_round_trip_is_zero_copy(self):
+        """Test that float32 vectors decode to a view over the stored bytes."""
+        vector = np.random.rand(384).astype(np.float32)
+        stored = encode_embedding(vector, 'float32')
+
+        decoded = decode_embedding(stored)
+
+        assert len(stored) == 4 + 384 * 4
+        assert decoded.dtype == np.float32
+        assert not decoded.flags.owndata
+        np.testing.assert_array_equal(decoded, vector)
+
+    def test_float16_halves_storage(self):
+        """Test that float16 storage is half the size and close to the original."""
+        vector = np.random.rand(384).astype(np.float32)
+        stored = encode_embedding(vector, 'float16')
+
+        decoded = decode_embedding(stored)
+
+        assert len(stored) == 4 + 384 * 2
+        assert decoded.dtype == np.float16
+        np.testing.assert_allclose(decoded, vector, atol=1e-3)
+
+    def test_dtype_from_environment(self, monkeypatch):
+        """Test that EMBEDDING_STORAGE_DTYPE selects the default dtype."""
+        monkeypatch.setenv('EMBEDDING_STORAGE_DTYPE', 'float16')
+
+        assert decode_embedding(encode_embedding([0.5, 0.25])).dtype == np.float16
+
+    @pytest.mark.parametrize('legacy', ['[0.5, 0.25]', b'[0.5, 0.25]'])
+    def test_legacy_json_still_readable(self, legacy):
+        """Test that JSON text from before the migration decodes."""
+        np.testing.assert_array_equal(decode_embedding(legacy), [0.5, 0.25])
+
+    @pytest.mark.parametrize('value', [None, '', 'not json', b'EV\x01f\x00', b'garbage'])
+    def test_invalid_values_return_none(self, value):
+        """Test that empty or malformed values decode to None."""
+        assert decode_embedding(value) is None
+
+    def test_decode_many_skips_bad_rows(self):
+        """Test that batch decoding skips malformed and wrong-size vectors."""
+        values = [encode_embedding([1, 0, 0]), None, encode_embedding([1, 0]), '[0, 1, 0]']
+
+        matrix, kept = decode_embeddings(values, dimension=3)
+
+        assert kept == [0, 3]
+        assert matrix.dtype == np.float32
+        np.testing.assert_array_equal(matrix, [[1, 0, 0], [0, 1, 0]])
+
+
+class TestMigration:
+    """Tests for converting JSON-text rows to binary."""
+
+    def test_json_rows_converted_in_batches(self, tmp_path):
+        """Test that every legacy row is converted and binary rows are untouched."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'vectors.db'}")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE chunks (id INTEGER PRIMARY KEY, embedding_vector TEXT)"))
+            for i in range(7):
+                conn.execute(text("INSERT INTO chunks (embedding_vector) VALUES (:v)"),
+                             {'v': json.dumps([float(i), 1.0])})
+            conn.execute(text("INSERT INTO chunks (embedding_vector) VALUES (:v)"),
+                         {'v': encode_embedding([9.0, 9.0], 'float32')})
+        session = sessionmaker(bind=engine)()
+
+        assert migrate_json_embeddings(session, 'chunks', batch_size=3) == 7
+        assert migrate_json_embeddings(session, 'chunks') == 0
+
+        rows = session.execute(text("SELECT id, embedding_vector FROM chunks ORDER BY id")).fetchall()
+        assert all(isinstance(value, bytes) for _, value in rows)
+        np.testing.assert_array_equal(decode_embedding(rows[2][1]), [2.0, 1.0])
+        np.testing.assert_array_equal(decode_embedding(rows[7][1]), [9.0, 9.0])
+        session.close()
@@ -0,0 +1,454 @@
+"""
+Unit tests for EmbeddingService - per-user index partitions.
+"""
+
+import hashlib
+import threading
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from miachat.database.models import Base, User, Document, DocumentChunk
+from miachat.api.core.embedding_service import EmbeddingService
+
+DIMENSION = 32
+
+
+class FakeModel:
+    """Deterministic stand-in for SentenceTransformer: one random unit vector per text."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = []
+        for text in texts:
+            rng = np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16))
+            vector = rng.standard_normal(DIMENSION).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.array(vectors, dtype=np.float32)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a throwaway SQLite database with three users."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'docs.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    for user_id in (1, 2, 3):
+        session.add(User(id=user_id, username=f"u{user_id}", email=f"u{user_id}@test", password_hash="x"))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture(autouse=True)
+def fake_model():
+    """Load FakeModel wherever the service loads a SentenceTransformer."""
+    with patch('sentence_transformers.SentenceTransformer', FakeModel):
+        yield
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Embedding service with a fake model and a temporary index path."""
+    return EmbeddingService(index_path=str(tmp_path / 'faiss_index'))
+
+
+def add_document(service, db, user_id, doc_id, texts):
+    """Create a document with one chunk per text and embed it."""
+    db.add(Document(id=doc_id, user_id=user_id, filename=f"{doc_id}.txt", original_filename=f"{doc_id}.txt",
+                    file_path=f"/tmp/{doc_id}.txt", doc_type='txt', file_size=1))
+    chunks = []
+    for i, text in enumerate(texts):
+        chunk_id = f"{doc_id}-{i}"
+        db.add(DocumentChunk(id=chunk_id, document_id=doc_id, chunk_index=i, text_content=text))
+        chunks.append({'id': chunk_id, 'text_content': text})
+    db.commit()
+    assert service.add_document_embeddings(doc_id, chunks, db)
+
+
+class TestPartitionedSearch:
+    """Tests for searching per-user partitions."""
+
+    def test_search_only_returns_callers_chunks(self, service, db):
+        """Test that a user with few documents still gets their own hits."""
+        add_document(service, db, 1, 'big', [f"user one note {i}" for i in range(50)])
+        add_document(service, db, 2, 'small', ["user two note"])
+
+        results = service.search_similar_chunks("user two note", user_id=2, top_k=3, similarity_threshold=0.5, db=db)
+
+        assert [r['chunk_id'] for r in results] == ['small-0']
+
+    def test_partition_loaded_from_disk_after_eviction(self, service, db):
+        """Test that an evicted partition is reloaded from its saved files."""
+        add_document(service, db, 1, 'doc', ["alpha", "beta"])
+        service._partitions.clear()
+
+        results = service.search_similar_chunks("beta", user_id=1, top_k=1, db=db)
+
+        assert results[0]['chunk_id'] == 'doc-1'
+        assert service.get_stats()['partition_loads'] == 1
+
+    def test_missing_partition_built_from_database(self, service, db, tmp_path):
+        """Test that a partition with no saved files is built from stored embeddings."""
+        add_document(service, db, 1, 'doc', ["alpha", "beta"])
+        service._drop_partition(1)
+
+        results = service.search_similar_chunks("alpha", user_id=1, top_k=1, db=db)
+
+        assert results[0]['chunk_id'] == 'doc-0'
+        assert service.get_stats()['partition_builds'] == 2
+
+    def test_removed_document_not_returned(self, service, db):
+        """Test that removing a document's embeddings drops it from its owner's partition."""
+        add_document(service, db, 1, 'keep', ["keep me"])
+        add_document(service, db, 1, 'gone', ["remove me"])
+
+        service.remove_document_embeddings('gone', db)
+        results = service.search_similar_chunks("remove me", user_id=1, top_k=5, similarity_threshold=-1, db=db)
+
+        assert [r['chunk_id'] for r in results] == ['keep-0']
+
+    def test_removal_compacts_past_dead_ratio(self, service, db):
+        """Test that removals are tombstoned, then compacted once the dead ratio is crossed."""
+        add_document(service, db, 1, 'a', [f"a {i}" for i in range(6)])
+        add_document(service, db, 1, 'b', ["b 0"])
+        add_document(service, db, 1, 'c', [f"c {i}" for i in range(3)])
+
+        service.remove_document_embeddings('b', db)
+        stats = service.get_stats()
+        assert (stats['live_vectors'], stats['dead_vectors'], stats['compactions']) == (9, 1, 0)
+
+        service.remove_document_embeddings('c', db)
+        stats = service.get_stats()
+        assert (stats['live_vectors'], stats['dead_vectors'], stats['compactions']) == (6, 0, 1)
+
+
+class TestAnnSwitchover:
+    """Tests for switching large partitions to the approximate index."""
+
+    def test_partition_switches_past_threshold(self, service, db, monkeypatch):
+        """Test that crossing FAISS_ANN_THRESHOLD converts the partition and keeps it searchable."""
+        monkeypatch.setenv('FAISS_ANN_THRESHOLD', '12')
+        add_document(service, db, 1, 'a', [f"note {i}" for i in range(10)])
+        assert service.get_stats()['index_kinds'] == {'flat': 1}
+
+        add_document(service, db, 1, 'b', [f"more {i}" for i in range(5)])
+
+        stats = service.get_stats()
+        assert stats['index_kinds'] == {'hnsw': 1}
+        assert stats['ann_switches'] == 1
+        assert service.search_similar_chunks("more 3", user_id=1, top_k=1, db=db)[0]['chunk_id'] == 'b-3'
+
+
+class TestQuantizedSearch:
+    """Tests for quantized partitions with exact rescoring."""
+
+    def test_hits_rescored_with_float_vectors(self, service, db, monkeypatch):
+        """Test that quantized candidates are returned with exact scores and stats are reported."""
+        monkeypatch.setenv('FAISS_QUANTIZATION', 'sq8')
+        monkeypatch.setenv('FAISS_QUANTIZE_MIN_VECTORS', '10')
+        add_document(service, db, 1, 'doc', [f"fact {i}" for i in range(40)])
+
+        results = service.search_similar_chunks("fact 7", user_id=1, top_k=3, similarity_threshold=-1, db=db)
+
+        query = FakeModel(None).encode(["fact 7"])[0]
+        for result in results:
+            expected = float(query @ FakeModel(None).encode([result['text_content']])[0])
+            assert result['similarity_score'] == pytest.approx(expected, abs=1e-6)
+        assert results[0]['chunk_id'] == 'doc-7'
+
+        stats = service.get_stats()
+        assert stats['index_codecs'] == {'sq8': 1}
+        assert stats['quantizations'] == 1
+        assert stats['memory_reduction'] > 1.5
+        assert stats['rescored_searches'] == 1
+        assert 0 <= stats['quantized_recall_at_k'] <= 1
+
+
+class TestSharedWorkers:
+    """Tests for worker processes sharing the partition files."""
+
+    def test_worker_picks_up_other_workers_upload(self, tmp_path, db, monkeypatch):
+        """Test that a second service reloads a partition checkpointed by the first."""
+        monkeypatch.setenv('FAISS_SHARED_INDEX', 'true')
+        monkeypatch.setenv('FAISS_GENERATION_POLL_INTERVAL', '0')
+        writer = EmbeddingService(index_path=str(tmp_path / 'faiss_index'))
+        reader = EmbeddingService(index_path=str(tmp_path / 'faiss_index'))
+
+        add_document(writer, db, 1, 'old', ["first upload"])
+        assert reader.search_similar_chunks("first upload", user_id=1, top_k=1, db=db)[0]['chunk_id'] == 'old-0'
+
+        add_document(writer, db, 1, 'new', ["second upload"])
+        results = reader.search_similar_chunks("second upload", user_id=1, top_k=1, db=db)
+
+        assert results[0]['chunk_id'] == 'new-0'
+        stats = reader.get_stats()
+        assert stats['partition_refreshes'] == 1
+        assert stats['partitions_mapped'] == 1
+
+
+class TestLazyInitialization:
+    """Tests for loading the model on first use or in the background."""
+
+    def test_model_not_loaded_at_construction(self, service):
+        """Test that creating the service loads no model and stats do not force it."""
+        assert not service.is_ready
+        assert service.get_stats()['model_loaded'] is False
+        assert service.get_readiness()['ready'] is False
+
+    def test_first_embedding_loads_model(self, service):
+        """Test that the first create_embeddings call loads the model once."""
+        service.create_embeddings(["hello"])
+        model = service._embedding_model
+        service.create_embeddings(["again"])
+
+        assert service.is_ready
+        assert service._embedding_model is model
+        assert service.dimension == DIMENSION
+        assert service.get_readiness()['load_seconds'] is not None
+
+    def test_warm_up_loads_in_background(self, service):
+        """Test that warm_up loads the model on a background thread."""
+        service.warm_up()
+        service._warmup_thread.join(5)
+
+        assert service.is_ready
+        assert service.get_stats()['embedding_dimension'] == DIMENSION
+
+    def test_failed_load_reported_and_retried(self, service):
+        """Test that a failed load is reported as not ready and retried on next use."""
+        with patch('sentence_transformers.SentenceTransformer', side_effect=OSError("no weights")):
+            service.warm_up()
+            service._warmup_thread.join(5)
+        readiness = service.get_readiness()
+        assert readiness['ready'] is False
+        assert readiness['error'] == "no weights"
+
+        assert len(service.create_embeddings(["hello"])) == 1
+        assert service.get_readiness()['error'] is None
+
+
+class TestPartitionEviction:
+    """Tests for the LRU memory cap."""
+
+    def test_least_recently_used_partition_evicted(self, tmp_path, db):
+        """Test that the cache stays under its cap by evicting the oldest partition."""
+        per_partition = 10 * (DIMENSION * 4 + 64)
+        service = EmbeddingService(index_path=str(tmp_path / 'faiss_index'),
+                                   max_partition_memory_mb=2.5 * per_partition / (1024 * 1024))
+
+        for user_id in (1, 2):
+            add_document(service, db, user_id, f"doc{user_id}", [f"u{user_id} {i}" for i in range(10)])
+        service.search_similar_chunks("u1 0", user_id=1, db=db)  # user 1 is now most recent
+        add_document(service, db, 3, 'doc3', [f"u3 {i}" for i in range(10)])
+
+        assert list(service._partitions) == [1, 3]
+        assert service.get_stats()['partition_evictions'] == 1
+
+    def test_rebuild_recreates_all_partitions(self, service, db):
+        """Test that rebuild_index rebuilds every user's partition from the database."""
+        add_document(service, db, 1, 'doc1', ["one"])
+        add_document(service, db, 2, 'doc2', ["two", "three"])
+
+        assert service.rebuild_index(db)
+
+        status = service.get_rebuild_status()
+        assert (status['state'], status['users_done'], status['vectors']) == ('completed', 2, 3)
+        assert service.search_similar_chunks("three", user_id=2, top_k=1, db=db)[0]['chunk_id'] == 'doc2-1'
+
+
+class TestBackgroundRebuild:
+    """Tests for shadow rebuilds and the swap."""
+
+    def test_searches_use_old_index_until_swap(self, service, db):
+        """Test that the live partitions keep serving while the shadow set is built."""
+        add_document(service, db, 1, 'doc', ["alpha", "beta"])
+        seen = []
+        swap = service._swap_in_partitions
+
+        def search_then_swap(shadow_dir):
+            seen.append(service.search_similar_chunks("beta", user_id=1, top_k=1, db=db)[0]['chunk_id'])
+            swap(shadow_dir)
+
+        with patch.object(service, '_swap_in_partitions', search_then_swap):
+            assert service.rebuild_index(db)
+
+        assert seen == ['doc-1']
+        assert service.get_stats()['partitions_loaded'] == 0  # reloaded lazily from the new set
+
+    def test_write_during_rebuild_not_lost(self, service, db):
+        """Test that a document added mid-rebuild is searchable after the swap."""
+        add_document(service, db, 1, 'old', ["before rebuild"])
+        swap = service._swap_in_partitions
+
+        def add_then_swap(shadow_dir):
+            add_document(service, db, 1, 'new', ["during rebuild"])
+            swap(shadow_dir)
+
+        with patch.object(service, '_swap_in_partitions', add_then_swap):
+            assert service.rebuild_index(db)
+
+        results = service.search_similar_chunks("during rebuild", user_id=1, top_k=1, db=db)
+        assert results[0]['chunk_id'] == 'new-0'
+
+    def test_concurrent_rebuild_rejected(self, service, db):
+        """Test that only one rebuild runs at a time."""
+        service._rebuild_lock.acquire()
+        try:
+            assert service.rebuild_index(db) is False
+        finally:
+            service._rebuild_lock.release()
+
+
+class TestSearchHydration:
+    """Tests for the read-only search path."""
+
+    def test_hits_hydrated_with_one_query_and_no_writes(self, service, db):
+        """Test that a search issues a single SELECT for its hits and never writes."""
+        add_document(service, db, 1, 'doc', [f"fact {i}" for i in range(8)])
+        statements = []
+        listen = lambda conn, cursor, statement, *args: statements.append(statement.split()[0].upper())
+        event.listen(db.get_bind(), 'before_cursor_execute', listen)
+        try:
+            results = service.search_similar_chunks("fact 3", user_id=1, top_k=5, similarity_threshold=-1, db=db)
+        finally:
+            event.remove(db.get_bind(), 'before_cursor_execute', listen)
+
+        assert len(results) == 5
+        assert results[0]['chunk_id'] == 'doc-3'
+        assert statements == ['SELECT']
+
+    def test_access_counts_flushed_in_batch(self, service, db):
+        """Test that buffered access counts are written by flush_access_counts."""
+        add_document(service, db, 1, 'doc', ["alpha"])
+        for _ in range(3):
+            service.search_similar_chunks("alpha", user_id=1, top_k=1, db=db)
+
+        assert db.get(Document, 'doc').access_count == 0
+        assert service.flush_access_counts(db) == 1
+
+        db.expire_all()
+        assert db.get(Document, 'doc').access_count == 3
+        assert service.flush_access_counts(db) == 0
+
+
+class TestConcurrentAccess:
+    """Tests for searches racing uploads and deletes."""
+
+    def test_interleaved_uploads_deletes_and_searches(self, service, db):
+        """Test that searches stay consistent while other threads upload and delete documents."""
+        Session = sessionmaker(bind=db.get_bind())
+        add_document(service, db, 1, 'base', [f"base {i}" for i in range(20)])
+        deleted = set()
+        errors = []
+        done = threading.Event()
+
+        def uploader():
+            session = Session()
+            try:
+                for n in range(15):
+                    add_document(service, session, 1, f"up{n}", [f"upload {n} part {i}" for i in range(3)])
+            finally:
+                session.close()
+
+        def deleter():
+            session = Session()
+            try:
+                for i in range(0, 20, 2):
+                    service.remove_document_embeddings(f"del{i}", session)
+                    deleted.add(f"del{i}")
+            finally:
+                session.close()
+
+        def searcher(seed):
+            session = Session()
+            rng = np.random.default_rng(seed)
+            try:
+                while not done.is_set():
+                    gone = set(deleted)
+                    text = f"delete me {rng.integers(20)}"
+                    results = service.search_similar_chunks(text, user_id=1, top_k=5,
+                                                            similarity_threshold=-1, db=session)
+                    for result in results:
+                        if result['document_id'] in gone:
+                            errors.append(f"{result['chunk_id']} returned after its document was deleted")
+                    expected = FakeModel(None).encode([text])[0]
+                    for result in results:
+                        chunk = session.get(DocumentChunk, result['chunk_id'])
+                        actual = FakeModel(None).encode([chunk.text_content])[0]
+                        if abs(result['similarity_score'] - float(expected @ actual)) > 1e-4:
+                            errors.append(f"{result['chunk_id']} scored against the wrong vector")
+            finally:
+                session.close()
+
+        for i in range(20):
+            add_document(service, db, 1, f"del{i}", [f"delete me {i}"])
+
+        writers = [threading.Thread(target=uploader), threading.Thread(target=deleter)]
+        readers = [threading.Thread(target=searcher, args=(seed,)) for seed in range(3)]
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        assert errors == []
+        partition = service._partitions[1]
+        assert partition.live_count == 20 + 15 * 3 + 10
+        assert not any(chunk_id.startswith(('del0-', 'del2-')) for chunk_id in partition.chunk_labels)
+
+
+@pytest.fixture(params=['in_process', 'sidecar'])
+def backend(request, service, db):
+    """The embedding service itself, or a client talking to it through the sidecar app."""
+    if request.param == 'in_process':
+        yield service
+        return
+    from fastapi.testclient import TestClient
+    from miachat.api.core.vector_client import RemoteEmbeddingService
+    from miachat.api.vector_service import create_app
+
+    with TestClient(create_app(service, sessionmaker(bind=db.get_bind()))) as client:
+        yield RemoteEmbeddingService(url='http://testserver', client=client)
+
+
+class TestBackends:
+    """Tests that the in-process service and the sidecar client behave the same."""
+
+    def test_add_search_and_remove(self, backend, db):
+        """Test that documents are searchable per user and gone after removal."""
+        add_document(backend, db, 1, 'one', ["alpha note", "beta note"])
+        add_document(backend, db, 2, 'two', ["gamma note"])
+
+        results = backend.search_similar_chunks("alpha note", user_id=1, top_k=2, similarity_threshold=0.0, db=db)
+        assert results[0]['chunk_id'] == 'one-0'
+        assert results[0]['similarity_score'] == pytest.approx(1.0, abs=1e-4)
+        assert {r['document_id'] for r in results} == {'one'}
+
+        assert backend.remove_document_embeddings('one', db)
+        db.query(DocumentChunk).filter(DocumentChunk.document_id == 'one').delete()
+        db.commit()
+        assert backend.search_similar_chunks("alpha note", user_id=1, similarity_threshold=0.0, db=db) == []
+
+    def test_embeddings_and_stats(self, backend, db):
+        """Test that embeddings round-trip exactly and stats report the loaded partition."""
+        embeddings = backend.create_embeddings(["alpha", "beta"])
+        np.testing.assert_array_equal(embeddings, FakeModel('x').encode(["alpha", "beta"]))
+
+        assert backend.get_readiness()['ready'] is True
+
+        add_document(backend, db, 1, 'one', ["alpha note"])
+        stats = backend.get_stats()
+        assert stats['embedding_dimension'] == DIMENSION
+        assert stats['partitions_loaded'] == 1
+        assert stats['live_vectors'] == 1
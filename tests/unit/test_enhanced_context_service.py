@@ -6,7 +6,9 @@ import pytest
 from datetime import datetime
 from unittest.mock import MagicMock, patch, PropertyMock
 
-from miachat.api.core.enhanced_context_service import EnhancedContextService, enhanced_context_service
+from miachat.api.core.enhanced_context_service import (
+    ContextSource, EnhancedContextService, SourceResult, enhanced_context_service
+)
 
 
 class TestEnhancedContextServiceInit:
@@ -247,6 +249,266 @@ class TestEnhancedContextRetrieval:
         assert len(result['reasoning_chain']) == 0
 
 
+class TestConcurrentAssembly:
+    """Tests for concurrent source fetching."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.service = EnhancedContextService(max_source_workers=4)
+        self.mock_db = MagicMock()
+
+    def _slow(self, delay, value):
+        """Return a side effect that sleeps before returning value."""
+        import time
+
+        def side_effect(*args, **kwargs):
+            time.sleep(delay)
+            return value
+        return side_effect
+
+    @patch('miachat.api.core.enhanced_context_service.memory_service')
+    @patch('miachat.api.core.enhanced_context_service.setting_service')
+    @patch('miachat.api.core.enhanced_context_service.backstory_service')
+    @patch('miachat.api.core.enhanced_context_service.fact_extraction_service')
+    @patch('miachat.api.core.enhanced_context_service.user_profile_service')
+    @patch('miachat.api.core.enhanced_context_service.tracking_service')
+    def test_concurrent_matches_sequential(
+        self, mock_tracking, mock_user_profile, mock_facts,
+        mock_backstory, mock_setting, mock_memory
+    ):
+        """Test that concurrent assembly produces exactly the sequential result."""
+        # Earlier sources are slower, so completion order is the reverse of merge order
+        mock_memory.get_context.side_effect = self._slow(0.05, [{'role': 'user', 'content': 'Hi'}])
+        mock_user_profile.format_user_profile_context.side_effect = self._slow(0.04, "User likes coffee")
+        mock_setting.format_setting_context.side_effect = self._slow(0.03, "Modern day setting")
+        mock_tracking.get_tracking_context.side_effect = self._slow(0.02, "Goal: run")
+        mock_backstory.get_relevant_backstory.side_effect = self._slow(0.01, ["Background"])
+        mock_facts.get_user_facts.return_value = [{'fact_key': 'name', 'fact_value': 'Jason'}]
+
+        kwargs = dict(
+            user_message="Tell me about yourself",
+            user_id=1,
+            conversation_id=1,
+            character_id="test-char",
+            db=self.mock_db,
+            include_documents=False
+        )
+        sequential = self.service.get_enhanced_context(concurrent=False, **kwargs)
+        concurrent = self.service.get_enhanced_context(concurrent=True, **kwargs)
+
+        assert concurrent == sequential
+        steps = [s['step'] for s in concurrent['reasoning_chain']]
+        assert steps.index('conversation_context') < steps.index('user_profile_context') < steps.index('backstory_retrieval')
+
+    @patch('miachat.api.core.enhanced_context_service.memory_service')
+    @patch('miachat.api.core.enhanced_context_service.setting_service')
+    @patch('miachat.api.core.enhanced_context_service.user_profile_service')
+    def test_source_failure_matches_sequential(self, mock_user_profile, mock_setting, mock_memory):
+        """Test that a failing source yields the same error result in both modes."""
+        mock_memory.get_context.return_value = []
+        mock_user_profile.format_user_profile_context.return_value = ""
+        mock_setting.format_setting_context.side_effect = RuntimeError("settings unavailable")
+
+        kwargs = dict(
+            user_message="Hello",
+            user_id=1,
+            character_id="test-char",
+            db=self.mock_db,
+            include_documents=False
+        )
+        sequential = self.service.get_enhanced_context(concurrent=False, **kwargs)
+        concurrent = self.service.get_enhanced_context(concurrent=True, **kwargs)
+
+        assert concurrent == sequential
+        assert concurrent['error'] == "settings unavailable"
+
+    def test_sequential_flag_from_environment(self, monkeypatch):
+        """Test that CONTEXT_CONCURRENT_ASSEMBLY=false selects the sequential path."""
+        monkeypatch.setenv('CONTEXT_CONCURRENT_ASSEMBLY', 'false')
+
+        assert EnhancedContextService().concurrent_assembly is False
+
+
+class TestSourcePools:
+    """Tests for the shared source pools under load."""
+
+    def _source(self, name, delay, ran, network=False, **kwargs):
+        """A source that sleeps, records that it ran and returns one update."""
+        import time
+
+        def fetch(db):
+            ran.append(name)
+            time.sleep(delay)
+            return SourceResult(updates={name: True})
+        return ContextSource(name, fetch, needs_db=False, network=network, **kwargs)
+
+    def test_unstarted_sources_cancelled_at_deadline(self):
+        """Test that queued fetches are cancelled instead of running after their turn gave up."""
+        import time
+
+        service = EnhancedContextService(max_source_workers=1, local_deadline_ms=100)
+        ran = []
+        results = service._fetch_sources_concurrently(
+            [self._source('slow', 0.3, ran), self._source('queued', 0, ran)], db=None
+        )
+        time.sleep(0.4)
+
+        assert [r.skipped for r in results] == [True, True]
+        assert ran == ['slow']
+        assert service.get_stats()['sources']['queued']['cancelled'] == 1
+
+    def test_slow_network_source_does_not_block_local_sources(self):
+        """Test that a hung network call leaves the local pool free for the next turn."""
+        service = EnhancedContextService(max_source_workers=1, max_network_workers=1, assembly_budget_ms=100)
+        ran = []
+        service._fetch_sources_concurrently([self._source('calendar', 0.5, ran, network=True)], db=None)
+
+        results = service._fetch_sources_concurrently([self._source('setting', 0, ran)], db=None)
+
+        assert results[0].updates == {'setting': True}
+        assert service._get_executor(network=True) is not service._get_executor()
+
+    def test_local_sources_outlast_network_budget(self):
+        """Test that a local source slower than the network budget is still used."""
+        service = EnhancedContextService(assembly_budget_ms=50, local_deadline_ms=1000)
+        results = service._fetch_sources_concurrently([self._source('backstory', 0.15, [])], db=None)
+
+        assert results[0].updates == {'backstory': True}
+
+    def test_required_source_never_dropped(self):
+        """Test that a required source is waited for past the local deadline."""
+        service = EnhancedContextService(local_deadline_ms=50)
+        results = service._fetch_sources_concurrently(
+            [self._source('documents', 0.15, [], required=True)], db=None
+        )
+
+        assert results[0].updates == {'documents': True}
+        assert not results[0].skipped
+
+    def test_pinned_and_comprehensive_documents_required(self):
+        """Test that forced document IDs or comprehensive analysis make the documents source required."""
+        service = EnhancedContextService()
+
+        def documents_source(**kwargs):
+            plan = service._plan_context_sources(
+                user_message="hi", user_id=1, conversation_id=None, character_id=None,
+                include_conversation_history=False, include_documents=True,
+                force_search=False, doc_references=[], **kwargs
+            )
+            return plan[0]
+
+        assert documents_source(comprehensive_analysis=False, force_document_ids=['d1']).required
+        assert documents_source(comprehensive_analysis=True, force_document_ids=None).required
+        assert not documents_source(comprehensive_analysis=False, force_document_ids=None).required
+
+    def test_message_dependent_late_result_not_reused(self):
+        """Test that a late result of a source without cache_key is never served to a later turn."""
+        import time
+
+        service = EnhancedContextService(local_deadline_ms=50)
+        service._fetch_sources_concurrently([self._source('backstory', 0.1, [])], db=None)
+        time.sleep(0.15)
+        results = service._fetch_sources_concurrently([self._source('backstory', 0.1, [])], db=None)
+
+        assert results[0].skipped
+        assert service.get_stats()['cached_late_results'] == 0
+
+
+class TestSourceDeadlines:
+    """Tests for per-source deadlines and late-result caching."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.service = EnhancedContextService(
+            concurrent_assembly=True,
+            assembly_budget_ms=150,
+            source_deadlines_ms={'calendar': 100}
+        )
+        self.mock_db = MagicMock()
+        sync_config = MagicMock()
+        sync_config.calendar_sync_enabled = True
+        self.mock_db.query.return_value.filter_by.return_value.first.return_value = sync_config
+
+    def _get_context(self, message="What's on today?"):
+        return self.service.get_enhanced_context(
+            user_message=message,
+            user_id=1,
+            character_id="test-char",
+            db=self.mock_db,
+            include_documents=False
+        )
+
+    @patch('miachat.api.core.enhanced_context_service.google_calendar_service')
+    @patch('miachat.api.core.enhanced_context_service.memory_service')
+    @patch('miachat.api.core.enhanced_context_service.setting_service')
+    @patch('miachat.api.core.enhanced_context_service.backstory_service')
+    @patch('miachat.api.core.enhanced_context_service.fact_extraction_service')
+    @patch('miachat.api.core.enhanced_context_service.user_profile_service')
+    @patch('miachat.api.core.enhanced_context_service.tracking_service')
+    def test_slow_source_dropped_then_served_next_turn(
+        self, mock_tracking, mock_user_profile, mock_facts,
+        mock_backstory, mock_setting, mock_memory, mock_calendar
+    ):
+        """Test that a late calendar is skipped, cached on arrival and reused for the next message."""
+        import time
+
+        mock_setting.format_setting_context.return_value = "Modern day setting"
+        mock_user_profile.format_user_profile_context.return_value = ""
+        mock_tracking.get_tracking_context.return_value = ""
+        mock_backstory.get_relevant_backstory.return_value = []
+        mock_facts.get_user_facts.return_value = []
+
+        def slow_calendar(**kwargs):
+            time.sleep(0.3)
+            return "Dentist at 3pm"
+        mock_calendar.get_calendar_context.side_effect = slow_calendar
+
+        started = time.monotonic()
+        first = self._get_context()
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.3
+        assert first['calendar_context'] == ''
+        assert first['skipped_sources'] == ['calendar']
+        assert first['setting_context'] == "Modern day setting"
+        assert any(s['step'] == 'source_timeout' for s in first['reasoning_chain'])
+
+        time.sleep(0.35)  # Let the late result land in the cache
+        second = self._get_context("Anything else this week?")
+
+        assert second['calendar_context'] == "Dentist at 3pm"
+        assert second['skipped_sources'] == []
+
+        stats = self.service.get_stats()['sources']['calendar']
+        assert stats['timed_out'] == 2
+        assert stats['late_arrivals'] >= 1
+        assert stats['served_from_cache'] == 1
+
+    @patch('miachat.api.core.enhanced_context_service.memory_service')
+    @patch('miachat.api.core.enhanced_context_service.setting_service')
+    @patch('miachat.api.core.enhanced_context_service.user_profile_service')
+    def test_fast_sources_recorded_in_stats(self, mock_user_profile, mock_setting, mock_memory):
+        """Test that on-time sources are counted as completed."""
+        mock_memory.get_context.return_value = []
+        mock_user_profile.format_user_profile_context.return_value = ""
+        mock_setting.format_setting_context.return_value = ""
+        self.mock_db.query.return_value.filter_by.return_value.first.return_value = None
+
+        with patch('miachat.api.core.enhanced_context_service.backstory_service') as mock_backstory, \
+             patch('miachat.api.core.enhanced_context_service.fact_extraction_service') as mock_facts, \
+             patch('miachat.api.core.enhanced_context_service.tracking_service') as mock_tracking:
+            mock_backstory.get_relevant_backstory.return_value = []
+            mock_facts.get_user_facts.return_value = []
+            mock_tracking.get_tracking_context.return_value = ""
+            result = self._get_context()
+
+        stats = self.service.get_stats()
+        assert result['skipped_sources'] == []
+        assert stats['assemblies'] == 1
+        assert stats['degraded_assemblies'] == 0
+        assert stats['sources']['setting']['completed'] == 1
+
+
 class TestRecentConversationContext:
     """Tests for recent conversation context retrieval."""
 
@@ -0,0 +1,250 @@
+"""
+Unit tests for the FTS5 document index and hybrid document search.
+"""
+
+import hashlib
+import re
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from miachat.database.models import Base, User, Document, DocumentChunk
+from miachat.database.fulltext import (
+    ensure_fulltext_index, fulltext_available, match_query, rebuild_fulltext_index,
+    search_chunks, search_document_titles
+)
+from miachat.api.core.document_service import DocumentService, reciprocal_rank_fusion
+from miachat.api.core.embedding_service import EmbeddingService
+from miachat.api.core.enhanced_context_service import EnhancedContextService
+
+DIMENSION = 256
+
+
+def word_vector(word):
+    rng = np.random.default_rng(int(hashlib.md5(word.encode()).hexdigest()[:8], 16))
+    return rng.standard_normal(DIMENSION).astype(np.float32)
+
+
+class FakeModel:
+    """Deterministic stand-in for SentenceTransformer: texts sharing words get similar vectors."""
+
+    def __init__(self, name):
+        pass
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = []
+        for text in texts:
+            vector = sum(word_vector(word) for word in re.findall(r'\w+', text.lower()))
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.array(vectors, dtype=np.float32)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a throwaway SQLite database with the full-text index and two users."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'docs.db'}")
+    Base.metadata.create_all(bind=engine)
+    assert ensure_fulltext_index(engine)
+    session = sessionmaker(bind=engine)()
+    for user_id in (1, 2):
+        session.add(User(id=user_id, username=f"u{user_id}", email=f"u{user_id}@test", password_hash="x"))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def embeddings(tmp_path):
+    """Embedding service with a fake model, patched in where document search uses it."""
+    with patch('sentence_transformers.SentenceTransformer', FakeModel):
+        service = EmbeddingService(index_path=str(tmp_path / 'faiss_index'))
+        with patch('miachat.api.core.document_service.embedding_service', service):
+            yield service
+
+
+def add_document(db, user_id, doc_id, filename, texts, title=None, embeddings=None, processed=True):
+    """Create a document with one chunk per text, embedding it if a service is given."""
+    db.add(Document(id=doc_id, user_id=user_id, filename=filename, original_filename=filename,
+                    file_path=f"/tmp/{filename}", doc_type='txt', file_size=1, is_processed=int(processed),
+                    doc_metadata={'title': title} if title else {}))
+    chunks = []
+    for i, text in enumerate(texts):
+        chunk_id = f"{doc_id}-{i}"
+        db.add(DocumentChunk(id=chunk_id, document_id=doc_id, chunk_index=i, text_content=text))
+        chunks.append({'id': chunk_id, 'text_content': text})
+    db.commit()
+    if embeddings is not None:
+        assert embeddings.add_document_embeddings(doc_id, chunks, db)
+
+
+class TestFulltextIndex:
+    """Tests for the FTS5 table and its sync triggers."""
+
+    def test_exact_term_ranked_first(self, db):
+        """Test that a code is found by BM25 and the matching chunk ranks first."""
+        add_document(db, 1, 'd1', 'notes.txt', ["Order ZX-481 shipped in March", "Weather was mild in March"])
+
+        hits = search_chunks(db, "where is ZX-481?", user_id=1)
+
+        assert hits[0][0] == 'd1-0'
+        assert 'd1-1' not in [chunk_id for chunk_id, _ in hits]
+
+    def test_search_scoped_to_user(self, db):
+        """Test that other users' chunks are not returned."""
+        add_document(db, 2, 'd2', 'secret.txt', ["Codename bluebird"])
+        assert search_chunks(db, "bluebird", user_id=1) == []
+
+    def test_triggers_follow_updates_and_deletes(self, db):
+        """Test that edited and deleted chunks are reflected without a rebuild."""
+        add_document(db, 1, 'd1', 'notes.txt', ["alpha", "beta"])
+        db.get(DocumentChunk, 'd1-0').text_content = "gamma"
+        db.delete(db.get(DocumentChunk, 'd1-1'))
+        db.commit()
+
+        assert search_chunks(db, "alpha", 1) == []
+        assert search_chunks(db, "beta", 1) == []
+        assert [chunk_id for chunk_id, _ in search_chunks(db, "gamma", 1)] == ['d1-0']
+
+    def test_renamed_document_retitled(self, db):
+        """Test that renaming a document updates the indexed title of its chunks."""
+        add_document(db, 1, 'd1', 'draft.txt', ["text"])
+        db.get(Document, 'd1').original_filename = 'Quarterly_Budget.xlsx'
+        db.commit()
+
+        assert search_document_titles(db, "draft", 1) == []
+        assert search_document_titles(db, "quarterly budget", 1) == ['d1']
+
+    def test_existing_chunks_backfilled(self, tmp_path):
+        """Test that creating the index on a populated database indexes the existing chunks."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add(User(id=1, username="u1", email="u1@test", password_hash="x"))
+        add_document(session, 1, 'd1', 'old.txt', ["legacy content"])
+
+        assert ensure_fulltext_index(engine)
+        assert [chunk_id for chunk_id, _ in search_chunks(session, "legacy", 1)] == ['d1-0']
+        assert rebuild_fulltext_index(session) == 1
+        session.close()
+
+    def test_match_query_quotes_input(self):
+        """Test that FTS5 syntax in user input is quoted and stopwords are dropped."""
+        assert match_query('the "NEAR" OR code*') == '"near" OR "code"'
+        assert match_query('budget rep', match_all=True, prefix=True) == '"budget"* AND "rep"*'
+        assert match_query('?!') is None
+
+    def test_chunk_sharing_one_common_word_not_returned(self, db):
+        """Test that chunks containing under half of the query's words are dropped."""
+        add_document(db, 1, 'd1', 'notes.txt', ["Lunch menu for Friday", "Friday forecast: sunny, warm weather"])
+
+        hits = search_chunks(db, "what's the weather forecast for Friday?", user_id=1)
+
+        assert [chunk_id for chunk_id, _ in hits] == ['d1-1']
+
+
+class TestHybridSearch:
+    """Tests for fusing BM25 and vector results in DocumentService.search_documents."""
+
+    def test_reciprocal_rank_fusion(self):
+        """Test that items ranked well in both lists come first."""
+        fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['c', 'a']], k=60)
+        assert [item for item, _ in fused] == ['a', 'c', 'b']
+        assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+    def test_exact_term_found_below_similarity_threshold(self, db, embeddings, tmp_path):
+        """Test that a chunk the vector search drops is returned through BM25 with its cosine score."""
+        add_document(db, 1, 'd1', 'ids.txt', ["Badge number QX-7731 belongs to Dana", "Lunch menu for Friday"],
+                     embeddings=embeddings)
+        service = DocumentService(documents_dir=str(tmp_path / 'documents'))
+
+        results = service.search_documents("QX-7731", user_id=1, similarity_threshold=0.9, db=db)
+
+        assert [result['chunk_id'] for result in results] == ['d1-0']
+        assert results[0]['bm25_score'] > 0
+        expected = float(np.dot(embeddings.create_embeddings(["QX-7731"])[0],
+                                embeddings.create_embeddings(["Badge number QX-7731 belongs to Dana"])[0]))
+        assert results[0]['similarity_score'] == pytest.approx(expected, abs=1e-5)
+
+    def test_unrelated_query_returns_nothing(self, db, embeddings, tmp_path):
+        """Test that a message sharing a single word with the documents retrieves no chunks."""
+        add_document(db, 1, 'd1', 'ids.txt', ["Badge number QX-7731 belongs to Dana", "Lunch menu for Friday"],
+                     embeddings=embeddings)
+        service = DocumentService(documents_dir=str(tmp_path / 'documents'))
+
+        assert service.search_documents("See you Friday, have a nice weekend", user_id=1,
+                                        similarity_threshold=0.5, db=db) == []
+
+    def test_lexical_hit_below_floor_dropped(self, db, embeddings, tmp_path, monkeypatch):
+        """Test that a BM25-only hit whose cosine is under the lexical floor is not returned."""
+        monkeypatch.setenv('DOCUMENT_SEARCH_LEXICAL_FLOOR', '1')
+        add_document(db, 1, 'd1', 'ids.txt', ["Badge number QX-7731 belongs to Dana"], embeddings=embeddings)
+        service = DocumentService(documents_dir=str(tmp_path / 'documents'))
+
+        assert service.search_documents("QX-7731", user_id=1, similarity_threshold=0.9, db=db) == []
+
+    def test_vector_only_without_index(self, db, embeddings, tmp_path, monkeypatch):
+        """Test that DOCUMENT_SEARCH_HYBRID=false keeps the vector-only behavior."""
+        monkeypatch.setenv('DOCUMENT_SEARCH_HYBRID', 'false')
+        add_document(db, 1, 'd1', 'ids.txt', ["Badge number QX-7731 belongs to Dana"], embeddings=embeddings)
+        service = DocumentService(documents_dir=str(tmp_path / 'documents'))
+
+        assert service.search_documents("QX-7731", user_id=1, similarity_threshold=0.99, db=db) == []
+
+    def test_index_detected_per_database(self, db, tmp_path):
+        """Test that a database without the FTS table is reported as unavailable."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+        Base.metadata.create_all(bind=engine)
+        plain = sessionmaker(bind=engine)()
+
+        assert fulltext_available(db)
+        assert not fulltext_available(plain)
+        plain.close()
+
+
+class TestReferencedDocuments:
+    """Tests for resolving document references through the title index."""
+
+    def test_reference_matched_by_filename_words(self, db):
+        """Test that a reference matches filename words in any order and metadata titles."""
+        add_document(db, 1, 'd1', 'Q3_budget-report.pdf', ["numbers"])
+        add_document(db, 1, 'd2', 'scan_0042.pdf', ["minutes"], title="Board Meeting Minutes")
+        service = EnhancedContextService()
+
+        by_filename = service._get_referenced_documents(
+            [{'extracted_name': 'Report Budget', 'reference_text': 'the report budget'}], 1, db)
+        by_title = service._get_referenced_documents(
+            [{'extracted_name': 'board meeting', 'reference_text': 'the board meeting'}], 1, db)
+
+        assert {chunk['document_id'] for chunk in by_filename} == {'d1'}
+        assert {chunk['document_id'] for chunk in by_title} == {'d2'}
+
+    def test_unmatched_reference_returns_nothing(self, db):
+        """Test that a reference matching no title returns no chunks instead of every document."""
+        add_document(db, 1, 'd1', 'notes.txt', ["numbers"])
+        chunks = EnhancedContextService()._get_referenced_documents(
+            [{'extracted_name': 'invoice', 'reference_text': 'the invoice'}], 1, db)
+        assert chunks == []
+
+    def test_name_inside_word_found_by_substring_fallback(self, db):
+        """Test that a name embedded in a longer filename token still matches when the index finds nothing."""
+        add_document(db, 1, 'd1', '2024budget_final.pdf', ["numbers"])
+        chunks = EnhancedContextService()._get_referenced_documents(
+            [{'extracted_name': 'budget', 'reference_text': 'the budget'}], 1, db)
+        assert {chunk['document_id'] for chunk in chunks} == {'d1'}
+
+    def test_unprocessed_documents_do_not_crowd_out_processed(self, db):
+        """Test that documents still processing are filtered before the limit."""
+        add_document(db, 1, 'd1', 'budget.pdf', ["draft"], processed=False)
+        add_document(db, 1, 'd2', 'budget_v2.pdf', ["draft"], processed=False)
+        add_document(db, 1, 'd3', 'budget_final.pdf', ["numbers"])
+
+        assert search_document_titles(db, "budget", 1, processed_only=True) == ['d3']
+        chunks = EnhancedContextService()._get_referenced_documents(
+            [{'extracted_name': 'budget', 'reference_text': 'the budget'}], 1, db)
+        assert {chunk['document_id'] for chunk in chunks} == {'d3'}
@@ -0,0 +1,76 @@
+"""
+Startup import budget for the API application.
+
+Runs a cold ``python -X importtime -c "import miachat.api.main"`` in a
+subprocess and parses its report. Fails when heavy optional dependencies are
+imported at startup again, or when the cumulative import time of
+miachat.api.main exceeds IMPORT_TIME_BUDGET_MS. Cold imports measured
+1.4-2.1s, so the default of 4000 leaves headroom for slow or busy machines
+while still catching a heavy dependency creeping back in; a dedicated CI
+runner can set a tighter budget.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[2] / 'src'
+BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', '4000'))
+
+# Loaded by the code paths that use them, never by importing the app
+DEFERRED_MODULES = [
+    'fitz', 'pymupdf', 'pandas', 'docx', 'reportlab', 'PIL', 'tiktoken',
+    'googleapiclient.discovery', 'google.oauth2.credentials', 'google_auth_oauthlib',
+    'ddgs', 'duckduckgo_search', 'torch', 'sentence_transformers', 'onnxruntime',
+]
+
+
+def parse_importtime(report: str) -> dict:
+    """Parse ``-X importtime`` output into {module: cumulative microseconds}."""
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+@pytest.fixture(scope="module")
+def import_times(tmp_path_factory):
+    """Import times from a cold import of miachat.api.main in a fresh interpreter."""
+    env = {**os.environ, 'PYTHONPATH': str(SRC_DIR), 'PYTHONDONTWRITEBYTECODE': '1'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import miachat.api.main'],
+        cwd=tmp_path_factory.mktemp('import_time'), env=env, capture_output=True, text=True, timeout=300
+    )
+    times = parse_importtime(result.stderr)
+    if 'miachat.api.main' not in times:
+        pytest.skip(f"miachat.api.main cannot be imported here: {result.stderr.strip().splitlines()[-1:]}")
+    return times
+
+
+class TestImportTime:
+    """Tests for the cold-start import budget."""
+
+    def test_heavy_dependencies_deferred(self, import_times):
+        """Test that document, export, image, Google, search and model libraries are not imported at startup."""
+        loaded = [module for module in DEFERRED_MODULES if module in import_times]
+        assert loaded == []
+
+    def test_main_within_budget(self, import_times):
+        """Test that importing miachat.api.main stays within IMPORT_TIME_BUDGET_MS."""
+        elapsed_ms = import_times['miachat.api.main'] / 1000
+        assert elapsed_ms <= BUDGET_MS, f"miachat.api.main took {elapsed_ms:.0f}ms (budget {BUDGET_MS:.0f}ms)"
+
+    def test_parse_importtime(self):
+        """Test that the importtime report is parsed into cumulative times per module."""
+        report = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   json.decoder\n"
+            "import time:       300 |        420 | json\n"
+        )
+        assert parse_importtime(report) == {'json.decoder': 120, 'json': 420}
@@ -0,0 +1,262 @@
+"""
+Unit tests for JobQueue - durable background jobs.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from miachat.database.models import Base, BackgroundJob
+from miachat.api.core.job_queue import JobQueue, _merge_exchanges, _run_fact_extraction, _run_sidebar_extraction
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Session factory for a throwaway SQLite database."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def queue(session_factory):
+    """A queue with no retry delay, run on the test thread."""
+    return JobQueue(session_factory=session_factory, workers=1, backoff_base=0)
+
+
+class TestEnqueueAndRun:
+    """Tests for enqueueing and running jobs."""
+
+    def test_job_runs_and_stores_result(self, queue):
+        """Test that a job runs once and records its result."""
+        calls = []
+        queue.register('echo', lambda payload, db: calls.append(payload) or {'echo': payload['value']})
+
+        job_id = queue.enqueue('echo', {'value': 42})
+        assert queue.run_pending() == 1
+
+        job = queue.get_job(job_id)
+        assert job['status'] == 'succeeded'
+        assert job['result'] == {'echo': 42}
+        assert calls == [{'value': 42}]
+
+    def test_async_handler_runs(self, queue):
+        """Test that coroutine handlers are awaited on the worker."""
+        async def handler(payload, db):
+            return payload['value'] * 2
+
+        queue.register('double', handler)
+        job_id = queue.enqueue('double', {'value': 21})
+        queue.run_pending()
+
+        assert queue.get_job(job_id)['result'] == 42
+
+    def test_unknown_job_type_rejected(self, queue):
+        """Test that enqueueing an unregistered type raises."""
+        with pytest.raises(ValueError):
+            queue.enqueue('nope', {})
+
+
+class TestCoalescing:
+    """Tests for coalescing pending jobs."""
+
+    def test_pending_jobs_with_same_key_are_merged(self, queue):
+        """Test that a second enqueue folds into the pending job."""
+        seen = []
+        queue.register('facts', lambda payload, db: seen.append(payload), merge=_merge_exchanges)
+
+        first = queue.enqueue('facts', {'exchanges': [{'user_message': 'a'}]}, coalesce_key='facts:1:c')
+        second = queue.enqueue('facts', {'exchanges': [{'user_message': 'b'}]}, coalesce_key='facts:1:c')
+        other = queue.enqueue('facts', {'exchanges': [{'user_message': 'c'}]}, coalesce_key='facts:2:c')
+        queue.run_pending()
+
+        assert first == second
+        assert other != first
+        assert seen[0]['exchanges'] == [{'user_message': 'a'}, {'user_message': 'b'}]
+
+    def test_without_merge_pending_payload_is_kept(self, queue):
+        """Test that coalescing without a merge function keeps the first payload."""
+        queue.register('title', lambda payload, db: payload['n'])
+
+        job_id = queue.enqueue('title', {'n': 1}, coalesce_key='conversation:7')
+        queue.enqueue('title', {'n': 2}, coalesce_key='conversation:7')
+        queue.run_pending()
+
+        assert queue.get_job(job_id)['result'] == 1
+
+
+class TestRetries:
+    """Tests for retry and failure handling."""
+
+    def test_failed_job_retried_then_succeeds(self, queue):
+        """Test that a transient failure is retried."""
+        attempts = []
+
+        def flaky(payload, db):
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise RuntimeError("provider down")
+            return 'ok'
+
+        queue.register('flaky', flaky, max_attempts=3)
+        job_id = queue.enqueue('flaky', {})
+        queue.run_pending()
+
+        job = queue.get_job(job_id)
+        assert job['status'] == 'succeeded'
+        assert job['attempts'] == 2
+
+    def test_job_fails_after_max_attempts(self, queue):
+        """Test that a job is marked failed once attempts run out."""
+        def broken(payload, db):
+            raise RuntimeError("always")
+
+        queue.register('broken', broken, max_attempts=2)
+        job_id = queue.enqueue('broken', {})
+        queue.run_pending()
+
+        job = queue.get_job(job_id)
+        assert job['status'] == 'failed'
+        assert job['attempts'] == 2
+        assert job['last_error'] == "always"
+
+    def test_retry_waits_for_backoff(self, session_factory):
+        """Test that a retried job is not due until its backoff expires."""
+        queue = JobQueue(session_factory=session_factory, backoff_base=60)
+        queue.register('broken', lambda payload, db: 1 / 0, max_attempts=3)
+
+        job_id = queue.enqueue('broken', {})
+        assert queue.run_pending() == 1  # first attempt only
+
+        job = queue.get_job(job_id)
+        assert job['status'] == 'pending'
+        assert datetime.fromisoformat(job['run_after']) > datetime.utcnow() + timedelta(seconds=50)
+
+
+class TestDurability:
+    """Tests for restart behaviour and statistics."""
+
+    def test_interrupted_jobs_requeued_on_start(self, queue, session_factory):
+        """Test that jobs left running by a dead process run again."""
+        queue.register('echo', lambda payload, db: 'done')
+        job_id = queue.enqueue('echo', {})
+
+        db = session_factory()
+        db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update({'status': 'running'})
+        db.commit()
+        db.close()
+
+        queue._requeue_interrupted()
+        queue.run_pending()
+
+        assert queue.get_job(job_id)['status'] == 'succeeded'
+
+    def test_stats_report_depth_and_latency(self, queue):
+        """Test that stats include per-type depth and latency."""
+        queue.register('echo', lambda payload, db: None)
+        queue.enqueue('echo', {})
+        queue.enqueue('echo', {})
+        queue.run_pending(limit=1)
+
+        stats = queue.get_stats()
+
+        assert stats['queue_depth'] == 1
+        assert stats['job_types']['echo']['pending'] == 1
+        assert stats['job_types']['echo']['succeeded'] == 1
+        assert stats['job_types']['echo']['avg_run_seconds'] is not None
+        assert stats['job_types']['echo']['oldest_pending_seconds'] is not None
+
+
+class TestFactExtraction:
+    """Tests for deferred fact extraction."""
+
+    def test_coalesced_exchanges_keep_their_replies(self):
+        """Test that every user message is passed with its own reply, in order, for its conversation."""
+        exchanges = [
+            {'user_message': 'I moved last month', 'assistant_response': 'Where to?', 'conversation_id': 's1'},
+            {'user_message': 'Lisbon', 'assistant_response': 'Lovely city!', 'conversation_id': 's1'},
+        ]
+        payload = {'user_id': 1, 'character_id': 'c', 'exchanges': exchanges}
+        service = 'miachat.api.core.fact_extraction_service.fact_extraction_service'
+        with patch(f'{service}.delete_facts_from_message', AsyncMock(return_value=[])), \
+                patch(f'{service}.extract_facts_from_message', AsyncMock(return_value=[{}])) as extract:
+            result = asyncio.run(_run_fact_extraction(payload, MagicMock()))
+
+        kwargs = extract.call_args.kwargs
+        assert kwargs['user_message'] == "I moved last month\nLisbon"
+        assert kwargs['assistant_response'] == (
+            "User: I moved last month\nAssistant: Where to?\n\nUser: Lisbon\nAssistant: Lovely city!"
+        )
+        assert kwargs['conversation_id'] == 's1'
+        assert result == {'deleted': 0, 'extracted': 1}
+
+
+class TestSidebarExtraction:
+    """Tests for deferred calendar extraction."""
+
+    def test_coalesced_messages_all_extracted(self, queue):
+        """Test that messages merged into one job are each extracted."""
+        queue.register('sidebar_extraction', _run_sidebar_extraction, merge=_merge_exchanges)
+        extract = AsyncMock(side_effect=lambda message, **kwargs: [{'summary': message}])
+
+        payload = lambda text: {'user_id': 1, 'character_id': 'c', 'messages': [{'message': text}]}
+        job_id = queue.enqueue('sidebar_extraction', payload('dentist at 3pm'), coalesce_key='sidebar:1:c')
+        queue.enqueue('sidebar_extraction', payload('lunch on friday'), coalesce_key='sidebar:1:c')
+
+        with patch('miachat.api.core.sidebar_extraction_service.sidebar_extraction_service.extract_calendar_events', extract):
+            queue.run_pending()
+
+        job = queue.get_job(job_id)
+        assert job['status'] == 'succeeded'
+        assert job['result'] == {
+            'calendar_events': [{'summary': 'dentist at 3pm'}, {'summary': 'lunch on friday'}], 'failed': 0
+        }
+
+    def test_failed_message_not_retried(self):
+        """Test that a failing message neither aborts the batch nor re-creates the other messages' events."""
+        from miachat.api.core.job_queue import job_queue
+        assert job_queue._job_types['sidebar_extraction'].max_attempts == 1
+
+        created = []
+
+        async def extract(message, **kwargs):
+            if message == 'bad':
+                raise RuntimeError("calendar API down")
+            created.append(message)
+            return [{'summary': message}]
+
+        payload = {'user_id': 1, 'character_id': 'c', 'messages': [{'message': m} for m in ('a', 'bad', 'b')]}
+        db = MagicMock()
+        with patch('miachat.api.core.sidebar_extraction_service.sidebar_extraction_service.extract_calendar_events', extract):
+            result = asyncio.run(_run_sidebar_extraction(payload, db))
+
+        assert created == ['a', 'b']
+        assert result == {'calendar_events': [{'summary': 'a'}, {'summary': 'b'}], 'failed': 1}
+
+
+class TestTitleGeneration:
+    """Tests for deferred conversation titles."""
+
+    def test_payload_holds_no_credentials(self, queue, session_factory):
+        """Test that the stored payload has only IDs and the LLM config is resolved when the job runs."""
+        from miachat.api.core.conversation_service import conversation_service
+        from miachat.api.core.job_queue import _run_title_generation
+
+        queue.register('title_generation', _run_title_generation)
+        with patch('miachat.api.core.job_queue.job_queue', queue):
+            job_id = conversation_service.generate_title_async(7, 1)
+        with session_factory() as db:
+            assert db.get(BackgroundJob, job_id).payload == {'conversation_id': 7, 'user_id': 1}
+
+        config = {'provider': 'openai', 'model': 'gpt-4o-mini', 'api_key': 'sk-secret'}
+        with patch('miachat.api.core.settings_service.settings_service.get_llm_config', return_value=config), \
+                patch.object(conversation_service, 'generate_title_with_llm', return_value="Trip plans") as generate:
+            queue.run_pending()
+
+        assert generate.call_args.args[0] == 7
+        assert generate.call_args.args[2] == config
+        assert queue.get_job(job_id)['result'] == "Trip plans"
@@ -0,0 +1,209 @@
+"""
+Unit tests for LLMClient - request building and the async pooled path.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from miachat.api.core.llm_client import LLMClient, ProviderConfigurationError
+
+
+def _client_with(handler) -> LLMClient:
+    """Create an LLMClient whose async pools use a mock transport."""
+    return LLMClient(transport=httpx.MockTransport(handler))
+
+
+class TestRequestBuilders:
+    """Tests for provider request preparation."""
+
+    def test_ollama_prepends_system_prompt(self):
+        """Test that Ollama requests include the system prompt as a message."""
+        client = LLMClient()
+        request = client._prepare_ollama(
+            [{"role": "user", "content": "Hi"}], "Be nice", {"model": "llama3.1:8b"}
+        )
+
+        assert request.url.endswith("/api/chat")
+        assert request.payload["messages"][0] == {"role": "system", "content": "Be nice"}
+        assert request.payload["stream"] is False
+
+    def test_anthropic_system_prompt_is_separate_field(self):
+        """Test that Anthropic requests move the system prompt out of messages."""
+        client = LLMClient()
+        request = client._prepare_anthropic(
+            [{"role": "system", "content": "x"}, {"role": "user", "content": "Hi"}],
+            "Be nice",
+            {"api_key": "k"}
+        )
+
+        assert request.payload["system"] == "Be nice"
+        assert all(m["role"] != "system" for m in request.payload["messages"])
+        assert request.headers["x-api-key"] == "k"
+
+    def test_missing_api_key_raises_configuration_error(self):
+        """Test that cloud builders refuse to build a request without a key."""
+        client = LLMClient()
+        client.openai_key = None
+
+        with pytest.raises(ProviderConfigurationError):
+            client._prepare_openai([], None, {})
+
+
+class TestAsyncGeneration:
+    """Tests for agenerate_response_with_config."""
+
+    @pytest.mark.asyncio
+    async def test_ollama_response_parsed(self):
+        """Test a successful Ollama round trip through the async pool."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            assert body["model"] == "llama3.1:8b"
+            return httpx.Response(200, json={"message": {"content": "Hello there"}})
+
+        client = _client_with(handler)
+        response = await client.agenerate_response_with_config(
+            [{"role": "user", "content": "Hi"}], None, {"provider": "ollama", "model": "llama3.1:8b"}
+        )
+        await client.aclose()
+
+        assert response == "Hello there"
+
+    @pytest.mark.asyncio
+    async def test_openai_response_parsed(self):
+        """Test a successful OpenAI round trip sends the bearer token."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.headers["Authorization"] == "Bearer sk-test"
+            return httpx.Response(200, json={"choices": [{"message": {"content": "OK"}}]})
+
+        client = _client_with(handler)
+        response = await client.agenerate_response_with_config(
+            [{"role": "user", "content": "Hi"}], "sys", {"provider": "openai", "api_key": "sk-test"}
+        )
+
+        assert response == "OK"
+
+    @pytest.mark.asyncio
+    async def test_pool_is_reused_per_provider(self):
+        """Test that repeated calls share one client per provider."""
+        client = _client_with(lambda r: httpx.Response(200, json={"message": {"content": "x"}}))
+
+        await client.agenerate_response_with_config([], None, {"provider": "ollama"})
+        first = client._async_clients["ollama"]
+        await client.agenerate_response_with_config([], None, {"provider": "ollama"})
+
+        assert client._async_clients["ollama"] is first
+
+    @pytest.mark.asyncio
+    async def test_connect_error_returns_message(self):
+        """Test that connection failures become a user-facing message."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("refused", request=request)
+
+        client = _client_with(handler)
+        response = await client.agenerate_response_with_config([], None, {"provider": "ollama"})
+
+        assert response == "Cannot connect to Ollama. Is the server running?"
+
+    @pytest.mark.asyncio
+    async def test_total_timeout_enforced(self):
+        """Test that the total budget cuts off a slow provider."""
+        async def slow_handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1)
+            return httpx.Response(200, json={"message": {"content": "late"}})
+
+        client = _client_with(slow_handler)
+        client.total_timeout = 0.05
+        response = await client.agenerate_response_with_config([], None, {"provider": "ollama"})
+
+        assert "timed out" in response
+
+    @pytest.mark.asyncio
+    async def test_http_error_status_returns_message(self):
+        """Test that non-2xx responses return the generic failure message."""
+        client = _client_with(lambda r: httpx.Response(500, json={}))
+        response = await client.agenerate_response_with_config(
+            [], None, {"provider": "openrouter", "api_key": "k"}
+        )
+
+        assert response == "Failed to generate response. Please try again."
+
+    @pytest.mark.asyncio
+    async def test_missing_provider(self):
+        """Test that a config without a provider is rejected without I/O."""
+        client = LLMClient()
+        response = await client.agenerate_response_with_config([], None, {})
+
+        assert "No LLM provider configured" in response
+
+
+class TestStreaming:
+    """Tests for astream_response_with_config."""
+
+    async def _collect(self, client, model_config):
+        return [d async for d in client.astream_response_with_config(
+            [{"role": "user", "content": "Hi"}], None, model_config
+        )]
+
+    @pytest.mark.asyncio
+    async def test_ollama_ndjson_stream(self):
+        """Test that Ollama NDJSON chunks are yielded in order."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert json.loads(request.content)["stream"] is True
+            lines = [
+                {"message": {"content": "Hel"}, "done": False},
+                {"message": {"content": "lo"}, "done": False},
+                {"message": {"content": ""}, "done": True},
+            ]
+            return httpx.Response(200, text="\n".join(json.dumps(l) for l in lines))
+
+        deltas = await self._collect(_client_with(handler), {"provider": "ollama"})
+
+        assert deltas == ["Hel", "lo"]
+
+    @pytest.mark.asyncio
+    async def test_openai_sse_stream(self):
+        """Test that OpenAI-style SSE deltas are parsed and [DONE] is ignored."""
+        body = (
+            ": keep-alive\n\n"
+            'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n'
+            'data: {"choices": [{"delta": {"content": "Hi"}}]}\n\n'
+            'data: {"choices": [{"delta": {"content": " there"}}]}\n\n'
+            "data: [DONE]\n\n"
+        )
+        client = _client_with(lambda r: httpx.Response(200, text=body))
+
+        deltas = await self._collect(client, {"provider": "openrouter", "api_key": "k"})
+
+        assert "".join(deltas) == "Hi there"
+
+    @pytest.mark.asyncio
+    async def test_anthropic_sse_stream(self):
+        """Test that only Anthropic content_block_delta events produce text."""
+        body = (
+            "event: message_start\n"
+            'data: {"type": "message_start", "message": {}}\n\n'
+            "event: content_block_delta\n"
+            'data: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Yo"}}\n\n'
+            "event: message_stop\n"
+            'data: {"type": "message_stop"}\n\n'
+        )
+        client = _client_with(lambda r: httpx.Response(200, text=body))
+
+        deltas = await self._collect(client, {"provider": "anthropic", "api_key": "k"})
+
+        assert deltas == ["Yo"]
+
+    @pytest.mark.asyncio
+    async def test_stream_error_raises_llm_error(self):
+        """Test that a failed stream surfaces a user-facing LLMError."""
+        from miachat.api.core.llm_client import LLMError
+
+        client = _client_with(lambda r: httpx.Response(503, text="busy"))
+
+        with pytest.raises(LLMError) as exc_info:
+            await self._collect(client, {"provider": "ollama"})
+
+        assert str(exc_info.value) == "Failed to generate response. Please try again."
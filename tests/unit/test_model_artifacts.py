@@ -0,0 +1,234 @@
+"""
+Unit tests for pinned, offline embedding model artifacts.
+"""
+
+import os
+import subprocess
+import sys
+import types
+from unittest.mock import patch
+
+import pytest
+
+from miachat.api.core.embedding_service import EmbeddingService
+from miachat.api.core.model_artifacts import (
+    ModelArtifactError, content_hash, resolve_model, verify_export_dir, verify_model_dir, write_manifest
+)
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """A saved-model directory with a nested file and a manifest."""
+    directory = tmp_path / 'model'
+    (directory / '1_Pooling').mkdir(parents=True)
+    (directory / 'config.json').write_text('{"hidden_size": 8}')
+    (directory / 'model.safetensors').write_bytes(b'\x00weights\x01' * 100)
+    (directory / '1_Pooling' / 'config.json').write_text('{"pooling_mode_mean_tokens": true}')
+    write_manifest(str(directory), 'test-model')
+    return directory
+
+
+@pytest.fixture
+def offline_env(monkeypatch):
+    """Restore the hub offline flags that resolve_model sets."""
+    monkeypatch.setenv('HF_HUB_OFFLINE', '0')
+    monkeypatch.setenv('TRANSFORMERS_OFFLINE', '0')
+    monkeypatch.delenv('EMBEDDING_MODEL_SHA256', raising=False)
+    return monkeypatch
+
+
+class RecordingModel:
+    """Stand-in SentenceTransformer that records where it was loaded from."""
+
+    loaded_from = []
+
+    def __init__(self, name_or_path):
+        self.loaded_from.append(name_or_path)
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+
+class OfflineRecordingModule(types.ModuleType):
+    """Stand-in sentence_transformers module that records the offline flag when it is imported from."""
+
+    def __init__(self):
+        super().__init__('sentence_transformers')
+        self.offline_at_import = []
+
+    def __getattr__(self, name):
+        if name != 'SentenceTransformer':
+            raise AttributeError(name)
+        self.offline_at_import.append(os.environ.get('HF_HUB_OFFLINE'))
+        return RecordingModel
+
+
+class FakeOnnxModel:
+    """Stand-in OnnxEmbeddingModel."""
+
+    def __init__(self, directory, quantize=False):
+        self.directory = directory
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+
+def fake_export(model, directory):
+    os.makedirs(directory, exist_ok=True)
+    for name in ('model.onnx', 'tokenizer.json', 'embedding_config.json'):
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(name)
+
+
+@pytest.fixture
+def onnx_backend(offline_env):
+    """ONNX backend with the torch export step and the runtime replaced by fakes."""
+    offline_env.setenv('EMBEDDING_BACKEND', 'onnx')
+    offline_env.delenv('EMBEDDING_ONNX_QUANTIZE', raising=False)
+    with patch('miachat.api.core.embedding_service.OnnxEmbeddingModel', FakeOnnxModel), \
+            patch('miachat.api.core.onnx_embeddings._write_export', side_effect=fake_export) as export, \
+            patch('sentence_transformers.SentenceTransformer', RecordingModel):
+        yield export
+
+
+class TestContentHash:
+    """Tests for hashing model directories."""
+
+    def test_hash_ignores_manifest(self, model_dir):
+        """Test that writing the manifest does not change the hash it records."""
+        before = content_hash(str(model_dir))
+        write_manifest(str(model_dir), 'test-model')
+        assert content_hash(str(model_dir)) == before
+
+    def test_hash_covers_contents_and_paths(self, model_dir):
+        """Test that changing a file's bytes or renaming it changes the hash."""
+        original = content_hash(str(model_dir))
+        (model_dir / 'config.json').write_text('{"hidden_size": 9}')
+        changed = content_hash(str(model_dir))
+        os.rename(model_dir / 'config.json', model_dir / 'config2.json')
+
+        assert len({original, changed, content_hash(str(model_dir))}) == 3
+
+
+class TestVerification:
+    """Tests for checking artifacts against their pinned hash."""
+
+    def test_manifest_hash_verified(self, model_dir, offline_env):
+        """Test that an untouched directory verifies against its manifest."""
+        assert verify_model_dir(str(model_dir)) == content_hash(str(model_dir))
+
+    def test_altered_file_rejected(self, model_dir, offline_env):
+        """Test that a modified weight file fails verification."""
+        (model_dir / 'model.safetensors').write_bytes(b'tampered')
+        with pytest.raises(ModelArtifactError, match="does not match"):
+            verify_model_dir(str(model_dir))
+
+    def test_env_pin_overrides_manifest(self, model_dir, offline_env):
+        """Test that EMBEDDING_MODEL_SHA256 is checked instead of the manifest."""
+        offline_env.setenv('EMBEDDING_MODEL_SHA256', '0' * 64)
+        with pytest.raises(ModelArtifactError, match="does not match"):
+            verify_model_dir(str(model_dir))
+
+    def test_unpinned_directory_rejected(self, model_dir, offline_env):
+        """Test that a directory without a manifest or pinned hash is not loaded."""
+        (model_dir / 'MANIFEST.json').unlink()
+        with pytest.raises(ModelArtifactError, match="No hash"):
+            verify_model_dir(str(model_dir))
+
+    def test_missing_directory_rejected(self, tmp_path, offline_env):
+        """Test that a missing directory is an error, not a reason to download."""
+        with pytest.raises(ModelArtifactError, match="does not exist"):
+            verify_model_dir(str(tmp_path / 'absent'))
+
+
+class TestOfflineLoading:
+    """Tests for loading the embedding model from the pinned directory."""
+
+    def test_name_used_without_model_dir(self, offline_env):
+        """Test that the model name is returned unchanged when no directory is configured."""
+        offline_env.delenv('EMBEDDING_MODEL_DIR', raising=False)
+        assert resolve_model('all-MiniLM-L6-v2') == 'all-MiniLM-L6-v2'
+        assert os.environ['HF_HUB_OFFLINE'] == '0'
+
+    def test_service_loads_from_directory_offline(self, model_dir, tmp_path, offline_env):
+        """Test that the service loads the verified directory with the hub offline."""
+        offline_env.setenv('EMBEDDING_MODEL_DIR', str(model_dir))
+        RecordingModel.loaded_from = []
+        with patch('sentence_transformers.SentenceTransformer', RecordingModel):
+            service = EmbeddingService(index_path=str(tmp_path / 'faiss_index'))
+            assert service.dimension == 8
+
+        assert RecordingModel.loaded_from == [str(model_dir)]
+        assert os.environ['HF_HUB_OFFLINE'] == '1'
+        assert service.get_readiness()['model_dir'] == str(model_dir)
+
+    def test_offline_before_sentence_transformers_import(self, model_dir, tmp_path, offline_env):
+        """Test that the hub is offline by the time sentence_transformers is imported."""
+        offline_env.setenv('EMBEDDING_MODEL_DIR', str(model_dir))
+        module = OfflineRecordingModule()
+        with patch.dict(sys.modules, {'sentence_transformers': module}):
+            EmbeddingService(index_path=str(tmp_path / 'faiss_index')).dimension
+
+        assert module.offline_at_import == ['1']
+
+    def test_offline_set_when_module_imported(self, model_dir):
+        """Test that importing model_artifacts with EMBEDDING_MODEL_DIR set switches the hub offline."""
+        env = {**os.environ, 'EMBEDDING_MODEL_DIR': str(model_dir), 'HF_HUB_OFFLINE': '0'}
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.abspath('src'), env.get('PYTHONPATH')]))
+        result = subprocess.run(
+            [sys.executable, '-c', "import os, miachat.api.core.model_artifacts; print(os.environ['HF_HUB_OFFLINE'])"],
+            capture_output=True, text=True, env=env, check=True
+        )
+        assert result.stdout.strip() == '1'
+
+    def test_service_refuses_altered_model(self, model_dir, tmp_path, offline_env):
+        """Test that a tampered artifact is reported and never loaded."""
+        offline_env.setenv('EMBEDDING_MODEL_DIR', str(model_dir))
+        (model_dir / 'model.safetensors').write_bytes(b'tampered')
+        RecordingModel.loaded_from = []
+        service = EmbeddingService(index_path=str(tmp_path / 'faiss_index'))
+
+        with patch('sentence_transformers.SentenceTransformer', RecordingModel):
+            with pytest.raises(ModelArtifactError):
+                service.create_embeddings(["hello"])
+
+        assert RecordingModel.loaded_from == []
+        assert "does not match" in service.get_readiness()['error']
+
+
+class TestOnnxArtifacts:
+    """Tests for verifying the ONNX export before it is loaded."""
+
+    def test_new_export_recorded_and_verified(self, tmp_path, onnx_backend, offline_env):
+        """Test that a fresh export gets a manifest and a later load verifies it."""
+        offline_env.setenv('EMBEDDING_ONNX_DIR', str(tmp_path / 'onnx'))
+        EmbeddingService(index_path=str(tmp_path / 'faiss_index')).dimension
+        assert verify_export_dir(str(tmp_path / 'onnx'))
+
+        (tmp_path / 'onnx' / 'model.onnx').write_text('tampered')
+        service = EmbeddingService(index_path=str(tmp_path / 'faiss_index'))
+        with pytest.raises(ModelArtifactError, match="does not match"):
+            service.dimension
+        assert onnx_backend.call_count == 1
+
+    def test_export_inside_model_dir_covered_by_its_hash(self, model_dir, tmp_path, onnx_backend, offline_env):
+        """Test that an export saved with the pinned model is verified with the model directory."""
+        fake_export(None, str(model_dir / 'onnx'))
+        write_manifest(str(model_dir), 'test-model')
+        offline_env.setenv('EMBEDDING_MODEL_DIR', str(model_dir))
+        offline_env.setenv('EMBEDDING_ONNX_DIR', str(model_dir / 'onnx'))
+        assert EmbeddingService(index_path=str(tmp_path / 'faiss_index')).dimension == 8
+
+        (model_dir / 'onnx' / 'model.onnx').write_text('tampered')
+        with pytest.raises(ModelArtifactError, match="does not match"):
+            EmbeddingService(index_path=str(tmp_path / 'faiss_index')).dimension
+
+    def test_unrecorded_export_refused_when_pinned(self, model_dir, tmp_path, onnx_backend, offline_env):
+        """Test that with a pinned model, an export without a manifest is not loaded."""
+        fake_export(None, str(tmp_path / 'onnx'))
+        offline_env.setenv('EMBEDDING_MODEL_DIR', str(model_dir))
+        offline_env.setenv('EMBEDDING_ONNX_DIR', str(tmp_path / 'onnx'))
+
+        with pytest.raises(ModelArtifactError, match="No MANIFEST.json"):
+            EmbeddingService(index_path=str(tmp_path / 'faiss_index')).dimension
+        onnx_backend.assert_not_called()
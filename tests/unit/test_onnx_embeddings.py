@@ -0,0 +1,135 @@
+"""
+Unit tests for the ONNX Runtime embedding backend.
+
+The parity tests export a tiny randomly initialised BERT model, so they
+need torch, transformers, sentence-transformers and onnxruntime but no
+downloaded weights.
+"""
+
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from miachat.api.core.model_artifacts import verify_export_dir
+from miachat.api.core.onnx_embeddings import (
+    OnnxEmbeddingModel, embedding_backend, export_onnx_model, onnx_model_exists
+)
+
+TEXTS = [
+    "hello world",
+    "the quick brown fox jumps over the lazy dog",
+    "a",
+    "notes about the project budget and the meeting schedule for next week " * 3,
+    "hello",
+]
+
+
+@pytest.fixture(scope="module")
+def torch_model(tmp_path_factory):
+    """SentenceTransformer over a small random BERT with mean pooling."""
+    st_models = pytest.importorskip("sentence_transformers.models")
+    pytest.importorskip("onnxruntime")
+    from sentence_transformers import SentenceTransformer
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    directory = tmp_path_factory.mktemp("bert")
+    words = sorted({word for text in TEXTS for word in text.split()})
+    vocab_file = directory / "vocab.txt"
+    vocab_file.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+    BertTokenizerFast(vocab_file=str(vocab_file)).save_pretrained(directory)
+    config = BertConfig(vocab_size=len(words) + 5, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=64)
+    BertModel(config).save_pretrained(directory)
+
+    transformer = st_models.Transformer(str(directory), max_seq_length=32)
+    pooling = st_models.Pooling(transformer.get_word_embedding_dimension(), 'mean')
+    return SentenceTransformer(modules=[transformer, pooling], device='cpu')
+
+
+def cosines(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+class TestOnnxParity:
+    """Tests that the ONNX backend agrees with the PyTorch backend."""
+
+    def test_full_precision_matches_torch(self, torch_model, tmp_path):
+        """Test that fp32 ONNX embeddings match PyTorch's, across padded batches."""
+        export_onnx_model(torch_model, str(tmp_path))
+        onnx_model = OnnxEmbeddingModel(str(tmp_path))
+
+        expected = torch_model.encode(TEXTS, normalize_embeddings=True)
+        actual = onnx_model.encode(TEXTS, normalize_embeddings=True, batch_size=2)
+
+        assert actual.shape == expected.shape
+        assert onnx_model.get_sentence_embedding_dimension() == torch_model.get_sentence_embedding_dimension()
+        assert cosines(actual, expected).min() > 0.9999
+        np.testing.assert_allclose(np.linalg.norm(actual, axis=1), 1.0, atol=1e-5)
+
+    def test_int8_close_to_torch(self, torch_model, tmp_path):
+        """Test that int8-quantized embeddings stay close to PyTorch's."""
+        export_onnx_model(torch_model, str(tmp_path), quantize=True)
+        assert onnx_model_exists(str(tmp_path), quantize=True)
+        onnx_model = OnnxEmbeddingModel(str(tmp_path), quantize=True)
+
+        expected = torch_model.encode(TEXTS, normalize_embeddings=True)
+        actual = onnx_model.encode(TEXTS)
+
+        assert cosines(actual, expected).min() > 0.95
+
+
+class TestBackendSelection:
+    """Tests for choosing the backend from the environment."""
+
+    def test_unknown_backend_falls_back_to_torch(self, monkeypatch):
+        """Test that an unrecognised EMBEDDING_BACKEND uses PyTorch."""
+        monkeypatch.setenv('EMBEDDING_BACKEND', 'tensorrt')
+        assert embedding_backend() == 'torch'
+        monkeypatch.setenv('EMBEDDING_BACKEND', 'ONNX')
+        assert embedding_backend() == 'onnx'
+
+    def test_incomplete_export_not_used(self, tmp_path):
+        """Test that a directory without the int8 weights does not count as a quantized export."""
+        for name in ('model.onnx', 'tokenizer.json', 'embedding_config.json'):
+            (tmp_path / name).write_text('')
+        assert onnx_model_exists(str(tmp_path))
+        assert not onnx_model_exists(str(tmp_path), quantize=True)
+
+
+def write_files(model, directory):
+    for name in ('model.onnx', 'tokenizer.json', 'embedding_config.json'):
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(name)
+
+
+class TestExport:
+    """Tests for writing the export atomically."""
+
+    def test_interrupted_export_leaves_nothing(self, tmp_path):
+        """Test that an export stopped half-way leaves neither the target nor staging files."""
+        def interrupted(model, directory):
+            open(os.path.join(directory, 'model.onnx'), 'w').close()
+            raise KeyboardInterrupt
+
+        with patch('miachat.api.core.onnx_embeddings._write_export', side_effect=interrupted):
+            with pytest.raises(KeyboardInterrupt):
+                export_onnx_model(None, str(tmp_path / 'onnx'), model_name='m')
+
+        assert os.listdir(tmp_path) == []
+
+    def test_partial_export_redone(self, tmp_path):
+        """Test that a directory left with only the graph by an older export is rebuilt completely."""
+        (tmp_path / 'onnx').mkdir()
+        (tmp_path / 'onnx' / 'model.onnx').write_text('partial')
+
+        with patch('miachat.api.core.onnx_embeddings._write_export', side_effect=write_files) as write:
+            export_onnx_model(None, str(tmp_path / 'onnx'), model_name='m')
+            export_onnx_model(None, str(tmp_path / 'onnx'), model_name='m')
+
+        assert write.call_count == 1
+        assert onnx_model_exists(str(tmp_path / 'onnx'))
+        assert (tmp_path / 'onnx' / 'model.onnx').read_text() == 'model.onnx'
+        assert verify_export_dir(str(tmp_path / 'onnx'))
+        assert sorted(os.listdir(tmp_path)) == ['onnx']
@@ -0,0 +1,141 @@
+"""
+Unit tests for ProviderHealthRegistry - cached provider availability.
+"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from miachat.api.core.llm_client import LLMClient
+from miachat.api.core.provider_health import ProviderHealthRegistry
+
+OLLAMA = "http://ollama.test:11434"
+
+
+def _tags_response(models):
+    response = MagicMock()
+    response.ok = True
+    response.json.return_value = {"models": [{"name": m} for m in models]}
+    return response
+
+
+class TestOllamaProbing:
+    """Tests for probe-backed (Ollama) entries."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.registry = ProviderHealthRegistry(fresh_ttl=60, max_stale=600)
+
+    @patch('miachat.api.core.provider_health.requests.get')
+    def test_first_read_probes_then_serves_cache(self, mock_get):
+        """Test that only the first read touches the network."""
+        mock_get.return_value = _tags_response(["llama3.1:8b"])
+
+        assert self.registry.is_available("ollama", OLLAMA, model="llama3.1:8b")
+        assert self.registry.is_available("ollama", OLLAMA, model="llama3.1:8b")
+        assert mock_get.call_count == 1
+
+    @patch('miachat.api.core.provider_health.requests.get')
+    def test_missing_model_is_unavailable(self, mock_get):
+        """Test that a model the probe did not see is reported unavailable."""
+        mock_get.return_value = _tags_response(["mistral:7b"])
+
+        assert not self.registry.is_available("ollama", OLLAMA, model="llama3.1:8b")
+
+    @patch('miachat.api.core.provider_health.requests.get')
+    def test_connection_error_is_unhealthy(self, mock_get):
+        """Test that an unreachable server is cached as unhealthy."""
+        import requests
+        mock_get.side_effect = requests.exceptions.ConnectionError()
+
+        entry = self.registry.get("ollama", OLLAMA)
+
+        assert entry.healthy is False
+        assert entry.error == "ConnectionError"
+
+    @patch('miachat.api.core.provider_health.requests.get')
+    def test_stale_entry_served_while_revalidating(self, mock_get):
+        """Test stale-while-revalidate: the stale value is returned immediately."""
+        mock_get.return_value = _tags_response([])
+        self.registry.refresh("ollama", OLLAMA)
+        self.registry._entries[("ollama", OLLAMA)].checked_at -= 120  # older than fresh_ttl
+
+        mock_get.return_value.ok = False
+        entry = self.registry.get("ollama", OLLAMA)
+        assert entry.healthy is True
+
+        deadline = time.monotonic() + 2
+        while self.registry.get("ollama", OLLAMA).healthy and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert self.registry.get("ollama", OLLAMA).healthy is False
+
+    @patch('miachat.api.core.provider_health.requests.get')
+    def test_failed_call_marks_unhealthy_immediately(self, mock_get):
+        """Test that a failed real call overrides a healthy probe result."""
+        mock_get.return_value = _tags_response(["llama3.1:8b"])
+        assert self.registry.is_available("ollama", OLLAMA)
+
+        self.registry.mark_unhealthy("ollama", OLLAMA, "timeout")
+
+        assert not self.registry.is_available("ollama", OLLAMA)
+        assert self.registry.get("ollama", OLLAMA).models == ["llama3.1:8b"]
+
+
+class TestCloudProviders:
+    """Tests for unprobed (cloud) providers."""
+
+    def test_unknown_provider_is_available(self):
+        """Test that cloud providers are assumed healthy until a call fails."""
+        registry = ProviderHealthRegistry()
+
+        assert registry.is_available("openai")
+        assert registry.snapshot() == []
+
+    def test_failure_benches_for_cooldown(self):
+        """Test that a failed call benches the provider until the cool-down ends."""
+        registry = ProviderHealthRegistry(unhealthy_cooldown=30)
+        registry.mark_unhealthy("openai", error="connect")
+
+        assert not registry.is_available("openai")
+
+        registry._entries[("openai", "")].checked_at -= 31
+        assert registry.is_available("openai")
+
+    def test_success_restores_provider(self):
+        """Test that a successful call marks the provider healthy again."""
+        registry = ProviderHealthRegistry()
+        registry.mark_unhealthy("anthropic", error="timeout")
+        registry.mark_healthy("anthropic")
+
+        assert registry.is_available("anthropic")
+        assert registry.snapshot()[0]["healthy"] is True
+
+
+class TestLLMClientReporting:
+    """Tests for LLMClient reporting call outcomes to the registry."""
+
+    @pytest.mark.asyncio
+    async def test_connect_error_marks_unhealthy(self):
+        """Test that a failed async call marks the provider unhealthy."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("refused", request=request)
+
+        registry = ProviderHealthRegistry()
+        client = LLMClient(transport=httpx.MockTransport(handler))
+        with patch('miachat.api.core.llm_client.provider_health', registry):
+            await client.agenerate_response_with_config([], None, {"provider": "openai", "api_key": "k"})
+
+        assert not registry.is_available("openai")
+
+    @pytest.mark.asyncio
+    async def test_client_error_does_not_mark_unhealthy(self):
+        """Test that a 4xx (e.g. bad key) says nothing about provider health."""
+        registry = ProviderHealthRegistry()
+        client = LLMClient(transport=httpx.MockTransport(lambda r: httpx.Response(401, json={})))
+        with patch('miachat.api.core.llm_client.provider_health', registry):
+            await client.agenerate_response_with_config([], None, {"provider": "openai", "api_key": "k"})
+
+        assert registry.is_available("openai")
+        assert registry.snapshot() == []
@@ -0,0 +1,380 @@
+"""
+Unit tests for IndexPartition - per-user FAISS index with tombstones.
+"""
+
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from miachat.api.core.vector_index import AnnConfig, IndexPartition, read_directory_generation
+
+DIMENSION = 8
+
+
+def unit_vectors(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def partition(tmp_path):
+    """Partition with ten chunks c0..c9."""
+    partition = IndexPartition(1, DIMENSION, str(tmp_path))
+    partition.add([f"c{i}" for i in range(10)], unit_vectors(10))
+    return partition
+
+
+class TestTombstones:
+    """Tests for removing vectors."""
+
+    def test_removed_chunk_never_returned(self, partition):
+        """Test that a tombstoned vector is excluded from searches at once."""
+        vectors = unit_vectors(10)
+        partition.remove(['c3'])
+
+        hits = partition.search(vectors[3:4], 10)
+
+        assert 'c3' not in [chunk_id for chunk_id, _ in hits]
+        assert len(hits) == 9
+        assert (partition.live_count, partition.dead_count) == (9, 1)
+
+    def test_readding_chunk_replaces_old_vector(self, partition):
+        """Test that re-embedding a chunk tombstones its previous vector."""
+        partition.add(['c0'], unit_vectors(1, seed=99))
+
+        hits = partition.search(unit_vectors(1, seed=99), 10)
+
+        assert [chunk_id for chunk_id, _ in hits].count('c0') == 1
+        assert hits[0][0] == 'c0'
+        assert partition.dead_count == 1
+
+    def test_compact_removes_dead_vectors(self, partition):
+        """Test that compaction physically drops tombstoned vectors."""
+        partition.remove(['c1', 'c2', 'c3'])
+
+        assert partition.dead_ratio() == pytest.approx(0.3)
+        assert partition.compact() == 3
+
+        assert partition.ntotal == 7
+        assert partition.dead_count == 0
+        assert len(partition.search(unit_vectors(1), 10)) == 7
+
+
+class TestPersistence:
+    """Tests for saving and loading partitions."""
+
+    def test_round_trip_keeps_labels_and_tombstones(self, partition, tmp_path):
+        """Test that a loaded partition has the same live and dead vectors."""
+        partition.remove(['c5'])
+        partition.checkpoint()
+
+        loaded = IndexPartition.load(1, DIMENSION, str(tmp_path))
+
+        assert (loaded.live_count, loaded.dead_count) == (9, 1)
+        assert loaded.next_label == partition.next_label
+        assert loaded.search(unit_vectors(10)[4:5], 1)[0][0] == 'c4'
+
+    def test_missing_files_load_as_none(self, tmp_path):
+        """Test that loading a partition that was never saved returns None."""
+        assert IndexPartition.load(42, DIMENSION, str(tmp_path)) is None
+
+
+class TestDeltaLog:
+    """Tests for incremental, crash-safe persistence."""
+
+    def test_writes_after_checkpoint_replayed(self, partition, tmp_path):
+        """Test that adds and removes since the checkpoint are replayed on load."""
+        partition.checkpoint()
+        checkpoint_size = (tmp_path / '1.ckpt').stat().st_size
+        partition.add(['n0'], unit_vectors(1, seed=7))
+        partition.remove(['c2'])
+
+        loaded = IndexPartition.load(1, DIMENSION, str(tmp_path))
+
+        assert (tmp_path / '1.ckpt').stat().st_size == checkpoint_size  # appends never rewrite it
+        assert loaded.search(unit_vectors(1, seed=7), 1)[0][0] == 'n0'
+        assert 'c2' not in loaded.chunk_labels
+        assert loaded.live_count == 10
+
+    def test_torn_tail_dropped(self, partition, tmp_path):
+        """Test that a half-written record from a crash is discarded."""
+        partition.checkpoint()
+        partition.add(['n0'], unit_vectors(1, seed=7))
+        with open(tmp_path / '1.log', 'ab') as f:
+            f.write(b'A\x10\x00\x00')  # crash mid-record
+
+        loaded = IndexPartition.load(1, DIMENSION, str(tmp_path))
+        loaded.add(['n1'], unit_vectors(1, seed=8))
+        reloaded = IndexPartition.load(1, DIMENSION, str(tmp_path))
+
+        assert {'n0', 'n1'} <= set(reloaded.chunk_labels)
+        assert reloaded.live_count == 12
+
+    def test_stale_log_from_interrupted_checkpoint_ignored(self, partition, tmp_path):
+        """Test that a log older than the checkpoint is not applied twice."""
+        partition.checkpoint()
+        partition.add(['n0'], unit_vectors(1, seed=7))
+        stale_log = (tmp_path / '1.log').read_bytes()
+        partition.checkpoint()
+        (tmp_path / '1.log').write_bytes(stale_log)  # crash before the log was reset
+
+        loaded = IndexPartition.load(1, DIMENSION, str(tmp_path))
+
+        assert loaded.live_count == 11
+        assert loaded.dead_count == 0
+
+    def test_corrupt_checkpoint_loads_as_none(self, partition, tmp_path):
+        """Test that an unreadable checkpoint is reported so the caller can rebuild."""
+        partition.checkpoint()
+        (tmp_path / '1.ckpt').write_bytes(b'garbage')
+
+        assert IndexPartition.load(1, DIMENSION, str(tmp_path)) is None
+
+
+class TestSnapshots:
+    """Tests for lock-free reads against published generations."""
+
+    def test_held_snapshot_unaffected_by_writes(self, partition):
+        """Test that a reader's snapshot keeps its index and mapping while writers publish new ones."""
+        vectors = unit_vectors(10)
+        snapshot = partition.snapshot()
+
+        partition.remove(['c1', 'c2'])
+        partition.compact()
+        partition.add(['c1'], unit_vectors(1, seed=5))
+
+        assert snapshot.search(vectors[2:3], 1)[0][0] == 'c2'
+        assert snapshot.index.ntotal == 10
+        assert partition.snapshot().version > snapshot.version
+        assert 'c2' not in [chunk_id for chunk_id, _ in partition.search(vectors[2:3], 10)]
+
+    def test_concurrent_writes_and_searches_stay_consistent(self, tmp_path):
+        """Test that interleaved adds, removes and searches never see a torn index or mapping."""
+        vectors = unit_vectors(200, seed=1)
+        partition = IndexPartition(1, DIMENSION, str(tmp_path))
+        partition.add([f"c{i}" for i in range(100)], vectors[:100])
+        errors = []
+        stop = threading.Event()
+
+        def writer():
+            rng = np.random.default_rng(2)
+            for _ in range(300):
+                ids = rng.choice(200, size=5, replace=False)
+                if rng.random() < 0.5:
+                    partition.add([f"c{i}" for i in ids], vectors[ids])
+                else:
+                    partition.remove([f"c{i}" for i in ids])
+                if partition.dead_ratio() > 0.3:
+                    partition.compact()
+            stop.set()
+
+        def reader(seed):
+            rng = np.random.default_rng(seed)
+            while not stop.is_set():
+                query = vectors[rng.integers(200)][None, :]
+                snapshot = partition.snapshot()
+                hits = snapshot.search(query, 10)
+                chunk_ids = [chunk_id for chunk_id, _ in hits]
+                if len(set(chunk_ids)) != len(chunk_ids):
+                    errors.append(f"duplicate hits {chunk_ids}")
+                for chunk_id, score in hits:
+                    # Every hit is live in its snapshot and scored against its own vector
+                    if chunk_id not in snapshot.chunk_labels:
+                        errors.append(f"{chunk_id} not live in generation {snapshot.version}")
+                    expected = float(query[0] @ vectors[int(chunk_id[1:])])
+                    if abs(score - expected) > 1e-4:
+                        errors.append(f"{chunk_id} scored {score}, expected {expected}")
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(s,)) for s in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert partition.live_count == len(partition.chunk_labels)
+        assert partition.ntotal == len(partition.labels)
+
+
+class TestAnnIndex:
+    """Tests for approximate index kinds."""
+
+    @pytest.mark.parametrize('kind', ['hnsw', 'ivf', 'ivfpq'])
+    def test_converted_partition_finds_and_filters(self, tmp_path, kind):
+        """Test that a converted partition still finds vectors and skips tombstones."""
+        vectors = unit_vectors(400, seed=3)
+        partition = IndexPartition(1, DIMENSION, str(tmp_path), ann=AnnConfig(kind=kind, nprobe=64))
+        partition.add([f"c{i}" for i in range(400)], vectors)
+
+        partition.convert(kind)
+        partition.remove(['c7'])
+
+        assert partition.kind == kind
+        assert partition.search(vectors[5:6], 1)[0][0] == 'c5'
+        assert 'c7' not in [chunk_id for chunk_id, _ in partition.search(vectors[7:8], 10)]
+
+    def test_kind_survives_checkpoint(self, tmp_path):
+        """Test that a reloaded partition keeps its approximate index."""
+        vectors = unit_vectors(50, seed=4)
+        partition = IndexPartition(1, DIMENSION, str(tmp_path), ann=AnnConfig(kind='hnsw'))
+        partition.add([f"c{i}" for i in range(50)], vectors)
+        partition.convert('hnsw')
+        partition.checkpoint()
+
+        loaded = IndexPartition.load(1, DIMENSION, str(tmp_path))
+
+        assert loaded.kind == 'hnsw'
+        assert loaded.search(vectors[9:10], 1)[0][0] == 'c9'
+
+    def test_hnsw_compaction_rebuilds_live_vectors(self, tmp_path):
+        """Test that compacting an HNSW partition drops dead vectors by rebuilding."""
+        vectors = unit_vectors(50, seed=5)
+        partition = IndexPartition(1, DIMENSION, str(tmp_path), ann=AnnConfig(kind='hnsw'))
+        partition.add([f"c{i}" for i in range(50)], vectors)
+        partition.convert('hnsw')
+        partition.remove([f"c{i}" for i in range(10)])
+
+        assert partition.compact() == 10
+        assert (partition.kind, partition.ntotal, partition.dead_count) == ('hnsw', 40, 0)
+        assert partition.search(vectors[20:21], 1)[0][0] == 'c20'
+
+    def test_wants_ann_past_threshold(self, tmp_path):
+        """Test that only flat partitions at the threshold ask to be converted."""
+        partition = IndexPartition(1, DIMENSION, str(tmp_path), ann=AnnConfig(threshold=10))
+        partition.add([f"c{i}" for i in range(9)], unit_vectors(9))
+        assert not partition.wants_ann()
+
+        partition.add(['c9'], unit_vectors(1, seed=9))
+        assert partition.wants_ann()
+
+        partition.convert('hnsw')
+        assert not partition.wants_ann()
+
+
+class TestQuantization:
+    """Tests for scalar-quantized storage."""
+
+    @pytest.mark.parametrize('codec', ['sq8', 'sq4'])
+    def test_quantized_partition_smaller_and_searchable(self, tmp_path, codec):
+        """Test that quantizing shrinks the vectors and keeps nearest neighbours findable."""
+        vectors = unit_vectors(300, seed=6)
+        partition = IndexPartition(1, DIMENSION, str(tmp_path), ann=AnnConfig(quantization=codec))
+        partition.add([f"c{i}" for i in range(300)], vectors)
+        float_bytes = partition.memory_bytes()
+
+        partition.convert('flat')
+
+        assert (partition.codec, partition.lossy) == (codec, True)
+        assert partition.memory_bytes() < float_bytes
+        assert partition.full_precision_bytes() == float_bytes
+        assert 'c42' in [chunk_id for chunk_id, _ in partition.search(vectors[42:43], 5)]
+
+    def test_quantized_hnsw(self, tmp_path):
+        """Test that an HNSW partition can store quantized codes."""
+        vectors = unit_vectors(300, seed=7)
+        partition = IndexPartition(1, DIMENSION, str(tmp_path), ann=AnnConfig(quantization='sq8'))
+        partition.add([f"c{i}" for i in range(300)], vectors)
+
+        partition.convert('hnsw')
+
+        assert (partition.kind, partition.codec) == ('hnsw', 'sq8')
+        assert partition.search(vectors[42:43], 1)[0][0] == 'c42'
+
+    def test_wants_quantization_past_minimum(self, tmp_path):
+        """Test that only float32 partitions with enough vectors ask to be quantized."""
+        partition = IndexPartition(1, DIMENSION, str(tmp_path), ann=AnnConfig(quantization='sq8', quantize_min_vectors=5))
+        partition.add([f"c{i}" for i in range(5)], unit_vectors(5))
+        assert partition.wants_quantization()
+
+        partition.convert('flat')
+        assert not partition.wants_quantization()
+
+
+class TestMappedCheckpoints:
+    """Tests for memory-mapped index files."""
+
+    def test_loaded_index_is_mapped_and_writable(self, partition, tmp_path):
+        """Test that a loaded partition maps its index file and copies it before writing."""
+        partition.checkpoint()
+
+        loaded = IndexPartition.load(1, DIMENSION, str(tmp_path))
+        assert loaded.mapped
+        loaded.add(['new'], unit_vectors(1, seed=11))
+
+        assert not loaded.mapped
+        assert loaded.search(unit_vectors(1, seed=11), 1)[0][0] == 'new'
+        assert loaded.search(unit_vectors(10)[4:5], 1)[0][0] == 'c4'
+
+    def test_checkpoint_maps_new_file_and_removes_old(self, partition, tmp_path):
+        """Test that each checkpoint serves its own file and leaves only that one behind."""
+        partition.checkpoint()
+        partition.add(['new'], unit_vectors(1, seed=12))
+        partition.checkpoint()
+
+        assert partition.mapped
+        assert sorted(f for f in os.listdir(tmp_path) if f.endswith('.index')) == [f"1.{partition.generation}.index"]
+
+    def test_tombstone_checkpoint_reuses_index_file(self, partition, tmp_path):
+        """Test that a checkpoint after removals only rewrites the mapping."""
+        partition.checkpoint()
+        index_files = [f for f in os.listdir(tmp_path) if f.endswith('.index')]
+        partition.remove(['c1'])
+        partition.checkpoint()
+
+        assert [f for f in os.listdir(tmp_path) if f.endswith('.index')] == index_files
+        assert IndexPartition.load(1, DIMENSION, str(tmp_path)).dead_count == 1
+
+    def test_unchanged_partition_not_rewritten(self, partition, tmp_path):
+        """Test that checkpointing an unchanged partition writes nothing."""
+        partition.checkpoint()
+        token = read_directory_generation(str(tmp_path))
+
+        partition.checkpoint()
+
+        assert read_directory_generation(str(tmp_path)) == token
+
+
+def _shared_writer(directory, prefix, seed):
+    partition = IndexPartition(1, DIMENSION, directory)
+    vectors = unit_vectors(10, seed=seed)
+    for i in range(10):
+        partition.add([f"{prefix}{i}"], vectors[i:i + 1])
+
+
+class TestSharedIndex:
+    """Tests for partitions shared by several processes."""
+
+    @pytest.fixture(autouse=True)
+    def shared(self, monkeypatch):
+        monkeypatch.setenv('FAISS_SHARED_INDEX', 'true')
+
+    def test_refresh_picks_up_other_writers(self, tmp_path):
+        """Test that a process sees another process's checkpoint and builds on it."""
+        first = IndexPartition(1, DIMENSION, str(tmp_path))
+        second = IndexPartition(1, DIMENSION, str(tmp_path))
+
+        first.add(['a'], unit_vectors(1, seed=1))
+        assert second.refresh()
+        second.add(['b'], unit_vectors(1, seed=2))  # catches up before writing
+
+        assert first.refresh()
+        assert set(first.chunk_labels) == {'a', 'b'}
+        assert not first.refresh()
+
+    def test_concurrent_processes_do_not_lose_writes(self, tmp_path):
+        """Test that writes from separate processes are serialized by the file lock."""
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_shared_writer, args=(str(tmp_path), prefix, seed))
+                   for prefix, seed in (('x', 1), ('y', 2))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+
+        loaded = IndexPartition.load(1, DIMENSION, str(tmp_path))
+        assert [worker.exitcode for worker in workers] == [0, 0]
+        assert loaded.live_count == 20